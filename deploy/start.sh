@@ -12,6 +12,9 @@ UI_PORT="${PORT:-8501}"
 mkdir -p "${APP_ROOT}/milestone3/outputs" || true
 
 export BACKEND_URL="${BACKEND_URL:-http://127.0.0.1:${BACKEND_PORT}}"
+# Streamlit calls the API from loopback on behalf of every user: treat it as a proxy so
+# the per-IP login limit does not become one shared cap (see README_API.md).
+export CLAUSEAI_TRUSTED_PROXIES="${CLAUSEAI_TRUSTED_PROXIES:-127.0.0.1,::1}"
 
 echo "Starting FastAPI backend on :${BACKEND_PORT} ..."
 python -m uvicorn app:app \
@@ -1,29 +1,52 @@
 from __future__ import annotations
 
-import io
+import asyncio
+import hmac
 import os
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Optional
+from pathlib import Path
+from typing import Any, List, Optional, Tuple, Union
 
-from fastapi import FastAPI, File, Form, Header, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, Header, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
 
-from contract_pipeline import run_full_pipeline, stable_contract_id
+from bulk_ingest import DEFAULT_CORPUS_DIR
+from contract_compare import compare_contracts
+from contract_pipeline import Deadline, LocalRAGIndex, StageCosts, extract_document_text, run_full_pipeline, stable_contract_id
 from db_sqlite import (
     create_user,
+    analysis_run_size_report,
     delete_analysis_run,
+    get_analysis_result,
+    get_analysis_result_field,
     get_analysis_run,
     init_db,
-    list_analysis_runs,
     login,
+    ResultUnavailable,
     save_analysis_run,
+    search_analysis_runs,
     seed_demo_users,
     user_from_token,
 )
+from clause_lsh import NearDuplicateLookup, lsh_db_path
+from corpus_index import ANN_DIRNAME, CorpusIndex
+from embedding_cache import attach_cache
+from embedding_service import attach_batching
+from facts_store import facts_db_path, query_facts
+from response_encoding import json_response
+from revisions import REVISIONS_DIR, RevisionResult, index_revision, owner_root
+import metrics
+from profiling import RequestProfile, list_profiles, new_request_id, profile_file, profile_scope
+from password_hashing import ACCOUNT_THROTTLE, IP_THROTTLE, HashPoolBusy, hash_metrics, shutdown_pool
 
 
 app = FastAPI(title="Contract Analysis API (Milestone 3)", version="1.0")
+# Learned durations of the optional pipeline stages, shared by all requests' deadlines.
+app.state.stage_costs = StageCosts()
 
 # CORS for browser-based UIs (Milestone 4).
 # Configure with env var FRONTEND_ORIGINS="http://localhost:5173,http://localhost:3000"
@@ -46,6 +69,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.watch_queue("hash_pool", lambda: hash_metrics()["inflight"])
 
 
 def _bearer_token(auth_header: str | None) -> str | None:
@@ -69,12 +95,30 @@ def _require_user(authorization: str | None) -> dict:
     return user
 
 
+def _admin_emails() -> set[str]:
+    """CLAUSEAI_ADMIN_EMAILS (comma-separated). The self-chosen `role` at /auth/register does not grant admin."""
+    return {e.strip().lower() for e in os.getenv("CLAUSEAI_ADMIN_EMAILS", "").split(",") if e.strip()}
+
+
+def _require_admin(authorization: str | None) -> dict:
+    user = _require_user(authorization)
+    if (user.get("email") or "").strip().lower() not in _admin_emails():
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
 class AnalyzeTextRequest(BaseModel):
     contract_text: str = Field(..., description="Extracted contract text")
     question: str = Field(..., description="User question")
     tone: str = Field("executive", description="executive | simple")
     no_evidence_threshold: float = Field(0.25, ge=0.0, le=1.0)
     contract_id: Optional[str] = None
+    previous_contract_id: Optional[str] = Field(
+        None, description="contract_id of the previous version: reuses its embeddings and returns a clause diff"
+    )
+    track_revisions: bool = Field(
+        False, description="Store this upload's index so a later upload can name it as previous_contract_id"
+    )
     intent_override: Optional[str] = Field(
         None,
         description="Optional intent override: fact_summary | qa | clause_extraction | risk_analysis | executive_review",
@@ -83,6 +127,20 @@ class AnalyzeTextRequest(BaseModel):
         False,
         description="If true, force running all agents for Launch Analysis (executive report), regardless of query topic.",
     )
+    include_agent_analysis: bool = Field(
+        False,
+        description="If true, return full per-agent retrieval dumps (same as agent_detail=full).",
+    )
+    agent_detail: Optional[str] = Field(
+        None,
+        description="Per-agent output level: none | summary (default: risk level + confidence) | full",
+    )
+    compact: bool = Field(False, description="If true, emit repeated chunk text once in a `chunks` table.")
+    fields: Optional[str] = Field(None, description="Comma-separated dotted paths to return, e.g. report,analysis.overall_risk")
+    deadline_ms: Optional[float] = Field(
+        None, gt=0, description="Response budget: optional stages are skipped or cut short to fit; see `deadline` in the response"
+    )
+    timings: bool = Field(False, description="If true, add per-stage durations (`timings`) to the response")
 
 
 class RegisterRequest(BaseModel):
@@ -107,47 +165,73 @@ class HistorySaveRequest(BaseModel):
     results: list[dict] = []
 
 
-def _utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+class CorpusSearchRequest(BaseModel):
+    query: str = Field(..., description="Free-text query")
+    top_k: int = Field(10, ge=1, le=100)
+    nprobe: int = Field(16, ge=1, le=1024, description="IVF lists to scan (higher = better recall, slower)")
+    contract_ids: Optional[List[str]] = Field(None, description="Restrict results to these contracts")
+    exact: bool = Field(False, description="Brute-force search (ground truth; slower on large corpora)")
 
 
-async def _read_upload_text(upload: UploadFile) -> str:
-    data = await upload.read()
-    if not data:
-        return ""
+class FactFilter(BaseModel):
+    fact: str = Field(..., description="payment_days | late_fee_pct | termination_notice_days | liability_cap | uptime_pct | ...")
+    op: str = Field("exists", description="eq | ne | lt | lte | gt | gte | in | exists | missing")
+    value: Optional[Union[float, str, List[Union[float, str]]]] = None
 
-    name = (upload.filename or "").lower()
-    content_type = (upload.content_type or "").lower()
 
-    # Plain text
-    if name.endswith(".txt") or content_type.startswith("text/"):
-        return data.decode("utf-8", errors="ignore")
+class FactsQueryRequest(BaseModel):
+    filters: List[FactFilter] = []
+    sort: Optional[str] = Field(None, description="Fact to sort contracts by (numeric value)")
+    order: str = Field("asc", description="asc | desc")
+    limit: int = Field(50, ge=1, le=1000)
+    offset: int = Field(0, ge=0)
+    aggregate: List[str] = Field([], description="Facts to summarize over all matching contracts")
+    evidence_facts: Optional[List[str]] = Field(None, description="Facts to return as evidence (default: filtered + sort facts)")
 
-    # PDF
-    if name.endswith(".pdf") or content_type == "application/pdf":
-        try:
-            from PyPDF2 import PdfReader
 
-            reader = PdfReader(io.BytesIO(data))
-            pages = []
-            for p in reader.pages:
-                pages.append(p.extract_text() or "")
-            return "\n".join(pages)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Could not parse PDF: {e}")
+class CompareRequest(BaseModel):
+    contract_ids: List[str] = Field(..., min_length=2, max_length=8, description="Ingested contract ids")
+    reference: Optional[str] = Field(None, description="Contract the others are diffed against (default: first id)")
 
-    # DOCX
-    if name.endswith(".docx"):
-        try:
-            import docx
 
-            doc = docx.Document(io.BytesIO(data))
-            return "\n".join([p.text for p in doc.paragraphs if p.text])
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Could not parse DOCX: {e}")
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
 
-    # Fallback: treat as utf-8 text
-    return data.decode("utf-8", errors="ignore")
+
+def _analyze_payload(
+    cid: str, final_json: dict, report: str, revision: Optional[dict] = None, timings: Optional[metrics.Timings] = None
+) -> dict:
+    return {
+        "contract_id": cid,
+        "generated_at": final_json.get("generated_at"),
+        "intent": final_json.get("intent"),
+        "question": final_json.get("question"),
+        "qa": final_json.get("qa"),
+        "analysis": final_json.get("analysis"),
+        "agent_analysis": final_json.get("agent_analysis"),
+        "confidence": final_json.get("confidence"),
+        "no_evidence": final_json.get("no_evidence"),
+        "evidence_score": final_json.get("evidence_score"),
+        "near_duplicates": final_json.get("near_duplicates"),
+        "revision": revision,
+        "deadline": final_json.get("deadline"),
+        "timings": timings.summary() if timings is not None else None,
+        "report": report,
+    }
+
+
+def _agent_detail(include_agent_analysis: bool, agent_detail: Optional[str]) -> str:
+    if (agent_detail or "").strip():
+        return agent_detail.strip().lower()
+    return "full" if include_agent_analysis else "summary"
+
+
+async def _read_upload_text(upload: UploadFile) -> str:
+    data = await upload.read()
+    try:
+        return extract_document_text(data, filename=upload.filename or "", content_type=upload.content_type or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/health")
@@ -161,23 +245,141 @@ def _startup():
     seed_demo_users()
 
 
+@app.on_event("shutdown")
+def _shutdown():
+    shutdown_pool()
+    for embedder in _EMBEDDER:
+        if embedder.encode_service is not None:
+            embedder.encode_service.close()
+
+
+def _trusted_proxies() -> set[str]:
+    """CLAUSEAI_TRUSTED_PROXIES (comma-separated peer addresses, e.g. the bundled UI or a load balancer)."""
+    return {p.strip() for p in os.getenv("CLAUSEAI_TRUSTED_PROXIES", "").split(",") if p.strip()}
+
+
+def _client_ip(request: Request) -> Optional[str]:
+    """Address the per-IP login limit counts against, or None when it is unknown.
+
+    Behind a trusted proxy the client is the last X-Forwarded-For hop not added by a
+    trusted proxy. A trusted peer that forwards no address (the Streamlit UI) gets no
+    per-IP key: its own address would turn the limit into one cap for every user.
+    """
+    peer = (request.client.host if request.client else "") or "unknown"
+    trusted = _trusted_proxies()
+    if peer not in trusted:
+        return peer
+    hops = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+    return next((h for h in reversed(hops) if h not in trusted), None)
+
+
+def _ip_key(request: Request) -> Optional[str]:
+    ip = _client_ip(request)
+    return f"ip:{ip}" if ip else None
+
+
+def _throttle_or_429(*, ip_key: Optional[str], account_key: Optional[str] = None) -> None:
+    """Reject before any hashing happens so throttled attempts cost no CPU.
+
+    Every attempt counts against the account; the IP window only counts failures
+    (see `_count_failure`), so one client's successful logins never lock out others.
+    """
+    ip_keys = [ip_key] if ip_key else []
+    account_keys = [account_key] if account_key else []
+    waits = [w for w in (IP_THROTTLE.retry_after(ip_keys), ACCOUNT_THROTTLE.retry_after(account_keys)) if w is not None]
+    if waits:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts. Please wait and try again.",
+            headers={"Retry-After": str(max(1, int(max(waits) + 0.999)))},
+        )
+    ACCOUNT_THROTTLE.hit(account_keys)
+
+
+def _count_failure(ip_key: Optional[str]) -> None:
+    IP_THROTTLE.hit([ip_key] if ip_key else [])
+
+
+def _busy_503() -> HTTPException:
+    return HTTPException(status_code=503, detail="Authentication is busy. Please retry.", headers={"Retry-After": "1"})
+
+
 @app.post("/auth/register")
-def register(req: RegisterRequest):
-    ok, msg = create_user(email=req.email, password=req.password, name=req.name, role=req.role)
+def register(req: RegisterRequest, request: Request):
+    ip_key = _ip_key(request)
+    _throttle_or_429(ip_key=ip_key)
+    try:
+        ok, msg = create_user(email=req.email, password=req.password, name=req.name, role=req.role)
+    except HashPoolBusy:
+        raise _busy_503()
     if not ok:
+        _count_failure(ip_key)
         raise HTTPException(status_code=400, detail=msg)
     return {"ok": True, "message": msg}
 
 
 @app.post("/auth/login")
-def auth_login(req: LoginRequest):
-    res = login(email=req.email, password=req.password)
+def auth_login(req: LoginRequest, request: Request):
+    account_key = f"acct:{(req.email or '').strip().lower()}"
+    ip_key = _ip_key(request)
+    _throttle_or_429(ip_key=ip_key, account_key=account_key)
+    try:
+        res = login(email=req.email, password=req.password)
+    except HashPoolBusy:
+        raise _busy_503()
     if not res:
+        _count_failure(ip_key)
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    # Successful login clears the per-account window (the IP window holds failures only).
+    ACCOUNT_THROTTLE.reset([account_key])
     token, user = res
     return {"ok": True, "token": token, "user": user}
 
 
+@app.get("/auth/hash_metrics")
+def auth_hash_metrics(authorization: str | None = Header(default=None)):
+    _require_user(authorization)
+    return {"ok": True, "metrics": hash_metrics()}
+
+
+@app.get("/metrics")
+def metrics_endpoint(authorization: str | None = Header(default=None)) -> Response:
+    """Prometheus scrape target. Set CLAUSEAI_METRICS_TOKEN to require `Authorization: Bearer <token>`."""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (CLAUSEAI_METRICS=0)")
+    token = os.getenv("CLAUSEAI_METRICS_TOKEN", "").strip()
+    if token and not hmac.compare_digest(_bearer_token(authorization) or "", token):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/admin/profiles")
+def admin_profiles(limit: int = 50, authorization: str | None = Header(default=None)):
+    _require_admin(authorization)
+    return {"ok": True, "profiles": list_profiles(limit=limit)}
+
+
+@app.get("/admin/profiles/{profile_id}")
+def admin_profile_get(profile_id: str, authorization: str | None = Header(default=None)):
+    _require_admin(authorization)
+    try:
+        path = profile_file(profile_id, "json")
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(path.read_bytes(), media_type="application/json")
+
+
+@app.get("/admin/profiles/{profile_id}/download")
+def admin_profile_download(profile_id: str, authorization: str | None = Header(default=None)):
+    """The merged cProfile stats (`pstats.Stats(path)`, snakeviz); 404 for memory-only profiles."""
+    _require_admin(authorization)
+    try:
+        path = profile_file(profile_id, "prof")
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Profile has no CPU stats")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+
 @app.get("/auth/me")
 def auth_me(authorization: str | None = Header(default=None)):
     user = _require_user(authorization)
@@ -185,10 +387,32 @@ def auth_me(authorization: str | None = Header(default=None)):
 
 
 @app.get("/history")
-def history_list(limit: int = 10, authorization: str | None = Header(default=None)):
+def history_list(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    mode: Optional[str] = None,
+    q: Optional[str] = None,
+    filename: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    authorization: str | None = Header(default=None),
+):
+    """Server-side filtered history. Pass `next_cursor` back as `cursor` for the next page."""
     user = _require_user(authorization)
-    runs = list_analysis_runs(user_email=user["email"], limit=limit)
-    return {"ok": True, "runs": runs}
+    try:
+        page = search_analysis_runs(
+            user_email=user["email"],
+            limit=limit,
+            cursor=cursor,
+            mode=mode,
+            q=q,
+            filename=filename,
+            date_from=date_from,
+            date_to=date_to,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ok": True, "runs": page["runs"], "next_cursor": page["next_cursor"]}
 
 
 @app.post("/history/save")
@@ -208,14 +432,47 @@ def history_save(req: HistorySaveRequest, authorization: str | None = Header(def
 
 
 @app.get("/history/{run_id}")
-def history_get(run_id: int, authorization: str | None = Header(default=None)):
+def history_get(run_id: int, lazy: bool = False, authorization: str | None = Header(default=None)):
+    """Saved run. `lazy=true` skips large result fields (listed per result in `_lazy_fields`)."""
     user = _require_user(authorization)
-    run = get_analysis_run(user_email=user["email"], run_id=run_id)
+    run = get_analysis_run(user_email=user["email"], run_id=run_id, lazy=lazy)
     if not run:
         raise HTTPException(status_code=404, detail="Not found")
     return {"ok": True, "run": run}
 
 
+@app.get("/history/{run_id}/results/{position}")
+def history_get_result(run_id: int, position: int, authorization: str | None = Header(default=None)):
+    user = _require_user(authorization)
+    result = get_analysis_result(user_email=user["email"], run_id=run_id, position=position)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return {"ok": True, "result": result}
+
+
+@app.get("/history/{run_id}/results/{position}/{field}")
+def history_get_result_field(
+    run_id: int, position: int, field: str, authorization: str | None = Header(default=None)
+):
+    user = _require_user(authorization)
+    try:
+        value = get_analysis_result_field(user_email=user["email"], run_id=run_id, position=position, field=field)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Not found")
+    except ResultUnavailable:
+        raise HTTPException(status_code=410, detail="Result unavailable: stored data is corrupt")
+    return {"ok": True, "field": field, "value": value}
+
+
+@app.get("/history/{run_id}/size")
+def history_size(run_id: int, authorization: str | None = Header(default=None)):
+    user = _require_user(authorization)
+    report = analysis_run_size_report(user_email=user["email"], run_id=run_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return {"ok": True, "size": report}
+
+
 @app.delete("/history/{run_id}")
 def history_delete(run_id: int, authorization: str | None = Header(default=None)):
     user = _require_user(authorization)
@@ -225,99 +482,338 @@ def history_delete(run_id: int, authorization: str | None = Header(default=None)
     return {"ok": True}
 
 
+_CORPUS_LOCK = threading.Lock()
+_CORPUS_CACHE: dict = {}
+
+
+_EMBEDDER: list = []
+
+
+def _embed_batching_enabled(embedder: LocalRAGIndex) -> bool:
+    # "auto": batch model calls; the hashing fallback is per-text work that gains nothing.
+    mode = os.getenv("CLAUSEAI_EMBED_BATCHING", "auto").strip().lower()
+    if mode in {"1", "true", "yes", "on"}:
+        return True
+    if mode in {"0", "false", "no", "off"}:
+        return False
+    return embedder.model is not None
+
+
+def _shared_embedder() -> LocalRAGIndex:
+    """One loaded embedding model per process (uploads, revisions, comparisons)."""
+    with _CORPUS_LOCK:
+        if not _EMBEDDER:
+            embedder = LocalRAGIndex(model_name=os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"))
+            cache_dir = os.getenv("CLAUSEAI_EMBEDDING_CACHE_DIR", "").strip()
+            if cache_dir:
+                cache = attach_cache(embedder, Path(cache_dir))
+                metrics.watch_cache("embedding", lambda: (cache.hits, cache.misses))
+            if _embed_batching_enabled(embedder):
+                service = attach_batching(
+                    embedder,
+                    max_batch=int(os.getenv("CLAUSEAI_EMBED_MAX_BATCH", "64")),
+                    max_wait_ms=float(os.getenv("CLAUSEAI_EMBED_MAX_WAIT_MS", "2")),
+                )
+                metrics.watch_queue("embedding", service.queue_depth)
+            _EMBEDDER.append(embedder)
+        return _EMBEDDER[0]
+
+
+def _revisions_dir() -> Path:
+    return Path(os.getenv("CLAUSEAI_REVISIONS_DIR", "").strip() or REVISIONS_DIR)
+
+
+def _revision_owner(request: Request, previous_contract_id: Optional[str], track_revisions: bool) -> Optional[str]:
+    """Email of the caller when the upload asks for revision tracking, which requires a login:
+    stored revisions (and their clause text, via `revision.diff`) belong to that user."""
+    if not (track_revisions or (isinstance(previous_contract_id, str) and previous_contract_id.strip())):
+        return None
+    return _require_user(request.headers.get("authorization"))["email"]
+
+
+def _index_upload(
+    contract_text: str, cid: str, previous_contract_id: Optional[str], owner: Optional[str] = None
+) -> Tuple[LocalRAGIndex, Optional[RevisionResult]]:
+    """Index an upload. Untracked uploads (no `owner`) get the standard overlapping chunks and
+    are not stored; a tracked one uses content-defined chunks and is stored and looked up
+    under its owner's revisions dir, so a later version can reuse its embeddings."""
+    prev = previous_contract_id.strip() if isinstance(previous_contract_id, str) and previous_contract_id.strip() else None
+    if owner is None:
+        rag = LocalRAGIndex.sharing_model(_shared_embedder())
+        rag.build(contract_text)
+        return rag, None
+    try:
+        revision = index_revision(
+            contract_text,
+            contract_id=cid,
+            previous_contract_id=prev,
+            embedder=_shared_embedder(),
+            root=owner_root(owner, _revisions_dir()),
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown previous_contract_id: {prev}")
+    return revision.rag, revision
+
+
+def _request_profile(request: Request) -> Optional[RequestProfile]:
+    """RequestProfile for an admin's `X-Profile: cpu | memory | all` request, else None."""
+    mode = request.headers.get("x-profile", "").strip().lower()
+    if not mode:
+        return None
+    user = _require_admin(request.headers.get("authorization"))
+    try:
+        return RequestProfile(
+            new_request_id(request.headers.get("x-request-id")),
+            mode,
+            info={"path": request.url.path, "user": user.get("email")},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _with_profile_header(response: Response, profile: Optional[RequestProfile]) -> Response:
+    if profile is not None:
+        response.headers["X-Profile-Id"] = profile.request_id
+    return response
+
+
+def _near_duplicate_lookup(cid: str) -> Optional[NearDuplicateLookup]:
+    db = lsh_db_path(_corpus_dir())
+    return NearDuplicateLookup(db, exclude_contract=cid) if db.exists() else None
+
+
+def _annotate_near_duplicates(final_json: dict, clf: Optional[NearDuplicateLookup]) -> None:
+    """Add "seen in N other contracts" to evidence clauses that match the corpus."""
+    summary = clf.summary() if clf is not None else None
+    if summary is None:
+        return
+    for item in (final_json.get("analysis") or {}).get("key_evidence") or []:
+        m = clf.matches.get(item.get("text") or "")
+        if m is not None:
+            item["seen_in"] = m.seen_in
+    final_json["near_duplicates"] = summary
+
+
+def _corpus_dir() -> Path:
+    return Path(os.getenv("CLAUSEAI_CORPUS_DIR", "").strip() or DEFAULT_CORPUS_DIR)
+
+
+def _load_corpus_index() -> CorpusIndex:
+    """Load (memory-mapped) once; reload when `corpus_index.py build` rewrites meta.json."""
+    corpus = _corpus_dir()
+    meta = corpus / ANN_DIRNAME / "meta.json"
+    try:
+        mtime = meta.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Corpus index not built. Run bulk_ingest.py, then corpus_index.py build.")
+    with _CORPUS_LOCK:
+        cached = _CORPUS_CACHE.get(str(corpus))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        index = CorpusIndex.load(corpus)
+        _CORPUS_CACHE[str(corpus)] = (mtime, index)
+        return index
+
+
+@app.post("/search")
+def corpus_search(req: CorpusSearchRequest, authorization: str | None = Header(default=None)):
+    _require_user(authorization)
+    index = _load_corpus_index()
+    try:
+        matches = index.search(
+            req.query, k=req.top_k, nprobe=req.nprobe, contract_ids=req.contract_ids, exact=req.exact
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "query": req.query,
+        "exact": req.exact,
+        "n_vectors": index.meta.get("n_vectors"),
+        "n_contracts": index.meta.get("n_contracts"),
+        "matches": [
+            {
+                "contract_id": m.contract_id,
+                "chunk_index": m.chunk_index,
+                "score": m.score,
+                "source": m.source,
+                "text": m.text,
+            }
+            for m in matches
+        ],
+    }
+
+
+@app.post("/facts/query")
+def facts_query(req: FactsQueryRequest, authorization: str | None = Header(default=None)) -> dict:
+    """Portfolio questions over the ingest-time clause facts, e.g. payment_days lt 15."""
+    _require_user(authorization)
+    db = facts_db_path(_corpus_dir())
+    if not db.exists():
+        raise HTTPException(status_code=404, detail="No clause facts yet. Run bulk_ingest.py first.")
+    t0 = time.perf_counter()
+    try:
+        out: dict[str, Any] = query_facts(
+            db,
+            filters=[{"fact": f.fact, "op": f.op, "value": f.value} for f in req.filters],
+            sort_fact=req.sort,
+            descending=(req.order or "").strip().lower() == "desc",
+            limit=req.limit,
+            offset=req.offset,
+            aggregate=req.aggregate,
+            evidence_facts=req.evidence_facts,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    out["took_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return out
+
+
+@app.post("/compare")
+def compare(req: CompareRequest, authorization: str | None = Header(default=None)) -> dict:
+    """Per-topic clause differences and risk deltas of N ingested contracts vs a reference."""
+    _require_user(authorization)
+    t0 = time.perf_counter()
+    try:
+        out: dict[str, Any] = compare_contracts(
+            req.contract_ids, corpus_dir=_corpus_dir(), reference=req.reference, embedder=_shared_embedder()
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Not in the corpus: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    out["took_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return out
+
+
 @app.post("/analyze")
 async def analyze_contract(
+    request: Request,
     file: UploadFile = File(...),
     question: str = Form(...),
     tone: str = Form("executive"),
     no_evidence_threshold: float = Form(0.25),
     contract_id: Optional[str] = Form(None),
+    previous_contract_id: Optional[str] = Form(None),
+    track_revisions: bool = Form(False),
     intent_override: Optional[str] = Form(None),
     run_all_agents: bool = Form(False),
-) -> dict:
+    include_agent_analysis: bool = Form(False),
+    agent_detail: Optional[str] = Form(None),
+    compact: bool = Form(False),
+    fields: Optional[str] = Form(None),
+    deadline_ms: Optional[float] = Form(None, gt=0),
+    timings: bool = Form(False),
+) -> Response:
+    # The budget covers the whole request, upload parsing and indexing included.
+    deadline = Deadline(deadline_ms, app.state.stage_costs) if deadline_ms is not None else None
     if not question or not question.strip():
         raise HTTPException(status_code=400, detail="Question is required")
+    profile = _request_profile(request)
+    owner = _revision_owner(request, previous_contract_id, track_revisions)
 
-    try:
-        contract_text = await _read_upload_text(file)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read upload: {e}")
+    with (
+        metrics.collect_timings(enabled=timings or profile is not None) as collected,
+        profile_scope(profile, collected),
+    ):
+        try:
+            contract_text = await _read_upload_text(file)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to read upload: {e}")
 
-    if not contract_text.strip():
-        raise HTTPException(status_code=400, detail="Uploaded file is empty or could not be extracted")
+        if not contract_text.strip():
+            raise HTTPException(status_code=400, detail="Uploaded file is empty or could not be extracted")
 
-    cid = contract_id.strip() if isinstance(contract_id, str) and contract_id.strip() else stable_contract_id(contract_text)
+        cid = contract_id.strip() if isinstance(contract_id, str) and contract_id.strip() else stable_contract_id(contract_text)
+        rag, revision = await asyncio.to_thread(_index_upload, contract_text, cid, previous_contract_id, owner)
+        near_dups = _near_duplicate_lookup(cid)
 
-    try:
-        final_json, report = await run_full_pipeline(
-            contract_text=contract_text,
-            question=question,
-            tone=tone,
-            contract_id=cid,
-            no_evidence_threshold=float(no_evidence_threshold),
-            intent_override=intent_override,
-            run_all_agents=bool(run_all_agents),
-        )
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Pipeline failed: {e}")
-
-    return {
-        "contract_id": cid,
-        "generated_at": final_json.get("generated_at"),
-        "intent": final_json.get("intent"),
-        "question": final_json.get("question"),
-        "qa": final_json.get("qa"),
-        "analysis": final_json.get("analysis"),
-        "agent_analysis": final_json.get("agent_analysis"),
-        "confidence": final_json.get("confidence"),
-        "no_evidence": final_json.get("no_evidence"),
-        "evidence_score": final_json.get("evidence_score"),
-        "report": report,
-    }
+        try:
+            final_json, report = await run_full_pipeline(
+                contract_text=contract_text,
+                question=question,
+                tone=tone,
+                contract_id=cid,
+                no_evidence_threshold=float(no_evidence_threshold),
+                intent_override=intent_override,
+                run_all_agents=bool(run_all_agents),
+                agent_detail=_agent_detail(bool(include_agent_analysis), agent_detail),
+                rag=rag,
+                previous_contract_id=revision.previous_contract_id if revision is not None else None,
+                on_clause_facts=near_dups,
+                deadline=deadline,
+                stage_costs=app.state.stage_costs,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Pipeline failed: {e}")
+        _annotate_near_duplicates(final_json, near_dups)
+
+    response = json_response(
+        _analyze_payload(
+            cid, final_json, report, revision.summary() if revision is not None else None, collected if timings else None
+        ),
+        accept_encoding=request.headers.get("accept-encoding", ""),
+        compact=bool(compact),
+        fields=fields,
+    )
+    return _with_profile_header(response, profile)
 
 
 @app.post("/analyze_text")
-async def analyze_contract_text(payload: AnalyzeTextRequest) -> dict:
+async def analyze_contract_text(payload: AnalyzeTextRequest, request: Request) -> Response:
+    deadline = Deadline(payload.deadline_ms, app.state.stage_costs) if payload.deadline_ms is not None else None
     if not payload.question or not payload.question.strip():
         raise HTTPException(status_code=400, detail="Question is required")
     if not payload.contract_text or not payload.contract_text.strip():
         raise HTTPException(status_code=400, detail="contract_text is empty")
-
-    cid = (
-        payload.contract_id.strip()
-        if isinstance(payload.contract_id, str) and payload.contract_id.strip()
-        else stable_contract_id(payload.contract_text)
-    )
-
-    try:
-        final_json, report = await run_full_pipeline(
-            contract_text=payload.contract_text,
-            question=payload.question,
-            tone=payload.tone,
-            contract_id=cid,
-            no_evidence_threshold=float(payload.no_evidence_threshold),
-            intent_override=payload.intent_override,
-            run_all_agents=bool(payload.run_all_agents),
+    profile = _request_profile(request)
+    owner = _revision_owner(request, payload.previous_contract_id, payload.track_revisions)
+
+    with (
+        metrics.collect_timings(enabled=payload.timings or profile is not None) as collected,
+        profile_scope(profile, collected),
+    ):
+        cid = (
+            payload.contract_id.strip()
+            if isinstance(payload.contract_id, str) and payload.contract_id.strip()
+            else stable_contract_id(payload.contract_text)
         )
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Pipeline failed: {e}")
+        rag, revision = await asyncio.to_thread(
+            _index_upload, payload.contract_text, cid, payload.previous_contract_id, owner
+        )
+        near_dups = _near_duplicate_lookup(cid)
 
-    return {
-        "contract_id": cid,
-        "generated_at": final_json.get("generated_at"),
-        "intent": final_json.get("intent"),
-        "question": final_json.get("question"),
-        "qa": final_json.get("qa"),
-        "analysis": final_json.get("analysis"),
-        "agent_analysis": final_json.get("agent_analysis"),
-        "confidence": final_json.get("confidence"),
-        "no_evidence": final_json.get("no_evidence"),
-        "evidence_score": final_json.get("evidence_score"),
-        "report": report,
-    }
+        try:
+            final_json, report = await run_full_pipeline(
+                contract_text=payload.contract_text,
+                question=payload.question,
+                tone=payload.tone,
+                contract_id=cid,
+                no_evidence_threshold=float(payload.no_evidence_threshold),
+                intent_override=payload.intent_override,
+                run_all_agents=bool(payload.run_all_agents),
+                agent_detail=_agent_detail(bool(payload.include_agent_analysis), payload.agent_detail),
+                rag=rag,
+                previous_contract_id=revision.previous_contract_id if revision is not None else None,
+                on_clause_facts=near_dups,
+                deadline=deadline,
+                stage_costs=app.state.stage_costs,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Pipeline failed: {e}")
+        _annotate_near_duplicates(final_json, near_dups)
+
+    response = json_response(
+        _analyze_payload(
+            cid, final_json, report, revision.summary() if revision is not None else None, collected if payload.timings else None
+        ),
+        accept_encoding=request.headers.get("accept-encoding", ""),
+        compact=bool(payload.compact),
+        fields=payload.fields,
+    )
+    return _with_profile_header(response, profile)
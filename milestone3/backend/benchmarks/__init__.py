@@ -0,0 +1,4 @@
+"""Ad-hoc performance measurements for the Milestone 3 backend.
+
+Run from milestone3/backend, e.g. `python -m benchmarks.response_encoding`.
+"""
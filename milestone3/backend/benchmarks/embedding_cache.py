@@ -0,0 +1,101 @@
+"""Corpus-level chunk dedup and ingest time with and without the shared embedding cache.
+
+Generates contracts from one template: shared boilerplate paragraphs (governing law,
+confidentiality, notices, ...) plus a few deal-specific clauses each, then
+ingests them twice: once embedding every chunk, once through a cold EmbeddingCache.
+
+    cd milestone3/backend
+    python -m benchmarks.embedding_cache [--contracts 400] [--model-name sentence-transformers/all-MiniLM-L6-v2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+from pathlib import Path
+
+from bulk_ingest import ingest_corpus
+from contract_pipeline import chunk_hash, chunk_text, content_defined_chunks
+
+BOILERPLATE = [
+    "Governing Law. This Agreement shall be governed by and construed in accordance with the laws of the State of "
+    "New York, without regard to its conflict of laws principles, and the parties submit to the exclusive "
+    "jurisdiction of the state and federal courts located in New York County for any dispute arising hereunder.",
+    "Confidentiality. Each party shall hold the other party's Confidential Information in strict confidence, use it "
+    "solely to perform this Agreement, and disclose it only to employees and contractors who need to know it and "
+    "are bound by obligations at least as protective as those set out in this Section.",
+    "Notices. All notices under this Agreement shall be in writing and delivered by hand, by recognized overnight "
+    "courier, or by email with confirmation of receipt, to the addresses set out on the signature page or as later "
+    "updated by written notice.",
+    "Force Majeure. Neither party shall be liable for any failure or delay in performance caused by events beyond "
+    "its reasonable control, including acts of God, war, terrorism, labor disputes, epidemics, or failures of "
+    "public utilities, provided it gives prompt notice and uses reasonable efforts to resume performance.",
+    "Assignment. Neither party may assign or transfer this Agreement without the prior written consent of the other "
+    "party, except to a successor in connection with a merger, acquisition, or sale of substantially all of its "
+    "assets, provided the successor assumes all obligations hereunder.",
+    "Entire Agreement. This Agreement constitutes the entire agreement between the parties regarding its subject "
+    "matter and supersedes all prior agreements, proposals and understandings, whether written or oral.",
+    "Severability. If any provision of this Agreement is held invalid or unenforceable, the remaining provisions "
+    "shall remain in full force and effect and the invalid provision shall be replaced by a valid provision that "
+    "most closely reflects the parties' intent.",
+    "Data Protection. Vendor shall process Personal Data only on documented instructions from Customer, implement "
+    "appropriate technical and organizational security measures, and notify Customer of any personal data breach "
+    "within 72 hours of becoming aware of it.",
+]
+
+
+def make_contract(rng: random.Random, i: int) -> str:
+    specific = [
+        f"Payment Terms. Customer shall pay undisputed invoices within {rng.choice([15, 30, 45, 60])} days of receipt "
+        f"under purchase order {rng.randint(10_000, 99_999)}.",
+        f"Services. Vendor {i} shall provide the services described in Statement of Work {rng.randint(1, 500)} "
+        f"at the rates in Schedule {rng.choice('ABCD')}.",
+        f"Term. This Agreement starts on the Effective Date and continues for {rng.randint(1, 5)} years.",
+    ]
+    # Same template for everyone: boilerplate in its usual order, occasionally one section
+    # dropped, and the deal-specific clauses at their usual places.
+    kept = [p for p in BOILERPLATE if rng.random() > 0.1]
+    paragraphs = specific[:2] + kept[:4] + specific[2:] + kept[4:]
+    return "\n\n".join(f"{n}. {p}" for n, p in enumerate(paragraphs, 1))
+
+
+def dedup(docs, split) -> float:
+    seen, total = set(), 0
+    for d in docs:
+        for c in split(d):
+            total += 1
+            seen.add(chunk_hash(c))
+    return 1 - len(seen) / total if total else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contracts", type=int, default=400)
+    parser.add_argument("--model-name", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = [make_contract(rng, i) for i in range(args.contracts)]
+    print(f"{len(docs)} contracts, {sum(len(d) for d in docs) / len(docs):.0f} chars avg")
+    print(f"  duplicate chunks, fixed 900/120 chunking:   {dedup(docs, chunk_text):6.1%}")
+    print(f"  duplicate chunks, content-defined chunking: {dedup(docs, content_defined_chunks):6.1%}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "src"
+        src.mkdir()
+        for i, d in enumerate(docs):
+            (src / f"c{i:05d}.txt").write_text(d, encoding="utf-8")
+        quiet = dict(workers=0, model_name=args.model_name, log=lambda *_: None)
+        base = ingest_corpus(src, corpus_dir=Path(tmp) / "nocache", **quiet)
+        cached = ingest_corpus(src, corpus_dir=Path(tmp) / "cached", embedding_cache_dir=Path(tmp) / "cache", **quiet)
+        for label, s in (("no cache", base), ("cold cache", cached)):
+            print(
+                f"  {label:<10} embedded {s['embedded']:>6}/{s['chunks']} chunks  embed {s['embed_seconds']:7.2f}s  "
+                f"total {s['seconds']:7.2f}s  dedup {(s['dedup_ratio'] or 0):6.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Single-query encode latency/throughput with and without micro-batching.
+
+N client threads each encode one short question at a time (what /search and the
+pipeline's evidence probe do), directly against the model or through a
+BatchingEncoder. Without sentence-transformers installed, a simulated device is used:
+a fixed per-forward-pass cost (kernel launch, tokenizer, Python overhead) plus a
+per-text matmul, serialized by a device lock like a single GPU/CPU model would be.
+
+    cd milestone3/backend
+    python -m benchmarks.embedding_service [--clients 1,8,32] [--requests 200] [--call-ms 4] [--model-name ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from contract_pipeline import LocalRAGIndex
+from embedding_service import BatchingEncoder
+
+
+class SimulatedModel:
+    """Stand-in for a transformer forward pass on one device."""
+
+    def __init__(self, *, call_ms: float, dim: int = 384, hidden: int = 1536) -> None:
+        rng = np.random.default_rng(0)
+        self.call_s = call_ms / 1000.0
+        self.w1 = rng.standard_normal((dim, hidden)).astype(np.float32) / np.sqrt(dim)
+        self.w2 = rng.standard_normal((hidden, dim)).astype(np.float32) / np.sqrt(hidden)
+        self.hashing = LocalRAGIndex(model_name="__hashing__")
+        self.hashing.model = None
+        self._device = threading.Lock()
+
+    def encode(self, texts: List[str], *, normalize_embeddings: bool = True) -> np.ndarray:
+        x = self.hashing.encode_direct(texts, normalize_embeddings=False)
+        with self._device:
+            time.sleep(self.call_s)
+            out = np.maximum(x @ self.w1, 0) @ self.w2
+        if normalize_embeddings:
+            out /= np.linalg.norm(out, axis=1, keepdims=True) + 1e-12
+        return out
+
+
+def run(encode: Callable[..., np.ndarray], clients: int, requests: int) -> dict:
+    latencies: List[float] = []
+    lock = threading.Lock()
+    per_client = max(1, requests // clients)
+
+    def client(i: int) -> None:
+        own = []
+        for j in range(per_client):
+            t0 = time.perf_counter()
+            encode([f"what is the termination notice period for vendor {i} case {j}"], normalize_embeddings=True)
+            own.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    ms = np.array(latencies) * 1000
+    return {"p50": float(np.percentile(ms, 50)), "p99": float(np.percentile(ms, 99)), "qps": len(ms) / wall}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=320, help="total encode calls per run")
+    parser.add_argument("--call-ms", type=float, default=4.0, help="simulated fixed cost per forward pass")
+    parser.add_argument("--model-name", default=None, help="real sentence-transformers model instead of the simulation")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.model_name:
+        model = LocalRAGIndex(model_name=args.model_name)
+        if model.model is None:
+            raise SystemExit("sentence-transformers is not installed; drop --model-name to use the simulation")
+        direct = model.encode_direct
+        label = model.embedder_name
+    else:
+        direct = SimulatedModel(call_ms=args.call_ms).encode
+        label = f"simulated device ({args.call_ms:g} ms/forward pass)"
+    print(label)
+    print(f"{'clients':>7}  {'mode':<8} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}  batches")
+    for n in [int(c) for c in args.clients.split(",") if c.strip()]:
+        r = run(direct, n, args.requests)
+        print(f"{n:>7}  {'direct':<8} {r['p50']:8.2f} {r['p99']:8.2f} {r['qps']:8.0f}")
+        service = BatchingEncoder(direct, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+        try:
+            r = run(service.encode, n, args.requests)
+        finally:
+            service.close()
+        s = service.stats
+        print(
+            f"{n:>7}  {'batched':<8} {r['p50']:8.2f} {r['p99']:8.2f} {r['qps']:8.0f}  "
+            f"{s['batches']} ({s['texts'] / max(1, s['batches']):.1f} texts avg, max {s['max_batch_texts']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Sharded exact search vs the single-threaded `cosine_sim_matrix` loop.
+
+Writes a synthetic corpus as per-contract vectors.npy files (the LocalRAGIndex.save
+layout), then times a query batch both ways and checks the top-k agree.
+
+    cd milestone3/backend
+    python -m benchmarks.exact_search [--rows 200000] [--dim 384] [--queries 64] [--workers 1,2,4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from contract_pipeline import cosine_sim_matrix
+from sharded_search import ShardedExactSearch
+
+
+def write_corpus(directory: Path, *, rows: int, dim: int, per_file: int, seed: int = 0) -> List[tuple]:
+    rng = np.random.default_rng(seed)
+    files = []
+    for i, start in enumerate(range(0, rows, per_file)):
+        n = min(per_file, rows - start)
+        v = rng.standard_normal((n, dim), dtype=np.float32)
+        v /= np.linalg.norm(v, axis=1, keepdims=True)
+        p = directory / f"c{i:05d}.npy"
+        np.save(p, v)
+        files.append((str(p), n))
+    return files
+
+
+def baseline(files: List[tuple], queries: np.ndarray, k: int) -> List[List[int]]:
+    """What LocalRAGIndex.query does, over one in-memory matrix, one query at a time."""
+    mat = np.concatenate([np.load(p) for p, _ in files])
+    out = []
+    for q in queries:
+        sims = cosine_sim_matrix(q, mat)
+        top = np.argpartition(-sims, k - 1)[:k]
+        out.append(top[np.argsort(-sims[top])].tolist())
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--per-file", type=int, default=40, help="chunks per contract file")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--workers", default=",".join(str(w) for w in sorted({1, 2, os.cpu_count() or 1})))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = write_corpus(Path(tmp), rows=args.rows, dim=args.dim, per_file=args.per_file)
+        rng = np.random.default_rng(1)
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+        t0 = time.perf_counter()
+        expected = baseline(files, queries, args.k)
+        base_s = time.perf_counter() - t0
+        print(f"{args.rows} x {args.dim} in {len(files)} files, {args.queries} queries, k={args.k}, cpus={os.cpu_count()}")
+        print(f"  cosine_sim_matrix loop         {args.queries / base_s:9.1f} q/s")
+
+        for w in [int(x) for x in args.workers.split(",") if x.strip()]:
+            for backend in ("process", "thread"):
+                if w <= 1 and backend == "thread":
+                    continue
+                with ShardedExactSearch(files, workers=w, backend=backend) as engine:
+                    engine.search(queries[:1], k=args.k)  # warm the pool / page cache
+                    t0 = time.perf_counter()
+                    got = engine.search(queries, k=args.k)
+                    s = time.perf_counter() - t0
+                agree = np.mean([[r for _, r in g] == e for g, e in zip(got, expected)])
+                label = f"sharded workers={w} {backend if w > 1 else 'inline'}"
+                print(f"  {label:<30} {args.queries / s:9.1f} q/s  x{base_s / s:5.1f}  top-k agree {agree:.0%}")
+
+
+if __name__ == "__main__":
+    main()
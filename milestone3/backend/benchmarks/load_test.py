@@ -0,0 +1,496 @@
+"""HTTP load test: starts the API under uvicorn and replays a request mix against it.
+
+The mix combines three kinds of request:
+- /analyze_text: questions from milestone2/outputs/rag_results over sample and generated
+  contracts, with a configurable intent mix;
+- GET /history (paged, per user);
+- POST /auth/login.
+
+Load runs in one of two modes:
+- closed loop: `--concurrency N` workers, each sending its next request when the previous
+  one returns;
+- open loop: `--rate R` Poisson arrivals per second, capped by `--max-in-flight`. When
+  the cap is reached, arrivals are dropped and counted.
+
+The report gives the following, after discarding `--warmup` seconds:
+- per-operation throughput, p50/p95/p99/max and error rate;
+- a log-scale latency histogram;
+- a timeline of completions, errors, in-flight requests and the server's CPU% and RSS.
+  The server figures are summed over the uvicorn process tree.
+
+    cd milestone3/backend
+    python -m benchmarks.load_test --concurrency 8 --duration 30
+    python -m benchmarks.load_test --rate 20 --mix analyze=0.6,history=0.3,login=0.1 --out load.json
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 ...   # an already running server
+
+The launched server gets a scratch database, memory and revisions directory, and raised
+login throttles (every simulated user logs in from 127.0.0.1). The load generator shares
+the machine with the server; its own CPU time is reported so the two can be told apart.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.synthetic_contracts import generate_contract
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+RAG_RESULTS_DIR = BACKEND_DIR.parents[1] / "milestone2" / "outputs" / "rag_results"
+# Log-spaced latency buckets (ms) for the histogram.
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, math.inf]
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """"a=0.7,b=0.3" -> {"a": 0.7, "b": 0.3} (weights need not sum to 1)."""
+    out: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        if part.strip():
+            name, _, w = part.partition("=")
+            out[name.strip()] = float(w or 1)
+    if not out or any(w < 0 for w in out.values()) or sum(out.values()) <= 0:
+        raise ValueError(f"Bad weights: {spec!r}")
+    return out
+
+
+def load_questions(directory: Path = RAG_RESULTS_DIR) -> List[str]:
+    qs = []
+    for p in sorted(Path(directory).glob("*.json")):
+        try:
+            q = json.loads(p.read_text(encoding="utf-8")).get("query")
+        except (OSError, ValueError):
+            continue
+        if isinstance(q, str) and q.strip():
+            qs.append(q.strip())
+    return qs or ["What are the payment terms?", "What are the termination rights?"]
+
+
+def load_contracts(paths: List[Path], pages: List[int]) -> List[str]:
+    texts = [p.read_text(encoding="utf-8", errors="ignore") for p in paths]
+    if not paths:
+        texts.append((BACKEND_DIR / "sample_contract.txt").read_text(encoding="utf-8"))
+    texts.extend(generate_contract(n, seed=i) for i, n in enumerate(pages))
+    return texts
+
+
+# ---------------------------------------------------------------------------
+# Results
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class OpStats:
+    latencies_ms: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def add(self, ms: float, status: str, ok: bool) -> None:
+        self.latencies_ms.append(ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self, seconds: float) -> Dict[str, Any]:
+        vs = sorted(self.latencies_ms)
+        n = len(vs)
+
+        def pct(p: float) -> Optional[float]:
+            return round(vs[min(n - 1, int(math.ceil(p * n)) - 1)], 2) if n else None
+
+        counts = [0] * len(BUCKETS_MS)
+        for v in vs:
+            counts[bisect.bisect_left(BUCKETS_MS, v)] += 1
+        return {
+            "requests": n,
+            "rps": round(n / seconds, 2) if seconds > 0 else None,
+            "errors": self.errors,
+            "error_rate": round(self.errors / n, 4) if n else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(vs[-1], 2) if n else None,
+            "statuses": dict(sorted(self.statuses.items())),
+            "histogram": [{"le_ms": b if b != math.inf else "inf", "count": c} for b, c in zip(BUCKETS_MS, counts)],
+        }
+
+
+class Recorder:
+    def __init__(self, warmup_s: float, interval_s: float) -> None:
+        self.t0 = time.perf_counter()
+        self.warmup_s = warmup_s
+        self.interval_s = interval_s
+        self.ops: Dict[str, OpStats] = {}
+        self.timeline: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self.dropped = 0
+        self._bucket = {"completed": 0, "errors": 0}
+
+    def record(self, op: str, started: float, status: str, ok: bool) -> None:
+        now = time.perf_counter()
+        self._bucket["completed"] += 1
+        self._bucket["errors"] += 0 if ok else 1
+        if started - self.t0 >= self.warmup_s:
+            self.ops.setdefault(op, OpStats()).add((now - started) * 1000.0, status, ok)
+
+    def tick(self, server: Optional[Dict[str, float]]) -> None:
+        row = {
+            "t_s": round(time.perf_counter() - self.t0, 2),
+            "completed": self._bucket["completed"],
+            "errors": self._bucket["errors"],
+            "in_flight": self.in_flight,
+        }
+        if server:
+            row.update(server)
+        self.timeline.append(row)
+        self._bucket = {"completed": 0, "errors": 0}
+
+
+# ---------------------------------------------------------------------------
+# Server process
+# ---------------------------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(*, port: int, workers: int, scratch: Path, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        {
+            "CLAUSEAI_BACKEND_DB_PATH": str(scratch / "backend.sqlite3"),
+            "CLAUSEAI_MEMORY_DIR": str(scratch / "api_memory"),
+            "CLAUSEAI_REVISIONS_DIR": str(scratch / "revisions"),
+            "CLAUSEAI_LOGIN_MAX_PER_IP": "1000000000",
+            "CLAUSEAI_LOGIN_MAX_PER_ACCOUNT": "1000000000",
+        }
+    )
+    env.update(extra_env)
+    (scratch / "api_memory").mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    return subprocess.Popen(cmd, cwd=str(BACKEND_DIR), env=env)
+
+
+async def wait_ready(base_url: str, proc: Optional[subprocess.Popen], timeout_s: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient(base_url=base_url, timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if proc is not None and proc.poll() is not None:
+                raise RuntimeError(f"server exited with status {proc.returncode}")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} not ready after {timeout_s:.0f}s")
+
+
+class ProcessTreeSampler:
+    """CPU% and RSS of a process and its children, from /proc (psutil when installed)."""
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self._last: Optional[Tuple[float, float]] = None
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        try:
+            import psutil  # type: ignore
+
+            self._psutil = psutil
+        except ImportError:
+            self._psutil = None
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for d in Path("/proc").iterdir():
+            if d.name.isdigit():
+                try:
+                    ppid = int((d / "stat").read_text().rsplit(")", 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+                children.setdefault(ppid, []).append(int(d.name))
+        out, todo = [], [self.pid]
+        while todo:
+            pid = todo.pop()
+            out.append(pid)
+            todo.extend(children.get(pid, []))
+        return out
+
+    def _cpu_rss(self) -> Optional[Tuple[float, float]]:
+        if self._psutil is not None:
+            try:
+                root = self._psutil.Process(self.pid)
+                procs = [root] + root.children(recursive=True)
+                cpu = sum(sum(p.cpu_times()[:2]) for p in procs)
+                return cpu, sum(p.memory_info().rss for p in procs)
+            except self._psutil.Error:
+                return None
+        if not Path("/proc").is_dir():
+            return None
+        cpu = rss = 0.0
+        for pid in self._tree():
+            try:
+                fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+                cpu += (int(fields[11]) + int(fields[12])) / self._tick
+                for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) * 1024
+            except (OSError, IndexError, ValueError):
+                continue
+        return cpu, rss
+
+    def sample(self) -> Optional[Dict[str, float]]:
+        now = time.perf_counter()
+        cur = self._cpu_rss()
+        if cur is None:
+            return None
+        out = {"server_rss_mb": round(cur[1] / 2**20, 1)}
+        if self._last is not None and now > self._last[0]:
+            out["server_cpu_pct"] = round((cur[0] - self._last[1]) / (now - self._last[0]) * 100.0, 1)
+        self._last = (now, cur[0])
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Load
+# ---------------------------------------------------------------------------
+
+
+class Workload:
+    def __init__(self, args: argparse.Namespace, contracts: List[str], questions: List[str], users: List[Dict[str, str]]) -> None:
+        self.rng = random.Random(args.seed)
+        self.mix = parse_weights(args.mix)
+        self.intents = parse_weights(args.intents)
+        self.contracts = contracts
+        self.questions = questions
+        self.users = users
+        self.analyze_options = {"agent_detail": args.agent_detail}
+
+    def _pick(self, weights: Dict[str, float]) -> str:
+        return self.rng.choices(list(weights), weights=list(weights.values()))[0]
+
+    async def one(self, client: httpx.AsyncClient, rec: Recorder) -> None:
+        op = self._pick(self.mix)
+        user = self.rng.choice(self.users)
+        started = time.perf_counter()
+        rec.in_flight += 1
+        try:
+            if op == "analyze":
+                intent = self._pick(self.intents)
+                body = {"contract_text": self.rng.choice(self.contracts), "question": self.rng.choice(self.questions), **self.analyze_options}
+                if intent != "auto":
+                    body["intent_override"] = intent
+                op = f"analyze:{intent}"
+                r = await client.post("/analyze_text", json=body)
+            elif op == "history":
+                r = await client.get("/history", params={"limit": 10}, headers={"Authorization": f"Bearer {user['token']}"})
+            elif op == "login":
+                r = await client.post("/auth/login", json={"email": user["email"], "password": user["password"]})
+            else:
+                raise ValueError(f"Unknown operation {op!r} in --mix")
+            rec.record(op, started, str(r.status_code), r.status_code < 400)
+        except httpx.HTTPError as e:
+            rec.record(op, started, type(e).__name__, False)
+        finally:
+            rec.in_flight -= 1
+
+
+async def setup_users(client: httpx.AsyncClient, n: int, history_runs: int) -> List[Dict[str, str]]:
+    users = []
+    tag = f"{int(time.time())}_{os.getpid()}"
+    for i in range(n):
+        u = {"email": f"load_{tag}_{i}@example.com", "password": "load-pass-1234"}
+        r = await client.post("/auth/register", json={**u, "name": f"Load {i}"})
+        if r.status_code >= 400 and "exists" not in r.text.lower():
+            raise RuntimeError(f"register failed: {r.status_code} {r.text[:200]}")
+        r = await client.post("/auth/login", json=u)
+        r.raise_for_status()
+        u["token"] = r.json()["token"]
+        for j in range(history_runs):
+            await client.post(
+                "/history/save",
+                json={"mode": "single", "question": f"seed question {j}", "filenames": [f"seed_{j}.txt"], "results": [{"report": "seed"}]},
+                headers={"Authorization": f"Bearer {u['token']}"},
+            )
+        users.append(u)
+    return users
+
+
+async def run_load(args: argparse.Namespace, base_url: str, sampler: Optional[ProcessTreeSampler]) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight) + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        users = await setup_users(client, args.users, args.history_runs)
+        work = Workload(args, load_contracts(args.contracts, args.pages), load_questions(args.questions_dir), users)
+        rec = Recorder(args.warmup, args.sample_interval)
+        stop_at = rec.t0 + args.warmup + args.duration
+        cpu0 = resource.getrusage(resource.RUSAGE_SELF)
+
+        async def sample_loop() -> None:
+            if sampler is not None:
+                sampler.sample()
+            while time.perf_counter() < stop_at:
+                await asyncio.sleep(args.sample_interval)
+                rec.tick(sampler.sample() if sampler is not None else None)
+
+        async def closed_worker() -> None:
+            while time.perf_counter() < stop_at:
+                await work.one(client, rec)
+
+        async def open_arrivals() -> None:
+            tasks = set()
+            arrivals = random.Random(args.seed + 1)
+            next_t = time.perf_counter()
+            while next_t < stop_at:
+                await asyncio.sleep(max(0.0, next_t - time.perf_counter()))
+                if rec.in_flight >= args.max_in_flight:
+                    rec.dropped += 1
+                else:
+                    t = asyncio.ensure_future(work.one(client, rec))
+                    tasks.add(t)
+                    t.add_done_callback(tasks.discard)
+                next_t += arrivals.expovariate(args.rate)
+            if tasks:
+                await asyncio.wait(tasks)
+
+        sampler_task = asyncio.ensure_future(sample_loop())
+        if args.rate:
+            await open_arrivals()
+        else:
+            await asyncio.gather(*(closed_worker() for _ in range(args.concurrency)))
+        await sampler_task
+        cpu1 = resource.getrusage(resource.RUSAGE_SELF)
+
+    measured = max(1e-9, time.perf_counter() - rec.t0 - args.warmup)
+    ops = {op: s.summary(measured) for op, s in sorted(rec.ops.items())}
+    total = OpStats()
+    for s in rec.ops.values():
+        total.latencies_ms.extend(s.latencies_ms)
+        total.errors += s.errors
+    server_rows = [r for r in rec.timeline if "server_cpu_pct" in r]
+    return {
+        "config": {
+            "mode": f"open {args.rate}/s" if args.rate else f"closed x{args.concurrency}",
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": work.mix,
+            "intents": work.intents,
+            "contracts": len(work.contracts),
+            "questions": len(work.questions),
+            "users": len(users),
+            "url": base_url,
+        },
+        "total": {k: v for k, v in total.summary(measured).items() if k not in {"statuses", "histogram"}},
+        "dropped": rec.dropped,
+        "ops": ops,
+        "server": {
+            "cpu_pct_avg": round(sum(r["server_cpu_pct"] for r in server_rows) / len(server_rows), 1) if server_rows else None,
+            "rss_mb_max": max((r["server_rss_mb"] for r in rec.timeline if "server_rss_mb" in r), default=None),
+        },
+        "client_cpu_s": round((cpu1.ru_utime + cpu1.ru_stime) - (cpu0.ru_utime + cpu0.ru_stime), 2),
+        "timeline": rec.timeline,
+    }
+
+
+def print_report(res: Dict[str, Any]) -> None:
+    cfg = res["config"]
+    print(f"\n{cfg['mode']}, {cfg['duration_s']}s (+{cfg['warmup_s']}s warm-up), {cfg['contracts']} contracts, {cfg['questions']} questions")
+    print(f"{'operation':<28} {'req':>6} {'req/s':>8} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    rows = list(res["ops"].items()) + [("TOTAL", res["total"])]
+    for op, s in rows:
+        err = f"{100 * s['error_rate']:.1f}" if s["error_rate"] is not None else "-"
+        print(
+            f"{op:<28} {s['requests']:>6} {s['rps'] or 0:>8.1f} {err:>6} "
+            + " ".join(f"{s[k] if s[k] is not None else '-':>9}" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        )
+    if res["dropped"]:
+        print(f"dropped arrivals (max in flight reached): {res['dropped']}")
+    for op, s in res["ops"].items():
+        peak = max(b["count"] for b in s["histogram"]) or 1
+        print(f"\n{op} latency histogram")
+        for b in s["histogram"]:
+            if b["count"]:
+                print(f"  <= {str(b['le_ms']):>6} ms {b['count']:>7} {'#' * max(1, round(40 * b['count'] / peak))}")
+    srv = res["server"]
+    print(f"\nserver: avg CPU {srv['cpu_pct_avg']}%, peak RSS {srv['rss_mb_max']} MB; load generator CPU {res['client_cpu_s']} s")
+    print(f"{'t (s)':>7} {'done':>6} {'err':>5} {'in-flight':>9} {'cpu%':>7} {'rss MB':>8}")
+    for r in res["timeline"]:
+        print(
+            f"{r['t_s']:>7} {r['completed']:>6} {r['errors']:>5} {r['in_flight']:>9} "
+            f"{r.get('server_cpu_pct', '-'):>7} {r.get('server_rss_mb', '-'):>8}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="target an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=0, help="port for the launched server (0 = any free port)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="closed loop: concurrent virtual users")
+    parser.add_argument("--rate", type=float, default=0.0, help="open loop: Poisson arrivals per second (overrides --concurrency)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="open loop: drop arrivals beyond this")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds excluded from the statistics")
+    parser.add_argument("--mix", default="analyze=0.7,history=0.2,login=0.1", help="operation weights")
+    parser.add_argument("--intents", default="auto=0.6,risk_analysis=0.25,executive_review=0.15", help="analyze intent weights (auto = detected)")
+    parser.add_argument("--agent-detail", default="summary", choices=["none", "summary", "full"])
+    parser.add_argument("--questions-dir", type=Path, default=RAG_RESULTS_DIR, help="*.json files with a `query` field")
+    parser.add_argument("--contracts", type=Path, nargs="*", default=[], help=".txt contracts (default: sample_contract.txt)")
+    parser.add_argument("--pages", type=lambda s: [int(x) for x in s.split(",") if x], default=[5, 20], help="generated contract sizes")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--history-runs", type=int, default=20, help="history entries seeded per user")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (s)")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="timeline / server sampling period (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the launched server (repeatable)")
+    parser.add_argument("--out", type=Path, default=None, help="write the full results JSON here")
+    args = parser.parse_args(argv)
+    parse_weights(args.mix)
+    parse_weights(args.intents)
+
+    proc = None
+    with tempfile.TemporaryDirectory(prefix="clauseai-load-") as scratch:
+        try:
+            if args.url:
+                base_url, sampler = args.url.rstrip("/"), None
+            else:
+                port = args.port or _free_port()
+                extra = dict(kv.split("=", 1) for kv in args.env)
+                proc = start_server(port=port, workers=args.workers, scratch=Path(scratch), extra_env=extra)
+                base_url, sampler = f"http://127.0.0.1:{port}", ProcessTreeSampler(proc.pid)
+            asyncio.run(wait_ready(base_url, proc))
+            res = asyncio.run(run_load(args, base_url, sampler))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+    print_report(res)
+    if args.out:
+        args.out.write_text(json.dumps(res, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
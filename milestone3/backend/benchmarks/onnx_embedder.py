@@ -0,0 +1,128 @@
+"""Agreement, speed and memory of the ONNX (int8) embedder vs sentence-transformers.
+
+Each backend runs in its own process, so peak RSS covers only that backend's imports
+and model. Both embed the same contract chunks; the report gives per-chunk cosine
+agreement and top-k retrieval overlap for the agent questions.
+
+    cd milestone3/backend
+    python -m benchmarks.onnx_embedder --onnx-dir ../outputs/onnx/all-MiniLM-L6-v2 [--contracts-dir DIR] [--limit 200]
+
+Needs sentence-transformers (torch) and onnxruntime + tokenizers in the same environment.
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from contract_pipeline import _agent_plan, chunk_text
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_backend(backend: str, onnx_dir: str, model_name: str, texts: List[str], out: str, conn) -> None:
+    os.environ.pop("CLAUSEAI_ONNX_MODEL_DIR", None)
+    os.environ["USE_SENTENCE_TRANSFORMERS"] = "1" if backend == "torch" else "0"
+    if backend == "onnx":
+        os.environ["CLAUSEAI_ONNX_MODEL_DIR"] = onnx_dir
+    from contract_pipeline import LocalRAGIndex
+
+    base_rss = _peak_rss_mb()
+    t0 = time.perf_counter()
+    rag = LocalRAGIndex(model_name=model_name)
+    load_s = time.perf_counter() - t0
+    if rag.model is None:
+        conn.send({"error": f"{backend} backend did not load (embedder={rag.embedder_name})"})
+        return
+    rag.encode(texts[:8])  # warm-up
+    t0 = time.perf_counter()
+    vecs = rag.encode(texts, normalize_embeddings=True)
+    encode_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for t in texts[:200]:
+        rag.encode([t])
+    single_ms = (time.perf_counter() - t0) * 1000 / min(200, len(texts))
+    np.save(out, np.asarray(vecs, dtype=np.float32))
+    conn.send(
+        {
+            "embedder": rag.embedder_name,
+            "load_s": load_s,
+            "encode_s": encode_s,
+            "single_ms": single_ms,
+            "rss_mb": _peak_rss_mb() - base_rss,
+        }
+    )
+
+
+def _load_texts(contracts_dir: Path | None, limit: int) -> List[str]:
+    if contracts_dir is not None:
+        files = sorted(p for p in contracts_dir.rglob("*.txt"))[:limit]
+        docs = [p.read_text(encoding="utf-8", errors="ignore") for p in files]
+    else:
+        docs = [Path(__file__).resolve().parents[1].joinpath("sample_contract.txt").read_text(encoding="utf-8")]
+    return [c for d in docs for c in chunk_text(d)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--onnx-dir", required=True)
+    parser.add_argument("--model-name", default=os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--contracts-dir", type=Path, default=None)
+    parser.add_argument("--limit", type=int, default=200, help="max contracts to chunk")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = _load_texts(args.contracts_dir, args.limit)
+    agents = ("legal", "compliance", "finance", "operations")
+    questions = list(dict.fromkeys(q for a in agents for q in _agent_plan(a, "Give me a risk analysis")))
+    print(f"{len(texts)} chunks, {len(questions)} questions")
+
+    ctx = mp.get_context("spawn")
+    results, vectors = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("torch", "onnx"):
+            out = str(Path(tmp) / f"{backend}.npy")
+            parent, child = ctx.Pipe()
+            p = ctx.Process(target=_run_backend, args=(backend, args.onnx_dir, args.model_name, texts + questions, out, child))
+            p.start()
+            res = parent.recv()
+            p.join()
+            if "error" in res:
+                raise SystemExit(res["error"])
+            results[backend] = res
+            vectors[backend] = np.load(out)
+
+    print(f"{'backend':<44} {'load s':>7} {'texts/s':>9} {'1-text ms':>10} {'peak RSS MB':>12}")
+    for backend, r in results.items():
+        print(
+            f"{r['embedder']:<44} {r['load_s']:7.2f} {(len(texts) + len(questions)) / r['encode_s']:9.1f} "
+            f"{r['single_ms']:10.2f} {r['rss_mb']:12.0f}"
+        )
+
+    a, b = vectors["torch"], vectors["onnx"]
+    cos = np.sum(a * b, axis=1)
+    print(f"cosine(torch, onnx) per text: mean {cos.mean():.4f}  p1 {np.percentile(cos, 1):.4f}  min {cos.min():.4f}")
+
+    n = len(texts)
+    overlaps = []
+    for qi in range(n, n + len(questions)):
+        top = [set(np.argsort(-(v[:n] @ v[qi]))[: args.top_k]) for v in (a, b)]
+        overlaps.append(len(top[0] & top[1]) / args.top_k)
+    print(f"top-{args.top_k} retrieval overlap over {len(questions)} questions: {np.mean(overlaps):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Benchmark suite for the contract_pipeline hot paths, with a stored baseline.
+
+Generated contracts from 1 to 500 pages (benchmarks/synthetic_contracts.py) go through:
+
+    chunk_text, LocalRAGIndex._hash_embed, LocalRAGIndex.build, LocalRAGIndex.query,
+    extract_clause_facts, build_sanitized_answer, build_executive_report_data,
+    run_full_pipeline for each intent,
+
+plus the db_sqlite history operations (save / list / get / lazy get / one result / delete)
+against a temporary database. Every case reports median, p95 and min wall time.
+
+Results are written as JSON and compared with a baseline; a case whose fastest run
+(--stat) is more than --threshold slower than its baseline (and more than --noise-ms in
+absolute terms) is flagged and the process exits with status 1.
+
+    cd milestone3/backend
+    python -m benchmarks.pipeline_suite                      # compare with benchmarks/baselines/pipeline_suite.json
+    python -m benchmarks.pipeline_suite --quick --filter pipeline/
+    python -m benchmarks.pipeline_suite --save-baseline      # accept the current numbers
+
+Baselines are machine-specific; the stored one records the machine it came from. The
+suite always uses the hashing embedder, so the numbers do not depend on model downloads.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synthetic_contracts import generate_contract
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "pipeline_suite.json"
+DEFAULT_PAGES = (1, 10, 100, 500)
+QUICK_PAGES = (1, 10)
+INTENT_QUESTIONS = {
+    "fact_summary": "What are the payment terms?",
+    "qa": "Can the customer terminate for convenience?",
+    "clause_extraction": "Extract the limitation of liability clause",
+    "risk_analysis": "Give me a risk analysis of this contract",
+    "executive_review": "Prepare an executive review of this agreement",
+}
+QUESTIONS = list(INTENT_QUESTIONS.values()) + [
+    "What are the late fees and interest on overdue invoices?",
+    "What uptime does the provider commit to?",
+    "What are the data protection obligations?",
+]
+
+
+def measure(fn: Callable[[], Any], *, min_time_s: float, min_repeat: int = 3, max_repeat: int = 200) -> Dict[str, float]:
+    """Run `fn` once to warm up, then until `min_time_s` has passed (within the repeat bounds)."""
+    fn()
+    samples: List[float] = []
+    start = time.perf_counter()
+    while len(samples) < max_repeat and (len(samples) < min_repeat or time.perf_counter() - start < min_time_s):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 4),
+        "min_ms": round(samples[0], 4),
+        "n": len(samples),
+    }
+
+
+def _machine() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+        "cpus": os.cpu_count(),
+        "commit": commit or None,
+    }
+
+
+def run_suite(*, pages: List[int], min_time_s: float, selected: Callable[[str], bool]) -> Dict[str, Any]:
+    """Time the selected cases; memory files and history go to a temporary directory."""
+    import contract_pipeline as cp
+    import db_sqlite
+
+    results: Dict[str, Dict[str, float]] = {}
+    embedder_name = None
+
+    def case(name: str, fn: Callable[[], Any], **kw: Any) -> None:
+        if not selected(name):
+            return
+        results[name] = measure(fn, min_time_s=min_time_s, **kw)
+        r = results[name]
+        print(f"  {name:<40} {r['median_ms']:>11.3f} {r['p95_ms']:>11.3f} {r['n']:>5}", flush=True)
+
+    print(f"  {'case':<40} {'median ms':>11} {'p95 ms':>11} {'n':>5}")
+    loop = asyncio.new_event_loop()
+    ids = itertools.count()
+    saved = (cp.MEMORY_DIR, db_sqlite.DB_PATH)
+    with tempfile.TemporaryDirectory() as tmp:
+        cp.MEMORY_DIR = Path(tmp) / "api_memory"
+        cp.MEMORY_DIR.mkdir()
+        db_sqlite.DB_PATH = Path(tmp) / "history.sqlite3"
+        try:
+            for p in pages:
+                text = generate_contract(p)
+                # Large inputs get fewer repeats; the budget still bounds each case.
+                reps = {"max_repeat": 200 if p <= 100 else 5}
+                chunks = cp.chunk_text(text)
+                rag = cp.LocalRAGIndex()
+                embedder_name = rag.embedder_name
+                rag.build(text)
+                facts = cp.extract_clause_facts(text)
+                qs = itertools.cycle(QUESTIONS)
+                matches = rag.query(QUESTIONS[0], top_k=5)
+
+                case(f"chunk_text/{p}p", lambda: cp.chunk_text(text), **reps)
+                case(f"hash_embed/{p}p", lambda: rag._hash_embed(chunks), **reps)
+                case(f"rag_build/{p}p", lambda: cp.LocalRAGIndex.sharing_model(rag).build(text), **reps)
+                case(f"rag_query/{p}p", lambda: rag.query(next(qs), top_k=5))
+                case(f"clause_facts/{p}p", lambda: cp.extract_clause_facts(text), **reps)
+                case(f"sanitized_answer/{p}p", lambda: cp.build_sanitized_answer(QUESTIONS[0], matches))
+                case(
+                    f"executive_report/{p}p",
+                    lambda: cp.build_executive_report_data(
+                        contract_text=text, rag=rag, question=INTENT_QUESTIONS["risk_analysis"], selected_agents=None, facts=facts
+                    ),
+                    **reps,
+                )
+                for intent, question in INTENT_QUESTIONS.items():
+                    # A fresh contract id per call: memory files would otherwise grow with every repeat.
+                    case(
+                        f"pipeline/{intent}/{p}p",
+                        lambda intent=intent, question=question: loop.run_until_complete(
+                            cp.run_full_pipeline(
+                                contract_text=text, question=question, intent_override=intent, contract_id=f"bench_{next(ids)}"
+                            )
+                        ),
+                        **reps,
+                    )
+
+            if any(selected(f"history/{op}") for op in ("save", "list", "get", "get_lazy", "get_result", "delete")):
+                _history_cases(case, cp, db_sqlite, loop)
+        finally:
+            cp.MEMORY_DIR, db_sqlite.DB_PATH = saved
+            loop.close()
+    return {"machine": _machine(), "embedder": embedder_name, "results": results}
+
+
+def _history_cases(case: Callable[..., None], cp: Any, db: Any, loop: asyncio.AbstractEventLoop) -> None:
+    db.init_db()
+    user = "bench@example.com"
+    text = generate_contract(3)
+    results = []
+    for intent in ("fact_summary", "risk_analysis", "executive_review"):
+        final_json, report = loop.run_until_complete(
+            cp.run_full_pipeline(contract_text=text, question=INTENT_QUESTIONS[intent], intent_override=intent, contract_id=f"hist_{intent}")
+        )
+        results.append({"filename": f"{intent}.txt", "report": report, **final_json})
+
+    def save() -> int:
+        return db.save_analysis_run(
+            user_email=user,
+            mode="single",
+            question=INTENT_QUESTIONS["risk_analysis"],
+            tone="executive",
+            run_all_agents=False,
+            no_evidence_threshold=0.25,
+            filenames=[r["filename"] for r in results],
+            results=results,
+        )
+
+    run_ids = [save() for _ in range(200)]
+    case("history/save", save)
+    case("history/list", lambda: db.search_analysis_runs(user_email=user, limit=20))
+    case("history/get", lambda: db.get_analysis_run(user_email=user, run_id=run_ids[100]))
+    case("history/get_lazy", lambda: db.get_analysis_run(user_email=user, run_id=run_ids[100], lazy=True))
+    case("history/get_result", lambda: db.get_analysis_result(user_email=user, run_id=run_ids[100], position=1))
+    case("history/delete", lambda: db.delete_analysis_run(user_email=user, run_id=save()))
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], *, threshold: float, noise_ms: float, stat: str = "min_ms"
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Split cases into regressions / improvements / unchanged against the baseline.
+
+    Compares the fastest run by default: on a shared machine the median moves with
+    background load far more than the minimum does.
+    """
+    out: Dict[str, List[Dict[str, Any]]] = {"regressions": [], "improvements": [], "unchanged": [], "new": []}
+    base = baseline.get("results") or {}
+    for name, r in (current.get("results") or {}).items():
+        b = base.get(name)
+        if b is None:
+            out["new"].append({"case": name, "ms": r[stat]})
+            continue
+        delta = r[stat] - b[stat]
+        ratio = r[stat] / b[stat] if b[stat] > 0 else float("inf")
+        row = {"case": name, "baseline_ms": b[stat], "ms": r[stat], "ratio": round(ratio, 3)}
+        if ratio > 1.0 + threshold and delta > noise_ms:
+            out["regressions"].append(row)
+        elif ratio < 1.0 / (1.0 + threshold) and -delta > noise_ms:
+            out["improvements"].append(row)
+        else:
+            out["unchanged"].append(row)
+    return out
+
+
+def merge_best(into: Dict[str, Any], other: Dict[str, Any], *, stat: str = "min_ms") -> Dict[str, Any]:
+    """Keep, per case, whichever run was faster (re-runs and multi-round baselines)."""
+    for name, r in (other.get("results") or {}).items():
+        mine = into["results"].get(name)
+        if mine is None or r[stat] < mine[stat]:
+            into["results"][name] = r
+    return into
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default=",".join(map(str, DEFAULT_PAGES)), help="contract sizes, comma-separated")
+    parser.add_argument("--quick", action="store_true", help=f"only {QUICK_PAGES} pages")
+    parser.add_argument("--filter", default="", help="run only cases whose name contains this (comma = any of)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds of repeats per case")
+    parser.add_argument("--out", type=Path, default=None, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--stat", choices=["min_ms", "median_ms", "p95_ms"], default="min_ms", help="statistic to compare")
+    parser.add_argument("--threshold", type=float, default=0.25, help="flag cases this much slower (0.25 = +25%%)")
+    parser.add_argument("--noise-ms", type=float, default=0.05, help="ignore absolute differences below this")
+    parser.add_argument("--rounds", type=int, default=1, help="run the suite N times, keep each case's best")
+    parser.add_argument("--confirm", type=int, default=2, help="re-run flagged cases up to N times before reporting")
+    args = parser.parse_args(argv)
+
+    # Deterministic embedder and no network: the numbers must not depend on the environment.
+    os.environ["USE_SENTENCE_TRANSFORMERS"] = "0"
+    os.environ.pop("CLAUSEAI_ONNX_MODEL_DIR", None)
+    os.environ.pop("QA_REWRITE_PROVIDER", None)
+
+    pages = list(QUICK_PAGES) if args.quick else [int(x) for x in args.pages.split(",") if x.strip()]
+    wanted = [w.strip() for w in args.filter.split(",") if w.strip()]
+    selected = lambda name: not wanted or any(w in name for w in wanted)  # noqa: E731
+    current = run_suite(pages=pages, min_time_s=args.min_time, selected=selected)
+    for _ in range(1, max(1, args.rounds)):
+        merge_best(current, run_suite(pages=pages, min_time_s=args.min_time, selected=selected), stat=args.stat)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(current, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        merged = current
+        if args.baseline.exists() and wanted:
+            # A filtered run only replaces the cases it ran.
+            merged = json.loads(args.baseline.read_text(encoding="utf-8"))
+            merged.update({k: v for k, v in current.items() if k != "results"})
+            merged.setdefault("results", {}).update(current["results"])
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(merged, indent=2, sort_keys=True), encoding="utf-8")
+        print(f"baseline written: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("embedder") != current.get("embedder"):
+        print(f"baseline embedder {baseline.get('embedder')!r} != current {current.get('embedder')!r}; not comparing")
+        return 0
+    bm, cm = baseline.get("machine") or {}, current["machine"]
+    if (bm.get("cpus"), bm.get("processor"), bm.get("python")) != (cm.get("cpus"), cm.get("processor"), cm.get("python")):
+        print(f"warning: baseline is from a different machine ({bm.get('platform')}, {bm.get('cpus')} cpus, Python {bm.get('python')})")
+
+    report = compare(current, baseline, threshold=args.threshold, noise_ms=args.noise_ms, stat=args.stat)
+    for _ in range(max(0, args.confirm)):
+        # A one-off slow run (background load) should not fail the check: measure again.
+        flagged = {row["case"] for row in report["regressions"]}
+        if not flagged:
+            break
+        print(f"\nre-running {len(flagged)} flagged case(s)")
+        flagged_pages = sorted({int(name.rsplit("/", 1)[1][:-1]) for name in flagged if name.endswith("p")})
+        rerun = run_suite(pages=flagged_pages, min_time_s=args.min_time * 2, selected=lambda name: name in flagged)
+        merge_best(current, rerun, stat=args.stat)
+        report = compare(current, baseline, threshold=args.threshold, noise_ms=args.noise_ms, stat=args.stat)
+    for label in ("regressions", "improvements"):
+        if report[label]:
+            print(f"\n{label} ({args.stat}, threshold {args.threshold:.0%}):")
+            for row in report[label]:
+                print(f"  {row['case']:<40} {row['baseline_ms']:>11.3f} -> {row['ms']:>11.3f} ms  x{row['ratio']:.2f}")
+    print(
+        f"\n{len(report['regressions'])} regressed, {len(report['improvements'])} improved, "
+        f"{len(report['unchanged'])} unchanged, {len(report['new'])} new"
+    )
+    if args.out:
+        current["comparison"] = report
+        args.out.write_text(json.dumps(current, indent=2), encoding="utf-8")
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
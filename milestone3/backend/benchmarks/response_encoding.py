@@ -0,0 +1,89 @@
+"""Response bytes and serialization time for a run_all_agents executive report.
+
+    cd milestone3/backend
+    python -m benchmarks.response_encoding [--contract sample_contract.txt] [--repeat 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from app import _analyze_payload
+from contract_pipeline import MEMORY_DIR, run_full_pipeline
+from response_encoding import compact_payload, dumps
+
+
+def _time_ms(fn: Callable[[], Any], *, repeat: int) -> float:
+    samples: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def measure(payload: Dict[str, Any], *, repeat: int) -> List[Dict[str, Any]]:
+    stdlib = lambda p: json.dumps(p, ensure_ascii=False).encode("utf-8")  # noqa: E731
+    rows = []
+    for name, encode in (
+        ("stdlib json", lambda: stdlib(payload)),
+        ("fast json", lambda: dumps(payload)),
+        ("compact + fast json", lambda: dumps(compact_payload(payload))),
+    ):
+        body = encode()
+        rows.append(
+            {
+                "variant": name,
+                "bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+                "serialize_ms_p50": _time_ms(encode, repeat=repeat),
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contract", default=str(Path(__file__).resolve().parents[1] / "sample_contract.txt"))
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON")
+    args = parser.parse_args()
+
+    text = Path(args.contract).read_text(encoding="utf-8", errors="ignore")
+    results: Dict[str, Any] = {}
+    for detail in ("full", "summary"):
+        cid = f"bench_response_encoding_{detail}"
+        final_json, report = asyncio.run(
+            run_full_pipeline(
+                contract_text=text,
+                question="Provide a comprehensive risk analysis",
+                contract_id=cid,
+                intent_override="risk_analysis",
+                run_all_agents=True,
+                agent_detail=detail,
+            )
+        )
+        (MEMORY_DIR / f"{cid}.json").unlink(missing_ok=True)
+        results[detail] = measure(_analyze_payload(cid, final_json, report), repeat=args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for detail, rows in results.items():
+        print(f"agent_detail={detail}")
+        for r in rows:
+            print(
+                f"  {r['variant']:<22} {r['bytes']:>8,} B  gzip {r['gzip_bytes']:>7,} B  "
+                f"serialize p50 {r['serialize_ms_p50']:.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
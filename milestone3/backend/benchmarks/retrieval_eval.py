@@ -0,0 +1,342 @@
+"""Retrieval quality vs speed across chunking, embedder and vector storage precision.
+
+Labelled data comes from the milestone 2 runs: milestone2/outputs/rag_results/*.json and
+rag_search_example.json. There are two kinds of file: rag_<agent>_NN_*.json and
+search_NN_*.json. Each holds a `query` and the CUAD passages that the Pinecone/MiniLM
+pipeline returned for it, with `contract_id` and `chunk_index`. These are silver labels:
+what milestone 2 retrieved, not hand-judged answers.
+
+The full CUAD contracts are not in the repository. Each contract is therefore rebuilt from
+its labelled passages. Passages are ordered by chunk_index, and adjacent chunks are merged
+on their overlap. Every passage keeps its character span in the rebuilt text. Distractor
+documents are added to the same corpus: sample_contract.txt and generated contracts
+(`--distractor-pages`).
+
+Each configuration re-chunks the corpus with `chunk_text`, embeds the chunks, stores the
+vectors as float32, float16 or int8, and answers every query against the whole corpus.
+int8 uses symmetric per-row quantization; cosine similarity ignores the per-row scale.
+A retrieved chunk counts as a hit for a labelled passage when the two spans overlap by
+at least `--min-overlap` of the shorter one.
+
+The report has one row per configuration:
+- recall@k: the share of labelled passages covered by the top k chunks, averaged per query;
+- MRR: the reciprocal rank of the first hit;
+- corpus build time: chunking and embedding;
+- query latency: query encoding and scoring;
+- stored index size: vectors and chunk text.
+
+    cd milestone3/backend
+    python -m benchmarks.retrieval_eval
+    python -m benchmarks.retrieval_eval --chunking 900/120,1000/200,600/100 --precision float32,int8 --k 1,5,10
+    USE_SENTENCE_TRANSFORMERS=1 python -m benchmarks.retrieval_eval --embedders hashing,minilm --out eval.json
+
+Embedders:
+- `hashing` is always available.
+- `minilm` needs sentence-transformers.
+- `onnx` needs CLAUSEAI_ONNX_MODEL_DIR (see onnx_embedder.py).
+
+A requested embedder that cannot be loaded is reported as unavailable and skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from benchmarks.synthetic_contracts import generate_contract
+from contract_pipeline import LocalRAGIndex, chunk_text, cosine_sim_matrix
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+MILESTONE2_OUTPUTS = BACKEND_DIR.parents[1] / "milestone2" / "outputs"
+LABEL_FILES = sorted((MILESTONE2_OUTPUTS / "rag_results").glob("*.json")) + [MILESTONE2_OUTPUTS / "rag_search_example.json"]
+PRECISIONS = ("float32", "float16", "int8")
+EMBEDDERS = {
+    "hashing": {},
+    "minilm": {"USE_SENTENCE_TRANSFORMERS": "1", "CLAUSEAI_ONNX_MODEL_DIR": ""},
+    "onnx": {"USE_SENTENCE_TRANSFORMERS": "0"},
+}
+
+
+@dataclass
+class Document:
+    doc_id: str
+    text: str
+
+
+@dataclass
+class LabelledQuery:
+    query: str
+    relevant: List[Tuple[str, int, int]]  # (doc_id, start, end) in the rebuilt document
+
+
+def _norm(text: str) -> str:
+    # chunk_text collapses whitespace; rebuilding from collapsed text keeps offsets aligned.
+    return " ".join((text or "").split())
+
+
+def _merge_overlap(prev: str, cur: str, *, probe: int = 60, window: int = 400) -> Optional[int]:
+    """Offset in `prev` where `cur` starts when `cur` continues `prev` with an overlap."""
+    head = cur[: min(probe, len(cur))]
+    if not head:
+        return None
+    at = prev.find(head, max(0, len(prev) - window))
+    return at if at >= 0 and prev[at:] == cur[: len(prev) - at] else None
+
+
+def load_labelled_set(files: Sequence[Path] = LABEL_FILES) -> Tuple[List[Document], List[LabelledQuery]]:
+    """Documents rebuilt from labelled passages, and the queries with gold spans in them."""
+    passages: Dict[str, Dict[int, str]] = {}
+    by_query: Dict[str, List[Tuple[str, int]]] = {}
+    for p in files:
+        try:
+            data = json.loads(Path(p).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        query = (data.get("query") or "").strip()
+        for r in data.get("results") or []:
+            cid, text = r.get("contract_id"), _norm(r.get("text") or "")
+            if not (query and cid and text) or r.get("chunk_index") is None:
+                continue
+            idx = int(r["chunk_index"])
+            passages.setdefault(cid, {})[idx] = text
+            if (cid, idx) not in by_query.setdefault(query, []):
+                by_query[query].append((cid, idx))
+
+    docs: List[Document] = []
+    spans: Dict[Tuple[str, int], Tuple[int, int]] = {}
+    for cid in sorted(passages):
+        text, last = "", None
+        for idx in sorted(passages[cid]):
+            chunk = passages[cid][idx]
+            at = _merge_overlap(text, chunk) if last is not None and idx == last + 1 else None
+            if at is None:
+                at = len(text) + (1 if text else 0)
+                text = f"{text} {chunk}" if text else chunk
+            else:
+                text = text[:at] + chunk
+            spans[(cid, idx)] = (at, at + len(chunk))
+            last = idx
+        docs.append(Document(cid, text))
+    queries = [LabelledQuery(q, [(cid, *spans[(cid, idx)]) for cid, idx in rel]) for q, rel in by_query.items()]
+    return docs, queries
+
+
+def distractors(pages: Sequence[int]) -> List[Document]:
+    out = [Document("sample_contract", _norm((BACKEND_DIR / "sample_contract.txt").read_text(encoding="utf-8")))]
+    out.extend(Document(f"synthetic_{n}p_{i}", _norm(generate_contract(n, seed=i))) for i, n in enumerate(pages))
+    return out
+
+
+def chunk_corpus(docs: Sequence[Document], chunk_size: int, overlap: int) -> Tuple[List[str], List[Tuple[str, int, int]]]:
+    """chunk_text over every document, with each chunk's (doc_id, start, end)."""
+    chunks: List[str] = []
+    where: List[Tuple[str, int, int]] = []
+    step = max(1, chunk_size - overlap)
+    for d in docs:
+        for i, c in enumerate(chunk_text(d.text, chunk_size=chunk_size, overlap=overlap)):
+            start = i * step
+            assert d.text[start : start + len(c)] == c, "chunk_text offsets drifted"
+            chunks.append(c)
+            where.append((d.doc_id, start, start + len(c)))
+    return chunks, where
+
+
+def store(vectors: np.ndarray, precision: str) -> np.ndarray:
+    """Vectors as they would be kept at `precision` (scored directly by cosine_sim_matrix)."""
+    v = np.asarray(vectors, dtype=np.float32)
+    if precision == "float32":
+        return v
+    if precision == "float16":
+        return v.astype(np.float16)
+    if precision == "int8":
+        scale = np.abs(v).max(axis=1, keepdims=True) / 127.0 + 1e-12
+        return np.clip(np.rint(v / scale), -127, 127).astype(np.int8)
+    raise ValueError(f"Unknown precision {precision!r}; use one of: {', '.join(PRECISIONS)}")
+
+
+def _hit(chunk: Tuple[str, int, int], gold: Tuple[str, int, int], min_overlap: float) -> bool:
+    if chunk[0] != gold[0]:
+        return False
+    inter = min(chunk[2], gold[2]) - max(chunk[1], gold[1])
+    return inter > 0 and inter >= min_overlap * min(chunk[2] - chunk[1], gold[2] - gold[1])
+
+
+def score_ranking(
+    ranked: Sequence[Tuple[str, int, int]], relevant: Sequence[Tuple[str, int, int]], ks: Sequence[int], min_overlap: float
+) -> Dict[str, float]:
+    """recall@k for each k (share of gold passages covered) and reciprocal rank of the first hit."""
+    out: Dict[str, float] = {}
+    first: Optional[int] = None
+    covered_at: Dict[int, int] = {}
+    for rank, chunk in enumerate(ranked, start=1):
+        for g, gold in enumerate(relevant):
+            if _hit(chunk, gold, min_overlap):
+                covered_at.setdefault(g, rank)
+                first = rank if first is None else first
+    for k in ks:
+        out[f"recall@{k}"] = sum(1 for r in covered_at.values() if r <= k) / len(relevant) if relevant else 0.0
+    out["rr"] = 1.0 / first if first else 0.0
+    return out
+
+
+def make_embedder(name: str) -> Optional[LocalRAGIndex]:
+    """LocalRAGIndex with the requested model, or None when it cannot be loaded here."""
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder {name!r}; use one of: {', '.join(EMBEDDERS)}")
+    saved = {k: os.environ.get(k) for k in ("USE_SENTENCE_TRANSFORMERS", "CLAUSEAI_ONNX_MODEL_DIR")}
+    try:
+        if name == "hashing":
+            os.environ["USE_SENTENCE_TRANSFORMERS"] = "0"
+            os.environ["CLAUSEAI_ONNX_MODEL_DIR"] = ""
+        else:
+            os.environ.update(EMBEDDERS[name])
+        rag = LocalRAGIndex()
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    return rag if (name == "hashing") == (rag.embedder_name == "hashing") else None
+
+
+def evaluate(
+    docs: Sequence[Document],
+    queries: Sequence[LabelledQuery],
+    *,
+    embedder: LocalRAGIndex,
+    chunk_size: int,
+    overlap: int,
+    precisions: Sequence[str] = PRECISIONS,
+    ks: Sequence[int] = (1, 3, 5, 10),
+    min_overlap: float = 0.5,
+    repeat: int = 3,
+) -> List[Dict[str, Any]]:
+    """One result row per precision for this chunking and embedder."""
+    build_ms: List[float] = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        chunks, where = chunk_corpus(docs, chunk_size, overlap)
+        vectors = np.asarray(embedder.encode_direct(chunks, normalize_embeddings=True), dtype=np.float32)
+        build_ms.append((time.perf_counter() - t0) * 1000.0)
+    text_bytes = sum(len(c.encode("utf-8")) for c in chunks)
+    top = max(ks)
+    rows = []
+    for precision in precisions:
+        stored = store(vectors, precision)
+        per_query: List[Dict[str, float]] = []
+        latencies: List[float] = []
+        for _ in range(max(1, repeat)):
+            per_query = []
+            for q in queries:
+                t0 = time.perf_counter()
+                qv = embedder.encode_direct([q.query], normalize_embeddings=True)[0]
+                sims = cosine_sim_matrix(np.asarray(qv, dtype=np.float32), stored)
+                idx = np.argpartition(-sims, min(top, len(sims)) - 1)[:top]
+                idx = idx[np.argsort(-sims[idx])]
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+                per_query.append(score_ranking([where[int(i)] for i in idx], q.relevant, ks, min_overlap))
+        row: Dict[str, Any] = {
+            "embedder": embedder.embedder_name,
+            "chunk_size": chunk_size,
+            "overlap": overlap,
+            "precision": precision,
+            "chunks": len(chunks),
+            "queries": len(queries),
+        }
+        for key in per_query[0] if per_query else []:
+            row["mrr" if key == "rr" else key] = round(statistics.fmean(m[key] for m in per_query), 4)
+        lat = sorted(latencies)
+        row.update(
+            {
+                "build_ms": round(min(build_ms), 2),
+                "query_ms_median": round(statistics.median(lat), 3),
+                "query_ms_p95": round(lat[min(len(lat) - 1, int(0.95 * len(lat)))], 3),
+                "index_bytes": int(stored.nbytes),
+                "chunk_text_bytes": text_bytes,
+            }
+        )
+        rows.append(row)
+    return rows
+
+
+def _parse_chunking(spec: str) -> List[Tuple[int, int]]:
+    out = []
+    for part in spec.split(","):
+        m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", part)
+        if not m or int(m.group(2)) >= int(m.group(1)):
+            raise argparse.ArgumentTypeError(f"Bad chunking {part!r}; use size/overlap with overlap < size, e.g. 900/120")
+        out.append((int(m.group(1)), int(m.group(2))))
+    return out
+
+
+def _csv(spec: str) -> List[str]:
+    return [s.strip() for s in spec.split(",") if s.strip()]
+
+
+def print_table(rows: List[Dict[str, Any]], ks: Sequence[int]) -> None:
+    cols = [f"recall@{k}" for k in ks] + ["mrr"]
+    print(f"{'embedder':<40} {'chunking':>9} {'prec':>7} {'chunks':>6} " + " ".join(f"{c:>9}" for c in cols)
+          + f" {'build ms':>9} {'q p50 ms':>9} {'q p95 ms':>9} {'index KB':>9}")
+    for r in rows:
+        print(
+            f"{r['embedder'][:40]:<40} {r['chunk_size']:>4}/{r['overlap']:<4} {r['precision']:>7} {r['chunks']:>6} "
+            + " ".join(f"{r[c]:>9.3f}" for c in cols)
+            + f" {r['build_ms']:>9.1f} {r['query_ms_median']:>9.3f} {r['query_ms_p95']:>9.3f}"
+            + f" {(r['index_bytes'] + r['chunk_text_bytes']) / 1024:>9.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunking", type=_parse_chunking, default=_parse_chunking("900/120,1000/200,600/100,1500/200"),
+                        help="size/overlap pairs (chunk_text defaults to 900/120; the milestone 1 notebook used 1000/200)")
+    parser.add_argument("--embedders", type=_csv, default=["hashing", "minilm"], help=f"any of: {', '.join(EMBEDDERS)}")
+    parser.add_argument("--precision", type=_csv, default=list(PRECISIONS), help=f"any of: {', '.join(PRECISIONS)}")
+    parser.add_argument("--k", type=lambda s: sorted({int(x) for x in _csv(s)}), default=[1, 3, 5, 10])
+    parser.add_argument("--min-overlap", type=float, default=0.5, help="share of the shorter span two spans must share")
+    parser.add_argument("--distractor-pages", type=lambda s: [int(x) for x in _csv(s)], default=[20],
+                        help="generated contracts added to the corpus (pages each)")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (fastest build is reported)")
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args(argv)
+    for p in args.precision:
+        store(np.zeros((1, 1), dtype=np.float32), p)
+
+    docs, queries = load_labelled_set()
+    corpus = docs + distractors(args.distractor_pages)
+    print(
+        f"{len(queries)} labelled queries, {sum(len(q.relevant) for q in queries)} relevant passages "
+        f"in {len(docs)} rebuilt contracts; {len(corpus) - len(docs)} distractors; "
+        f"{sum(len(d.text) for d in corpus):,} characters"
+    )
+    rows: List[Dict[str, Any]] = []
+    unavailable: List[str] = []
+    for name in args.embedders:
+        embedder = make_embedder(name)
+        if embedder is None:
+            unavailable.append(name)
+            print(f"embedder {name!r} unavailable here; skipped", file=sys.stderr)
+            continue
+        for size, overlap in args.chunking:
+            rows += evaluate(corpus, queries, embedder=embedder, chunk_size=size, overlap=overlap,
+                             precisions=args.precision, ks=args.k, min_overlap=args.min_overlap, repeat=args.repeat)
+    print_table(rows, args.k)
+    if args.out:
+        meta = {"queries": len(queries), "documents": len(corpus), "min_overlap": args.min_overlap, "unavailable": unavailable}
+        args.out.write_text(json.dumps({**meta, "results": rows}, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
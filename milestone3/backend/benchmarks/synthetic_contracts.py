@@ -0,0 +1,67 @@
+"""Deterministic synthetic contracts of a given length (for benchmarks and load tests).
+
+Each contract repeats numbered sections drawn from a pool of clause templates (payment,
+late fees, termination, liability, SLA, audit, data protection, ...) with varying
+numbers, padded with boilerplate, so every pipeline stage finds something to extract.
+A "page" is about 3,000 characters.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import List
+
+PAGE_CHARS = 3000
+
+_CLAUSES = [
+    ("Payment Terms", "Customer will pay all undisputed amounts within {days} days of invoice date."),
+    ("Late Fees / Interest", "Late payments accrue interest at {pct}% per month (or the maximum permitted by law, if lower)."),
+    ("Termination", "Either party may terminate this Agreement for material breach if such breach is not cured within {days} days after written notice."),
+    ("Termination for Convenience", "Customer may terminate this Agreement for convenience upon {days} days prior written notice."),
+    ("Limitation of Liability", "Each party's aggregate liability is capped at the fees paid in the {months} months preceding the claim, except that liability for confidentiality breach is uncapped."),
+    ("Indemnification", "Provider shall indemnify, defend and hold harmless Customer from third-party claims arising from infringement or gross negligence."),
+    ("Service Levels (SLA)", "Provider commits to {uptime}% monthly uptime. Service credits apply if uptime falls below {uptime}%."),
+    ("Audit", "Customer may audit Provider's security controls annually upon {days} days' reasonable notice."),
+    ("Data Protection", "Provider shall process personal data only on documented instructions and comply with GDPR and applicable privacy laws."),
+    ("Confidentiality", "Each party shall keep the other party's Confidential Information secret for {years} years after termination."),
+    ("Fees and Invoicing", "Provider will invoice monthly in arrears; fees are exclusive of taxes and increase by at most {pct}% per year."),
+    ("Deliverables", "Provider shall deliver the milestones listed in Schedule {n} by the dates set out in the project plan."),
+    ("Governing Law", "This Agreement is governed by the laws of the State of New York, without regard to conflict of laws principles."),
+    ("Notices", "Notices must be in writing and delivered by courier or email to the addresses set out in Schedule {n}."),
+]
+
+_BOILERPLATE = (
+    "The parties acknowledge that the headings in this Agreement are for convenience only and do not affect "
+    "interpretation. No waiver of any provision shall be effective unless in writing and signed by the waiving party. "
+    "If any provision is held invalid, the remaining provisions continue in full force and effect."
+)
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        days=rng.choice([10, 15, 30, 45, 60, 90]),
+        pct=rng.choice([1, 1.5, 2, 3, 5]),
+        months=rng.choice([6, 12, 24]),
+        uptime=rng.choice([99.0, 99.5, 99.9, 99.95]),
+        years=rng.choice([2, 3, 5]),
+        n=rng.randint(1, 9),
+    )
+
+
+def generate_contract(pages: int, *, seed: int = 0) -> str:
+    """A contract of roughly `pages` * PAGE_CHARS characters (same output for the same seed)."""
+    rng = random.Random(f"{seed}:{pages}")
+    target = max(1, int(pages)) * PAGE_CHARS
+    parts: List[str] = ["MASTER SERVICES AGREEMENT", ""]
+    size = 0
+    section = 1
+    while size < target:
+        heading, template = _CLAUSES[(section - 1) % len(_CLAUSES)] if section <= len(_CLAUSES) else rng.choice(_CLAUSES)
+        body = _fill(template, rng)
+        if rng.random() < 0.6:
+            body = f"{body} {_BOILERPLATE}"
+        block = f"{section}. {heading}\n{body}\n"
+        parts.append(block)
+        size += len(block)
+        section += 1
+    return "\n".join(parts)
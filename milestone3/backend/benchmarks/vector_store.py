@@ -0,0 +1,89 @@
+"""Upsert throughput and query latency across every VectorStore backend.
+
+Same random unit vectors, metadata and queries for each backend: batched upsert,
+single-query p50/p99 without and with a metadata filter (one contract's chunks),
+and batched query throughput. The `http` backend is the Pinecone-protocol client
+talking to a local `vector_store.serve()` over an in-memory store.
+
+    cd milestone3/backend
+    python -m benchmarks.vector_store [--vectors 50000] [--dim 384] [--queries 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from vector_store import CHUNKS_NAMESPACE, MemoryVectorStore, PineconeHTTPStore, open_store, serve
+
+
+def _pcts(ms):
+    return float(np.percentile(ms, 50)), float(np.percentile(ms, 99))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--contracts", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1000, help="upsert batch size")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", default="memory,mmap,sqlite,http")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    records = [
+        {"id": f"c{i % args.contracts}::{i}", "values": vecs[i], "metadata": {"contract_id": f"c{i % args.contracts}", "chunk_index": i}}
+        for i in range(args.vectors)
+    ]
+    queries = vecs[rng.choice(args.vectors, args.queries, replace=False)] + 0.1 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    flt = {"contract_id": {"$eq": "c7"}}
+
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, top-{args.top_k}")
+    print(f"{'backend':<8} {'upsert/s':>10} {'q p50 ms':>9} {'q p99 ms':>9} {'filt p50':>9} {'filt p99':>9} {'batch q/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+            server = None
+            if backend == "http":
+                server = serve(MemoryVectorStore(args.dim), port=0)
+                store = PineconeHTTPStore(f"http://127.0.0.1:{server.server_address[1]}", dim=args.dim)
+            else:
+                store = open_store(backend, dim=args.dim, path=Path(tmp) / backend)
+
+            t0 = time.perf_counter()
+            for i in range(0, len(records), args.batch):
+                store.upsert(records[i : i + args.batch], namespace=CHUNKS_NAMESPACE)
+            upsert_rate = len(records) / (time.perf_counter() - t0)
+
+            def single(**kw):
+                ms = []
+                for q in queries:
+                    t = time.perf_counter()
+                    store.query(q, top_k=args.top_k, namespace=CHUNKS_NAMESPACE, **kw)
+                    ms.append((time.perf_counter() - t) * 1000)
+                return _pcts(ms)
+
+            store.query(queries[0], top_k=args.top_k, namespace=CHUNKS_NAMESPACE)  # warm caches
+            plain = single()
+            filtered = single(filter=flt)
+            t0 = time.perf_counter()
+            for i in range(0, len(queries), 32):
+                store.query_many(queries[i : i + 32], top_k=args.top_k, namespace=CHUNKS_NAMESPACE)
+            batch_rate = len(queries) / (time.perf_counter() - t0)
+            print(
+                f"{backend:<8} {upsert_rate:10.0f} {plain[0]:9.2f} {plain[1]:9.2f} "
+                f"{filtered[0]:9.2f} {filtered[1]:9.2f} {batch_rate:10.0f}"
+            )
+            store.close()
+            if server is not None:
+                server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
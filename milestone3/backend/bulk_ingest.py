@@ -0,0 +1,347 @@
+"""Offline bulk ingestion of a contract corpus into per-contract index artifacts.
+
+Walks a directory of .txt/.pdf/.docx files, parses + chunks + embeds them in a process
+pool, and writes one artifact folder per contract (see LocalRAGIndex.save). A manifest of
+file content hashes makes re-runs incremental: unchanged files are skipped, and an
+interrupted run resumes from its last checkpoint.
+
+    cd milestone3/backend
+    python bulk_ingest.py --input ../../data/contracts --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from contract_pipeline import (
+    OUTPUTS_DIR,
+    SUPPORTED_DOCUMENT_SUFFIXES,
+    LocalRAGIndex,
+    extract_clause_facts,
+    extract_document_text,
+    stable_contract_id,
+    utc_now_iso,
+)
+from clause_lsh import delete_contract_clauses, lsh_db_path, replace_many_contract_clauses
+from embedding_cache import DEFAULT_CACHE_DIR, DEFAULT_CAPACITY, attach_cache
+from facts_store import FACTS_VERSION, delete_contract_facts, facts_db_path, replace_many_contract_facts
+
+
+DEFAULT_CORPUS_DIR = OUTPUTS_DIR / "corpus"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def artifact_dir(corpus_dir: Path, contract_id: str) -> Path:
+    return Path(corpus_dir) / "contracts" / contract_id
+
+
+def load_manifest(corpus_dir: Path) -> Dict[str, Any]:
+    p = Path(corpus_dir) / MANIFEST_NAME
+    if not p.exists():
+        return {"version": MANIFEST_VERSION, "files": {}}
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    data.setdefault("files", {})
+    return data
+
+
+def save_manifest(corpus_dir: Path, manifest: Dict[str, Any]) -> None:
+    """Atomic write so an interrupted run never leaves a torn manifest."""
+    d = Path(corpus_dir)
+    d.mkdir(parents=True, exist_ok=True)
+    manifest["updated_at"] = utc_now_iso()
+    tmp = d / f".{MANIFEST_NAME}.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, d / MANIFEST_NAME)
+
+
+def iter_documents(input_dir: Path) -> Iterator[Path]:
+    for p in sorted(Path(input_dir).rglob("*")):
+        if p.is_file() and p.suffix.lower() in SUPPORTED_DOCUMENT_SUFFIXES:
+            yield p
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# One embedder per worker process (model load is the expensive part).
+_WORKER_RAG: Optional[LocalRAGIndex] = None
+
+
+def _worker_init(model_name: str, cache_dir: Optional[str] = None, cache_capacity: int = DEFAULT_CAPACITY) -> None:
+    global _WORKER_RAG
+    _WORKER_RAG = LocalRAGIndex(model_name=model_name)
+    if cache_dir:
+        attach_cache(_WORKER_RAG, Path(cache_dir), capacity=cache_capacity)
+
+
+def _ingest_one(
+    path: str,
+    *,
+    corpus_dir: str,
+    model_name: str,
+    chunk_size: int,
+    overlap: int,
+) -> Dict[str, Any]:
+    rag = _WORKER_RAG or LocalRAGIndex(model_name=model_name)
+    t0 = time.perf_counter()
+    text = extract_document_text(Path(path).read_bytes(), filename=path)
+    if not text.strip():
+        raise ValueError("No extractable text")
+    contract_id = stable_contract_id(text)
+    t_embed = time.perf_counter()
+    embedded = rag.build(text, chunk_size=chunk_size, overlap=overlap)
+    embed_seconds = time.perf_counter() - t_embed
+    rag.save(
+        artifact_dir(Path(corpus_dir), contract_id),
+        meta={
+            "contract_id": contract_id,
+            "model_name": model_name,
+            "chunk_size": chunk_size,
+            "overlap": overlap,
+            "source": Path(path).name,
+            "n_chars": len(text),
+        },
+    )
+    return {
+        "contract_id": contract_id,
+        "n_chunks": len(rag.chunks),
+        "n_embedded": embedded,
+        "embed_seconds": embed_seconds,
+        "n_chars": len(text),
+        "facts": extract_clause_facts(text),
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def ingest_corpus(
+    input_dir: Path,
+    *,
+    corpus_dir: Path = DEFAULT_CORPUS_DIR,
+    workers: int = max(1, (os.cpu_count() or 2) - 1),
+    model_name: Optional[str] = None,
+    chunk_size: int = 900,
+    overlap: int = 120,
+    checkpoint_every: int = 25,
+    prune: bool = False,
+    force: bool = False,
+    embedding_cache_dir: Optional[Path] = None,
+    cache_capacity: int = DEFAULT_CAPACITY,
+    log=print,
+) -> Dict[str, Any]:
+    """Ingest new/changed documents under `input_dir`. Returns run statistics.
+
+    `workers=0` runs inline (no process pool), which is handy for tests and debugging.
+    With `embedding_cache_dir`, chunks already embedded for any earlier contract (this
+    run or a previous one) are read from the shared cache instead of re-embedded.
+    """
+
+    input_dir = Path(input_dir)
+    corpus_dir = Path(corpus_dir)
+    model_name = model_name or os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+    embedder_name = LocalRAGIndex(model_name=model_name).embedder_name
+
+    manifest = load_manifest(corpus_dir)
+    settings = {
+        "embedder_name": embedder_name,
+        "chunk_size": int(chunk_size),
+        "overlap": int(overlap),
+        "facts_version": FACTS_VERSION,
+    }
+    facts_db = facts_db_path(corpus_dir)
+    if any(manifest.get(k) != v for k, v in settings.items()):
+        # Different embedder/chunking/fact extraction invalidates every artifact.
+        force = force or bool(manifest["files"])
+    # model_name is recorded (for corpus_index.py) but not part of `settings`: the embedder_name already
+    # changes with the model, and older manifests without it should not force a full re-ingest.
+    manifest.update({"version": MANIFEST_VERSION, **settings, "model_name": model_name})
+    files: Dict[str, Dict[str, Any]] = manifest["files"]
+
+    todo: List[tuple[str, Path, str]] = []
+    present: set[str] = set()
+    skipped = 0
+    for path in iter_documents(input_dir):
+        rel = path.relative_to(input_dir).as_posix()
+        present.add(rel)
+        sha = file_sha256(path)
+        prev = files.get(rel) or {}
+        done = prev.get("status") == "ok" and artifact_dir(corpus_dir, prev.get("contract_id") or "_").exists()
+        if not force and done and prev.get("sha256") == sha:
+            skipped += 1
+            continue
+        todo.append((rel, path, sha))
+
+    def drop_if_unreferenced(cid: Optional[str]) -> None:
+        """Remove a contract's artifacts, facts and clauses once no manifest entry points at it."""
+        if cid and not any(f.get("contract_id") == cid for f in files.values()):
+            shutil.rmtree(artifact_dir(corpus_dir, cid), ignore_errors=True)
+            delete_contract_facts(facts_db, cid)
+            delete_contract_clauses(lsh_db_path(corpus_dir), cid)
+
+    pruned = 0
+    if prune:
+        for rel in [r for r in files if r not in present]:
+            cid = files.pop(rel).get("contract_id")
+            pruned += 1
+            drop_if_unreferenced(cid)
+
+    log(f"{len(todo)} to ingest, {skipped} unchanged, {pruned} pruned; workers={workers}")
+
+    stats = {
+        "ingested": 0,
+        "failed": 0,
+        "skipped": skipped,
+        "pruned": pruned,
+        "chunks": 0,
+        "embedded": 0,
+        "embed_seconds": 0.0,
+        "chars": 0,
+        "facts": 0,
+        "new_clauses": 0,
+    }
+    t0 = time.perf_counter()
+    # Facts are buffered and committed in one transaction right before each manifest
+    # checkpoint, so the manifest never marks a file done whose facts were not stored.
+    pending_facts: List[tuple] = []
+
+    def checkpoint() -> None:
+        stats["facts"] += replace_many_contract_facts(facts_db, pending_facts)
+        # Fact-bearing statements feed the near-duplicate clause index (clause_lsh.py).
+        stats["new_clauses"] += replace_many_contract_clauses(lsh_db_path(corpus_dir), [(cid, f) for cid, f, _ in pending_facts])
+        pending_facts.clear()
+        save_manifest(corpus_dir, manifest)
+
+    def record(rel: str, sha: str, res: Optional[Dict[str, Any]], err: Optional[BaseException]) -> None:
+        old_cid = (files.get(rel) or {}).get("contract_id")
+        if err is not None:
+            stats["failed"] += 1
+            files[rel] = {"sha256": sha, "status": "error", "error": str(err), "ingested_at": utc_now_iso()}
+            log(f"  FAILED {rel}: {err}")
+        else:
+            stats["ingested"] += 1
+            stats["chunks"] += int(res["n_chunks"])
+            stats["embedded"] += int(res["n_embedded"])
+            stats["embed_seconds"] += float(res["embed_seconds"])
+            stats["chars"] += int(res["n_chars"])
+            # Workers only extract; the parent is the single SQLite writer.
+            pending_facts.append((res["contract_id"], res["facts"], rel))
+            files[rel] = {
+                "sha256": sha,
+                "status": "ok",
+                "contract_id": res["contract_id"],
+                "n_chunks": res["n_chunks"],
+                "n_chars": res["n_chars"],
+                "ingested_at": utc_now_iso(),
+            }
+        # An edited (or now failing) file leaves its previous version behind unless dropped here.
+        drop_if_unreferenced(old_cid)
+        completed = stats["ingested"] + stats["failed"]
+        if checkpoint_every and completed % checkpoint_every == 0:
+            checkpoint()
+            log(f"  checkpoint: {completed}/{len(todo)}")
+
+    kwargs = {"corpus_dir": str(corpus_dir), "model_name": model_name, "chunk_size": chunk_size, "overlap": overlap}
+    cache_dir = str(embedding_cache_dir) if embedding_cache_dir else None
+    initargs = (model_name, cache_dir, int(cache_capacity))
+    try:
+        if workers <= 0:
+            if todo:
+                _worker_init(*initargs)
+            for rel, path, sha in todo:
+                try:
+                    record(rel, sha, _ingest_one(str(path), **kwargs), None)
+                except Exception as e:
+                    record(rel, sha, None, e)
+        elif todo:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=initargs) as pool:
+                futures = {pool.submit(_ingest_one, str(path), **kwargs): (rel, sha) for rel, path, sha in todo}
+                for fut in as_completed(futures):
+                    rel, sha = futures[fut]
+                    try:
+                        record(rel, sha, fut.result(), None)
+                    except Exception as e:
+                        record(rel, sha, None, e)
+    finally:
+        # Always checkpoint, including on Ctrl+C, so the next run resumes.
+        checkpoint()
+        if workers <= 0:
+            # Inline runs used this process as the worker; drop its embedder and cache handle.
+            global _WORKER_RAG
+            _WORKER_RAG = None
+
+    elapsed = time.perf_counter() - t0
+    reused = stats["chunks"] - stats["embedded"]
+    stats.update(
+        {
+            # Share of chunks served from the cache (or repeated within a contract).
+            "dedup_ratio": (reused / stats["chunks"]) if stats["chunks"] else None,
+            # Estimate: reused chunks x the measured build time per embedded chunk.
+            "embed_seconds_saved": (reused * stats["embed_seconds"] / stats["embedded"]) if stats["embedded"] else None,
+            "seconds": elapsed,
+            "docs_per_sec": (stats["ingested"] / elapsed) if elapsed > 0 else None,
+            "chunks_per_sec": (stats["chunks"] / elapsed) if elapsed > 0 else None,
+            "corpus_dir": str(corpus_dir),
+        }
+    )
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True, help="directory with .txt/.pdf/.docx contracts (recursive)")
+    parser.add_argument("--out", default=str(DEFAULT_CORPUS_DIR), help="corpus artifact directory")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--model-name", default=None)
+    parser.add_argument("--chunk-size", type=int, default=900)
+    parser.add_argument("--overlap", type=int, default=120)
+    parser.add_argument("--checkpoint-every", type=int, default=25)
+    parser.add_argument("--prune", action="store_true", help="drop manifest entries/artifacts for deleted files")
+    parser.add_argument("--force", action="store_true", help="re-ingest everything")
+    parser.add_argument("--embedding-cache", default=str(DEFAULT_CACHE_DIR), help="shared chunk-embedding cache directory")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="embed every chunk, bypassing the cache")
+    parser.add_argument("--cache-capacity", type=int, default=DEFAULT_CAPACITY, help="cache size in chunks (LRU beyond that)")
+    args = parser.parse_args()
+
+    stats = ingest_corpus(
+        Path(args.input),
+        corpus_dir=Path(args.out),
+        workers=args.workers,
+        model_name=args.model_name,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        checkpoint_every=args.checkpoint_every,
+        prune=args.prune,
+        force=args.force,
+        embedding_cache_dir=None if args.no_embedding_cache else Path(args.embedding_cache),
+        cache_capacity=args.cache_capacity,
+    )
+    print(
+        f"ingested={stats['ingested']} skipped={stats['skipped']} failed={stats['failed']} "
+        f"chunks={stats['chunks']} facts={stats['facts']} in {stats['seconds']:.2f}s "
+        f"({(stats['docs_per_sec'] or 0):.1f} docs/s, {(stats['chunks_per_sec'] or 0):.1f} chunks/s)"
+    )
+    if stats["chunks"]:
+        print(
+            f"embedded={stats['embedded']} dedup={(stats['dedup_ratio'] or 0):.1%} "
+            f"(~{(stats['embed_seconds_saved'] or 0):.1f}s of embedding saved)"
+        )
+
+
+if __name__ == "__main__":
+    main()
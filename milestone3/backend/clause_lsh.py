@@ -0,0 +1,316 @@
+"""Near-duplicate clause detection across the corpus (MinHash + LSH banding).
+
+Many clauses differ only in party names or figures ("within 30 days" vs "within 45
+days"). Each fact-bearing statement is normalized (_normalize_clause, lower-cased,
+digits masked), shingled into word 3-grams and MinHashed; the signature is split into
+bands and stored in SQLite next to the facts DB (<corpus>/clause_lsh.sqlite3).
+
+A lookup returns the already-analysed near-duplicates (estimated Jaccard >= MIN_JACCARD)
+with their stored (fact, topic) kinds and the contracts they were seen in. The API
+reports "seen in N other contracts" per evidence clause; the classification itself is
+always recomputed from the contract's own text.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from contract_pipeline import ClauseFact, _normalize_clause
+
+log = logging.getLogger(__name__)
+
+
+LSH_DB_NAME = "clause_lsh.sqlite3"
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MIN_JACCARD = 0.8
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240611)
+_PERM_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_DIGITS_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD_RE = re.compile(r"[a-z0-9#%]+")
+
+
+def lsh_db_path(corpus_dir: Path) -> Path:
+    return Path(corpus_dir) / LSH_DB_NAME
+
+
+def clause_key_text(stmt: str) -> str:
+    """Normalized clause text: headings stripped, lower-cased, every number masked."""
+    return _DIGITS_RE.sub("#", _normalize_clause(stmt).lower())
+
+
+def minhash(stmt: str) -> np.ndarray:
+    """NUM_PERM-value MinHash signature over word 3-gram shingles of clause_key_text."""
+    words = _WORD_RE.findall(clause_key_text(stmt))
+    grams = [" ".join(words[i : i + 3]) for i in range(max(1, len(words) - 2))] if words else [""]
+    x = np.array([zlib.crc32(g.encode("utf-8")) % _PRIME for g in set(grams)], dtype=np.uint64)
+    return ((x[:, None] * _PERM_A[None, :] + _PERM_B[None, :]) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def _band_keys(sig: np.ndarray) -> List[Tuple[int, int]]:
+    return [(b, zlib.crc32(sig[b * ROWS : (b + 1) * ROWS].tobytes())) for b in range(BANDS)]
+
+
+@dataclass
+class NearDuplicate:
+    """Already-analysed clauses near-identical to a query statement."""
+
+    text: str
+    similarity: float
+    kinds: List[Tuple[str, str]]
+    seen_in: int = 0
+    example_contract_ids: List[str] = field(default_factory=list)
+
+
+def _connect(db: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(str(db), timeout=30)
+    con.row_factory = sqlite3.Row
+    return con
+
+
+def init_lsh_db(db: Path) -> None:
+    Path(db).parent.mkdir(parents=True, exist_ok=True)
+    con = _connect(db)
+    try:
+        with con:
+            con.execute("PRAGMA journal_mode=WAL")
+            # One row per distinct normalized clause; contracts reference it via occurrences,
+            # so boilerplate shared by thousands of contracts is one LSH candidate, not thousands.
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lsh_clauses (
+                    clause_id INTEGER PRIMARY KEY,
+                    key_hash TEXT NOT NULL UNIQUE,
+                    text TEXT NOT NULL,
+                    kinds TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    n_contracts INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lsh_occurrences (
+                    clause_id INTEGER NOT NULL,
+                    contract_id TEXT NOT NULL,
+                    PRIMARY KEY (clause_id, contract_id)
+                ) WITHOUT ROWID
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_lsh_occurrences_contract ON lsh_occurrences(contract_id)")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS lsh_bands (band INTEGER NOT NULL, bucket INTEGER NOT NULL, clause_id INTEGER NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_lsh_bands_bucket ON lsh_bands(band, bucket, clause_id)")
+    finally:
+        con.close()
+
+
+def statement_kinds(facts: Iterable[ClauseFact]) -> Dict[str, List[Tuple[str, str]]]:
+    """Fact-bearing statements of one contract -> their (fact, topic) kinds, in order."""
+    out: Dict[str, List[Tuple[str, str]]] = {}
+    for f in facts:
+        kinds = out.setdefault(f.evidence, [])
+        if (f.fact, f.topic) not in kinds:
+            kinds.append((f.fact, f.topic))
+    return out
+
+
+def replace_many_contract_clauses(db: Path, items: Sequence[Tuple[str, List[ClauseFact]]]) -> int:
+    """(Re)index the fact-bearing statements of many contracts in one transaction.
+
+    Returns the number of new distinct clauses added to the index.
+    """
+
+    if not items:
+        return 0
+    init_lsh_db(db)
+    con = _connect(db)
+    added = 0
+    try:
+        with con:
+            touched = set()
+            for contract_id, facts in items:
+                touched.update(_forget(con, contract_id))
+                for text, kinds in statement_kinds(facts).items():
+                    key = hashlib.sha1(clause_key_text(text).encode("utf-8")).hexdigest()
+                    row = con.execute("SELECT clause_id FROM lsh_clauses WHERE key_hash = ?", (key,)).fetchone()
+                    if row is None:
+                        sig = minhash(text)
+                        clause_id = con.execute(
+                            "INSERT INTO lsh_clauses (key_hash, text, kinds, signature) VALUES (?, ?, ?, ?)",
+                            (key, text, json.dumps(kinds), sig.tobytes()),
+                        ).lastrowid
+                        con.executemany(
+                            "INSERT INTO lsh_bands (band, bucket, clause_id) VALUES (?, ?, ?)",
+                            [(b, k, clause_id) for b, k in _band_keys(sig)],
+                        )
+                        added += 1
+                    else:
+                        clause_id = row["clause_id"]
+                    con.execute(
+                        "INSERT OR IGNORE INTO lsh_occurrences (clause_id, contract_id) VALUES (?, ?)", (clause_id, contract_id)
+                    )
+                    touched.add(clause_id)
+            _recount(con, touched)
+    finally:
+        con.close()
+    return added
+
+
+def _forget(con: sqlite3.Connection, contract_id: str) -> List[int]:
+    ids = [r[0] for r in con.execute("SELECT clause_id FROM lsh_occurrences WHERE contract_id = ?", (contract_id,))]
+    con.execute("DELETE FROM lsh_occurrences WHERE contract_id = ?", (contract_id,))
+    return ids
+
+
+def _recount(con: sqlite3.Connection, clause_ids: Iterable[int]) -> None:
+    con.executemany(
+        "UPDATE lsh_clauses SET n_contracts = (SELECT COUNT(*) FROM lsh_occurrences o WHERE o.clause_id = lsh_clauses.clause_id) "
+        "WHERE clause_id = ?",
+        [(c,) for c in clause_ids],
+    )
+
+
+def delete_contract_clauses(db: Path, contract_id: str) -> None:
+    """Forget a contract's occurrences (its distinct clauses stay as analysed references)."""
+    if not Path(db).exists():
+        return
+    con = _connect(db)
+    try:
+        with con:
+            _recount(con, _forget(con, contract_id))
+    finally:
+        con.close()
+
+
+def find_near_duplicates(
+    db: Path,
+    statements: Sequence[str],
+    *,
+    exclude_contract: Optional[str] = None,
+    min_jaccard: float = MIN_JACCARD,
+    max_examples: int = 5,
+) -> Dict[str, NearDuplicate]:
+    """Best already-analysed near-duplicate per statement (statements without one are absent).
+
+    `seen_in` counts the distinct contracts (other than `exclude_contract`) containing any
+    clause within `min_jaccard` of the statement.
+    """
+
+    stmts = list(dict.fromkeys(s for s in statements if (s or "").strip()))
+    if not stmts or not Path(db).exists():
+        return {}
+    sigs = {s: minhash(s) for s in stmts}
+    keys = {s: _band_keys(sig) for s, sig in sigs.items()}
+    con = _connect(db)
+    out: Dict[str, NearDuplicate] = {}
+    try:
+        wanted = sorted({k for ks in keys.values() for k in ks})
+        hits: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i in range(0, len(wanted), 400):
+            part = wanted[i : i + 400]
+            q = f"SELECT band, bucket, clause_id FROM lsh_bands WHERE (band, bucket) IN (VALUES {','.join('(?, ?)' for _ in part)})"
+            for r in con.execute(q, [v for pair in part for v in pair]):
+                hits[(r["band"], r["bucket"])].append(r["clause_id"])
+        cand_ids = sorted({c for ids in hits.values() for c in ids})
+        rows: Dict[int, sqlite3.Row] = {}
+        for i in range(0, len(cand_ids), 500):
+            part = cand_ids[i : i + 500]
+            q = (
+                "SELECT clause_id, text, kinds, signature, n_contracts FROM lsh_clauses "
+                f"WHERE clause_id IN ({','.join('?' * len(part))})"
+            )
+            rows.update({r["clause_id"]: r for r in con.execute(q, part)})
+
+        for s in stmts:
+            sims = {}
+            for c in {c for k in keys[s] for c in hits.get(k, ())}:
+                sim = float(np.mean(np.frombuffer(rows[c]["signature"], dtype=np.uint32) == sigs[s]))
+                if sim >= min_jaccard:
+                    sims[c] = sim
+            if not sims:
+                continue
+            ids = sorted(sims)
+            marks = ",".join("?" * len(ids))
+            params = [*ids, exclude_contract or ""]
+            if len(ids) == 1:
+                # Common case (one distinct clause): the stored count avoids scanning occurrences.
+                own = con.execute(
+                    "SELECT 1 FROM lsh_occurrences WHERE clause_id = ? AND contract_id = ?", params
+                ).fetchone()
+                seen_in = int(rows[ids[0]]["n_contracts"]) - (1 if own else 0)
+            else:
+                seen_in = con.execute(
+                    f"SELECT COUNT(DISTINCT contract_id) FROM lsh_occurrences WHERE clause_id IN ({marks}) AND contract_id != ?",
+                    params,
+                ).fetchone()[0]
+            if not seen_in:
+                continue
+            examples = [
+                r["contract_id"]
+                for r in con.execute(
+                    f"SELECT DISTINCT contract_id FROM lsh_occurrences WHERE clause_id IN ({marks}) AND contract_id != ? "
+                    f"ORDER BY contract_id LIMIT {int(max_examples)}",
+                    params,
+                )
+            ]
+            best = max(sims, key=lambda c: (sims[c], -c))
+            out[s] = NearDuplicate(
+                text=rows[best]["text"],
+                similarity=sims[best],
+                kinds=[tuple(k) for k in json.loads(rows[best]["kinds"])],
+                seen_in=int(seen_in),
+                example_contract_ids=examples,
+            )
+    finally:
+        con.close()
+    return out
+
+
+class NearDuplicateLookup:
+    """`on_clause_facts` callback for run_full_pipeline that finds corpus near-duplicates.
+
+    One call resolves every fact-bearing statement of the contract in one DB round trip;
+    `matches` then holds evidence text -> NearDuplicate for the response. The contract's
+    own classification is never replaced: a near-duplicate can differ in exactly the
+    keyword that decides its topic. The lookup only annotates, so a DB error (locked or
+    corrupt clause_lsh.sqlite3) is logged and leaves `matches` None.
+    """
+
+    def __init__(self, db: Path, *, exclude_contract: Optional[str] = None) -> None:
+        self.db = Path(db)
+        self.exclude_contract = exclude_contract
+        self.matches: Optional[Dict[str, NearDuplicate]] = None
+        self.checked = 0
+
+    def __call__(self, facts: List[ClauseFact]) -> None:
+        stmts = list(statement_kinds(facts))
+        try:
+            matches = find_near_duplicates(self.db, stmts, exclude_contract=self.exclude_contract)
+        except sqlite3.Error:
+            log.exception("near-duplicate lookup failed (%s)", self.db)
+            return
+        self.checked = len(stmts)
+        self.matches = matches
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """None if the contract's clauses were never looked up (non-risk questions)."""
+        if self.matches is None:
+            return None
+        return {"statements_checked": self.checked, "seen_before": len(self.matches)}
@@ -0,0 +1,288 @@
+"""Side-by-side comparison of N ingested contracts (e.g. a draft vs template + precedents).
+
+Every contract is loaded once: its cached index (memory-mapped), its ingest-time clause
+facts and its executive risk analysis. The topic clauses of all contracts are then
+embedded in a single batch and aligned against the reference contract with one Gram
+matrix, so adding a contract adds one row block, not one pipeline run per pair.
+
+    cd milestone3/backend
+    python contract_compare.py <template_id> <draft_id> [<precedent_id> ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bulk_ingest import DEFAULT_CORPUS_DIR, artifact_dir
+from contract_pipeline import (
+    ClauseFact,
+    LocalRAGIndex,
+    _extract_topic_statements,
+    _normalize_clause,
+    _risk_rank,
+    build_executive_report_data,
+    classify_liability_cap,
+    late_fee_monthly_pct,
+    parse_payment_days,
+    parse_uptime_pct,
+    parse_within_days,
+)
+from facts_store import facts_db_path, get_contract_facts
+from portfolio_sweep import AGENTS, corpus_contracts
+
+
+# (topic, fact, agent, retrieval query, value parser used when a contract has no stored facts)
+COMPARE_TOPICS: List[Tuple[str, str, str, str, Any]] = [
+    ("payment", "payment_days", "finance", "payment terms invoice due within days undisputed amounts", parse_payment_days),
+    ("late", "late_fee_pct", "finance", "late fees interest overdue per month penalty", late_fee_monthly_pct),
+    ("termination", "termination_notice_days", "legal", "termination terminate material breach cure notice", parse_within_days),
+    ("liability", "liability_cap", "legal", "limitation of liability liability cap capped uncapped", classify_liability_cap),
+    ("availability", "uptime_pct", "operations", "service availability uptime % of the time scheduled maintenance", parse_uptime_pct),
+    ("sla", "uptime_pct", "operations", "SLA uptime service credits service level", parse_uptime_pct),
+    (
+        "compliance",
+        "compliance",
+        "compliance",
+        "privacy data protection security breach notification incident retention subprocessor audit",
+        lambda s: None,
+    ),
+]
+
+# Aligned clause pairs below this cosine are treated as unrelated (one added, one missing).
+ALIGN_MIN_SIM = 0.5
+# At or above this cosine (or identical normalized text) a clause counts as unchanged.
+SAME_MIN_SIM = 0.98
+MAX_CLAUSES_PER_TOPIC = 8
+
+
+@dataclass
+class TopicClause:
+    text: str
+    value: Any = None
+
+
+@dataclass
+class LoadedContract:
+    contract_id: str
+    source: Optional[str]
+    from_facts: bool
+    analysis: Dict[str, Any]
+    clauses: Dict[str, List[TopicClause]] = field(default_factory=dict)
+
+
+def _fact_value(f: ClauseFact) -> Any:
+    if f.fact == "liability_cap":
+        return f.value_text
+    if f.value_num is not None:
+        return f.value_num
+    return f.value_text
+
+
+def load_contract(
+    corpus_dir: Path,
+    contract_id: str,
+    *,
+    embedder: LocalRAGIndex,
+    source: Optional[str] = None,
+) -> LoadedContract:
+    """Index, facts, risk analysis and per-topic clauses for one ingested contract."""
+
+    rag = LocalRAGIndex.load(artifact_dir(corpus_dir, contract_id), embedder=embedder, mmap=True)
+    facts = get_contract_facts(facts_db_path(corpus_dir), contract_id)
+    analysis = build_executive_report_data(contract_text="", rag=rag, selected_agents=list(AGENTS), facts=facts)
+
+    clauses: Dict[str, List[TopicClause]] = {}
+    for topic, fact, _agent, query, parse in COMPARE_TOPICS:
+        if facts is not None:
+            items = [TopicClause(f.evidence, _fact_value(f)) for f in facts if f.fact == fact and f.topic == topic]
+        else:
+            items = [
+                TopicClause(s, parse(s))
+                for s in _extract_topic_statements(rag, query=query, topic=topic, max_items=MAX_CLAUSES_PER_TOPIC)
+            ]
+        clauses[topic] = items[:MAX_CLAUSES_PER_TOPIC]
+    return LoadedContract(contract_id, source, facts is not None, analysis, clauses)
+
+
+def _align(sims: np.ndarray) -> List[Tuple[int, int, float]]:
+    """Greedy one-to-one alignment (best pairs first) of reference rows to other columns."""
+
+    pairs: List[Tuple[int, int, float]] = []
+    if sims.size == 0:
+        return pairs
+    used_r: set = set()
+    used_o: set = set()
+    for flat in np.argsort(-sims, axis=None, kind="stable"):
+        r, o = divmod(int(flat), sims.shape[1])
+        s = float(sims[r, o])
+        if s < ALIGN_MIN_SIM:
+            break
+        if r in used_r or o in used_o:
+            continue
+        used_r.add(r)
+        used_o.add(o)
+        pairs.append((r, o, s))
+    return pairs
+
+
+def _topic_value(items: List[TopicClause]) -> Any:
+    return next((c.value for c in items if c.value is not None), None)
+
+
+def _risk_delta(ref: Optional[str], other: Optional[str]) -> Dict[str, Any]:
+    a, b = _risk_rank(ref or ""), _risk_rank(other or "")
+    return {"reference": ref, "other": other, "delta": (b - a) if a and b else None}
+
+
+def compare_loaded(
+    contracts: Sequence[LoadedContract],
+    *,
+    embedder: LocalRAGIndex,
+    reference: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Align every contract's topic clauses against the reference contract and diff them."""
+
+    if len(contracts) < 2:
+        raise ValueError("Need at least two contracts to compare")
+    ids = [c.contract_id for c in contracts]
+    ref_id = reference or ids[0]
+    if ref_id not in ids:
+        raise ValueError(f"Reference {ref_id!r} is not among the compared contracts")
+    ref = contracts[ids.index(ref_id)]
+    others = [c for c in contracts if c.contract_id != ref_id]
+
+    # One encode call for every clause of every contract, then one Gram matrix.
+    rows: Dict[Tuple[str, str], Tuple[int, int]] = {}
+    texts: List[str] = []
+    for c in contracts:
+        for topic, *_ in COMPARE_TOPICS:
+            items = c.clauses.get(topic) or []
+            rows[(c.contract_id, topic)] = (len(texts), len(texts) + len(items))
+            texts.extend(t.text for t in items)
+    if texts:
+        vecs = np.asarray(embedder.encode(texts, normalize_embeddings=True), dtype=np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+        gram = vecs @ vecs.T
+    else:
+        gram = np.zeros((0, 0), dtype=np.float32)
+
+    topics_out: List[Dict[str, Any]] = []
+    for topic, fact, agent, *_ in COMPARE_TOPICS:
+        ref_items = ref.clauses.get(topic) or []
+        r0, r1 = rows[(ref_id, topic)]
+        ref_value = _topic_value(ref_items)
+        comparisons: List[Dict[str, Any]] = []
+        for c in others:
+            items = c.clauses.get(topic) or []
+            o0, o1 = rows[(c.contract_id, topic)]
+            pairs = _align(gram[r0:r1, o0:o1])
+            matched_r = {r for r, _, _ in pairs}
+            matched_o = {o for _, o, _ in pairs}
+            diff: List[Dict[str, Any]] = []
+            for r, o, s in pairs:
+                same = s >= SAME_MIN_SIM or _normalize_clause(ref_items[r].text).lower() == _normalize_clause(items[o].text).lower()
+                diff.append(
+                    {
+                        "status": "same" if same else "changed",
+                        "similarity": round(s, 4),
+                        "reference": ref_items[r].text,
+                        "other": items[o].text,
+                        "reference_value": ref_items[r].value,
+                        "other_value": items[o].value,
+                    }
+                )
+            diff += [{"status": "missing", "reference": t.text, "reference_value": t.value} for i, t in enumerate(ref_items) if i not in matched_r]
+            diff += [{"status": "added", "other": t.text, "other_value": t.value} for i, t in enumerate(items) if i not in matched_o]
+
+            value = _topic_value(items)
+            numeric = isinstance(value, (int, float)) and isinstance(ref_value, (int, float))
+            n = max(len(ref_items), len(items))
+            comparisons.append(
+                {
+                    "contract_id": c.contract_id,
+                    "value": value,
+                    "value_changed": value != ref_value,
+                    "value_delta": (value - ref_value) if numeric else None,
+                    # Sum of aligned similarities over the larger side: 1.0 only if every clause has a twin.
+                    "similarity": round(sum(s for _, _, s in pairs) / n, 4) if n else None,
+                    "identical": all(d["status"] == "same" for d in diff),
+                    "clauses": diff,
+                }
+            )
+        topics_out.append(
+            {
+                "topic": topic,
+                "fact": fact,
+                "agent": agent,
+                "reference_value": ref_value,
+                "comparisons": comparisons,
+            }
+        )
+
+    risk_deltas = [
+        {
+            "contract_id": c.contract_id,
+            "overall": _risk_delta(ref.analysis.get("overall_risk"), c.analysis.get("overall_risk")),
+            "agents": {
+                a: _risk_delta((ref.analysis.get(a) or {}).get("risk_level"), (c.analysis.get(a) or {}).get("risk_level"))
+                for a in AGENTS
+            },
+        }
+        for c in others
+    ]
+
+    return {
+        "reference": ref_id,
+        "contracts": [
+            {
+                "contract_id": c.contract_id,
+                "source": c.source,
+                "from_facts": c.from_facts,
+                "overall_risk": c.analysis.get("overall_risk"),
+                "risk": {a: (c.analysis.get(a) or {}).get("risk_level") for a in AGENTS},
+            }
+            for c in contracts
+        ],
+        "topics": topics_out,
+        "risk_deltas": risk_deltas,
+    }
+
+
+def compare_contracts(
+    contract_ids: Sequence[str],
+    *,
+    corpus_dir: Path = DEFAULT_CORPUS_DIR,
+    reference: Optional[str] = None,
+    embedder: Optional[LocalRAGIndex] = None,
+) -> Dict[str, Any]:
+    """Compare ingested contracts by id. Raises KeyError for ids not in the corpus."""
+
+    corpus_dir = Path(corpus_dir)
+    ids = list(dict.fromkeys(contract_ids))
+    sources = corpus_contracts(corpus_dir)
+    unknown = [cid for cid in ids if cid not in sources]
+    if unknown:
+        raise KeyError(", ".join(unknown))
+    embedder = embedder or LocalRAGIndex(model_name=os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"))
+    loaded = [load_contract(corpus_dir, cid, embedder=embedder, source=sources[cid]) for cid in ids]
+    return compare_loaded(loaded, embedder=embedder, reference=reference)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("contract_ids", nargs="+", help="first id is the reference unless --reference is given")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS_DIR))
+    parser.add_argument("--reference", default=None)
+    args = parser.parse_args()
+    print(json.dumps(compare_contracts(args.contract_ids, corpus_dir=Path(args.corpus), reference=args.reference), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,25 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
+import io
 import json
 import os
 import re
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 
+from metrics import PIPELINES_IN_FLIGHT, timed
+
 
 def _maybe_load_sentence_transformer():
     """Lazy-load SentenceTransformer.
@@ -31,12 +40,30 @@ def _maybe_load_sentence_transformer():
         return None
 
 
+def _maybe_load_onnx_encoder():
+    """Load the ONNX embedder from CLAUSEAI_ONNX_MODEL_DIR (see onnx_embedder.py).
+
+    Opt-in like sentence-transformers; needs only onnxruntime + tokenizers (no torch).
+    Returns None when unset or when the model cannot be loaded.
+    """
+
+    model_dir = os.getenv("CLAUSEAI_ONNX_MODEL_DIR", "").strip()
+    if not model_dir:
+        return None
+    try:
+        from onnx_embedder import load_onnx_encoder
+
+        return load_onnx_encoder(Path(model_dir))
+    except Exception:
+        return None
+
+
 # Base folder for Milestone 3
 MILESTONE3_DIR = Path(__file__).resolve().parents[1]
 OUTPUTS_DIR = MILESTONE3_DIR / "outputs"
 OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
 
-MEMORY_DIR = OUTPUTS_DIR / "api_memory"
+MEMORY_DIR = Path(os.getenv("CLAUSEAI_MEMORY_DIR", "").strip() or OUTPUTS_DIR / "api_memory")
 MEMORY_DIR.mkdir(parents=True, exist_ok=True)
 
 
@@ -91,6 +118,12 @@ COMMON_RISK_TERMS = [
 
 RISK_ORDER = {"low": 0, "medium": 1, "high": 2, "unknown": 1}
 
+# How much per-agent output run_full_pipeline produces (the executive report never uses it):
+# - none:    skip the agent fan-out; only `selected_agents` is returned
+# - summary: risk_level + confidence per agent from one batched retrieval (default)
+# - full:    the original per-agent dumps (per-query matches, evidence, findings) for debugging
+AGENT_DETAIL_LEVELS = ("none", "summary", "full")
+
 
 def detect_intent(question: str) -> str:
     """Determine user intent from the question.
@@ -154,13 +187,23 @@ def _heading_for_fact_summary(question: str) -> str:
     return "Answer"
 
 
-def format_fact_summary_report(question: str, matches: List[RetrievalMatch]) -> str:
+@timed("report")
+def format_fact_summary_report(
+    question: str,
+    matches: List[RetrievalMatch],
+    *,
+    deadline: Optional["Deadline"] = None,
+    stage_costs: Optional["StageCosts"] = None,
+) -> str:
     """Section A answer formatting (fact_summary/qa).
 
     Rules:
     - Include only clauses that answer the question
     - No risk/confidence language
     - Clean bullets, no paragraph dumps
+
+    The optional LLM rewrite is skipped or cut short when `deadline` runs low; its
+    duration feeds `stage_costs` (the deadline's own when it has one).
     """
 
     sa = build_sanitized_answer(question, matches)
@@ -173,23 +216,28 @@ def format_fact_summary_report(question: str, matches: List[RetrievalMatch]) ->
     # - QA_REWRITE_PROVIDER=http
     # - QA_REWRITE_URL=<your local endpoint>
     # - QA_REWRITE_MODEL=<optional model name>
+    # All bullets are rewritten concurrently, with caching and a circuit breaker.
     try:
-        from qa_llm_rewriter import load_rewrite_config_from_env, rewrite_clause_to_bullet  # type: ignore
+        from qa_llm_rewriter import load_rewrite_config_from_env, rewrite_bullets  # type: ignore
 
         cfg = load_rewrite_config_from_env()
         if cfg.provider not in {"", "none", "off", "disabled"}:
-            for sec in sections:
-                heading = (sec.get("heading") or "Answer").strip()
-                new_bullets: List[str] = []
-                for b in (sec.get("bullets") or []):
-                    rewritten = rewrite_clause_to_bullet(
-                        question=question,
-                        heading=heading,
-                        clause_text=b,
-                        config=cfg,
-                    )
-                    new_bullets.append(rewritten or b)
-                sec["bullets"] = new_bullets
+            items = [
+                ((sec.get("heading") or "Answer").strip(), b) for sec in sections for b in (sec.get("bullets") or [])
+            ]
+            if deadline is not None and not deadline.affords("llm_rewrite"):
+                deadline.degrade("llm_rewrite", "skipped", bullets=len(items))
+            else:
+                stats: Dict[str, int] = {}
+                budget_s = None if deadline is None else deadline.remaining_s()
+                costs = deadline.costs if deadline is not None else stage_costs
+                with costs.timed("llm_rewrite") if costs is not None else nullcontext({}) as run:
+                    rewritten = iter(rewrite_bullets(question=question, items=items, config=cfg, budget_s=budget_s, stats=stats))
+                    run["complete"] = not stats.get("timed_out")
+                if deadline is not None and stats.get("timed_out"):
+                    deadline.degrade("llm_rewrite", "cut_short", bullets=len(items), not_rewritten=stats["timed_out"])
+                for sec in sections:
+                    sec["bullets"] = [next(rewritten) or b for b in (sec.get("bullets") or [])]
     except Exception:
         # Any failure keeps deterministic bullets.
         pass
@@ -217,6 +265,47 @@ def stable_contract_id(contract_text: str) -> str:
     return f"uploaded_{h[:12]}"
 
 
+SUPPORTED_DOCUMENT_SUFFIXES = (".txt", ".pdf", ".docx")
+
+
+@timed("parse")
+def extract_document_text(data: bytes, *, filename: str = "", content_type: str = "") -> str:
+    """Extract plain text from an uploaded/ingested .txt, .pdf or .docx payload.
+
+    Raises ValueError when a PDF/DOCX cannot be parsed. Unknown types are decoded as UTF-8.
+    """
+
+    if not data:
+        return ""
+
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+
+    if name.endswith(".txt") or ctype.startswith("text/"):
+        return data.decode("utf-8", errors="ignore")
+
+    if name.endswith(".pdf") or ctype == "application/pdf":
+        try:
+            from PyPDF2 import PdfReader
+
+            reader = PdfReader(io.BytesIO(data))
+            return "\n".join([(p.extract_text() or "") for p in reader.pages])
+        except Exception as e:
+            raise ValueError(f"Could not parse PDF: {e}")
+
+    if name.endswith(".docx"):
+        try:
+            import docx
+
+            doc = docx.Document(io.BytesIO(data))
+            return "\n".join([p.text for p in doc.paragraphs if p.text])
+        except Exception as e:
+            raise ValueError(f"Could not parse DOCX: {e}")
+
+    return data.decode("utf-8", errors="ignore")
+
+
+@timed("chunk")
 def chunk_text(text: str, *, chunk_size: int = 900, overlap: int = 120) -> List[str]:
     t = " ".join((text or "").split())
     if not t:
@@ -234,6 +323,50 @@ def chunk_text(text: str, *, chunk_size: int = 900, overlap: int = 120) -> List[
     return out
 
 
+def chunk_hash(chunk: str) -> str:
+    """Content key for a chunk; equal text -> equal embedding, whatever the document."""
+    return hashlib.sha1(chunk.encode("utf-8", errors="ignore")).hexdigest()[:20]
+
+
+@timed("chunk")
+def content_defined_chunks(text: str, *, min_chars: int = 300, avg_chars: int = 900, max_chars: int = 1800) -> List[str]:
+    """Split text into chunks whose boundaries depend only on nearby words.
+
+    A boundary falls after a word when the hash of the last three words hits a fixed
+    residue (or the chunk reaches `max_chars`). An edit therefore moves at most the
+    boundaries around it: chunks before and after it keep their exact text, and with it
+    their chunk_hash, so a revised contract re-embeds only what changed. Chunks are
+    whitespace-normalized and do not overlap (" ".join(chunks) is the normalized text).
+    A tail shorter than `min_chars` is merged into the last chunk.
+    """
+
+    words = (text or "").split()
+    if not words:
+        return []
+    # ~6 chars per word (including the separator) between min_chars and a boundary.
+    divisor = max(1, (avg_chars - min_chars) // 6)
+    out: List[str] = []
+    start = 0
+    size = 0
+    for i, w in enumerate(words):
+        size += len(w) + 1
+        if size < min_chars:
+            continue
+        window = " ".join(words[max(0, i - 2) : i + 1]).encode("utf-8", errors="ignore")
+        if size >= max_chars or zlib.crc32(window) % divisor == 0:
+            out.append(" ".join(words[start : i + 1]))
+            start = i + 1
+            size = 0
+    if start < len(words):
+        tail = " ".join(words[start:])
+        # A short tail joins the last chunk (only the final chunk depends on where the text ends).
+        if out and size < min_chars:
+            out[-1] = f"{out[-1]} {tail}"
+        else:
+            out.append(tail)
+    return out
+
+
 def cosine_sim_matrix(query_vec: np.ndarray, doc_vecs: np.ndarray) -> np.ndarray:
     q = query_vec.astype(np.float32)
     d = doc_vecs.astype(np.float32)
@@ -242,6 +375,30 @@ def cosine_sim_matrix(query_vec: np.ndarray, doc_vecs: np.ndarray) -> np.ndarray
     return (d @ q) / (dn * qn)
 
 
+@contextmanager
+def staged_dir(dest: Path) -> Iterator[Path]:
+    """Yield an empty sibling directory; on success it replaces `dest` (via os.replace), else it is removed.
+
+    Readers see either the old directory or the complete new one, apart from the instant
+    between the two renames, where `dest` is briefly absent.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tag = uuid.uuid4().hex[:12]
+    staging = dest.with_name(f".{dest.name}.tmp-{tag}")
+    staging.mkdir()
+    try:
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    old = dest.with_name(f".{dest.name}.old-{tag}")
+    if dest.exists():
+        os.replace(dest, old)
+    os.replace(staging, dest)
+    shutil.rmtree(old, ignore_errors=True)
+
+
 @dataclass
 class RetrievalMatch:
     score: float
@@ -252,19 +409,29 @@ class RetrievalMatch:
 class LocalRAGIndex:
     """Minimal local RAG index (in-memory).
 
-    Prefers SentenceTransformers embeddings when available; falls back to a
-    deterministic hashing embedder (no torch) when not.
+    Prefers an exported ONNX model (CLAUSEAI_ONNX_MODEL_DIR), then SentenceTransformers
+    embeddings when available; falls back to a deterministic hashing embedder (no torch)
+    when neither is.
     """
 
-    def __init__(self, *, model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> None:
+    def __init__(self, *, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", embedding_cache: Any = None) -> None:
         self.model_name = model_name
         self.model = None
         self.embedder_name = "hashing"
+        # Optional embedding_cache.EmbeddingCache consulted by build/build_from_chunks.
+        self.embedding_cache = embedding_cache
+        # Optional embedding_service.BatchingEncoder that coalesces concurrent encode() calls.
+        self.encode_service: Any = None
 
         self._hash_dim = 384
         self._hash_salt = "m3"
 
-        SentenceTransformer = _maybe_load_sentence_transformer()
+        # An exported ONNX model, when configured, replaces the torch path entirely.
+        onnx_encoder = _maybe_load_onnx_encoder()
+        if onnx_encoder is not None:
+            self.model = onnx_encoder
+            self.embedder_name = onnx_encoder.embedder_name
+        SentenceTransformer = _maybe_load_sentence_transformer() if self.model is None else None
         if SentenceTransformer is not None:
             try:
                 self.model = SentenceTransformer(model_name)
@@ -296,19 +463,115 @@ class LocalRAGIndex:
             out = out / norms
         return out
 
+    @timed("embed")
     def encode(self, texts: List[str], *, normalize_embeddings: bool = True) -> np.ndarray:
+        service = getattr(self, "encode_service", None)
+        if service is not None:
+            return service.encode(texts, normalize_embeddings=normalize_embeddings)
+        return self.encode_direct(texts, normalize_embeddings=normalize_embeddings)
+
+    def encode_direct(self, texts: List[str], *, normalize_embeddings: bool = True) -> np.ndarray:
+        """Run the model on `texts` in the calling thread (bypasses encode_service)."""
         if self.model is not None:
             vecs = self.model.encode(texts, normalize_embeddings=normalize_embeddings)
             return np.asarray(vecs, dtype=np.float32)
         return self._hash_embed(texts, normalize_embeddings=normalize_embeddings)
 
-    def build(self, contract_text: str) -> None:
-        self.chunks = chunk_text(contract_text)
+    def build(self, contract_text: str, *, chunk_size: int = 900, overlap: int = 120) -> int:
+        """Chunk and embed `contract_text`. Returns the number of chunks actually embedded."""
+        return self.build_from_chunks(chunk_text(contract_text, chunk_size=chunk_size, overlap=overlap))
+
+    def build_from_chunks(self, chunks: List[str], *, reuse: Optional[Dict[str, np.ndarray]] = None) -> int:
+        """Index pre-split chunks, embedding only those not found by chunk_hash.
+
+        Vectors are looked up in `reuse`, then in the shared embedding cache (if any);
+        repeated chunks within the document are embedded once. Newly embedded chunks
+        are added to the cache. Returns the number of chunks that had to be embedded.
+        """
+        self.chunks = list(chunks)
         if not self.chunks:
             self.vectors = None
-            return
-        self.vectors = self.encode(self.chunks, normalize_embeddings=True)
+            return 0
+        keys = [chunk_hash(c) for c in self.chunks]
+        known: Dict[str, np.ndarray] = dict(reuse or {})
+        cache = getattr(self, "embedding_cache", None)
+        if cache is not None:
+            known.update(cache.get_many([k for k in keys if k not in known]))
+        first: Dict[str, int] = {}
+        for i, k in enumerate(keys):
+            if k not in known:
+                first.setdefault(k, i)
+        todo = list(first.values())
+        if todo:
+            fresh = np.asarray(self.encode([self.chunks[i] for i in todo], normalize_embeddings=True), dtype=np.float32)
+            known.update(zip(first, fresh))
+            if cache is not None:
+                cache.put_many(list(first), fresh)
+        self.vectors = np.stack([np.asarray(known[k], dtype=np.float32) for k in keys])
+        return len(todo)
+
+    def save(self, directory: Path, *, meta: Optional[Dict[str, Any]] = None) -> None:
+        """Persist chunks + vectors as index artifacts (chunks.json, vectors.npy, meta.json).
+
+        Written to a staging directory and swapped in, so a crash never leaves a partial index.
+        """
+        with staged_dir(Path(directory)) as d:
+            self._write_artifacts(d, meta)
+
+    def _write_artifacts(self, d: Path, meta: Optional[Dict[str, Any]]) -> None:
+        vectors = self.vectors if self.vectors is not None else np.zeros((0, self._hash_dim), dtype=np.float32)
+        np.save(d / "vectors.npy", np.asarray(vectors, dtype=np.float32))
+        (d / "chunks.json").write_text(json.dumps(self.chunks, ensure_ascii=False), encoding="utf-8")
+        info = {"embedder_name": self.embedder_name, "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0}
+        info.update(meta or {})
+        info["n_chunks"] = len(self.chunks)
+        (d / "meta.json").write_text(json.dumps(info, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    @classmethod
+    def sharing_model(cls, embedder: "LocalRAGIndex") -> "LocalRAGIndex":
+        """Empty index that reuses `embedder`'s already-loaded model."""
+        rag = cls.__new__(cls)
+        rag.model_name = embedder.model_name
+        rag.model = embedder.model
+        rag.embedder_name = embedder.embedder_name
+        rag._hash_dim = embedder._hash_dim
+        rag._hash_salt = embedder._hash_salt
+        rag.embedding_cache = getattr(embedder, "embedding_cache", None)
+        rag.encode_service = getattr(embedder, "encode_service", None)
+        rag.chunks = []
+        rag.vectors = None
+        return rag
+
+    @classmethod
+    def load(
+        cls,
+        directory: Path,
+        *,
+        embedder: Optional["LocalRAGIndex"] = None,
+        mmap: bool = False,
+    ) -> "LocalRAGIndex":
+        """Load artifacts written by `save`.
+
+        Pass `embedder` to reuse an already-loaded model (avoids one model load per contract).
+        Raises ValueError if the artifacts were built with a different embedder.
+        """
+
+        d = Path(directory)
+        meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+        if embedder is not None:
+            rag = cls.sharing_model(embedder)
+        else:
+            rag = cls(model_name=meta.get("model_name") or "sentence-transformers/all-MiniLM-L6-v2")
+        if meta.get("embedder_name") and meta["embedder_name"] != rag.embedder_name:
+            raise ValueError(
+                f"Index at {d} was built with {meta['embedder_name']!r}, current embedder is {rag.embedder_name!r}"
+            )
+        rag.chunks = json.loads((d / "chunks.json").read_text(encoding="utf-8"))
+        vectors = np.load(d / "vectors.npy", mmap_mode="r" if mmap else None)
+        rag.vectors = vectors if len(rag.chunks) else None
+        return rag
 
+    @timed("retrieve")
     def query(self, query_text: str, *, top_k: int = 5) -> List[RetrievalMatch]:
         if not (query_text or "").strip() or self.vectors is None or not self.chunks:
             return []
@@ -320,6 +583,27 @@ class LocalRAGIndex:
             out.append(RetrievalMatch(score=float(sims[int(i)]), chunk_index=int(i), text=self.chunks[int(i)]))
         return out
 
+    @timed("retrieve")
+    def query_many(self, query_texts: List[str], *, top_k: int = 5) -> List[List[RetrievalMatch]]:
+        """Batched `query`: one encode call and one matrix product for all queries.
+
+        Returns the same matches as calling `query` per text (empty texts -> []).
+        """
+        out: List[List[RetrievalMatch]] = [[] for _ in query_texts]
+        live = [i for i, q in enumerate(query_texts) if (q or "").strip()]
+        if not live or self.vectors is None or not self.chunks:
+            return out
+        qvs = np.asarray(self.encode([query_texts[i] for i in live], normalize_embeddings=True), dtype=np.float32)
+        d = self.vectors.astype(np.float32)
+        dn = np.linalg.norm(d, axis=1) + 1e-12
+        qn = np.linalg.norm(qvs, axis=1) + 1e-12
+        sims = (qvs @ d.T) / (qn[:, None] * dn[None, :])
+        k = max(1, int(top_k))
+        for row, i in enumerate(live):
+            idxs = np.argsort(-sims[row])[:k]
+            out[i] = [RetrievalMatch(score=float(sims[row, int(j)]), chunk_index=int(j), text=self.chunks[int(j)]) for j in idxs]
+        return out
+
 
 def infer_risk_from_text(text: str) -> str:
     t = (text or "").lower()
@@ -762,6 +1046,36 @@ def _agent_plan(agent_type: str, user_question: str) -> List[str]:
     return [base]
 
 
+def _agent_findings(agent_type: str) -> List[str]:
+    findings: List[str] = []
+    if agent_type == "legal":
+        findings = [
+            "Review termination and breach triggers.",
+            "Check indemnity and limitation of liability language.",
+            "Confirm confidentiality / IP sections if present.",
+        ]
+    elif agent_type == "compliance":
+        findings = [
+            "Review privacy and data protection obligations.",
+            "Check audit/reporting rights and breach notification clauses.",
+            "Verify data retention/deletion requirements if present.",
+        ]
+    elif agent_type == "finance":
+        findings = [
+            "Review payment terms, invoicing, and due dates.",
+            "Check late fees, penalties, and interest provisions.",
+            "Confirm liability allocation and indemnity impacts.",
+        ]
+    elif agent_type == "operations":
+        findings = [
+            "Review deliverables, timelines, and acceptance criteria.",
+            "Check SLA/uplink uptime commitments and service credits.",
+            "Confirm support and escalation requirements.",
+        ]
+    return findings
+
+
+@timed("agents")
 def run_agent(
     *,
     agent_type: str,
@@ -788,32 +1102,7 @@ def run_agent(
     conf = confidence_from_matches(all_matches)
     combined_text = " ".join([m.text for m in all_matches])
     risk = infer_risk_from_text(combined_text)
-
-    findings: List[str] = []
-    if agent_type == "legal":
-        findings = [
-            "Review termination and breach triggers.",
-            "Check indemnity and limitation of liability language.",
-            "Confirm confidentiality / IP sections if present.",
-        ]
-    elif agent_type == "compliance":
-        findings = [
-            "Review privacy and data protection obligations.",
-            "Check audit/reporting rights and breach notification clauses.",
-            "Verify data retention/deletion requirements if present.",
-        ]
-    elif agent_type == "finance":
-        findings = [
-            "Review payment terms, invoicing, and due dates.",
-            "Check late fees, penalties, and interest provisions.",
-            "Confirm liability allocation and indemnity impacts.",
-        ]
-    elif agent_type == "operations":
-        findings = [
-            "Review deliverables, timelines, and acceptance criteria.",
-            "Check SLA/uplink uptime commitments and service credits.",
-            "Confirm support and escalation requirements.",
-        ]
+    findings = _agent_findings(agent_type)
 
     return {
         "agent_type": agent_type,
@@ -830,6 +1119,37 @@ def run_agent(
     }
 
 
+@timed("agents")
+def run_agents_summary(
+    *,
+    agent_types: List[str],
+    question: str,
+    rag: LocalRAGIndex,
+    top_k_per_query: int = 5,
+) -> Dict[str, Dict[str, Any]]:
+    """Only the per-agent fields the response uses (risk_level, confidence, evidence).
+
+    Same retrieval as `run_agent`, but every agent's plan is deduplicated and scored in a
+    single batched query, and no per-query match dumps are built. `evidence` feeds
+    `high_risk_evidence` and is dropped from the summary-level `agent_analysis`.
+    """
+
+    plans = {a: _agent_plan(a, question) for a in agent_types}
+    unique_queries = list(dict.fromkeys(q for qs in plans.values() for q in qs))
+    matches_by_query = dict(zip(unique_queries, rag.query_many(unique_queries, top_k=top_k_per_query)))
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for agent_type, queries in plans.items():
+        all_matches = [m for q in queries for m in matches_by_query.get(q, [])]
+        out[agent_type] = {
+            "agent_type": agent_type,
+            "confidence": confidence_from_matches(all_matches),
+            "risk_level": infer_risk_from_text(" ".join([m.text for m in all_matches])),
+            "evidence": _evidence_snippets(all_matches, max_items=5),
+        }
+    return out
+
+
 def overall_risk(per_agent: Dict[str, str]) -> str:
     best = "low"
     for rl in per_agent.values():
@@ -960,7 +1280,276 @@ def _extract_topic_statements(rag: LocalRAGIndex, *, query: str, topic: str, max
     return out
 
 
-def _finance_risk(payment_terms: List[str], late_fees: List[str]) -> Tuple[str, List[str], List[Tuple[str, str]]]:
+# ---- Clause facts -----------------------------------------------------------
+#
+# Typed figures pulled from clause text. The same parsers back the risk helpers below
+# and the ingest-time extraction (extract_clause_facts), so stored facts and live
+# scoring can never disagree.
+
+# "within 30 days", "within thirty (30) days", "within 10 business days".
+_WITHIN_DAYS_RE = re.compile(
+    r"\bwithin\s+(?:(\d{1,3})\s*(?:\((?:\d{1,3}|[a-z\-]+)\))?|[a-z][a-z\-]*\s*\((\d{1,3})\))\s+(?:calendar\s+|business\s+)?days\b"
+)
+_NET_DAYS_RE = re.compile(r"\bnet[\s\-]?(\d{1,3})\b")
+_LATE_FEE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%.*\b(per month|monthly|per annum|per year|annually)\b")
+_UPTIME_RE = re.compile(r"\b(\d{2}\.\d+)\s*%")
+_HOURS_RE = re.compile(r"\bwithin\s+(\d{1,3})\s+hours\b")
+_MONTHS_OF_FEES_RE = re.compile(r"\b(\d{1,3})\s*\(?\d*\)?\s+months?\b")
+# Cheap prefilter: a statement without any of these cannot match a fact topic below.
+_FACT_HINT_RE = re.compile(
+    r"pay|invoic|due|late|overdue|delinquent|interest|%|penalt|charge|terminat|breach|cure|liab|cap|limitation|"
+    r"uptime|availab|maintenance|sla|service credit|privacy|data|security|incident|notif|retention|"
+    r"subprocessor|audit|soc ?2|iso ?27001|gdpr|hipaa"
+)
+_AUDIT_FREQUENCY = ("annually", "annual", "quarterly", "monthly", "once per year", "times per year", "upon request")
+
+
+def parse_within_days(clause: str) -> Optional[int]:
+    m = _WITHIN_DAYS_RE.search((clause or "").lower())
+    return int(m.group(1) or m.group(2)) if m else None
+
+
+def parse_payment_days(clause: str) -> Optional[int]:
+    """Payment window in days: "within N days" or "net N"."""
+    days = parse_within_days(clause)
+    if days is None:
+        m = _NET_DAYS_RE.search((clause or "").lower())
+        days = int(m.group(1)) if m else None
+    return days
+
+
+def parse_late_fee(clause: str) -> Tuple[Optional[float], Optional[str]]:
+    """(rate %, "per_month" | "per_year") from a late-fee clause."""
+    m = _LATE_FEE_RE.search((clause or "").lower())
+    if not m:
+        return None, None
+    unit = "per_month" if m.group(2) in {"per month", "monthly"} else "per_year"
+    return float(m.group(1)), unit
+
+
+def late_fee_monthly_pct(clause: str) -> Optional[float]:
+    """Late-fee rate as a monthly % (per-year rates / 12), the unit late_fee_pct facts are stored in."""
+    pct, unit = parse_late_fee(clause)
+    if pct is None:
+        return None
+    return pct if unit == "per_month" else round(pct / 12.0, 4)
+
+
+def parse_uptime_pct(clause: str) -> Optional[float]:
+    m = _UPTIME_RE.search((clause or "").lower())
+    return float(m.group(1)) if m else None
+
+
+def classify_liability_cap(clause: str) -> str:
+    """uncapped | capped_with_exceptions | capped | unspecified."""
+    ml = (clause or "").lower()
+    capped = any(k in ml for k in ["capped", "cap", "fees paid"])
+    if any(k in ml for k in ["uncapped", "unlimited"]):
+        # A general cap with a carved-out uncapped exception (e.g. confidentiality) is not "uncapped".
+        return "capped_with_exceptions" if ("except" in ml or "excluding" in ml) and capped else "uncapped"
+    return "capped" if capped else "unspecified"
+
+
+@dataclass
+class ClauseFact:
+    fact: str
+    topic: str
+    evidence: str
+    start: int
+    end: int
+    value_num: Optional[float] = None
+    value_text: Optional[str] = None
+    unit: Optional[str] = None
+
+
+FACT_KINDS = (
+    "payment_days",
+    "late_fee_pct",
+    "termination_notice_days",
+    "liability_cap",
+    "uptime_pct",
+    "service_credits",
+    "audit_rights",
+    "breach_notice_hours",
+    "compliance",
+)
+
+
+def _clause_spans(text: str) -> List[Tuple[int, int]]:
+    """Character spans of clauses in the raw text (same boundaries as _split_into_clause_candidates)."""
+    starts = [m.start() for m in re.finditer(r"(?<!\S)\d+\.\s+[A-Z]", text)]
+    if len(starts) <= 1:
+        return [(m.start(), m.end()) for m in re.finditer(r"\S[^.!?;]*[.!?;]?", text)]
+    if starts[0] > 0 and text[: starts[0]].strip():
+        starts.insert(0, 0)
+    return [(s, e) for s, e in zip(starts, starts[1:] + [len(text)])]
+
+
+def _normalized_with_offsets(raw: str, base: int) -> Tuple[str, List[int]]:
+    """" ".join(raw.split()) plus, per output char, its offset in the original text."""
+    parts: List[str] = []
+    offsets: List[int] = []
+    for m in re.finditer(r"\S+", raw):
+        if parts:
+            parts.append(" ")
+            offsets.append(base + m.start() - 1)
+        parts.append(m.group(0))
+        offsets.extend(range(base + m.start(), base + m.end()))
+    return "".join(parts), offsets
+
+
+def classify_statement(stmt: str) -> List[Tuple[str, str]]:
+    """(fact, topic) kinds a statement carries, using the executive report's topic filters."""
+
+    ml = stmt.lower()
+    kinds: List[Tuple[str, str]] = []
+    if _clause_matches_topic(stmt, "payment"):
+        kinds.append(("payment_days", "payment"))
+    if _clause_matches_topic(stmt, "late"):
+        kinds.append(("late_fee_pct", "late"))
+    if _clause_matches_topic(stmt, "termination"):
+        kinds.append(("termination_notice_days", "termination"))
+    if _clause_matches_topic(stmt, "liability"):
+        kinds.append(("liability_cap", "liability"))
+    if _clause_matches_topic(stmt, "availability"):
+        kinds.append(("uptime_pct", "availability"))
+    if _clause_matches_topic(stmt, "sla"):
+        kinds.append(("uptime_pct", "sla"))
+        if "service credit" in ml:
+            kinds.append(("service_credits", "sla"))
+    if _clause_matches_compliance(stmt):
+        kinds.append(("compliance", "compliance"))
+        if "audit" in ml:
+            kinds.append(("audit_rights", "compliance"))
+        if _HOURS_RE.search(ml) and any(k in ml for k in ["breach", "incident", "notif"]):
+            kinds.append(("breach_notice_hours", "compliance"))
+    return kinds
+
+
+def _fact_values(fact: str, stmt: str) -> Dict[str, Any]:
+    """Typed value of one fact kind, parsed from the statement's own text."""
+
+    ml = stmt.lower()
+    if fact == "payment_days":
+        days = parse_payment_days(stmt)
+        if days is None and ("upon receipt" in ml or "immediately" in ml):
+            return {"value_num": 0.0, "value_text": "upon receipt", "unit": "days"}
+        return {"value_num": days, "unit": "days"}
+    if fact == "late_fee_pct":
+        # Stored as a monthly rate so /facts/query filters and sorts compare like with like;
+        # value_text keeps the rate as written.
+        pct, unit = parse_late_fee(stmt)
+        if pct is None:
+            return {"value_num": None, "unit": None}
+        return {"value_num": late_fee_monthly_pct(stmt), "value_text": f"{pct:g}% {unit}", "unit": "per_month"}
+    if fact == "termination_notice_days":
+        return {"value_num": parse_within_days(stmt), "unit": "days"}
+    if fact == "liability_cap":
+        months = _MONTHS_OF_FEES_RE.search(ml) if "fees" in ml else None
+        return {
+            "value_text": classify_liability_cap(stmt),
+            "value_num": float(months.group(1)) if months else None,
+            "unit": "months_of_fees" if months else None,
+        }
+    if fact == "uptime_pct":
+        return {"value_num": parse_uptime_pct(stmt), "unit": "%"}
+    if fact == "service_credits":
+        return {"value_num": 1.0}
+    if fact == "audit_rights":
+        return {"value_num": 1.0, "value_text": next((f for f in _AUDIT_FREQUENCY if f in ml), None)}
+    if fact == "breach_notice_hours":
+        hours = _HOURS_RE.search(ml)
+        return {"value_num": float(hours.group(1)) if hours else None, "unit": "hours"}
+    return {}
+
+
+def iter_fact_statements(contract_text: str) -> Iterator[Tuple[str, Tuple[int, int]]]:
+    """Atomic statements that may carry a fact, with their (start, end) in the raw text."""
+
+    text = contract_text or ""
+    for cs, ce in _clause_spans(text):
+        norm = _normalize_clause(text[cs:ce])
+        if not norm:
+            continue
+        flat, offsets = _normalized_with_offsets(text[cs:ce], cs)
+        for raw in _split_into_atomic_statements(norm):
+            s = _normalize_clause(raw)
+            if not s or not _FACT_HINT_RE.search(s.lower()):
+                continue
+            i = flat.find(s)
+            yield s, ((offsets[i], offsets[i + len(s) - 1] + 1) if i >= 0 else (cs, ce))
+
+
+@timed("extract_facts")
+def extract_clause_facts(contract_text: str) -> List[ClauseFact]:
+    """Every typed fact in the contract, in document order, with source offsets.
+
+    Statements are split and topic-filtered exactly as the executive report does it,
+    so a fact's `evidence` is the same bullet text the report would quote.
+    """
+
+    facts: List[ClauseFact] = []
+    seen: set[Tuple[str, str, str]] = set()
+
+    def add(fact: str, topic: str, stmt: str, span: Tuple[int, int], **values: Any) -> None:
+        key = (fact, topic, stmt.lower())
+        if key in seen:
+            return
+        seen.add(key)
+        facts.append(ClauseFact(fact=fact, topic=topic, evidence=stmt[:320], start=span[0], end=span[1], **values))
+
+    for s, span in iter_fact_statements(contract_text):
+        for fact, topic in classify_statement(s):
+            add(fact, topic, s, span, **_fact_values(fact, s))
+    return facts
+
+
+def _facts_topic_statements(
+    facts: List[ClauseFact],
+    *,
+    fact: str,
+    topic: str,
+    max_items: int,
+    matches: Optional[List[RetrievalMatch]] = None,
+) -> List[str]:
+    """Evidence of one (fact, topic), in the order _extract_topic_statements would quote it.
+
+    With `matches` (the topic query's retrieved chunks), statements are ranked by the
+    best retrieved chunk containing them, then their position in it; statements outside
+    every retrieved chunk are left out, as retrieval would. Without matches, document order.
+    """
+
+    evidence = list(dict.fromkeys(f.evidence for f in facts if f.fact == fact and f.topic == topic))
+    if matches is None:
+        return evidence[:max_items]
+    out: List[str] = []
+    for m in matches:
+        chunk = m.text.lower()
+        found = [(chunk.find(e.lower()), e) for e in evidence if e not in out]
+        out += [e for pos, e in sorted(found) if pos >= 0]
+        if len(out) >= max_items:
+            break
+    return out[:max_items]
+
+
+FactLookup = Dict[Tuple[str, str], ClauseFact]
+
+
+def _fact_lookup(facts: Optional[List[ClauseFact]]) -> Optional[FactLookup]:
+    return {(f.fact, f.evidence): f for f in facts} if facts is not None else None
+
+
+def _fact_num(lookup: Optional[FactLookup], fact: str, clause: str, parse) -> Any:
+    """Stored value for this clause when facts are available, else parse the clause now."""
+    f = (lookup or {}).get((fact, clause))
+    if f is not None:
+        return f.value_num
+    return parse(clause)
+
+
+def _finance_risk(
+    payment_terms: List[str], late_fees: List[str], *, facts: Optional[FactLookup] = None
+) -> Tuple[str, List[str], List[Tuple[str, str]]]:
     """Return (risk_level, points, evidence_items(label,text))."""
 
     points: List[str] = []
@@ -971,13 +1560,8 @@ def _finance_risk(payment_terms: List[str], late_fees: List[str]) -> Tuple[str,
     pay_risk = "low"
     pay_clause = payment_terms[0] if payment_terms else ""
     if pay_clause:
-        days = None
-        m = re.search(r"\bwithin\s+(\d{1,3})\s*\(?\d*\)?\s+days\b", pay_clause.lower())
-        if m:
-            try:
-                days = int(m.group(1))
-            except Exception:
-                days = None
+        days = _fact_num(facts, "payment_days", pay_clause, parse_payment_days)
+        days = int(days) if days is not None else None
 
         if "upon receipt" in pay_clause.lower() or "immediately" in pay_clause.lower():
             pay_risk = "high"
@@ -998,13 +1582,10 @@ def _finance_risk(payment_terms: List[str], late_fees: List[str]) -> Tuple[str,
     late_clause = late_fees[0] if late_fees else ""
     if late_clause:
         ml = late_clause.lower()
-        pct = None
-        mm = re.search(r"(\d+(?:\.\d+)?)\s*%.*\b(per month|monthly)\b", ml)
-        if mm:
-            try:
-                pct = float(mm.group(1))
-            except Exception:
-                pct = None
+        # The rate as written: the stored fact is normalized to a monthly rate.
+        pct, unit = parse_late_fee(late_clause)
+        if unit != "per_month":
+            pct = None
 
         if any(k in ml for k in ["liquidated damages", "penalty", "punitive"]):
             late_risk = "high"
@@ -1028,7 +1609,9 @@ def _finance_risk(payment_terms: List[str], late_fees: List[str]) -> Tuple[str,
     return _max_risk(risks), points, evidence
 
 
-def _legal_risk(termination: List[str], liability: List[str]) -> Tuple[str, List[str], List[Tuple[str, str]]]:
+def _legal_risk(
+    termination: List[str], liability: List[str], *, facts: Optional[FactLookup] = None
+) -> Tuple[str, List[str], List[Tuple[str, str]]]:
     points: List[str] = []
     evidence: List[Tuple[str, str]] = []
     risks: List[str] = []
@@ -1036,14 +1619,9 @@ def _legal_risk(termination: List[str], liability: List[str]) -> Tuple[str, List
     term_risk = "low"
     term_clause = termination[0] if termination else ""
     if term_clause:
-        days = None
         ml = term_clause.lower()
-        m = re.search(r"\bwithin\s+(\d{1,3})\s*\(?\d*\)?\s+days\b", ml)
-        if m:
-            try:
-                days = int(m.group(1))
-            except Exception:
-                days = None
+        days = _fact_num(facts, "termination_notice_days", term_clause, parse_within_days)
+        days = int(days) if days is not None else None
 
         if "immediately" in ml or "without notice" in ml:
             term_risk = "high"
@@ -1065,17 +1643,11 @@ def _legal_risk(termination: List[str], liability: List[str]) -> Tuple[str, List
     liab_clause = liability[0] if liability else ""
     if liab_clause:
         ml = liab_clause.lower()
-        if any(k in ml for k in ["uncapped", "unlimited"]):
-            # Only mark HIGH when uncapped is broad. If the contract is generally capped
-            # with a specific uncapped exception (common for confidentiality), treat as MEDIUM.
-            if ("except" in ml or "excluding" in ml) and any(k in ml for k in ["cap", "capped", "fees paid"]):
-                liab_risk = "medium"
-            else:
-                liab_risk = "high"
-        elif any(k in ml for k in ["capped", "cap", "fees paid"]):
-            liab_risk = "medium"
-        else:
-            liab_risk = "medium"
+        # Only HIGH when uncapped is broad; a general cap with a specific uncapped
+        # exception (common for confidentiality) is MEDIUM, as is any stated cap.
+        stored = (facts or {}).get(("liability_cap", liab_clause))
+        cap = stored.value_text if stored is not None else classify_liability_cap(liab_clause)
+        liab_risk = "high" if cap == "uncapped" else "medium"
 
         if "capped" in ml or "cap" in ml or "fees paid" in ml:
             points.append("Limitation of Liability caps aggregate liability based on fees paid (with stated exceptions, if any).")
@@ -1090,7 +1662,9 @@ def _legal_risk(termination: List[str], liability: List[str]) -> Tuple[str, List
     return _max_risk(risks), points, evidence
 
 
-def _operations_risk(availability: List[str], sla: List[str]) -> Tuple[str, List[str], List[Tuple[str, str]]]:
+def _operations_risk(
+    availability: List[str], sla: List[str], *, facts: Optional[FactLookup] = None
+) -> Tuple[str, List[str], List[Tuple[str, str]]]:
     """Operations risk derived from availability/SLA clauses.
 
     If service availability text exists, this section must not be N/A.
@@ -1102,18 +1676,12 @@ def _operations_risk(availability: List[str], sla: List[str]) -> Tuple[str, List
 
     ml = clause.lower()
     risk = "low"
-    m = re.search(r"\b(\d{2}\.\d+)\s*%\b", ml)
-    if m:
-        try:
-            pct = float(m.group(1))
-            if pct < 99.0:
-                risk = "medium"
-        except Exception:
-            pass
+    pct = _fact_num(facts, "uptime_pct", clause, parse_uptime_pct)
+    if pct is not None and pct < 99.0:
+        risk = "medium"
     pts: List[str] = []
-    m2 = re.search(r"\b(\d{2}\.\d+)\s*%\b", ml)
-    if m2:
-        pts.append(f"SLA includes an uptime commitment of {m2.group(1)}%.")
+    if pct is not None:
+        pts.append(f"SLA includes an uptime commitment of {pct:g}%.")
     if "availability" in ml or "service availability" in ml:
         pts.append("The agreement states a service availability / uptime commitment.")
     if "scheduled maintenance" in ml:
@@ -1158,17 +1726,23 @@ def _compliance_risk(compliance: List[str]) -> Tuple[str, List[str], List[Tuple[
     return risk, points, evidence
 
 
+@timed("executive_report")
 def build_executive_report_data(
     *,
     contract_text: str,
     rag: LocalRAGIndex,
     question: Optional[str] = None,
     selected_agents: Optional[List[str]] = None,
+    facts: Optional[List[ClauseFact]] = None,
 ) -> Dict[str, Any]:
     """Build contract-specific executive risk analysis backed by explicit clause evidence.
 
     If a question is specific (e.g., about payment terms), only the relevant agent sections
     are generated to avoid unrelated content in the executive report.
+
+    With `facts` (from extract_clause_facts or the ingest-time facts store), clauses and
+    figures are read from the facts instead of being re-split and re-parsed; retrieval
+    still decides which clauses are quoted.
     """
 
     all_agents = ["legal", "compliance", "finance", "operations"]
@@ -1183,6 +1757,15 @@ def build_executive_report_data(
     def _skipped_section() -> Tuple[str, List[str], List[Tuple[str, str]]]:
         return "n/a", ["Skipped (not relevant to the question)."], []
 
+    lookup = _fact_lookup(facts)
+
+    def _statements(*, query: str, topic: str, max_items: int, fact: str) -> List[str]:
+        if facts is not None:
+            # Retrieval still ranks the clauses; facts spare re-splitting and re-parsing them.
+            matches = rag.query(query, top_k=6) if rag is not None and rag.vectors is not None else None
+            return _facts_topic_statements(facts, fact=fact, topic=topic, max_items=max_items, matches=matches)
+        return _extract_topic_statements(rag, query=query, topic=topic, max_items=max_items)
+
     payment_terms: List[str] = []
     late_fees: List[str] = []
     termination: List[str] = []
@@ -1192,67 +1775,67 @@ def build_executive_report_data(
     compliance: List[str] = []
 
     if "finance" in selected_set:
-        payment_terms = _extract_topic_statements(
-            rag,
+        payment_terms = _statements(
             query="payment terms invoice due within days undisputed amounts",
             topic="payment",
             max_items=3,
+            fact="payment_days",
         )
-        late_fees = _extract_topic_statements(
-            rag,
+        late_fees = _statements(
             query="late fees interest overdue per month penalty",
             topic="late",
             max_items=3,
+            fact="late_fee_pct",
         )
 
     if "legal" in selected_set:
-        termination = _extract_topic_statements(
-            rag,
+        termination = _statements(
             query="termination terminate material breach cure notice",
             topic="termination",
             max_items=3,
+            fact="termination_notice_days",
         )
-        liability = _extract_topic_statements(
-            rag,
+        liability = _statements(
             query="limitation of liability liability cap capped uncapped",
             topic="liability",
             max_items=2,
+            fact="liability_cap",
         )
 
     if "operations" in selected_set:
-        availability = _extract_topic_statements(
-            rag,
+        availability = _statements(
             query="service availability availability uptime % of the time scheduled maintenance",
             topic="availability",
             max_items=2,
+            fact="uptime_pct",
         )
-        sla = _extract_topic_statements(
-            rag,
+        sla = _statements(
             query="SLA uptime service credits service level",
             topic="sla",
             max_items=2,
+            fact="uptime_pct",
         )
 
     if "compliance" in selected_set:
-        compliance = _extract_topic_statements(
-            rag,
+        compliance = _statements(
             query="privacy data protection security breach notification incident retention subprocessor audit",
             topic="compliance",
             max_items=3,
+            fact="compliance",
         )
 
     if "finance" in selected_set:
-        finance_risk, finance_points, finance_ev = _finance_risk(payment_terms, late_fees)
+        finance_risk, finance_points, finance_ev = _finance_risk(payment_terms, late_fees, facts=lookup)
     else:
         finance_risk, finance_points, finance_ev = _skipped_section()
 
     if "legal" in selected_set:
-        legal_risk, legal_points, legal_ev = _legal_risk(termination, liability)
+        legal_risk, legal_points, legal_ev = _legal_risk(termination, liability, facts=lookup)
     else:
         legal_risk, legal_points, legal_ev = _skipped_section()
 
     if "operations" in selected_set:
-        ops_risk, ops_points, ops_ev = _operations_risk(availability, sla)
+        ops_risk, ops_points, ops_ev = _operations_risk(availability, sla, facts=lookup)
     else:
         ops_risk, ops_points, ops_ev = _skipped_section()
 
@@ -1359,6 +1942,7 @@ def _sanitize_evidence_text(text: str) -> Optional[str]:
     return cleaned
 
 
+@timed("report")
 def format_report(final_json: Dict[str, Any], *, tone: str = "executive") -> str:
     """Final Executive Contract Analysis Report.
 
@@ -1428,6 +2012,7 @@ def _memory_path(contract_id: str) -> Path:
     return MEMORY_DIR / f"{contract_id}.json"
 
 
+@timed("memory_load")
 def _load_memory(contract_id: str) -> List[Dict[str, Any]]:
     p = _memory_path(contract_id)
     if not p.exists():
@@ -1438,6 +2023,7 @@ def _load_memory(contract_id: str) -> List[Dict[str, Any]]:
         return []
 
 
+@timed("memory_save")
 def _save_memory(contract_id: str, records: List[Dict[str, Any]]) -> None:
     p = _memory_path(contract_id)
     p.write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -1469,6 +2055,104 @@ def _top_sim(vec: np.ndarray, others: List[np.ndarray]) -> Optional[float]:
     return max(sims) if sims else None
 
 
+class StageCosts:
+    """Learned cost estimates (ms) of the optional stages a Deadline can skip.
+
+    One instance lives for the process (the API keeps it on `app.state`). A completed
+    run moves its stage's estimate toward the observed duration (EWMA); a run that was
+    cut short only shows the stage takes at least that long, so it can raise the
+    estimate but never lower it. Every skip decays the estimate a little, so a stage
+    skipped on a stale, inflated estimate gets tried and re-measured again.
+    """
+
+    DEFAULT_MS: Dict[str, float] = {"llm_rewrite": 1000.0, "agent_analysis": 100.0, "extra_topics": 30.0}
+
+    def __init__(self, initial_ms: Optional[Dict[str, float]] = None, *, alpha: float = 0.3, skip_decay: float = 0.9) -> None:
+        self.estimates: Dict[str, float] = {**self.DEFAULT_MS, **(initial_ms or {})}
+        self.alpha = float(alpha)
+        self.skip_decay = float(skip_decay)
+        self._lock = threading.Lock()
+
+    def estimate(self, stage: str) -> float:
+        return self.estimates.get(stage, 0.0)
+
+    def observe(self, stage: str, ms: float, *, complete: bool = True) -> None:
+        with self._lock:
+            prev = self.estimates.get(stage)
+            if prev is None:
+                self.estimates[stage] = ms
+            elif complete:
+                self.estimates[stage] = (1 - self.alpha) * prev + self.alpha * ms
+            else:
+                self.estimates[stage] = max(prev, ms)
+
+    def skipped(self, stage: str) -> None:
+        with self._lock:
+            if stage in self.estimates:
+                self.estimates[stage] *= self.skip_decay
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[Dict[str, bool]]:
+        """Observe the block's duration; set `["complete"] = False` in the yielded dict if it was cut short."""
+        t0 = time.perf_counter()
+        run = {"complete": True}
+        try:
+            yield run
+        finally:
+            self.observe(stage, (time.perf_counter() - t0) * 1000.0, complete=run["complete"])
+
+
+class Deadline:
+    """Response-time budget for one run_full_pipeline call.
+
+    Mandatory stages (probe, sanitized answer, executive analysis of the question's
+    topics) always run. Optional stages ask `affords(stage)` first, against the
+    estimate in `costs` (see StageCosts). Whatever was skipped or cut short is listed
+    in `summary()["degraded"]`.
+    """
+
+    def __init__(self, budget_ms: Optional[float], costs: Optional[StageCosts] = None) -> None:
+        self.budget_ms = None if budget_ms is None else max(0.0, float(budget_ms))
+        self.costs = costs if costs is not None else StageCosts()
+        self._t0 = time.perf_counter()
+        self.degraded: List[Dict[str, Any]] = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def remaining_ms(self) -> float:
+        return float("inf") if self.budget_ms is None else self.budget_ms - self.elapsed_ms()
+
+    def remaining_s(self) -> Optional[float]:
+        return None if self.budget_ms is None else max(0.0, self.remaining_ms() / 1000.0)
+
+    def affords(self, stage: str) -> bool:
+        return self.remaining_ms() >= self.costs.estimate(stage)
+
+    def degrade(self, stage: str, action: str, **detail: Any) -> None:
+        self.degraded.append(
+            {
+                "stage": stage,
+                "action": action,
+                "remaining_ms": round(max(0.0, self.remaining_ms()), 1),
+                "estimated_ms": round(self.costs.estimate(stage), 1),
+                **detail,
+            }
+        )
+        if action == "skipped":
+            self.costs.skipped(stage)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = self.elapsed_ms()
+        return {
+            "deadline_ms": self.budget_ms,
+            "elapsed_ms": round(elapsed, 1),
+            "met": self.budget_ms is None or elapsed <= self.budget_ms,
+            "degraded": self.degraded,
+        }
+
+
+@PIPELINES_IN_FLIGHT.track
 async def run_full_pipeline(
     *,
     contract_text: str,
@@ -1479,6 +2163,12 @@ async def run_full_pipeline(
     no_evidence_threshold: float = 0.25,
     intent_override: Optional[str] = None,
     run_all_agents: bool = False,
+    agent_detail: str = "summary",
+    rag: Optional[LocalRAGIndex] = None,
+    previous_contract_id: Optional[str] = None,
+    on_clause_facts: Optional[Callable[[List[ClauseFact]], None]] = None,
+    deadline: Optional[Deadline] = None,
+    stage_costs: Optional[StageCosts] = None,
 ) -> Tuple[Dict[str, Any], str]:
     """End-to-end pipeline.
 
@@ -1487,6 +2177,15 @@ async def run_full_pipeline(
     3) Memory lookup/refinement (local disk)
     4) Final JSON
     5) Report formatting
+
+    Pass a prebuilt `rag` (e.g. from revisions.index_revision) to skip chunking and
+    embedding; `previous_contract_id` seeds memory for a revision that has none yet.
+    `on_clause_facts` receives the extracted clause facts (risk/review intents only) and
+    runs off the event loop, e.g. the near-duplicate lookup in clause_lsh.py.
+    With a `deadline`, optional stages (LLM rewrite, agent analysis, executive topics
+    beyond the question's own) are skipped or cut short to fit; the response gets a
+    `deadline` object listing what was degraded. Optional stage durations are fed to
+    the deadline's StageCosts, or to `stage_costs` when there is no deadline.
     """
     if not (contract_text or "").strip():
         raise ValueError("Empty contract_text")
@@ -1494,6 +2193,7 @@ async def run_full_pipeline(
         raise ValueError("Empty question")
 
     contract_id = contract_id or stable_contract_id(contract_text)
+    costs = deadline.costs if deadline is not None else stage_costs
 
     override = (intent_override or "").strip().lower()
     allowed = {"fact_summary", "clause_extraction", "qa", "risk_analysis", "executive_review"}
@@ -1506,25 +2206,48 @@ async def run_full_pipeline(
         else:
             selected_agents_for_exec = select_agents_for_question(question)
 
-    model_name = model_name or os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
-    rag = LocalRAGIndex(model_name=model_name)
-    rag.build(contract_text)
+    if rag is None:
+        model_name = model_name or os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+        rag = LocalRAGIndex(model_name=model_name)
+        await asyncio.to_thread(rag.build, contract_text)
 
-    # Evidence probe for safe grounding.
-    probe = rag.query(question, top_k=3)
+    # Evidence probe for safe grounding. Embedding work runs off the event loop so
+    # concurrent requests can overlap (and share batches, see embedding_service.py).
+    probe = await asyncio.to_thread(rag.query, question, top_k=3)
     best_score = max([m.score for m in probe], default=None)
 
     # For risk_analysis/executive_review, use clause-extraction evidence as the gate.
     # This avoids false negatives when the user's phrasing ("risk analysis") doesn't
     # appear in the contract text but relevant clauses do.
     executive_analysis: Optional[Dict[str, Any]] = None
+    clause_facts: Optional[List[ClauseFact]] = None
     if intent in {"risk_analysis", "executive_review"}:
-        executive_analysis = build_executive_report_data(
+        relevant = select_agents_for_question(question)
+        extra = [a for a in (selected_agents_for_exec or []) if a not in relevant]
+        if extra and deadline is not None and not deadline.affords("extra_topics"):
+            selected_agents_for_exec = [a for a in selected_agents_for_exec or [] if a in relevant]
+            deadline.degrade("extra_topics", "skipped", agents=extra)
+            extra = []
+        t0 = time.perf_counter()
+        # One pass over the whole contract replaces per-topic retrieval + re-parsing.
+        clause_facts = extract_clause_facts(contract_text)
+        lookup = (
+            asyncio.create_task(asyncio.to_thread(on_clause_facts, clause_facts)) if on_clause_facts is not None else None
+        )
+        executive_analysis = await asyncio.to_thread(
+            build_executive_report_data,
             contract_text=contract_text,
             rag=rag,
             question=question,
             selected_agents=selected_agents_for_exec,
+            facts=clause_facts,
         )
+        if lookup is not None:
+            await lookup
+        if extra:
+            share = len(extra) / max(1, len(selected_agents_for_exec or []))
+            if costs is not None:
+                costs.observe("extra_topics", (time.perf_counter() - t0) * 1000.0 * share)
         has_exec_evidence = bool(executive_analysis.get("key_evidence"))
         no_evidence = not has_exec_evidence
     else:
@@ -1533,7 +2256,10 @@ async def run_full_pipeline(
     # Strict minimal output unless user explicitly asked for risk/review/analysis.
     if intent in {"fact_summary", "qa", "clause_extraction"}:
         qa = build_question_answer(question, probe)
-        report = format_fact_summary_report(question, probe)
+        # The optional LLM rewrite inside waits on HTTP calls; keep it off the event loop.
+        report = await asyncio.to_thread(
+            format_fact_summary_report, question, probe, deadline=deadline, stage_costs=stage_costs
+        )
         # Populate minimal analysis object so frontend can find evidence for highlighting
         final_json = {
             "contract_id": contract_id,
@@ -1550,6 +2276,8 @@ async def run_full_pipeline(
             "evidence_score": best_score,
             "message": "No relevant evidence found in the provided document for this question." if no_evidence else None,
         }
+        if deadline is not None:
+            final_json["deadline"] = deadline.summary()
         return final_json, report
 
     # For risk_analysis/executive_review, still avoid hallucinations.
@@ -1584,26 +2312,60 @@ async def run_full_pipeline(
             "evidence_score": best_score,
             "message": "No relevant evidence found in the provided document for this question.",
         }
+        if deadline is not None:
+            final_json["deadline"] = deadline.summary()
         report = format_report(final_json, tone=tone)
         return final_json, report
 
     mem = _load_memory(contract_id)
-    q_vec_np = rag.encode([question], normalize_embeddings=True)[0]
+    if not mem and previous_contract_id:
+        mem = _load_memory(previous_contract_id)
+    q_vec_np = (await asyncio.to_thread(rag.encode, [question], normalize_embeddings=True))[0]
 
     selected_agents = selected_agents_for_exec or select_agents_for_question(question)
-    tasks: List[asyncio.Future] = []
-    task_types: List[str] = []
-    for agent_type in selected_agents:
-        tasks.append(asyncio.to_thread(run_agent, agent_type=agent_type, question=question, rag=rag))
-        task_types.append(agent_type)
-
-    results: List[Dict[str, Any]] = []
-    if tasks:
-        results = await asyncio.gather(*tasks)
-
-    agent_map: Dict[str, Dict[str, Any]] = {t: r for t, r in zip(task_types, results)}
+    detail = (agent_detail or "summary").strip().lower()
+    if detail not in AGENT_DETAIL_LEVELS:
+        detail = "summary"
+
+    agent_map: Dict[str, Dict[str, Any]] = {}
+    if detail != "none" and selected_agents and deadline is not None and not deadline.affords("agent_analysis"):
+        deadline.degrade("agent_analysis", "skipped", agents=list(selected_agents))
+    elif detail == "full":
+        tasks: Dict[asyncio.Future, str] = {}
+        for agent_type in selected_agents:
+            task = asyncio.ensure_future(asyncio.to_thread(run_agent, agent_type=agent_type, question=question, rag=rag))
+            tasks[task] = agent_type
+
+        if tasks:
+            t0 = time.perf_counter()
+            timeout = None if deadline is None else deadline.remaining_s()
+            done, pending = await asyncio.wait(list(tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()  # the worker thread finishes in the background; its result is dropped
+            agent_map = {tasks[t]: t.result() for t in done}
+            if costs is not None:
+                costs.observe("agent_analysis", (time.perf_counter() - t0) * 1000.0, complete=not pending)
+            if pending and deadline is not None:
+                deadline.degrade("agent_analysis", "cut_short", agents=[tasks[t] for t in pending])
+    elif detail == "summary" and selected_agents:
+        t0 = time.perf_counter()
+        job = asyncio.ensure_future(
+            asyncio.to_thread(run_agents_summary, agent_types=list(selected_agents), question=question, rag=rag)
+        )
+        done, _ = await asyncio.wait([job], timeout=None if deadline is None else deadline.remaining_s())
+        if costs is not None:
+            # A cut-short run only bounds the cost from below.
+            costs.observe("agent_analysis", (time.perf_counter() - t0) * 1000.0, complete=bool(done))
+        if done:
+            agent_map = job.result()
+        else:
+            job.cancel()
+            if deadline is not None:
+                deadline.degrade("agent_analysis", "cut_short", agents=list(selected_agents))
 
     def _skipped(agent_type: str) -> Dict[str, Any]:
+        if detail != "full":
+            return {"agent_type": agent_type, "confidence": None, "risk_level": "n/a", "skipped": True}
         return {
             "agent_type": agent_type,
             "question": question,
@@ -1651,6 +2413,10 @@ async def run_full_pipeline(
             continue
         seen_evidence.add(k)
         deduped_evidence.append(ev)
+    if detail == "summary":
+        legal, compliance, finance, operations = (
+            {k: v for k, v in sec.items() if k != "evidence"} for sec in (legal, compliance, finance, operations)
+        )
 
     final_json = {
         "contract_id": contract_id,
@@ -1665,15 +2431,21 @@ async def run_full_pipeline(
             rag=rag,
             question=question,
             selected_agents=selected_agents,
+            facts=clause_facts,
+        ),
+        # Agent outputs are for debugging only; the executive report does not use them.
+        "agent_analysis": (
+            {"selected_agents": selected_agents, "detail": detail}
+            if detail == "none"
+            else {
+                "selected_agents": selected_agents,
+                "detail": detail,
+                "legal": legal,
+                "compliance": compliance,
+                "finance": finance,
+                "operations": operations,
+            }
         ),
-        # Keep agent outputs for debugging, but do not use them to format the executive report.
-        "agent_analysis": {
-            "selected_agents": selected_agents,
-            "legal": legal,
-            "compliance": compliance,
-            "finance": finance,
-            "operations": operations,
-        },
         "confidence": {
             "overall_avg": overall_conf,
             "per_agent": per_agent_conf,
@@ -1682,6 +2454,8 @@ async def run_full_pipeline(
         "no_evidence": False,
         "evidence_score": best_score,
     }
+    if deadline is not None:
+        final_json["deadline"] = deadline.summary()
 
     report = format_report(final_json, tone=tone)
 
@@ -0,0 +1,410 @@
+"""Corpus-wide approximate nearest-neighbour search over ingested contracts.
+
+IVF-flat over numpy: chunk vectors from every contract ingested by bulk_ingest.py are
+clustered with spherical k-means; a query scans only the `nprobe` closest clusters.
+Everything is persisted under <corpus>/ann/ and memory-mapped on load.
+
+    cd milestone3/backend
+    python corpus_index.py build
+    python corpus_index.py eval --k 10 --queries 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from bulk_ingest import DEFAULT_CORPUS_DIR, artifact_dir, load_manifest
+from contract_pipeline import LocalRAGIndex, staged_dir, utc_now_iso
+
+
+ANN_DIRNAME = "ann"
+
+
+def _ingest_model_name(corpus_dir: Path, manifest: Dict[str, Any], contract_ids: Sequence[str]) -> Optional[str]:
+    """Model the corpus was actually embedded with: the ingest manifest, else an artifact's meta.json."""
+    if manifest.get("model_name"):
+        return manifest["model_name"]
+    for cid in contract_ids[:1]:
+        try:
+            meta = json.loads((artifact_dir(corpus_dir, cid) / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            break
+        if meta.get("model_name"):
+            return meta["model_name"]
+    return os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+
+
+@dataclass
+class CorpusMatch:
+    score: float
+    contract_id: str
+    chunk_index: int
+    text: str
+    source: Optional[str] = None
+
+
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first (argpartition, then sort the head)."""
+    k = min(int(k), scores.shape[0])
+    if k <= 0:
+        return np.zeros((0,), dtype=np.int64)
+    head = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+    return head[np.argsort(-scores[head], kind="stable")]
+
+
+def spherical_kmeans(x: np.ndarray, nlist: int, *, iters: int = 15, seed: int = 0, max_train: int = 100_000) -> np.ndarray:
+    """Cosine k-means on (a sample of) unit vectors. Returns (nlist, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    train = x if x.shape[0] <= max_train else x[rng.choice(x.shape[0], max_train, replace=False)]
+    nlist = max(1, min(int(nlist), train.shape[0]))
+    centroids = train[rng.choice(train.shape[0], nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(train @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, train)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points so every list is used.
+            sums[empty] = train[rng.choice(train.shape[0], int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class CorpusIndex:
+    """IVF-flat index over all ingested contracts with contract-id metadata filtering."""
+
+    def __init__(
+        self,
+        *,
+        corpus_dir: Path,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        contract_codes: np.ndarray,
+        chunk_indexes: np.ndarray,
+        contract_ids: List[str],
+        meta: Dict[str, Any],
+    ) -> None:
+        self.corpus_dir = Path(corpus_dir)
+        # Rows are grouped by inverted list: list i is vectors[list_offsets[i]:list_offsets[i+1]].
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.contract_codes = contract_codes
+        self.chunk_indexes = chunk_indexes
+        self.contract_ids = contract_ids
+        self._code_of = {cid: i for i, cid in enumerate(contract_ids)}
+        self.meta = meta
+        self._chunk_cache: Dict[str, List[str]] = {}
+        self._embedder: Optional[LocalRAGIndex] = None
+
+    # ---- build / persist -------------------------------------------------
+
+    @classmethod
+    def build(cls, corpus_dir: Path = DEFAULT_CORPUS_DIR, *, nlist: Optional[int] = None, seed: int = 0) -> "CorpusIndex":
+        corpus_dir = Path(corpus_dir)
+        manifest = load_manifest(corpus_dir)
+        contract_ids = sorted(
+            {f["contract_id"] for f in manifest["files"].values() if f.get("status") == "ok" and f.get("contract_id")}
+        )
+        if not contract_ids:
+            raise ValueError(f"No ingested contracts under {corpus_dir}; run bulk_ingest.py first")
+
+        blocks: List[np.ndarray] = []
+        codes: List[np.ndarray] = []
+        chunk_idx: List[np.ndarray] = []
+        for code, cid in enumerate(contract_ids):
+            v = np.load(artifact_dir(corpus_dir, cid) / "vectors.npy", mmap_mode="r")
+            if v.shape[0] == 0:
+                continue
+            blocks.append(np.asarray(v, dtype=np.float32))
+            codes.append(np.full(v.shape[0], code, dtype=np.int32))
+            chunk_idx.append(np.arange(v.shape[0], dtype=np.int32))
+        if not blocks:
+            raise ValueError("no vectors to index")
+        x = _normalize_rows(np.concatenate(blocks))
+        all_codes = np.concatenate(codes)
+        all_chunks = np.concatenate(chunk_idx)
+
+        nlist = int(nlist or max(1, round(math.sqrt(x.shape[0]))))
+        centroids = spherical_kmeans(x, nlist, seed=seed)
+        assign = np.argmax(x @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=centroids.shape[0])
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        meta = {
+            "built_at": utc_now_iso(),
+            "embedder_name": manifest.get("embedder_name"),
+            "model_name": _ingest_model_name(corpus_dir, manifest, contract_ids),
+            "n_vectors": int(x.shape[0]),
+            "n_contracts": len(contract_ids),
+            "nlist": int(centroids.shape[0]),
+            "dim": int(x.shape[1]),
+        }
+        return cls(
+            corpus_dir=corpus_dir,
+            vectors=x[order],
+            centroids=centroids,
+            list_offsets=offsets,
+            contract_codes=all_codes[order],
+            chunk_indexes=all_chunks[order],
+            contract_ids=contract_ids,
+            meta=meta,
+        )
+
+    def save(self) -> Path:
+        """Write <corpus>/ann/ into a staging directory and swap it in (never a half-written index)."""
+        dest = self.corpus_dir / ANN_DIRNAME
+        with staged_dir(dest) as d:
+            np.save(d / "vectors.npy", self.vectors)
+            np.save(d / "centroids.npy", self.centroids)
+            np.save(d / "list_offsets.npy", self.list_offsets)
+            np.save(d / "contract_codes.npy", self.contract_codes)
+            np.save(d / "chunk_indexes.npy", self.chunk_indexes)
+            (d / "contracts.json").write_text(json.dumps(self.contract_ids), encoding="utf-8")
+            (d / "meta.json").write_text(json.dumps(self.meta, indent=2), encoding="utf-8")
+        return dest
+
+    @classmethod
+    def load(cls, corpus_dir: Path = DEFAULT_CORPUS_DIR) -> "CorpusIndex":
+        d = Path(corpus_dir) / ANN_DIRNAME
+        if not (d / "meta.json").exists():
+            raise FileNotFoundError(f"No corpus index at {d}; run `python corpus_index.py build`")
+        return cls(
+            corpus_dir=Path(corpus_dir),
+            vectors=np.load(d / "vectors.npy", mmap_mode="r"),
+            centroids=np.load(d / "centroids.npy"),
+            list_offsets=np.load(d / "list_offsets.npy"),
+            contract_codes=np.load(d / "contract_codes.npy"),
+            chunk_indexes=np.load(d / "chunk_indexes.npy"),
+            contract_ids=json.loads((d / "contracts.json").read_text(encoding="utf-8")),
+            meta=json.loads((d / "meta.json").read_text(encoding="utf-8")),
+        )
+
+    # ---- query -----------------------------------------------------------
+
+    @property
+    def embedder(self) -> LocalRAGIndex:
+        if self._embedder is None:
+            self._embedder = LocalRAGIndex(model_name=self.meta.get("model_name") or "sentence-transformers/all-MiniLM-L6-v2")
+            expected = self.meta.get("embedder_name")
+            if expected and expected != self._embedder.embedder_name:
+                raise ValueError(f"Corpus index was built with {expected!r}, runtime embedder is {self._embedder.embedder_name!r}")
+        return self._embedder
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return _normalize_rows(self.embedder.encode(texts, normalize_embeddings=True))
+
+    def _allowed_codes(self, contract_ids: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        if contract_ids is None:
+            return None
+        return np.asarray(sorted({self._code_of[c] for c in contract_ids if c in self._code_of}), dtype=np.int32)
+
+    def search_vectors(
+        self,
+        queries: np.ndarray,
+        *,
+        k: int = 10,
+        nprobe: int = 16,
+        contract_ids: Optional[Sequence[str]] = None,
+        exact: bool = False,
+    ) -> List[List[tuple[float, int]]]:
+        """Top-k (score, row) per query. Filtered searches over a small subset go exact."""
+
+        q = _normalize_rows(np.atleast_2d(queries))
+        allowed = self._allowed_codes(contract_ids)
+        if allowed is not None and allowed.size == 0:
+            return [[] for _ in range(q.shape[0])]
+
+        subset_rows: Optional[np.ndarray] = None
+        if allowed is not None:
+            subset_rows = np.flatnonzero(np.isin(self.contract_codes, allowed))
+            # A handful of contracts is cheaper (and exact) to scan directly than to probe.
+            if subset_rows.size <= max(2048, self.vectors.shape[0] // max(1, self.centroids.shape[0]) * nprobe):
+                exact = True
+
+        out: List[List[tuple[float, int]]] = []
+        if exact:
+            rows = subset_rows if subset_rows is not None else None
+            mat = self.vectors if rows is None else self.vectors[rows]
+            scores = q @ np.asarray(mat).T
+            for r in range(q.shape[0]):
+                top = _top_k(scores[r], k)
+                ids = top if rows is None else rows[top]
+                out.append([(float(scores[r, t]), int(i)) for t, i in zip(top, ids)])
+            return out
+
+        probe = min(max(1, int(nprobe)), self.centroids.shape[0])
+        cent_scores = q @ self.centroids.T
+        for r in range(q.shape[0]):
+            lists = _top_k(cent_scores[r], probe)
+            # Lists are contiguous row ranges, so each one is scored on a view (no gather copy).
+            parts_scores: List[np.ndarray] = []
+            parts_rows: List[np.ndarray] = []
+            for i in lists:
+                a, b = int(self.list_offsets[i]), int(self.list_offsets[i + 1])
+                if a == b:
+                    continue
+                sc = self.vectors[a:b] @ q[r]
+                rows = np.arange(a, b)
+                if allowed is not None:
+                    keep = np.isin(self.contract_codes[a:b], allowed)
+                    sc, rows = sc[keep], rows[keep]
+                parts_scores.append(sc)
+                parts_rows.append(rows)
+            if not parts_scores:
+                out.append([])
+                continue
+            scores = np.concatenate(parts_scores)
+            rows = np.concatenate(parts_rows)
+            top = _top_k(scores, k)
+            out.append([(float(scores[t]), int(rows[t])) for t in top])
+        return out
+
+    def _chunks_for(self, contract_id: str) -> List[str]:
+        chunks = self._chunk_cache.get(contract_id)
+        if chunks is None:
+            p = artifact_dir(self.corpus_dir, contract_id) / "chunks.json"
+            chunks = json.loads(p.read_text(encoding="utf-8"))
+            if len(self._chunk_cache) > 256:
+                self._chunk_cache.clear()
+            self._chunk_cache[contract_id] = chunks
+        return chunks
+
+    def _sources(self) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        for rel, f in load_manifest(self.corpus_dir)["files"].items():
+            if f.get("contract_id"):
+                out.setdefault(f["contract_id"], rel)
+        return out
+
+    def search(
+        self,
+        query: str,
+        *,
+        k: int = 10,
+        nprobe: int = 16,
+        contract_ids: Optional[Sequence[str]] = None,
+        exact: bool = False,
+    ) -> List[CorpusMatch]:
+        if not (query or "").strip():
+            return []
+        hits = self.search_vectors(self.encode([query]), k=k, nprobe=nprobe, contract_ids=contract_ids, exact=exact)[0]
+        sources = self._sources() if hits else {}
+        out: List[CorpusMatch] = []
+        for score, row in hits:
+            cid = self.contract_ids[int(self.contract_codes[row])]
+            ci = int(self.chunk_indexes[row])
+            chunks = self._chunks_for(cid)
+            out.append(
+                CorpusMatch(
+                    score=score,
+                    contract_id=cid,
+                    chunk_index=ci,
+                    text=chunks[ci] if ci < len(chunks) else "",
+                    source=sources.get(cid),
+                )
+            )
+        return out
+
+
+def evaluate_recall(
+    index: CorpusIndex,
+    queries: np.ndarray,
+    *,
+    k: int = 10,
+    nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32),
+) -> List[Dict[str, Any]]:
+    """recall@k of IVF search vs exact search, with per-query latency, for each nprobe.
+
+    `recall_at_k` counts an approximate hit as correct when it scores at least the exact
+    k-th score (duplicate boilerplate chunks tie, and any tied row is an equally good
+    answer); `id_recall_at_k` is the stricter row-id overlap.
+    """
+
+    # Both sides are timed one query at a time (the /search request shape).
+    t0 = time.perf_counter()
+    truth = [index.search_vectors(q, k=k, exact=True)[0] for q in queries]
+    exact_ms = (time.perf_counter() - t0) * 1000.0 / max(1, len(queries))
+    truth_sets = [{row for _, row in hits} for hits in truth]
+    kth = [hits[-1][0] if hits else float("inf") for hits in truth]
+
+    rows: List[Dict[str, Any]] = [
+        {"nprobe": "exact", "recall_at_k": 1.0, "id_recall_at_k": 1.0, "ms_per_query": exact_ms}
+    ]
+    for nprobe in nprobes:
+        t0 = time.perf_counter()
+        approx = [index.search_vectors(q, k=k, nprobe=nprobe)[0] for q in queries]
+        ms = (time.perf_counter() - t0) * 1000.0 / max(1, len(queries))
+        denom = [max(1, len(t)) for t in truth_sets]
+        recall = [sum(1 for sc, _ in approx[i] if sc >= kth[i] - 1e-6) / denom[i] for i in range(len(approx))]
+        id_recall = [len(truth_sets[i] & {row for _, row in approx[i]}) / denom[i] for i in range(len(approx))]
+        rows.append(
+            {
+                "nprobe": int(nprobe),
+                "recall_at_k": float(np.mean(recall)),
+                "id_recall_at_k": float(np.mean(id_recall)),
+                "ms_per_query": ms,
+            }
+        )
+    return rows
+
+
+def sample_queries(index: CorpusIndex, n: int, *, seed: int = 0) -> np.ndarray:
+    """Evaluation queries: the first sentence of randomly sampled corpus chunks, re-encoded."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(index.vectors.shape[0], min(n, index.vectors.shape[0]), replace=False)
+    texts: List[str] = []
+    for row in rows:
+        cid = index.contract_ids[int(index.contract_codes[row])]
+        chunk = index._chunks_for(cid)[int(index.chunk_indexes[row])]
+        texts.append(chunk.split(". ")[0][:200])
+    return index.encode(texts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build", "eval"])
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS_DIR))
+    parser.add_argument("--nlist", type=int, default=None, help="number of IVF lists (default sqrt(N))")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        t0 = time.perf_counter()
+        index = CorpusIndex.build(Path(args.corpus), nlist=args.nlist)
+        path = index.save()
+        m = index.meta
+        print(f"built {m['n_vectors']} vectors / {m['n_contracts']} contracts, nlist={m['nlist']} "
+              f"in {time.perf_counter() - t0:.2f}s -> {path}")
+        return
+
+    index = CorpusIndex.load(Path(args.corpus))
+    queries = sample_queries(index, args.queries)
+    print(f"recall@{args.k} over {len(queries)} queries, {index.meta['n_vectors']} vectors, nlist={index.meta['nlist']}")
+    for row in evaluate_recall(index, queries, k=args.k):
+        print(
+            f"  nprobe={row['nprobe']!s:>5}  recall={row['recall_at_k']:.3f}  "
+            f"id_recall={row['id_recall_at_k']:.3f}  {row['ms_per_query']:.3f} ms/query"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,25 @@
 from __future__ import annotations
 
 import base64
-import hashlib
 import hmac
 import json
 import os
+import re
 import secrets
 import sqlite3
+import zlib
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+from password_hashing import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    HashPoolBusy,
+    current_iterations,
+    hash_password,
+    submit_hash,
+)
+
 
 _BASE_DIR = Path(__file__).resolve().parents[1]
 _OUTPUTS_DIR = _BASE_DIR / "outputs"
@@ -19,6 +28,11 @@ _OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = Path(os.getenv("CLAUSEAI_BACKEND_DB_PATH", str(_OUTPUTS_DIR / "clauseai_backend.sqlite3")))
 SESSION_TTL_HOURS = float(os.getenv("CLAUSEAI_SESSION_TTL_HOURS", "72"))
 
+# Run results are stored per file in `analysis_run_results`; any top-level field whose JSON
+# is larger than this goes to `analysis_run_fields` compressed and is only loaded on demand.
+RESULTS_CODEC = os.getenv("CLAUSEAI_RESULTS_CODEC", "zstd").strip().lower()
+LAZY_FIELD_MIN_BYTES = int(os.getenv("CLAUSEAI_LAZY_FIELD_MIN_BYTES", "512"))
+
 
 # Demo user seed is optional and only enabled when CLAUSEAI_DEMO_PASSWORD is set.
 # This avoids hardcoding credentials into the repository (GitHub secret scanning will flag them).
@@ -88,9 +102,269 @@ def init_db() -> None:
             )
             """
         )
+        _ensure_column(
+            con,
+            "users",
+            "password_iterations",
+            f"INTEGER NOT NULL DEFAULT {DEFAULT_PBKDF2_ITERATIONS}",
+        )
+        # Keyset pagination walks (user_email, id) newest-first; mode filter has its own path.
+        con.execute("CREATE INDEX IF NOT EXISTS idx_analysis_runs_user_id ON analysis_runs(user_email, id)")
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_analysis_runs_user_mode_id ON analysis_runs(user_email, mode, id)"
+        )
+        _ensure_column(con, "analysis_runs", "results_storage", "TEXT NOT NULL DEFAULT 'inline'")
+        # Report/answer text for LIKE search when FTS5 is unavailable (normalized runs keep results_json empty).
+        _ensure_column(con, "analysis_runs", "search_text", "TEXT NOT NULL DEFAULT ''")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_run_results (
+                run_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                filename TEXT,
+                inline_json TEXT NOT NULL,
+                PRIMARY KEY(run_id, position),
+                FOREIGN KEY(run_id) REFERENCES analysis_runs(id)
+            )
+            """
+        )
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_run_fields (
+                run_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                raw_bytes INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY(run_id, position, field),
+                FOREIGN KEY(run_id) REFERENCES analysis_runs(id)
+            )
+            """
+        )
+        _init_history_fts(con)
         con.commit()
 
 
+def _ensure_column(con: sqlite3.Connection, table: str, column: str, ddl: str) -> None:
+    """Additive migration for databases created before `column` existed."""
+    cols = {r[1] for r in con.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in cols:
+        con.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+# Full-text index over history (question, filenames, report text). rowid == analysis_runs.id.
+# Falls back to LIKE filtering when the local SQLite build lacks FTS5.
+_FTS_AVAILABLE: Optional[bool] = None
+_FTS_BACKFILLED: set[str] = set()
+
+
+def _init_history_fts(con: sqlite3.Connection) -> None:
+    global _FTS_AVAILABLE
+    if _FTS_AVAILABLE is False:
+        return
+    try:
+        con.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS analysis_runs_fts
+            USING fts5(question, filenames, report_text, tokenize = 'unicode61')
+            """
+        )
+        _FTS_AVAILABLE = True
+    except sqlite3.OperationalError:
+        _FTS_AVAILABLE = False
+        return
+
+    # Backfill runs saved before the index existed (once per process per DB file).
+    key = str(DB_PATH)
+    if key in _FTS_BACKFILLED:
+        return
+    rows = con.execute(
+        """
+        SELECT id, question, files_json, results_json, results_storage FROM analysis_runs
+        WHERE id NOT IN (SELECT rowid FROM analysis_runs_fts)
+        """
+    ).fetchall()
+    for r in rows:
+        try:
+            files = json.loads(r["files_json"] or "[]")
+        except Exception:
+            files = []
+        if r["results_storage"] == "normalized":
+            results = _load_results(con, run_id=int(r["id"]), lazy=False)
+        else:
+            try:
+                results = json.loads(r["results_json"] or "[]")
+            except Exception:
+                results = []
+        _index_run_fts(con, run_id=int(r["id"]), question=r["question"] or "", filenames=files, results=results)
+    _FTS_BACKFILLED.add(key)
+
+
+def _report_text(results: List[Dict[str, Any]]) -> str:
+    parts: List[str] = []
+    for r in results or []:
+        if not isinstance(r, dict):
+            continue
+        if isinstance(r.get("report"), str):
+            parts.append(r["report"])
+        qa = r.get("qa")
+        if isinstance(qa, dict) and isinstance(qa.get("answer"), str):
+            parts.append(qa["answer"])
+    return "\n".join(parts)
+
+
+def _index_run_fts(
+    con: sqlite3.Connection,
+    *,
+    run_id: int,
+    question: str,
+    filenames: List[str],
+    results: List[Dict[str, Any]],
+) -> None:
+    if not _FTS_AVAILABLE:
+        return
+    con.execute(
+        "INSERT OR REPLACE INTO analysis_runs_fts(rowid, question, filenames, report_text) VALUES (?, ?, ?, ?)",
+        (int(run_id), question or "", " ".join(str(f) for f in (filenames or [])), _report_text(results)),
+    )
+
+
+def _fts_query(text: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query: every word must match (prefix match on each)."""
+    tokens = re.findall(r"\w+", (text or "").lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens[:16])
+
+
+def _like_escape(text: str) -> str:
+    return (text or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _date_bound(value: Optional[str], *, end: bool) -> Optional[str]:
+    """Normalize a YYYY-MM-DD or ISO timestamp into a created_at comparison bound.
+
+    A bare date as `end` means "through the end of that day" (exclusive next-day bound).
+    """
+    v = (value or "").strip()
+    if not v:
+        return None
+    try:
+        if len(v) == 10:
+            d = datetime.strptime(v, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            if end:
+                d = d + timedelta(days=1)
+            return d.isoformat()
+        d = datetime.fromisoformat(v.replace("Z", "+00:00"))
+        if d.tzinfo is None:
+            d = d.replace(tzinfo=timezone.utc)
+        return d.astimezone(timezone.utc).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD or ISO 8601)")
+
+
+def _zstd():
+    try:
+        import zstandard  # type: ignore
+
+        return zstandard
+    except Exception:
+        return None
+
+
+def _compress(raw: bytes) -> Tuple[str, bytes]:
+    """Compress with the configured codec (zstd when installed, else zlib)."""
+    if RESULTS_CODEC == "none":
+        return "none", raw
+    if RESULTS_CODEC == "zstd":
+        zstd = _zstd()
+        if zstd is not None:
+            return "zstd", zstd.ZstdCompressor(level=9).compress(raw)
+    return "zlib", zlib.compress(raw, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "none":
+        return bytes(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        zstd = _zstd()
+        if zstd is None:
+            raise RuntimeError("Stored result uses zstd but the 'zstandard' package is not installed")
+        return zstd.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def _split_result(result: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """Split one result into small inline fields and large (lazy) JSON-encoded fields."""
+    inline: Dict[str, Any] = {}
+    lazy: Dict[str, bytes] = {}
+    for key, value in (result or {}).items():
+        raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if len(raw) >= LAZY_FIELD_MIN_BYTES:
+            lazy[str(key)] = raw
+        else:
+            inline[str(key)] = value
+    return inline, lazy
+
+
+def _store_results(con: sqlite3.Connection, *, run_id: int, results: List[Dict[str, Any]]) -> None:
+    for pos, result in enumerate(results or []):
+        if not isinstance(result, dict):
+            result = {"value": result}
+        inline, lazy = _split_result(result)
+        con.execute(
+            "INSERT INTO analysis_run_results(run_id, position, filename, inline_json) VALUES (?, ?, ?, ?)",
+            (run_id, pos, str(result.get("filename") or ""), json.dumps(inline, ensure_ascii=False)),
+        )
+        for field, raw in lazy.items():
+            codec, data = _compress(raw)
+            con.execute(
+                """
+                INSERT INTO analysis_run_fields(run_id, position, field, codec, raw_bytes, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (run_id, pos, field, codec, len(raw), sqlite3.Binary(data)),
+            )
+
+
+def _load_results(con: sqlite3.Connection, *, run_id: int, lazy: bool, position: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Rebuild results for a normalized run. With lazy=True large fields are left out and
+    listed under `_lazy_fields` so the caller can fetch them individually."""
+
+    pos_sql = "" if position is None else " AND position = ?"
+    pos_params: Tuple[Any, ...] = () if position is None else (int(position),)
+    rows = con.execute(
+        f"SELECT position, inline_json FROM analysis_run_results WHERE run_id = ?{pos_sql} ORDER BY position",
+        (run_id, *pos_params),
+    ).fetchall()
+    out: Dict[int, Dict[str, Any]] = {}
+    for r in rows:
+        try:
+            out[int(r["position"])] = json.loads(r["inline_json"] or "{}")
+        except Exception:
+            out[int(r["position"])] = {}
+
+    cols = "position, field" if lazy else "position, field, codec, data"
+    for r in con.execute(
+        f"SELECT {cols} FROM analysis_run_fields WHERE run_id = ?{pos_sql} ORDER BY position, field",
+        (run_id, *pos_params),
+    ):
+        target = out.get(int(r["position"]))
+        if target is None:
+            continue
+        if lazy:
+            target.setdefault("_lazy_fields", []).append(r["field"])
+            continue
+        try:
+            target[r["field"]] = json.loads(_decompress(r["codec"], r["data"]))
+        except Exception:
+            target[r["field"]] = None
+    return [out[k] for k in sorted(out)]
+
+
 def seed_demo_users() -> None:
     """Idempotently seed a small set of demo users (for local/dev UX)."""
     init_db()
@@ -126,9 +400,9 @@ def _decode_salt(salt_b64: str) -> bytes:
     return base64.b64decode((salt_b64 or "").encode("ascii"))
 
 
-def _pbkdf2_hash(password: str, *, salt: bytes, iterations: int = 120_000) -> str:
-    dk = hashlib.pbkdf2_hmac("sha256", (password or "").encode("utf-8"), salt, iterations)
-    return base64.b64encode(dk).decode("ascii")
+def _pbkdf2_hash(password: str, *, salt: bytes, iterations: int = DEFAULT_PBKDF2_ITERATIONS) -> str:
+    # CPU-heavy; runs on the dedicated bounded hashing pool (see password_hashing.py).
+    return hash_password(password, salt=salt, iterations=iterations)
 
 
 def create_user(*, email: str, password: str, name: str, role: str = "User") -> Tuple[bool, str]:
@@ -146,36 +420,85 @@ def create_user(*, email: str, password: str, name: str, role: str = "User") ->
 
     with _connect() as con:
         exists = con.execute("SELECT 1 FROM users WHERE email = ?", (email_n,)).fetchone()
-        if exists:
+    if exists:
+        return False, "An account with this email already exists"
+
+    # Hash outside the connection so the DB isn't held open while the pool works.
+    iterations = current_iterations()
+    password_hash = _pbkdf2_hash(password, salt=salt, iterations=iterations)
+
+    with _connect() as con:
+        try:
+            con.execute(
+                """
+                INSERT INTO users(
+                    email, name, role, avatar, password_salt, password_hash, password_iterations, created_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    email_n,
+                    name.strip(),
+                    (role or "User").strip() or "User",
+                    avatar,
+                    _encode_salt(salt),
+                    password_hash,
+                    int(iterations),
+                    _utc_now_iso(),
+                ),
+            )
+        except sqlite3.IntegrityError:
             return False, "An account with this email already exists"
-        con.execute(
-            """
-            INSERT INTO users(email, name, role, avatar, password_salt, password_hash, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                email_n,
-                name.strip(),
-                (role or "User").strip() or "User",
-                avatar,
-                _encode_salt(salt),
-                _pbkdf2_hash(password, salt=salt),
-                _utc_now_iso(),
-            ),
-        )
         con.commit()
     return True, "Account created"
 
 
-def _verify_password(password: str, *, salt_b64: str, expected_hash: str) -> bool:
+def _verify_password(password: str, *, salt_b64: str, expected_hash: str, iterations: int) -> bool:
     try:
         salt = _decode_salt(salt_b64)
-        got = _pbkdf2_hash(password, salt=salt)
+        got = _pbkdf2_hash(password, salt=salt, iterations=iterations)
         return hmac.compare_digest(expected_hash or "", got)
+    except HashPoolBusy:
+        # Saturation is not a wrong password; let the API answer 503.
+        raise
     except Exception:
         return False
 
 
+def _schedule_rehash(*, email: str, password: str, old_hash: str) -> None:
+    """Upgrade a stored hash to the current iteration count in the background.
+
+    Runs after a successful login so the login response never pays for the new cost.
+    The UPDATE is conditional on the old hash so a concurrent password change wins.
+    """
+
+    iterations = current_iterations()
+    salt = _new_salt()
+    try:
+        fut = submit_hash(password, salt=salt, iterations=iterations)
+    except Exception:
+        # Pool busy: try again on the next login.
+        return
+
+    def _store(f) -> None:
+        try:
+            new_hash = f.result()
+            with _connect() as con:
+                con.execute(
+                    """
+                    UPDATE users
+                    SET password_salt = ?, password_hash = ?, password_iterations = ?
+                    WHERE email = ? AND password_hash = ?
+                    """,
+                    (_encode_salt(salt), new_hash, int(iterations), email, old_hash),
+                )
+                con.commit()
+        except Exception:
+            return
+
+    fut.add_done_callback(_store)
+
+
 def get_user(email: str) -> Optional[Dict[str, Any]]:
     init_db()
     email_n = _norm_email(email)
@@ -189,16 +512,29 @@ def login(*, email: str, password: str) -> Optional[Tuple[str, Dict[str, Any]]]:
     email_n = _norm_email(email)
     with _connect() as con:
         row = con.execute(
-            "SELECT email, name, role, avatar, password_salt, password_hash FROM users WHERE email = ?",
+            """
+            SELECT email, name, role, avatar, password_salt, password_hash, password_iterations
+            FROM users WHERE email = ?
+            """,
             (email_n,),
         ).fetchone()
-        if not row:
-            return None
-        d = dict(row)
-        ok = _verify_password(password, salt_b64=d.get("password_salt") or "", expected_hash=d.get("password_hash") or "")
-        if not ok:
-            return None
+    if not row:
+        return None
+    d = dict(row)
+    stored_iterations = int(d.get("password_iterations") or DEFAULT_PBKDF2_ITERATIONS)
+    ok = _verify_password(
+        password,
+        salt_b64=d.get("password_salt") or "",
+        expected_hash=d.get("password_hash") or "",
+        iterations=stored_iterations,
+    )
+    if not ok:
+        return None
 
+    if stored_iterations != current_iterations():
+        _schedule_rehash(email=email_n, password=password, old_hash=d.get("password_hash") or "")
+
+    with _connect() as con:
         token = secrets.token_urlsafe(32)
         now = _utc_now()
         expires = now + timedelta(hours=SESSION_TTL_HOURS)
@@ -256,16 +592,15 @@ def save_analysis_run(
         raise ValueError("Missing user_email")
 
     files_json = json.dumps(filenames or [], ensure_ascii=False)
-    results_json = json.dumps(results or [], ensure_ascii=False)
 
     with _connect() as con:
         cur = con.execute(
             """
             INSERT INTO analysis_runs(
                 user_email, created_at, mode, question, tone, run_all_agents,
-                no_evidence_threshold, files_json, results_json
+                no_evidence_threshold, files_json, results_json, results_storage, search_text
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'normalized', ?)
             """,
             (
                 email_n,
@@ -276,27 +611,102 @@ def save_analysis_run(
                 1 if run_all_agents else 0,
                 float(no_evidence_threshold),
                 files_json,
-                results_json,
+                "[]",
+                "" if _FTS_AVAILABLE else _report_text(results or []),
             ),
         )
+        run_id = int(cur.lastrowid)
+        _store_results(con, run_id=run_id, results=results or [])
+        _index_run_fts(con, run_id=run_id, question=question or "", filenames=filenames or [], results=results or [])
         con.commit()
-        return int(cur.lastrowid)
+        return run_id
 
 
 def list_analysis_runs(*, user_email: str, limit: int = 10) -> List[Dict[str, Any]]:
+    return search_analysis_runs(user_email=user_email, limit=limit)["runs"]
+
+
+def search_analysis_runs(
+    *,
+    user_email: str,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    mode: Optional[str] = None,
+    q: Optional[str] = None,
+    filename: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Filtered, newest-first history page.
+
+    Pagination is keyset-based: `cursor` is the opaque `next_cursor` from the previous
+    page (the last run id seen), so every page costs the same regardless of depth.
+    """
+
     init_db()
     email_n = _norm_email(user_email)
+    limit = max(1, min(int(limit), 200))
+
+    where: List[str] = ["r.user_email = ?"]
+    params: List[Any] = [email_n]
+    join = ""
+
+    if cursor not in (None, ""):
+        try:
+            before_id = int(str(cursor))
+        except ValueError:
+            raise ValueError("Invalid cursor")
+        where.append("r.id < ?")
+        params.append(before_id)
+
+    mode_n = (mode or "").strip().lower()
+    if mode_n and mode_n != "all":
+        where.append("r.mode = ?")
+        params.append(mode_n)
+
+    lo = _date_bound(date_from, end=False)
+    hi = _date_bound(date_to, end=True)
+    if lo:
+        where.append("r.created_at >= ?")
+        params.append(lo)
+    if hi:
+        where.append("r.created_at < ?")
+        params.append(hi)
+
+    if (filename or "").strip():
+        where.append("r.files_json LIKE ? ESCAPE '\\'")
+        params.append(f"%{_like_escape(filename.strip())}%")
+
+    fts = _fts_query(q or "")
+    if fts:
+        if _FTS_AVAILABLE:
+            join = "JOIN analysis_runs_fts ON analysis_runs_fts.rowid = r.id"
+            where.append("analysis_runs_fts MATCH ?")
+            params.append(fts)
+        else:
+            for tok in re.findall(r"\w+", (q or "").lower())[:16]:
+                like = f"%{_like_escape(tok)}%"
+                where.append(
+                    "(r.question LIKE ? ESCAPE '\\' OR r.files_json LIKE ? ESCAPE '\\'"
+                    " OR r.results_json LIKE ? ESCAPE '\\' OR r.search_text LIKE ? ESCAPE '\\')"
+                )
+                params.extend([like, like, like, like])
+
+    sql = f"""
+        SELECT r.id, r.created_at, r.mode, r.question, r.tone, r.run_all_agents, r.no_evidence_threshold, r.files_json
+        FROM analysis_runs r
+        {join}
+        WHERE {" AND ".join(where)}
+        ORDER BY r.id DESC
+        LIMIT ?
+    """
+    # Fetch one extra row to know whether another page exists.
+    params.append(limit + 1)
     with _connect() as con:
-        rows = con.execute(
-            """
-            SELECT id, created_at, mode, question, tone, run_all_agents, no_evidence_threshold, files_json
-            FROM analysis_runs
-            WHERE user_email = ?
-            ORDER BY id DESC
-            LIMIT ?
-            """,
-            (email_n, int(limit)),
-        ).fetchall()
+        rows = con.execute(sql, params).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     out: List[Dict[str, Any]] = []
     for r in rows:
         d = dict(r)
@@ -305,10 +715,12 @@ def list_analysis_runs(*, user_email: str, limit: int = 10) -> List[Dict[str, An
         except Exception:
             d["files"] = []
         out.append(d)
-    return out
+    next_cursor = str(out[-1]["id"]) if (has_more and out) else None
+    return {"runs": out, "next_cursor": next_cursor}
 
 
-def get_analysis_run(*, user_email: str, run_id: int) -> Optional[Dict[str, Any]]:
+def get_analysis_run(*, user_email: str, run_id: int, lazy: bool = False) -> Optional[Dict[str, Any]]:
+    """Load a run. With lazy=True, large result fields are omitted (see `_lazy_fields`)."""
     init_db()
     email_n = _norm_email(user_email)
     with _connect() as con:
@@ -316,18 +728,136 @@ def get_analysis_run(*, user_email: str, run_id: int) -> Optional[Dict[str, Any]
             "SELECT * FROM analysis_runs WHERE user_email = ? AND id = ?",
             (email_n, int(run_id)),
         ).fetchone()
-    if not row:
-        return None
-    d = dict(row)
+        if not row:
+            return None
+        d = dict(row)
+        if d.get("results_storage") == "normalized":
+            d["results"] = _load_results(con, run_id=int(run_id), lazy=lazy)
+        else:
+            try:
+                d["results"] = json.loads(d.get("results_json") or "[]")
+            except Exception:
+                d["results"] = []
+    d.pop("results_json", None)
     try:
         d["files"] = json.loads(d.get("files_json") or "[]")
     except Exception:
         d["files"] = []
+    return d
+
+
+def _owned_run_storage(con: sqlite3.Connection, *, email_n: str, run_id: int) -> Optional[sqlite3.Row]:
+    return con.execute(
+        "SELECT id, results_storage, results_json FROM analysis_runs WHERE user_email = ? AND id = ?",
+        (email_n, int(run_id)),
+    ).fetchone()
+
+
+def get_analysis_result(*, user_email: str, run_id: int, position: int) -> Optional[Dict[str, Any]]:
+    """One file's full result from a run (decompresses only that file's fields)."""
+    init_db()
+    email_n = _norm_email(user_email)
+    with _connect() as con:
+        row = _owned_run_storage(con, email_n=email_n, run_id=run_id)
+        if not row:
+            return None
+        if row["results_storage"] == "normalized":
+            results = _load_results(con, run_id=int(run_id), lazy=False, position=int(position))
+            return results[0] if results else None
     try:
-        d["results"] = json.loads(d.get("results_json") or "[]")
+        results = json.loads(row["results_json"] or "[]")
     except Exception:
-        d["results"] = []
-    return d
+        return None
+    return results[int(position)] if 0 <= int(position) < len(results) else None
+
+
+class ResultUnavailable(Exception):
+    """A stored result field exists but cannot be decoded (corrupt blob or JSON, missing codec)."""
+
+
+def get_analysis_result_field(*, user_email: str, run_id: int, position: int, field: str) -> Any:
+    """One field of one result (decompresses just that field). Raises KeyError when absent,
+    ResultUnavailable when the stored bytes do not decode."""
+    init_db()
+    email_n = _norm_email(user_email)
+    with _connect() as con:
+        row = _owned_run_storage(con, email_n=email_n, run_id=run_id)
+        if not row:
+            raise KeyError("run")
+        try:
+            if row["results_storage"] == "normalized":
+                f = con.execute(
+                    "SELECT codec, data FROM analysis_run_fields WHERE run_id = ? AND position = ? AND field = ?",
+                    (int(run_id), int(position), field),
+                ).fetchone()
+                if f is not None:
+                    return json.loads(_decompress(f["codec"], f["data"]))
+                r = con.execute(
+                    "SELECT inline_json FROM analysis_run_results WHERE run_id = ? AND position = ?",
+                    (int(run_id), int(position)),
+                ).fetchone()
+                inline = json.loads(r["inline_json"] or "{}") if r else {}
+            else:
+                results = json.loads(row["results_json"] or "[]")
+                inline = results[int(position)] if 0 <= int(position) < len(results) else {}
+        except Exception as e:
+            # zlib.error, zstd errors, a missing zstandard install and JSON/Unicode decode errors.
+            raise ResultUnavailable(field) from e
+    if not isinstance(inline, dict) or field not in inline:
+        raise KeyError(field)
+    return inline[field]
+
+
+def analysis_run_size_report(*, user_email: str, run_id: int) -> Optional[Dict[str, Any]]:
+    """Bytes for a run's results: as one JSON blob (before) vs normalized+compressed (after)."""
+    init_db()
+    email_n = _norm_email(user_email)
+    with _connect() as con:
+        row = _owned_run_storage(con, email_n=email_n, run_id=run_id)
+        if not row:
+            return None
+        if row["results_storage"] != "normalized":
+            size = len((row["results_json"] or "").encode("utf-8"))
+            return {
+                "run_id": int(run_id),
+                "storage": "inline",
+                "before_bytes": size,
+                "after_bytes": size,
+                "ratio": 1.0 if size else None,
+                "fields": [],
+            }
+
+        inline_bytes = con.execute(
+            "SELECT COALESCE(SUM(LENGTH(CAST(inline_json AS BLOB))), 0) FROM analysis_run_results WHERE run_id = ?",
+            (int(run_id),),
+        ).fetchone()[0]
+        fields = [
+            {
+                "position": int(r["position"]),
+                "field": r["field"],
+                "codec": r["codec"],
+                "raw_bytes": int(r["raw_bytes"]),
+                "stored_bytes": int(r["stored_bytes"]),
+            }
+            for r in con.execute(
+                """
+                SELECT position, field, codec, raw_bytes, LENGTH(data) AS stored_bytes
+                FROM analysis_run_fields WHERE run_id = ? ORDER BY position, field
+                """,
+                (int(run_id),),
+            )
+        ]
+        # Reconstruct the legacy blob size exactly rather than estimating it.
+        before = len(json.dumps(_load_results(con, run_id=int(run_id), lazy=False), ensure_ascii=False).encode("utf-8"))
+    after = int(inline_bytes) + sum(f["stored_bytes"] for f in fields)
+    return {
+        "run_id": int(run_id),
+        "storage": "normalized",
+        "before_bytes": before,
+        "after_bytes": after,
+        "ratio": (after / before) if before else None,
+        "fields": fields,
+    }
 
 
 def delete_analysis_run(*, user_email: str, run_id: int) -> bool:
@@ -338,5 +868,10 @@ def delete_analysis_run(*, user_email: str, run_id: int) -> bool:
             "DELETE FROM analysis_runs WHERE user_email = ? AND id = ?",
             (email_n, int(run_id)),
         )
+        if cur.rowcount > 0:
+            con.execute("DELETE FROM analysis_run_results WHERE run_id = ?", (int(run_id),))
+            con.execute("DELETE FROM analysis_run_fields WHERE run_id = ?", (int(run_id),))
+            if _FTS_AVAILABLE:
+                con.execute("DELETE FROM analysis_runs_fts WHERE rowid = ?", (int(run_id),))
         con.commit()
         return cur.rowcount > 0
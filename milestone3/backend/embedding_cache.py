@@ -0,0 +1,173 @@
+"""On-disk chunk-embedding cache shared across contracts (and processes).
+
+Contracts repeat a lot of boilerplate (governing law, confidentiality, notices), so the
+same chunk text is embedded again and again. The cache stores one float32 row per
+(embedder, chunk hash):
+
+    <root>/<embedder>/vectors.f32   fixed-capacity memory-mapped matrix (slots)
+    <root>/<embedder>/index.sqlite3 chunk hash -> slot, last-used tick (LRU)
+
+When every slot is taken, the least recently used entries are evicted. Lookups and
+inserts hold the SQLite write lock while they touch the matrix, so concurrent ingest
+workers never read a slot that is being overwritten.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from contract_pipeline import OUTPUTS_DIR, LocalRAGIndex
+
+
+DEFAULT_CACHE_DIR = OUTPUTS_DIR / "embedding_cache"
+DEFAULT_CAPACITY = 500_000
+
+
+def _safe_name(name: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name) or "default"
+
+
+class EmbeddingCache:
+    """LRU cache of chunk embeddings for one embedder, memory-mapped from disk."""
+
+    def __init__(self, root: Path, *, embedder_name: str, dim: int, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.directory = Path(root) / _safe_name(embedder_name)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        info_path = self.directory / "cache.json"
+        info = {"embedder_name": embedder_name, "dim": int(dim), "capacity": int(capacity)}
+        if info_path.exists():
+            stored = json.loads(info_path.read_text(encoding="utf-8"))
+            if stored.get("dim") != info["dim"]:
+                raise ValueError(f"Embedding cache at {self.directory} has dim {stored.get('dim')}, expected {dim}")
+            # Capacity is fixed when the cache is created.
+            info["capacity"] = int(stored["capacity"])
+        else:
+            info_path.write_text(json.dumps(info, indent=2), encoding="utf-8")
+        self.embedder_name = embedder_name
+        self.dim = int(dim)
+        self.capacity = int(info["capacity"])
+        vec_path = self.directory / "vectors.f32"
+        if not vec_path.exists() or vec_path.stat().st_size != self.capacity * self.dim * 4:
+            # Sparse file: untouched slots take no disk space.
+            with open(vec_path, "ab") as f:
+                f.truncate(self.capacity * self.dim * 4)
+        self._vectors = np.memmap(vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self._db = self.directory / "index.sqlite3"
+        self._local = threading.local()
+        con = self._connect()
+        with con:
+            con.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_used INTEGER NOT NULL)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+            con.execute("CREATE TABLE IF NOT EXISTS clock (id INTEGER PRIMARY KEY CHECK (id = 0), tick INTEGER NOT NULL)")
+            con.execute("INSERT OR IGNORE INTO clock (id, tick) VALUES (0, 0)")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(str(self._db), timeout=60, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _tick(self, con: sqlite3.Connection) -> int:
+        con.execute("UPDATE clock SET tick = tick + 1 WHERE id = 0")
+        return int(con.execute("SELECT tick FROM clock WHERE id = 0").fetchone()[0])
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors (copies) for the keys that are present; marks them recently used."""
+
+        wanted = list(dict.fromkeys(keys))
+        if not wanted:
+            return {}
+        con = self._connect()
+        out: Dict[str, np.ndarray] = {}
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            slots: Dict[str, int] = {}
+            for i in range(0, len(wanted), 500):
+                part = wanted[i : i + 500]
+                q = f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                slots.update({k: int(s) for k, s in con.execute(q, part)})
+            if slots:
+                tick = self._tick(con)
+                con.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(tick, k) for k in slots])
+                rows = np.array(list(slots.values()), dtype=np.int64)
+                vecs = np.asarray(self._vectors[rows])
+                out = {k: vecs[i] for i, k in enumerate(slots)}
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        self.hits += len(out)
+        self.misses += len(wanted) - len(out)
+        return out
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        """Store vectors for new keys, evicting least recently used entries when full."""
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        items = list(dict(zip(keys, range(len(keys)))).items())[: self.capacity]
+        if not items:
+            return
+        con = self._connect()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            present = set()
+            for i in range(0, len(items), 500):
+                part = [k for k, _ in items[i : i + 500]]
+                present.update(k for (k,) in con.execute(f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(part))})", part))
+            items = [(k, i) for k, i in items if k not in present]
+            if items:
+                # Slots stay dense (0..used-1 taken): entries are only deleted to be reused.
+                used = int(con.execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+                slots: List[int] = list(range(used, used + min(max(0, self.capacity - used), len(items))))
+                need = len(items) - len(slots)
+                if need:
+                    victims = con.execute("SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (need,)).fetchall()
+                    con.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+                    slots += [int(s) for _, s in victims]
+                    self.evictions += len(victims)
+                tick = self._tick(con)
+                rows = np.array(slots, dtype=np.int64)
+                # Shared mapping: other processes see the rows through the page cache.
+                self._vectors[rows] = vectors[[i for _, i in items]]
+                con.executemany(
+                    "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(k, int(s), tick) for (k, _), s in zip(items, slots)],
+                )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        return int(self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        looked_up = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / looked_up) if looked_up else None,
+            "entries": len(self),
+            "capacity": self.capacity,
+        }
+
+
+def attach_cache(embedder: LocalRAGIndex, root: Path = DEFAULT_CACHE_DIR, *, capacity: int = DEFAULT_CAPACITY) -> EmbeddingCache:
+    """Open the cache for `embedder`'s model and make its build() calls use it."""
+    dim = int(embedder.encode(["dimension probe"], normalize_embeddings=True).shape[1])
+    cache = EmbeddingCache(root, embedder_name=embedder.embedder_name, dim=dim, capacity=capacity)
+    embedder.embedding_cache = cache
+    return cache
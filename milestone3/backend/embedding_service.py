@@ -0,0 +1,132 @@
+"""In-process micro-batching for embedding calls shared by concurrent requests.
+
+Concurrent pipelines mostly encode tiny batches (one question per `query`). The
+BatchingEncoder queues encode calls from all threads and runs them through the model
+as one batch; each caller gets its rows back through a future.
+
+Batching is adaptive: the worker always takes everything already queued, and only
+waits up to `max_wait_ms` for more when the previous batch actually combined several
+callers. A lone client therefore pays no added latency; under load batches fill up.
+
+    rag = LocalRAGIndex(model_name=...)
+    rag.encode_service = BatchingEncoder(rag.encode_direct, max_batch=64, max_wait_ms=2)
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+EncodeFn = Callable[..., np.ndarray]
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    normalize: bool
+    future: Future = field(default_factory=Future)
+
+
+class BatchingEncoder:
+    """Thread-safe `encode` that coalesces concurrent calls into model batches."""
+
+    def __init__(self, encode_fn: EncodeFn, *, max_batch: int = 64, max_wait_ms: float = 2.0, name: str = "clauseai-embed") -> None:
+        self._encode_fn = encode_fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._closed = False
+        self._last_batch_requests = 0
+        self.stats: Dict[str, int] = {"requests": 0, "texts": 0, "batches": 0, "max_batch_texts": 0}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def encode(self, texts: List[str], *, normalize_embeddings: bool = True) -> np.ndarray:
+        texts = list(texts)
+        if not texts or self._closed or threading.current_thread() is self._thread:
+            return self._encode_fn(texts, normalize_embeddings=normalize_embeddings)
+        req = _Request(texts, bool(normalize_embeddings))
+        self._queue.put(req)
+        return req.future.result()
+
+    def queue_depth(self) -> int:
+        """Requests waiting for the worker (not counting the batch being encoded)."""
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        n = len(first.texts)
+        wait = self.max_wait_s if self._last_batch_requests > 1 else 0.0
+        deadline = time.monotonic() + wait
+        while n < self.max_batch:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    req = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if req is None:
+                self._queue.put(None)
+                break
+            batch.append(req)
+            n += len(req.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+            self._last_batch_requests = len(batch)
+            for normalize in (True, False):
+                group = [r for r in batch if r.normalize is normalize]
+                if not group:
+                    continue
+                texts = [t for r in group for t in r.texts]
+                try:
+                    vecs = np.asarray(self._encode_fn(texts, normalize_embeddings=normalize), dtype=np.float32)
+                except BaseException as e:  # noqa: BLE001 - handed to every caller in the batch
+                    for r in group:
+                        r.future.set_exception(e)
+                    continue
+                start = 0
+                for r in group:
+                    r.future.set_result(vecs[start : start + len(r.texts)])
+                    start += len(r.texts)
+                self.stats["batches"] += 1
+                self.stats["texts"] += len(texts)
+                self.stats["requests"] += len(group)
+                self.stats["max_batch_texts"] = max(self.stats["max_batch_texts"], len(texts))
+        # Drain anything submitted during shutdown.
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is not None:
+                req.future.set_result(self._encode_fn(req.texts, normalize_embeddings=req.normalize))
+
+
+def attach_batching(embedder: Any, *, max_batch: int = 64, max_wait_ms: float = 2.0) -> BatchingEncoder:
+    """Route `embedder.encode` (and indexes made with LocalRAGIndex.sharing_model) through a BatchingEncoder."""
+    service = BatchingEncoder(embedder.encode_direct, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    embedder.encode_service = service
+    return service
@@ -0,0 +1,388 @@
+"""Per-corpus SQLite table of typed clause facts (see contract_pipeline.extract_clause_facts).
+
+Written by bulk_ingest.py next to the corpus artifacts (<corpus>/facts.sqlite3); read by
+risk scoring (portfolio_sweep.py) and by cross-contract queries.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from contract_pipeline import FACT_KINDS, ClauseFact, utc_now_iso
+
+
+FACTS_DB_NAME = "facts.sqlite3"
+
+# Bump when extract_clause_facts changes meaningfully; bulk_ingest re-extracts on mismatch.
+FACTS_VERSION = 1
+
+
+def facts_db_path(corpus_dir: Path) -> Path:
+    return Path(corpus_dir) / FACTS_DB_NAME
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(db_path)
+    con.row_factory = sqlite3.Row
+    return con
+
+
+_INITIALIZED: set[str] = set()
+
+
+def init_facts_db(db_path: Path) -> None:
+    key = str(Path(db_path).resolve())
+    if key in _INITIALIZED and Path(db_path).exists():
+        return
+    with _connect(db_path) as con:
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS contract_facts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                contract_id TEXT NOT NULL,
+                fact TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                value_num REAL,
+                value_text TEXT,
+                unit TEXT,
+                start_offset INTEGER NOT NULL,
+                end_offset INTEGER NOT NULL,
+                evidence TEXT NOT NULL
+            )
+            """
+        )
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS contracts (
+                contract_id TEXT PRIMARY KEY,
+                source TEXT,
+                n_facts INTEGER NOT NULL,
+                facts_version INTEGER NOT NULL,
+                extracted_at TEXT NOT NULL
+            )
+            """
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS idx_contract_facts_contract ON contract_facts(contract_id, fact)")
+        # Covering indexes: filters seek (fact, value) -> contract_id; aggregates and sorting
+        # scan (fact, contract_id) -> value without touching the table.
+        con.execute("DROP INDEX IF EXISTS idx_contract_facts_num")
+        con.execute("DROP INDEX IF EXISTS idx_contract_facts_text")
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_contract_facts_fact_num ON contract_facts(fact, value_num, contract_id)"
+        )
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_contract_facts_fact_text ON contract_facts(fact, value_text, contract_id)"
+        )
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_contract_facts_fact_contract "
+            "ON contract_facts(fact, contract_id, value_num, value_text)"
+        )
+    _INITIALIZED.add(key)
+
+
+def replace_contract_facts(
+    db_path: Path,
+    contract_id: str,
+    facts: Iterable[ClauseFact],
+    *,
+    source: Optional[str] = None,
+) -> int:
+    """Replace every fact for `contract_id` in one transaction. Returns the number stored."""
+    return replace_many_contract_facts(db_path, [(contract_id, list(facts), source)])
+
+
+def replace_many_contract_facts(
+    db_path: Path,
+    items: Sequence[Tuple[str, List[ClauseFact], Optional[str]]],
+) -> int:
+    """Batch form of replace_contract_facts: one transaction (one fsync) for many contracts."""
+
+    if not items:
+        return 0
+    init_facts_db(db_path)
+    now = utc_now_iso()
+    total = 0
+    with _connect(db_path) as con:
+        for contract_id, facts, source in items:
+            rows = [
+                (contract_id, f.fact, f.topic, f.value_num, f.value_text, f.unit, f.start, f.end, f.evidence)
+                for f in facts
+            ]
+            con.execute("DELETE FROM contract_facts WHERE contract_id = ?", (contract_id,))
+            con.executemany(
+                """
+                INSERT INTO contract_facts
+                    (contract_id, fact, topic, value_num, value_text, unit, start_offset, end_offset, evidence)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            con.execute(
+                """
+                INSERT INTO contracts (contract_id, source, n_facts, facts_version, extracted_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(contract_id) DO UPDATE SET
+                    source = excluded.source,
+                    n_facts = excluded.n_facts,
+                    facts_version = excluded.facts_version,
+                    extracted_at = excluded.extracted_at
+                """,
+                (contract_id, source, len(rows), FACTS_VERSION, now),
+            )
+            total += len(rows)
+        # Keeps planner statistics current as the table grows (cheap when nothing changed).
+        con.execute("PRAGMA optimize")
+    return total
+
+
+def get_contract_facts(db_path: Path, contract_id: str) -> Optional[List[ClauseFact]]:
+    """Facts in document order, or None if the contract was never extracted (at this version)."""
+
+    if not Path(db_path).exists():
+        return None
+    with _connect(db_path) as con:
+        head = con.execute(
+            "SELECT facts_version FROM contracts WHERE contract_id = ?", (contract_id,)
+        ).fetchone()
+        if head is None or int(head["facts_version"]) != FACTS_VERSION:
+            return None
+        rows = con.execute(
+            """
+            SELECT fact, topic, evidence, start_offset, end_offset, value_num, value_text, unit
+            FROM contract_facts WHERE contract_id = ? ORDER BY start_offset, id
+            """,
+            (contract_id,),
+        ).fetchall()
+    return [
+        ClauseFact(
+            fact=r["fact"],
+            topic=r["topic"],
+            evidence=r["evidence"],
+            start=int(r["start_offset"]),
+            end=int(r["end_offset"]),
+            value_num=r["value_num"],
+            value_text=r["value_text"],
+            unit=r["unit"],
+        )
+        for r in rows
+    ]
+
+
+def delete_contract_facts(db_path: Path, contract_id: str) -> None:
+    if not Path(db_path).exists():
+        return
+    with _connect(db_path) as con:
+        con.execute("DELETE FROM contract_facts WHERE contract_id = ?", (contract_id,))
+        con.execute("DELETE FROM contracts WHERE contract_id = ?", (contract_id,))
+
+
+# ---- Cross-contract queries ------------------------------------------------
+
+_NUM_OPS = {"lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+FILTER_OPS = ("eq", "ne", "lt", "lte", "gt", "gte", "in", "exists", "missing")
+
+
+def _split_values(values: Sequence[Any]) -> Tuple[List[float], List[str]]:
+    """Filter values -> (numbers, texts). Numeric strings such as "30" count as numbers."""
+    nums: List[float] = []
+    texts: List[str] = []
+    for v in values:
+        if isinstance(v, bool) or v is None:
+            raise ValueError(f"Unsupported filter value {v!r}")
+        if isinstance(v, (int, float)):
+            nums.append(float(v))
+            continue
+        try:
+            nums.append(float(str(v).strip()))
+        except ValueError:
+            texts.append(str(v))
+    return nums, texts
+
+
+def _filter_sql(flt: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """One filter -> `contract_id [NOT] IN (...)` clause. A contract matches when any of
+    its facts of that kind satisfies the condition (or, for `missing`, none exists)."""
+
+    fact = str(flt.get("fact") or "").strip()
+    op = str(flt.get("op") or "exists").strip().lower()
+    value = flt.get("value")
+    if fact not in FACT_KINDS:
+        raise ValueError(f"Unknown fact {fact!r}; expected one of {', '.join(FACT_KINDS)}")
+    if op not in FILTER_OPS:
+        raise ValueError(f"Unknown op {op!r}; expected one of {', '.join(FILTER_OPS)}")
+
+    sub = "SELECT contract_id FROM contract_facts WHERE fact = ?"
+    params: List[Any] = [fact]
+    if op == "missing":
+        return f"c.contract_id NOT IN ({sub})", params
+    if op == "exists":
+        return f"c.contract_id IN ({sub})", params
+    if op in _NUM_OPS:
+        try:
+            num = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Filter {fact} {op} needs a numeric value")
+        return f"c.contract_id IN ({sub} AND value_num {_NUM_OPS[op]} ?)", params + [num]
+
+    values = value if op == "in" else [value]
+    if not isinstance(values, list) or not values:
+        raise ValueError(f"Filter {fact} {op} needs a value")
+    nums, texts = _split_values(values)
+    conds = [f"{col} IN ({','.join('?' for _ in vs)})" for col, vs in (("value_num", nums), ("value_text", texts)) if vs]
+    match = f"{sub} AND ({' OR '.join(conds)})"
+    if op == "ne":
+        # "ne" = has this fact, but never with this value.
+        return f"c.contract_id IN ({sub}) AND c.contract_id NOT IN ({match})", params + params + nums + texts
+    return f"c.contract_id IN ({match})", params + nums + texts
+
+
+def _row_matches(flt: Dict[str, Any], value_num: Optional[float], value_text: Optional[str]) -> bool:
+    op = str(flt.get("op") or "exists").strip().lower()
+    value = flt.get("value")
+    if op == "exists":
+        return True
+    if op in _NUM_OPS:
+        if value_num is None:
+            return False
+        v = float(value)
+        return {"lt": value_num < v, "lte": value_num <= v, "gt": value_num > v, "gte": value_num >= v}[op]
+    nums, texts = _split_values(value if op == "in" else [value])
+    hit = (value_num is not None and value_num in nums) or (value_text is not None and value_text in texts)
+    return not hit if op == "ne" else hit
+
+
+def _aggregate(con: sqlite3.Connection, where: str, params: List[Any], fact: str) -> Dict[str, Any]:
+    if fact not in FACT_KINDS:
+        raise ValueError(f"Unknown fact {fact!r}; expected one of {', '.join(FACT_KINDS)}")
+    scope = f"SELECT c.contract_id FROM contracts c WHERE {where}"
+    num = con.execute(
+        f"""
+        SELECT COUNT(DISTINCT contract_id) AS contracts, COUNT(value_num) AS n,
+               MIN(value_num) AS min, MAX(value_num) AS max, AVG(value_num) AS avg
+        FROM contract_facts WHERE fact = ? AND contract_id IN ({scope})
+        """,
+        [fact] + params,
+    ).fetchone()
+    out: Dict[str, Any] = {
+        "contracts": int(num["contracts"]),
+        "facts_with_value": int(num["n"]),
+        "min": num["min"],
+        "max": num["max"],
+        "avg": num["avg"],
+    }
+    # Distribution over contracts (not clauses): distinct value per contract.
+    key = "value_text" if fact in {"liability_cap", "audit_rights"} else "value_num"
+    rows = con.execute(
+        f"""
+        SELECT {key} AS value, COUNT(DISTINCT contract_id) AS contracts
+        FROM contract_facts WHERE fact = ? AND contract_id IN ({scope})
+        GROUP BY {key} ORDER BY contracts DESC, value LIMIT 50
+        """,
+        [fact] + params,
+    ).fetchall()
+    out["by_value"] = [{"value": r["value"], "contracts": int(r["contracts"])} for r in rows]
+    return out
+
+
+def query_facts(
+    db_path: Path,
+    *,
+    filters: Sequence[Dict[str, Any]] = (),
+    sort_fact: Optional[str] = None,
+    descending: bool = False,
+    limit: int = 50,
+    offset: int = 0,
+    aggregate: Sequence[str] = (),
+    evidence_facts: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """Contracts whose facts satisfy every filter, with supporting clause evidence.
+
+    Evidence is returned for the facts named in the filters and sort (or
+    `evidence_facts`). `aggregate` summarizes the named facts over the whole match set.
+    """
+
+    init_facts_db(db_path)
+    clauses: List[str] = []
+    params: List[Any] = []
+    for flt in filters:
+        sql, p = _filter_sql(flt)
+        clauses.append(sql)
+        params.extend(p)
+    where = " AND ".join(clauses) or "1=1"
+
+    # Sorting joins one grouped pass over the sort fact (MIN for asc, MAX for desc) rather
+    # than a correlated subquery per contract. Contracts without a value sort last.
+    join = ""
+    join_params: List[Any] = []
+    order = "c.contract_id"
+    if sort_fact:
+        if sort_fact not in FACT_KINDS:
+            raise ValueError(f"Unknown sort fact {sort_fact!r}")
+        join = (
+            f"LEFT JOIN (SELECT contract_id, {'MAX' if descending else 'MIN'}(value_num) AS v "
+            "FROM contract_facts WHERE fact = ? GROUP BY contract_id) s ON s.contract_id = c.contract_id"
+        )
+        join_params = [sort_fact]
+        order = f"s.v IS NULL, s.v {'DESC' if descending else 'ASC'}, c.contract_id"
+
+    if evidence_facts is None:
+        evidence_facts = [f.get("fact") for f in filters] + ([sort_fact] if sort_fact else [])
+    wanted = [w for w in dict.fromkeys(evidence_facts) if w]
+
+    with _connect(db_path) as con:
+        total = int(con.execute(f"SELECT COUNT(*) FROM contracts c WHERE {where}", params).fetchone()[0])
+        heads = con.execute(
+            f"SELECT c.contract_id, c.source, {'s.v' if sort_fact else 'NULL'} AS sort_value "
+            f"FROM contracts c {join} WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+            join_params + params + [max(1, min(int(limit), 1000)), max(0, int(offset))],
+        ).fetchall()
+        ids = [h["contract_id"] for h in heads]
+        evidence: Dict[str, List[Dict[str, Any]]] = {cid: [] for cid in ids}
+        if ids and wanted:
+            rows = con.execute(
+                f"""
+                SELECT contract_id, fact, topic, value_num, value_text, unit, start_offset, end_offset, evidence
+                FROM contract_facts
+                WHERE contract_id IN ({",".join("?" for _ in ids)}) AND fact IN ({",".join("?" for _ in wanted)})
+                ORDER BY contract_id, start_offset, id
+                """,
+                ids + wanted,
+            ).fetchall()
+            by_fact: Dict[str, List[Dict[str, Any]]] = {}
+            for flt in filters:
+                by_fact.setdefault(str(flt.get("fact")), []).append(flt)
+            for r in rows:
+                # For filtered facts, only the clauses that satisfy the filter are evidence.
+                flts = by_fact.get(r["fact"])
+                if flts and not all(_row_matches(f, r["value_num"], r["value_text"]) for f in flts):
+                    continue
+                evidence[r["contract_id"]].append(
+                    {
+                        "fact": r["fact"],
+                        "topic": r["topic"],
+                        "value": r["value_num"] if r["value_num"] is not None else r["value_text"],
+                        "value_text": r["value_text"],
+                        "unit": r["unit"],
+                        "start": r["start_offset"],
+                        "end": r["end_offset"],
+                        "evidence": r["evidence"],
+                    }
+                )
+        aggregations = {fact: _aggregate(con, where, params, fact) for fact in dict.fromkeys(aggregate)}
+
+    return {
+        "total": total,
+        "contracts": [
+            {
+                "contract_id": h["contract_id"],
+                "source": h["source"],
+                "sort_value": h["sort_value"],
+                "facts": evidence[h["contract_id"]],
+            }
+            for h in heads
+        ],
+        "aggregations": aggregations,
+    }
@@ -0,0 +1,307 @@
+"""Stage timing spans and Prometheus text exposition (no client library needed).
+
+Pipeline functions are wrapped in `stage("encode")` spans. A span does two things,
+each only when switched on:
+
+- exports its duration to the `clauseai_stage_seconds` histogram, unless
+  CLAUSEAI_METRICS=0;
+- adds it to the request's `Timings` when a request asked for a `timings` block
+  (`collect_timings()`, a contextvar, so spans in asyncio.to_thread workers count too).
+
+With both off, a span is one flag check and a shared no-op context manager.
+
+Values that are cheaper to read than to maintain (queue depth, cache hit counters)
+are registered with `watch_queue` / `watch_cache` and read at scrape time only.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+ENABLED = os.getenv("CLAUSEAI_METRICS", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+# Seconds; spans range from sub-millisecond encodes to multi-second PDF parses.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _fmt(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    v = float(v)
+    return str(int(v)) if v.is_integer() and abs(v) < 1e15 else repr(v)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    esc = lambda s: str(s).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            s = self._series.get(labelvalues)
+            if s is None:
+                s = self._series[labelvalues] = ([0] * (len(self.buckets) + 1), [0.0])
+            s[0][i] += 1
+            s[1][0] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {k: (list(c), s[0]) for k, (c, s) in self._series.items()}
+        for values, (counts, total) in sorted(series.items()):
+            cum = 0
+            for le, n in zip(self.buckets + (math.inf,), counts):
+                cum += n
+                yield f"{self.name}_bucket{_labels(self.labelnames, values, [('le', _fmt(le))])} {cum}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_fmt(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {cum}"
+
+
+class Gauge:
+    def __init__(self, name: str, help: str) -> None:
+        self.name, self.help = name, help
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def track(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Decorate a coroutine function: the gauge counts calls currently running."""
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            self.inc()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.dec()
+
+        return wrapper
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {_fmt(self._value)}"
+
+
+class Callback:
+    """Metric whose samples are read at scrape time: fn() -> [(labels, value), ...]."""
+
+    def __init__(self, name: str, help: str, type: str, fn: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> None:
+        self.name, self.help, self.type, self._fn = name, help, type, fn
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        for labels, v in self._fn():
+            yield f"{self.name}{_labels(list(labels), list(labels.values()))} {_fmt(v)}"
+
+
+_REGISTRY: Dict[str, Any] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def register(metric: Any) -> Any:
+    """Add (or replace, by name) a metric in the exposition."""
+    with _REGISTRY_LOCK:
+        _REGISTRY[metric.name] = metric
+    return metric
+
+
+def render() -> str:
+    """Everything registered, in Prometheus text format 0.0.4."""
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    lines: List[str] = []
+    for m in metrics:
+        try:
+            lines.extend(list(m.render()))
+        except Exception:  # a broken collector must not take the endpoint down
+            continue
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = register(Histogram("clauseai_stage_seconds", "Duration of pipeline stages.", ["stage"]))
+HTTP_SECONDS = register(Histogram("clauseai_http_request_seconds", "HTTP request duration by route.", ["method", "route", "status"]))
+PIPELINES_IN_FLIGHT = register(Gauge("clauseai_pipelines_in_flight", "run_full_pipeline calls currently running."))
+
+# name -> () -> (hits, misses) / () -> depth; read only when /metrics is scraped.
+_CACHES: Dict[str, Callable[[], Tuple[float, float]]] = {}
+_QUEUES: Dict[str, Callable[[], float]] = {}
+
+
+def watch_cache(name: str, fn: Callable[[], Tuple[float, float]]) -> None:
+    _CACHES[name] = fn
+
+
+def watch_queue(name: str, fn: Callable[[], float]) -> None:
+    _QUEUES[name] = fn
+
+
+def _cache_lookups() -> Iterator[Tuple[Dict[str, str], float]]:
+    for name, fn in sorted(_CACHES.items()):
+        hits, misses = fn()
+        yield {"cache": name, "result": "hit"}, hits
+        yield {"cache": name, "result": "miss"}, misses
+
+
+def _cache_hit_ratio() -> Iterator[Tuple[Dict[str, str], float]]:
+    for name, fn in sorted(_CACHES.items()):
+        hits, misses = fn()
+        if hits + misses:
+            yield {"cache": name}, hits / (hits + misses)
+
+
+register(Callback("clauseai_cache_lookups_total", "Cache lookups by result.", "counter", _cache_lookups))
+register(Callback("clauseai_cache_hit_ratio", "Lifetime hit ratio per cache.", "gauge", _cache_hit_ratio))
+register(
+    Callback(
+        "clauseai_queue_depth",
+        "Pending work per queue (hash_pool counts hashes in flight).",
+        "gauge",
+        lambda: [({"queue": name}, fn()) for name, fn in sorted(_QUEUES.items())],
+    )
+)
+
+
+# ---------------------------------------------------------------------------
+# Per-request timings
+# ---------------------------------------------------------------------------
+
+
+class Timings:
+    """Per-stage totals for one request: {stage: {"ms", "calls"}}."""
+
+    def __init__(self) -> None:
+        self._t0 = time.perf_counter()
+        self._stages: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        # Set by profiling.RequestProfile: enter()/exit() around every span of this request.
+        self.profiler: Optional[Any] = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            s = self._stages.setdefault(stage, [0.0, 0])
+            s[0] += seconds
+            s[1] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {k: {"ms": round(v[0] * 1000.0, 3), "calls": int(v[1])} for k, v in self._stages.items()}
+        return {"total_ms": round((time.perf_counter() - self._t0) * 1000.0, 3), "stages": stages}
+
+
+_TIMINGS: contextvars.ContextVar[Optional[Timings]] = contextvars.ContextVar("clauseai_timings", default=None)
+_NOOP = nullcontext()
+
+
+@contextmanager
+def collect_timings(enabled: bool = True) -> Iterator[Optional[Timings]]:
+    """Collect the spans of the current context (and the threads it hands work to).
+
+    Yields None (and collects nothing) when not `enabled`.
+    """
+    if not enabled:
+        yield None
+        return
+    timings = Timings()
+    token = _TIMINGS.set(timings)
+    try:
+        yield timings
+    finally:
+        _TIMINGS.reset(token)
+
+
+@contextmanager
+def _span(name: str, timings: Optional[Timings]) -> Iterator[None]:
+    profiler = timings.profiler if timings is not None else None
+    if profiler is not None:
+        profiler.enter()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        if profiler is not None:
+            profiler.exit()
+        if ENABLED:
+            STAGE_SECONDS.observe(dt, name)
+        if timings is not None:
+            timings.add(name, dt)
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage (no-op when nothing is listening)."""
+    timings = _TIMINGS.get()
+    if not ENABLED and timings is None:
+        return _NOOP
+    return _span(name, timings)
+
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of `stage` for sync functions."""
+
+    def deco(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+class MetricsMiddleware:
+    """ASGI middleware feeding `clauseai_http_request_seconds`, labelled by route template."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def _send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            # The router stores the matched route in the (shared) scope; raw paths would
+            # explode label cardinality (/history/1, /history/2, ...).
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - t0, scope.get("method", ""), route, str(status[0]))
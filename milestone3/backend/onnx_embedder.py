@@ -0,0 +1,155 @@
+"""CPU embedder backend: an exported (optionally int8-quantized) ONNX MiniLM.
+
+Runs the same sentence-transformers model without torch. At runtime it needs only
+`onnxruntime` and `tokenizers`, and it reads everything from a local directory (no
+network access):
+
+    <dir>/model_quantized.onnx   (or model.onnx)
+    <dir>/tokenizer.json
+    <dir>/onnx_embedder.json     model_name, max_seq_length, quantized
+
+Export once on a machine that has torch + transformers:
+
+    cd milestone3/backend
+    python -m onnx_embedder --model-name sentence-transformers/all-MiniLM-L6-v2 --out ../outputs/onnx/all-MiniLM-L6-v2
+
+Then set `CLAUSEAI_ONNX_MODEL_DIR` to that directory; LocalRAGIndex uses it instead of
+sentence-transformers. Mean pooling + L2 normalization reproduce the
+sentence-transformers output. Compare agreement, speed and memory with
+`python -m benchmarks.onnx_embedder`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+CONFIG_NAME = "onnx_embedder.json"
+MODEL_FILES = ("model_quantized.onnx", "model.onnx")
+DEFAULT_MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's sentence-transformers setting
+
+
+class OnnxSentenceEncoder:
+    """`encode()`-compatible wrapper around an ONNX transformer session."""
+
+    def __init__(self, session: Any, tokenizer: Any, *, model_name: str, quantized: bool, batch_size: int = 32) -> None:
+        self.session = session
+        self.tokenizer = tokenizer
+        self.model_name = model_name
+        self.quantized = quantized
+        self.batch_size = max(1, int(batch_size))
+        self._input_names = {i.name for i in session.get_inputs()}
+        self.embedder_name = f"onnx{'-int8' if quantized else ''}:{model_name}"
+
+    @classmethod
+    def from_dir(cls, directory: Path, *, threads: int = 0) -> "OnnxSentenceEncoder":
+        import onnxruntime as ort  # type: ignore
+        from tokenizers import Tokenizer  # type: ignore
+
+        d = Path(directory)
+        config: Dict[str, Any] = {}
+        if (d / CONFIG_NAME).exists():
+            config = json.loads((d / CONFIG_NAME).read_text(encoding="utf-8"))
+        model_path = next((d / name for name in MODEL_FILES if (d / name).exists()), None)
+        if model_path is None:
+            raise FileNotFoundError(f"No ONNX model ({' or '.join(MODEL_FILES)}) in {d}")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+
+        tokenizer = Tokenizer.from_file(str(d / "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=int(config.get("max_seq_length", DEFAULT_MAX_SEQ_LENGTH)))
+        pad_id = tokenizer.token_to_id("[PAD]")
+        tokenizer.enable_padding(pad_id=0 if pad_id is None else pad_id, pad_token="[PAD]")
+        return cls(
+            session,
+            tokenizer,
+            model_name=str(config.get("model_name") or d.name),
+            quantized=model_path.name == "model_quantized.onnx",
+        )
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]  # (batch, seq, dim)
+        weights = mask[:, :, None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: List[str], *, normalize_embeddings: bool = True, batch_size: int = 0) -> np.ndarray:
+        texts = [t or "" for t in texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        size = int(batch_size) or self.batch_size
+        # Length-sorted batches keep padding (and wasted compute) small.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        parts = [self._forward([texts[i] for i in order[s : s + size]]) for s in range(0, len(order), size)]
+        out = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        out[order] = np.concatenate(parts)
+        if normalize_embeddings:
+            out /= np.linalg.norm(out, axis=1, keepdims=True) + 1e-12
+        return out
+
+
+def export_onnx(model_name: str, out_dir: Path, *, quantize: bool = True, max_seq_length: int = DEFAULT_MAX_SEQ_LENGTH, opset: int = 14) -> Path:
+    """Export `model_name` to ONNX (needs torch + transformers) and optionally int8-quantize it."""
+    import torch  # type: ignore
+    from transformers import AutoModel, AutoTokenizer  # type: ignore
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(str(out))  # writes tokenizer.json for fast tokenizers
+
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    probe = tokenizer(["export probe sentence"], return_tensors="pt")
+    axes = {n: {0: "batch", 1: "sequence"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(probe[n] for n in names),
+            str(out / "model.onnx"),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=opset,
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+        quantize_dynamic(str(out / "model.onnx"), str(out / "model_quantized.onnx"), weight_type=QuantType.QInt8)
+    config = {"model_name": model_name, "max_seq_length": int(max_seq_length), "quantized": bool(quantize), "opset": opset}
+    (out / CONFIG_NAME).write_text(json.dumps(config, indent=2), encoding="utf-8")
+    return out
+
+
+def load_onnx_encoder(directory: Path) -> OnnxSentenceEncoder:
+    return OnnxSentenceEncoder.from_dir(directory, threads=int(os.getenv("CLAUSEAI_ONNX_THREADS", "0") or 0))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model to (int8) ONNX.")
+    parser.add_argument("--model-name", default=os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--max-seq-length", type=int, default=DEFAULT_MAX_SEQ_LENGTH)
+    args = parser.parse_args()
+    out = export_onnx(args.model_name, Path(args.out), quantize=not args.no_quantize, max_seq_length=args.max_seq_length)
+    print(f"Exported {args.model_name} to {out}")
+
+
+if __name__ == "__main__":
+    main()
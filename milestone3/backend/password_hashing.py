@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+# PBKDF2 cost for *new* hashes. Stored hashes keep their own iteration count and are
+# transparently upgraded after a successful login (see db_sqlite.login).
+DEFAULT_PBKDF2_ITERATIONS = 120_000
+
+# Hashing runs in a dedicated, bounded worker pool so a burst of logins cannot starve
+# analysis requests (which share the FastAPI threadpool) of CPU.
+#   CLAUSEAI_HASH_POOL=process|thread   (default: process; falls back to thread)
+#   CLAUSEAI_HASH_WORKERS=<n>           (default: min(2, cpu_count))
+#   CLAUSEAI_HASH_MAX_INFLIGHT=<n>      (default: 4 * workers; extra requests are rejected)
+HASH_POOL_KIND = os.getenv("CLAUSEAI_HASH_POOL", "process").strip().lower()
+HASH_WORKERS = max(1, int(os.getenv("CLAUSEAI_HASH_WORKERS", str(min(2, os.cpu_count() or 1)))))
+HASH_MAX_INFLIGHT = max(1, int(os.getenv("CLAUSEAI_HASH_MAX_INFLIGHT", str(4 * HASH_WORKERS))))
+
+
+class HashPoolBusy(RuntimeError):
+    """Raised when the hashing pool is saturated; callers should answer 503."""
+
+
+def current_iterations() -> int:
+    """Iteration count for new hashes (read at call time so it can be tuned live)."""
+    try:
+        return max(1, int(os.getenv("CLAUSEAI_PBKDF2_ITERATIONS", str(DEFAULT_PBKDF2_ITERATIONS))))
+    except Exception:
+        return DEFAULT_PBKDF2_ITERATIONS
+
+
+def pbkdf2_hash(password: str, *, salt: bytes, iterations: int = DEFAULT_PBKDF2_ITERATIONS) -> str:
+    """Pure PBKDF2-SHA256 hash (runs inside the worker pool)."""
+    dk = hashlib.pbkdf2_hmac("sha256", (password or "").encode("utf-8"), salt, int(iterations))
+    return base64.b64encode(dk).decode("ascii")
+
+
+def _pbkdf2_job(password: str, salt: bytes, iterations: int) -> Tuple[str, float]:
+    # Returns the hash plus pure compute time so queue wait can be reported separately.
+    t0 = time.perf_counter()
+    out = pbkdf2_hash(password, salt=salt, iterations=iterations)
+    return out, time.perf_counter() - t0
+
+
+_POOL: Optional[Executor] = None
+_POOL_KIND = "none"
+_POOL_LOCK = threading.Lock()
+_INFLIGHT = threading.BoundedSemaphore(HASH_MAX_INFLIGHT)
+
+
+def _get_pool() -> Executor:
+    global _POOL, _POOL_KIND
+    if _POOL is not None:
+        return _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            return _POOL
+        if HASH_POOL_KIND == "process":
+            try:
+                pool: Executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+                # Fail early (e.g. sandboxed platforms without multiprocessing support).
+                pool.submit(pbkdf2_hash, "", salt=b"warmup", iterations=1).result(timeout=30)
+                _POOL, _POOL_KIND = pool, "process"
+                return _POOL
+            except Exception:
+                _POOL = None
+        _POOL = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="clauseai-hash")
+        _POOL_KIND = "thread"
+        return _POOL
+
+
+def shutdown_pool() -> None:
+    global _POOL, _POOL_KIND
+    with _POOL_LOCK:
+        pool, _POOL, _POOL_KIND = _POOL, None, "none"
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _HashMetrics:
+    """Rolling latency window + counters for the hashing pool."""
+
+    def __init__(self, *, window: int = 512) -> None:
+        self._lock = threading.Lock()
+        self._total_s: Deque[float] = deque(maxlen=window)
+        self._compute_s: Deque[float] = deque(maxlen=window)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.inflight = 0
+
+    def started(self) -> None:
+        with self._lock:
+            self.inflight += 1
+
+    def finished(self, *, total_s: float, compute_s: Optional[float], ok: bool) -> None:
+        with self._lock:
+            self.inflight = max(0, self.inflight - 1)
+            if ok:
+                self.completed += 1
+                self._total_s.append(total_s)
+                if compute_s is not None:
+                    self._compute_s.append(compute_s)
+            else:
+                self.failed += 1
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    @staticmethod
+    def _summary(values: List[float]) -> Dict[str, Optional[float]]:
+        if not values:
+            return {"p50_ms": None, "p95_ms": None, "max_ms": None, "avg_ms": None}
+        vs = sorted(values)
+
+        def pct(p: float) -> float:
+            return vs[min(len(vs) - 1, int(round(p * (len(vs) - 1))))] * 1000.0
+
+        return {
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": vs[-1] * 1000.0,
+            "avg_ms": (sum(vs) / len(vs)) * 1000.0,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = list(self._total_s)
+            compute = list(self._compute_s)
+            out: Dict[str, Any] = {
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "inflight": self.inflight,
+            }
+        out["latency"] = self._summary(total)
+        out["compute"] = self._summary(compute)
+        return out
+
+
+_METRICS = _HashMetrics()
+
+
+def submit_hash(password: str, *, salt: bytes, iterations: Optional[int] = None) -> "Future[str]":
+    """Queue a hash on the bounded pool. Raises HashPoolBusy instead of queueing unboundedly."""
+
+    iters = int(iterations or current_iterations())
+    if not _INFLIGHT.acquire(blocking=False):
+        _METRICS.reject()
+        raise HashPoolBusy("Password hashing is busy; please retry shortly")
+
+    _METRICS.started()
+    t0 = time.perf_counter()
+    out: "Future[str]" = Future()
+    try:
+        inner = _get_pool().submit(_pbkdf2_job, password or "", salt, iters)
+    except Exception as e:
+        _INFLIGHT.release()
+        _METRICS.finished(total_s=0.0, compute_s=None, ok=False)
+        out.set_exception(e)
+        return out
+
+    def _done(f: Future) -> None:
+        _INFLIGHT.release()
+        try:
+            digest, compute_s = f.result()
+        except BaseException as e:  # noqa: BLE001 - propagate worker failures to the caller
+            _METRICS.finished(total_s=time.perf_counter() - t0, compute_s=None, ok=False)
+            out.set_exception(e)
+            return
+        _METRICS.finished(total_s=time.perf_counter() - t0, compute_s=compute_s, ok=True)
+        out.set_result(digest)
+
+    inner.add_done_callback(_done)
+    return out
+
+
+def hash_password(password: str, *, salt: bytes, iterations: Optional[int] = None, timeout_s: float = 30.0) -> str:
+    """Blocking helper: hash on the pool and wait (the caller's thread only waits, it doesn't burn CPU).
+
+    A hash still queued after `timeout_s` raises HashPoolBusy, like a full pool.
+    """
+    try:
+        return submit_hash(password, salt=salt, iterations=iterations).result(timeout=timeout_s)
+    except FutureTimeout:
+        raise HashPoolBusy("Password hashing timed out; please retry shortly") from None
+
+
+def hash_metrics() -> Dict[str, Any]:
+    snap = _METRICS.snapshot()
+    snap.update(
+        {
+            "pool": _POOL_KIND,
+            "workers": HASH_WORKERS,
+            "max_inflight": HASH_MAX_INFLIGHT,
+            "iterations": current_iterations(),
+        }
+    )
+    return snap
+
+
+class AttemptThrottle:
+    """Sliding-window attempt limiter keyed by arbitrary strings (account, IP).
+
+    Checked *before* hashing so throttled attempts cost no CPU.
+    """
+
+    def __init__(self, *, max_attempts: int, window_s: float) -> None:
+        self.max_attempts = max(1, int(max_attempts))
+        self.window_s = float(window_s)
+        self._lock = threading.Lock()
+        self._hits: Dict[str, Deque[float]] = {}
+
+    def _prune(self, key: str, now: float) -> Deque[float]:
+        q = self._hits.setdefault(key, deque())
+        while q and now - q[0] >= self.window_s:
+            q.popleft()
+        return q
+
+    def retry_after(self, keys: Iterable[str]) -> Optional[float]:
+        """Seconds until an attempt is allowed again, or None if not throttled."""
+        now = time.monotonic()
+        worst: Optional[float] = None
+        with self._lock:
+            for k in keys:
+                if not k:
+                    continue
+                q = self._prune(k, now)
+                if len(q) >= self.max_attempts:
+                    wait = self.window_s - (now - q[0])
+                    worst = wait if worst is None else max(worst, wait)
+        return worst
+
+    def hit(self, keys: Iterable[str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for k in keys:
+                if k:
+                    self._prune(k, now).append(now)
+            # Bound memory: drop idle keys opportunistically.
+            if len(self._hits) > 10_000:
+                for k in [k for k, q in self._hits.items() if not q]:
+                    self._hits.pop(k, None)
+
+    def reset(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for k in keys:
+                self._hits.pop(k, None)
+
+
+# Per-account limit is tight (targets password guessing); per-IP limit is looser
+# (targets guessing across many accounts from one client) and counts failures only.
+ACCOUNT_THROTTLE = AttemptThrottle(
+    max_attempts=int(os.getenv("CLAUSEAI_LOGIN_MAX_PER_ACCOUNT", "5")),
+    window_s=float(os.getenv("CLAUSEAI_LOGIN_WINDOW_S", "300")),
+)
+IP_THROTTLE = AttemptThrottle(
+    max_attempts=int(os.getenv("CLAUSEAI_LOGIN_MAX_PER_IP", "30")),
+    window_s=float(os.getenv("CLAUSEAI_LOGIN_IP_WINDOW_S", "60")),
+)
@@ -0,0 +1,262 @@
+"""Portfolio risk sweep: executive risk levels for every contract in the corpus.
+
+Runs build_executive_report_data (all agents) against the cached per-contract indexes
+written by bulk_ingest.py, in a process pool, and streams one JSON line per contract.
+The output file is its own checkpoint: re-running skips contracts already in it, so an
+interrupted (or budget-limited) sweep resumes where it stopped.
+
+    cd milestone3/backend
+    python bulk_ingest.py --input /path/to/contracts        # refresh indexes (incremental)
+    python portfolio_sweep.py --out ../outputs/sweeps/2026-W42.jsonl --workers 8 --budget-s 600
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from bulk_ingest import DEFAULT_CORPUS_DIR, artifact_dir, load_manifest
+from contract_pipeline import OUTPUTS_DIR, LocalRAGIndex, build_executive_report_data, utc_now_iso
+from facts_store import facts_db_path, get_contract_facts
+
+
+AGENTS = ["legal", "compliance", "finance", "operations"]
+DEFAULT_SWEEP_DIR = OUTPUTS_DIR / "sweeps"
+
+
+def _maybe_load_pyarrow():
+    try:
+        import pyarrow  # type: ignore
+        import pyarrow.parquet  # type: ignore  # noqa: F401
+
+        return pyarrow
+    except Exception:
+        return None
+
+
+def corpus_contracts(corpus_dir: Path) -> Dict[str, str]:
+    """contract_id -> source file (relative path) for every successfully ingested contract."""
+    out: Dict[str, str] = {}
+    for rel, f in sorted(load_manifest(corpus_dir)["files"].items()):
+        if f.get("status") == "ok" and f.get("contract_id"):
+            out.setdefault(f["contract_id"], rel)
+    return out
+
+
+def completed_ids(out_path: Path) -> Set[str]:
+    """Contract ids already in the output. A torn last line (killed mid-write) is dropped."""
+    done: Set[str] = set()
+    if not out_path.exists():
+        return done
+    good_bytes = 0
+    with open(out_path, "rb") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except Exception:
+                break
+            if not line.endswith(b"\n"):
+                break
+            good_bytes += len(line)
+            if row.get("contract_id"):
+                done.add(row["contract_id"])
+    if good_bytes != out_path.stat().st_size:
+        with open(out_path, "r+b") as f:
+            f.truncate(good_bytes)
+    return done
+
+
+# One embedder per worker process; indexes are loaded memory-mapped per contract.
+_WORKER_EMBEDDER: Optional[LocalRAGIndex] = None
+
+
+def _worker_init(model_name: str) -> None:
+    global _WORKER_EMBEDDER
+    _WORKER_EMBEDDER = LocalRAGIndex(model_name=model_name)
+
+
+def sweep_one(contract_id: str, *, corpus_dir: str, model_name: str, include_analysis: bool = False) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    embedder = _WORKER_EMBEDDER or LocalRAGIndex(model_name=model_name)
+    rag = LocalRAGIndex.load(artifact_dir(Path(corpus_dir), contract_id), embedder=embedder, mmap=True)
+    # Ingest-time clause facts when available; otherwise retrieval on the cached index.
+    # contract_text is not read by the report builder.
+    facts = get_contract_facts(facts_db_path(Path(corpus_dir)), contract_id)
+    analysis = build_executive_report_data(contract_text="", rag=rag, selected_agents=list(AGENTS), facts=facts)
+    row: Dict[str, Any] = {
+        "contract_id": contract_id,
+        "overall_risk": analysis.get("overall_risk"),
+        "agents": {a: (analysis.get(a) or {}).get("risk_level") for a in AGENTS},
+        "n_chunks": len(rag.chunks),
+        "from_facts": facts is not None,
+        "seconds": round(time.perf_counter() - t0, 4),
+    }
+    if include_analysis:
+        row["analysis"] = analysis
+    return row
+
+
+def sweep_portfolio(
+    out_path: Path,
+    *,
+    corpus_dir: Path = DEFAULT_CORPUS_DIR,
+    contract_ids: Optional[Iterable[str]] = None,
+    workers: int = max(1, (os.cpu_count() or 2) - 1),
+    model_name: Optional[str] = None,
+    budget_s: Optional[float] = None,
+    include_analysis: bool = False,
+    fresh: bool = False,
+    log: Callable[[str], Any] = print,
+) -> Dict[str, Any]:
+    """Sweep every (or the given) contract into `out_path` (JSONL). Returns run statistics.
+
+    With `budget_s`, no new contracts are started after the budget elapses; the run
+    reports `complete=False` and the next invocation resumes. `workers=0` runs inline.
+    """
+
+    corpus_dir = Path(corpus_dir)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    model_name = model_name or os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+
+    sources = corpus_contracts(corpus_dir)
+    wanted = list(dict.fromkeys(contract_ids)) if contract_ids is not None else list(sources)
+    if fresh and out_path.exists():
+        out_path.unlink()
+    done = completed_ids(out_path)
+    todo = [cid for cid in wanted if cid not in done]
+    missing = [cid for cid in todo if cid not in sources]
+    todo = [cid for cid in todo if cid in sources]
+    log(f"{len(todo)} to sweep, {len(done)} already done, {len(missing)} not in corpus; workers={workers}")
+
+    stats: Dict[str, Any] = {"swept": 0, "failed": 0, "resumed": len(done), "missing": len(missing)}
+    risk_counts: Counter = Counter()
+    t0 = time.perf_counter()
+    deadline = (t0 + float(budget_s)) if budget_s else None
+    kwargs = {"corpus_dir": str(corpus_dir), "model_name": model_name, "include_analysis": include_analysis}
+
+    with open(out_path, "a", encoding="utf-8") as out:
+
+        def write(cid: str, row: Optional[Dict[str, Any]], err: Optional[BaseException]) -> None:
+            if err is not None:
+                stats["failed"] += 1
+                log(f"  FAILED {cid}: {err}")
+                return
+            row.update({"source": sources.get(cid), "swept_at": utc_now_iso()})
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+            stats["swept"] += 1
+            risk_counts[row.get("overall_risk") or "unknown"] += 1
+            n = stats["swept"]
+            if n % 100 == 0:
+                rate = n / (time.perf_counter() - t0)
+                log(f"  {n}/{len(todo)} ({rate:.1f}/s, ~{(len(todo) - n) / rate:.0f}s left)")
+
+        def over_budget() -> bool:
+            return deadline is not None and time.perf_counter() >= deadline
+
+        pending = list(reversed(todo))
+        if workers <= 0:
+            while pending and not over_budget():
+                cid = pending.pop()
+                try:
+                    write(cid, sweep_one(cid, **kwargs), None)
+                except Exception as e:
+                    write(cid, None, e)
+        elif pending:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=(model_name,)) as pool:
+                # Bounded submission so a budget stop leaves little queued work behind.
+                inflight: Dict[Future, str] = {}
+                while pending or inflight:
+                    while pending and len(inflight) < 4 * workers and not over_budget():
+                        cid = pending.pop()
+                        inflight[pool.submit(sweep_one, cid, **kwargs)] = cid
+                    if not inflight:
+                        break
+                    finished, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        cid = inflight.pop(fut)
+                        try:
+                            write(cid, fut.result(), None)
+                        except Exception as e:
+                            write(cid, None, e)
+
+    elapsed = time.perf_counter() - t0
+    stats.update(
+        {
+            "seconds": elapsed,
+            "contracts_per_sec": (stats["swept"] / elapsed) if elapsed > 0 and stats["swept"] else None,
+            "remaining": len(todo) - stats["swept"] - stats["failed"],
+            "overall_risk": dict(risk_counts),
+            "out": str(out_path),
+        }
+    )
+    stats["complete"] = stats["remaining"] == 0
+    return stats
+
+
+def write_parquet(jsonl_path: Path, parquet_path: Path) -> bool:
+    """Flatten the sweep to Parquet (one column per agent). Needs pyarrow; returns False without it."""
+    pa = _maybe_load_pyarrow()
+    if pa is None:
+        return False
+    rows: List[Dict[str, Any]] = []
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            r = json.loads(line)
+            flat = {k: v for k, v in r.items() if k not in {"agents", "analysis"}}
+            flat.update({f"{a}_risk": (r.get("agents") or {}).get(a) for a in AGENTS})
+            rows.append(flat)
+    pa.parquet.write_table(pa.Table.from_pylist(rows), str(parquet_path))
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS_DIR))
+    parser.add_argument("--out", default=str(DEFAULT_SWEEP_DIR / f"sweep_{time.strftime('%G-W%V')}.jsonl"))
+    parser.add_argument("--contracts", default=None, help="file with one contract_id per line (default: whole corpus)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--model-name", default=None)
+    parser.add_argument("--budget-s", type=float, default=None, help="stop starting new contracts after this many seconds")
+    parser.add_argument("--include-analysis", action="store_true", help="store findings/evidence, not just risk levels")
+    parser.add_argument("--parquet", default=None, help="also write a Parquet copy (requires pyarrow)")
+    parser.add_argument("--fresh", action="store_true", help="discard existing output instead of resuming")
+    args = parser.parse_args()
+
+    ids = None
+    if args.contracts:
+        ids = [ln.strip() for ln in Path(args.contracts).read_text(encoding="utf-8").splitlines() if ln.strip()]
+
+    stats = sweep_portfolio(
+        Path(args.out),
+        corpus_dir=Path(args.corpus),
+        contract_ids=ids,
+        workers=args.workers,
+        model_name=args.model_name,
+        budget_s=args.budget_s,
+        include_analysis=args.include_analysis,
+        fresh=args.fresh,
+    )
+    print(
+        f"swept={stats['swept']} failed={stats['failed']} resumed={stats['resumed']} remaining={stats['remaining']} "
+        f"in {stats['seconds']:.2f}s ({(stats['contracts_per_sec'] or 0):.1f} contracts/s) -> {stats['out']}"
+    )
+    print(f"overall risk: {stats['overall_risk']}")
+    if not stats["complete"]:
+        print("budget reached; re-run the same command to resume")
+    if args.parquet:
+        if write_parquet(Path(args.out), Path(args.parquet)):
+            print(f"parquet -> {args.parquet}")
+        else:
+            print("pyarrow is not installed; skipped Parquet output")
+
+
+if __name__ == "__main__":
+    main()
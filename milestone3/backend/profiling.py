@@ -0,0 +1,242 @@
+"""On-demand profiling of single analyze requests.
+
+An admin sends `X-Profile: cpu | memory | all` with an /analyze or /analyze_text call;
+that one request runs under cProfile and/or tracemalloc and leaves, in
+outputs/profiles/ (override with CLAUSEAI_PROFILES_DIR):
+
+    <request_id>.prof   merged cProfile stats (pstats / snakeviz)
+    <request_id>.json   request info, stage timings, top functions, peak memory, top allocations
+
+CPU profiling hooks into the stage spans of metrics.py: the outermost span in each
+thread enables a per-thread cProfile.Profile, so work handed to asyncio.to_thread is
+included while other requests interleaved on the event loop are not. Memory profiling
+uses tracemalloc, which is process-wide: concurrent requests show up in its numbers.
+
+Requests without the header never reach this module.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from contract_pipeline import OUTPUTS_DIR, utc_now_iso
+from metrics import Timings
+
+
+PROFILES_DIR = OUTPUTS_DIR / "profiles"
+PROFILE_MODES = {"cpu": ("cpu",), "memory": ("memory",), "all": ("cpu", "memory"), "1": ("cpu", "memory")}
+TOP_N = 30
+
+_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+_TRACE_LOCK = threading.Lock()
+_TRACE_USERS = 0
+_TRACE_STARTED = False  # tracemalloc was started here (not via PYTHONTRACEMALLOC), so stop it when done
+
+
+def profiles_dir() -> Path:
+    return Path(os.getenv("CLAUSEAI_PROFILES_DIR", "").strip() or PROFILES_DIR)
+
+
+def valid_profile_id(profile_id: str) -> bool:
+    return bool(_ID_RE.match(profile_id or "")) and not profile_id.startswith(".")
+
+
+def new_request_id(requested: Optional[str] = None) -> str:
+    """Caller-supplied X-Request-ID when it is file-name safe, else a fresh one."""
+    rid = (requested or "").strip()
+    return rid if valid_profile_id(rid) else uuid.uuid4().hex[:16]
+
+
+class RequestProfile:
+    """Profiles one request; plugs into metrics.Timings as its `profiler`."""
+
+    def __init__(self, request_id: str, mode: str, *, info: Optional[Dict[str, Any]] = None) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; use one of: cpu, memory, all")
+        self.request_id = request_id
+        self.mode = mode
+        self.cpu = "cpu" in PROFILE_MODES[mode]
+        self.memory = "memory" in PROFILE_MODES[mode]
+        self.info = dict(info or {})
+        self._lock = threading.Lock()
+        self._profiles: Dict[int, cProfile.Profile] = {}
+        self._depth: Dict[int, int] = {}
+
+    # -- span hooks (called from metrics._span, in whichever thread runs the stage) --
+
+    def enter(self) -> None:
+        tid = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(tid, 0)
+            self._depth[tid] = depth + 1
+            if depth:
+                return
+            prof = self._profiles.get(tid)
+            if prof is None:
+                prof = self._profiles[tid] = cProfile.Profile()
+        prof.enable()
+
+    def exit(self) -> None:
+        tid = threading.get_ident()
+        with self._lock:
+            self._depth[tid] -= 1
+            if self._depth[tid]:
+                return
+            prof = self._profiles[tid]
+        prof.disable()
+
+    # -- lifecycle --
+
+    @contextmanager
+    def running(self, timings: Timings) -> Iterator["RequestProfile"]:
+        global _TRACE_USERS, _TRACE_STARTED
+        if self.cpu:
+            timings.profiler = self
+        baseline = 0
+        if self.memory:
+            with _TRACE_LOCK:
+                if _TRACE_USERS == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _TRACE_STARTED = True
+                _TRACE_USERS += 1
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            yield self
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            timings.profiler = None
+            wall_ms = (time.perf_counter() - t0) * 1000.0
+            memory: Optional[Dict[str, Any]] = None
+            if self.memory:
+                with _TRACE_LOCK:
+                    current, peak = tracemalloc.get_traced_memory()
+                    snapshot = tracemalloc.take_snapshot()
+                    _TRACE_USERS -= 1
+                    if _TRACE_USERS == 0 and _TRACE_STARTED:
+                        tracemalloc.stop()
+                        _TRACE_STARTED = False
+                memory = {
+                    "baseline_bytes": baseline,
+                    "peak_bytes": peak,
+                    "peak_above_baseline_bytes": max(0, peak - baseline),
+                    "retained_bytes": current - baseline,
+                    "top_allocations": _top_allocations(snapshot),
+                }
+            self._write(timings, wall_ms, memory, error)
+
+    def _write(self, timings: Timings, wall_ms: float, memory: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        out = profiles_dir()
+        out.mkdir(parents=True, exist_ok=True)
+        cpu: Optional[Dict[str, Any]] = None
+        if self.cpu:
+            profiles = [p for p in self._profiles.values() if p.getstats()]
+            cpu = {"file": None, "threads": len(profiles), "top_functions": []}
+            if profiles:
+                stats = pstats.Stats(profiles[0])
+                for p in profiles[1:]:
+                    stats.add(p)
+                stats.dump_stats(str(out / f"{self.request_id}.prof"))
+                cpu["file"] = f"{self.request_id}.prof"
+                cpu["top_functions"] = _top_functions(stats)
+        meta = {
+            "profile_id": self.request_id,
+            "mode": self.mode,
+            "created_at": utc_now_iso(),
+            "wall_ms": round(wall_ms, 3),
+            "error": error,
+            **self.info,
+            "timings": timings.summary(),
+            "cpu": cpu,
+            "memory": memory,
+        }
+        tmp = out / f".{self.request_id}.json.tmp"
+        tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(out / f"{self.request_id}.json")
+
+
+def _short_path(filename: str) -> str:
+    parts = Path(filename).parts
+    for marker in ("site-packages", "backend", "lib"):
+        if marker in parts:
+            return "/".join(parts[len(parts) - parts[::-1].index(marker) :])
+    return filename
+
+
+def _top_functions(stats: pstats.Stats) -> List[Dict[str, Any]]:
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:TOP_N]  # type: ignore[attr-defined]
+    return [
+        {
+            "function": f"{_short_path(file)}:{line}({func})",
+            "calls": nc,
+            "tottime_ms": round(tt * 1000.0, 3),
+            "cumtime_ms": round(ct * 1000.0, 3),
+        }
+        for (file, line, func), (_cc, nc, tt, ct, _callers) in rows
+    ]
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+    snapshot = snapshot.filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    )
+    return [
+        {"where": f"{_short_path(s.traceback[0].filename)}:{s.traceback[0].lineno}", "bytes": s.size, "blocks": s.count}
+        for s in snapshot.statistics("lineno")[:TOP_N]
+    ]
+
+
+def list_profiles(*, limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest first; summary fields only."""
+    out = []
+    for p in profiles_dir().glob("*.json"):
+        try:
+            meta = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        out.append(
+            {
+                "profile_id": meta.get("profile_id"),
+                "created_at": meta.get("created_at"),
+                "mode": meta.get("mode"),
+                "path": meta.get("path"),
+                "user": meta.get("user"),
+                "wall_ms": meta.get("wall_ms"),
+                "peak_bytes": (meta.get("memory") or {}).get("peak_bytes"),
+                "has_prof": bool((meta.get("cpu") or {}).get("file")),
+            }
+        )
+    out.sort(key=lambda m: m.get("created_at") or "", reverse=True)
+    return out[: max(1, int(limit))]
+
+
+def profile_file(profile_id: str, kind: str) -> Path:
+    """Path of an existing `<profile_id>.prof` / `.json`. Raises KeyError when absent."""
+    if kind not in {"prof", "json"} or not valid_profile_id(profile_id):
+        raise KeyError(profile_id)
+    p = profiles_dir() / f"{profile_id}.{kind}"
+    if not p.is_file():
+        raise KeyError(profile_id)
+    return p
+
+
+def profile_scope(profile: Optional[RequestProfile], timings: Optional[Timings]):
+    """`profile.running(timings)`, or a no-op for unprofiled requests."""
+    if profile is None or timings is None:
+        return nullcontext()
+    return profile.running(timings)
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import os
 import re
+import sqlite3
+import threading
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-import requests
+import httpx
+
+from contract_pipeline import OUTPUTS_DIR
+from metrics import stage, watch_cache
 
 
 BANNED_OUTPUT_TERMS = [
@@ -71,12 +80,24 @@ HEADING_FORBIDDEN_KEYWORDS = {
 }
 
 
+DEFAULT_CACHE_PATH = OUTPUTS_DIR / "qa_rewrite_cache.sqlite3"
+
+
 @dataclass(frozen=True)
 class RewriteConfig:
     provider: str
     url: Optional[str] = None
     model: Optional[str] = None
     timeout_s: float = 20.0
+    # Concurrent model calls per report (one pooled client is shared by all reports).
+    max_concurrency: int = 4
+    # SQLite cache of validated rewrites; None disables it.
+    cache_path: Optional[str] = str(DEFAULT_CACHE_PATH)
+    # Circuit breaker: after `breaker_failures` consecutive errors or calls slower than
+    # `slow_call_s`, skip the model (deterministic bullets) for `breaker_cooldown_s`.
+    slow_call_s: float = 5.0
+    breaker_failures: int = 3
+    breaker_cooldown_s: float = 60.0
 
 
 def load_rewrite_config_from_env() -> RewriteConfig:
@@ -84,7 +105,18 @@ def load_rewrite_config_from_env() -> RewriteConfig:
     url = os.getenv("QA_REWRITE_URL")
     model = os.getenv("QA_REWRITE_MODEL")
     timeout_s = float(os.getenv("QA_REWRITE_TIMEOUT_S", "20"))
-    return RewriteConfig(provider=provider, url=url, model=model, timeout_s=timeout_s)
+    cache = os.getenv("QA_REWRITE_CACHE", "").strip() or str(DEFAULT_CACHE_PATH)
+    return RewriteConfig(
+        provider=provider,
+        url=url,
+        model=model,
+        timeout_s=timeout_s,
+        max_concurrency=int(os.getenv("QA_REWRITE_MAX_CONCURRENCY", "4")),
+        cache_path=None if cache.lower() in {"0", "off", "none"} else cache,
+        slow_call_s=float(os.getenv("QA_REWRITE_SLOW_S", "5")),
+        breaker_failures=int(os.getenv("QA_REWRITE_BREAKER_FAILURES", "3")),
+        breaker_cooldown_s=float(os.getenv("QA_REWRITE_BREAKER_COOLDOWN_S", "60")),
+    )
 
 
 def _numbers_in(text: str) -> set[str]:
@@ -154,31 +186,8 @@ def _extract_text_from_response(data: Any) -> Optional[str]:
     return None
 
 
-def rewrite_clause_to_bullet(
-    *,
-    question: str,
-    heading: str,
-    clause_text: str,
-    config: RewriteConfig,
-) -> Optional[str]:
-    """Rewrite a single clause into a single clean bullet.
-
-    IMPORTANT:
-    - The clause_text is already filtered/approved by deterministic rules.
-    - The LLM is used only to simplify language, not to add information.
-    """
-
-    if config.provider in {"", "none", "off", "disabled"}:
-        return None
-
-    if config.provider != "http":
-        # Keep only HTTP provider for now to avoid heavy local deps.
-        return None
-
-    if not config.url:
-        return None
-
-    prompt = (
+def _build_prompt(*, question: str, heading: str, clause_text: str) -> str:
+    return (
         "You are rewriting contract clauses into ONE short bullet.\n"
         "Rules (STRICT):\n"
         "- Use ONLY the provided clause text.\n"
@@ -191,28 +200,8 @@ def rewrite_clause_to_bullet(
         "Return one short bullet sentence."
     )
 
-    payload: Dict[str, Any] = {
-        "prompt": prompt,
-    }
-
-    # Support Ollama-style, but keep generic.
-    if config.model:
-        payload["model"] = config.model
-
-    headers = {"Content-Type": "application/json"}
-    try:
-        resp = requests.post(config.url, data=json.dumps(payload), headers=headers, timeout=config.timeout_s)
-    except Exception:
-        return None
-
-    if resp.status_code >= 400:
-        return None
-
-    try:
-        data = resp.json()
-    except Exception:
-        data = resp.text
 
+def _candidate_from_response(data: Any, *, heading: str, clause_text: str) -> Optional[str]:
     text = _extract_text_from_response(data)
     if not text:
         return None
@@ -222,5 +211,234 @@ def rewrite_clause_to_bullet(
     if not lines:
         return None
 
-    candidate = lines[0]
-    return validate_rewrite(heading=heading, source_clause=clause_text, rewritten=candidate)
+    return validate_rewrite(heading=heading, source_clause=clause_text, rewritten=lines[0])
+
+
+class RewriteCache:
+    """Persistent (endpoint, model, heading, clause) -> validated rewrite, or None when the model's output was rejected."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        with self._con:
+            self._con.execute(
+                "CREATE TABLE IF NOT EXISTS rewrites (key TEXT PRIMARY KEY, rewritten TEXT, created_at REAL NOT NULL)"
+            )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url: Optional[str], model: Optional[str], heading: str, clause_text: str) -> str:
+        raw = "\x00".join([url or "", model or "", (heading or "").strip().lower(), " ".join((clause_text or "").split())])
+        return hashlib.sha1(raw.encode("utf-8", errors="ignore")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Optional[str]]:
+        wanted = list(dict.fromkeys(keys))
+        if not wanted:
+            return {}
+        with self._lock:
+            q = f"SELECT key, rewritten FROM rewrites WHERE key IN ({','.join('?' * len(wanted))})"
+            out = {k: v for k, v in self._con.execute(q, wanted)}
+            self.hits += len(out)
+            self.misses += len(wanted) - len(out)
+            return out
+
+    def put_many(self, items: Dict[str, Optional[str]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._con:
+            self._con.executemany(
+                "INSERT OR REPLACE INTO rewrites (key, rewritten, created_at) VALUES (?, ?, ?)",
+                [(k, v, now) for k, v in items.items()],
+            )
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open (skip calls) -> half-open (one trial call)."""
+
+    def __init__(self, *, failures: int, slow_call_s: float, cooldown_s: float) -> None:
+        self.failures = max(1, int(failures))
+        self.slow_call_s = float(slow_call_s)
+        self.cooldown_s = float(cooldown_s)
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.cooldown_s else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_s or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def abandon(self) -> None:
+        """A call was cancelled before it finished: no verdict, but free the half-open trial slot."""
+        with self._lock:
+            self._trial = False
+
+    def record(self, *, ok: bool, seconds: float) -> None:
+        with self._lock:
+            self._trial = False
+            if ok and seconds <= self.slow_call_s:
+                self._consecutive = 0
+                self._opened_at = None
+                return
+            self._consecutive += 1
+            if self._consecutive >= self.failures or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+class _RewriteClient:
+    """Owns a background event loop and one pooled httpx.AsyncClient for an endpoint."""
+
+    def __init__(self, config: RewriteConfig) -> None:
+        self.breaker = CircuitBreaker(
+            failures=config.breaker_failures, slow_call_s=config.slow_call_s, cooldown_s=config.breaker_cooldown_s
+        )
+        self._limit = max(1, int(config.max_concurrency))
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="qa-rewrite", daemon=True).start()
+        self._client = asyncio.run_coroutine_threadsafe(self._make_client(config), self._loop).result()
+
+    async def _make_client(self, config: RewriteConfig) -> httpx.AsyncClient:
+        # Room for a few reports at once; each report is capped by its own semaphore.
+        limits = httpx.Limits(max_connections=self._limit * 4, max_keepalive_connections=self._limit * 4)
+        return httpx.AsyncClient(limits=limits, timeout=config.timeout_s, headers={"Content-Type": "application/json"})
+
+    async def _call(self, config: RewriteConfig, sem: asyncio.Semaphore, question: str, heading: str, clause: str):
+        """(rewrite or None, whether the model actually answered)."""
+        async with sem:
+            if not self.breaker.allow():
+                return None, False
+            payload: Dict[str, Any] = {"prompt": _build_prompt(question=question, heading=heading, clause_text=clause)}
+            # Support Ollama-style, but keep generic.
+            if config.model:
+                payload["model"] = config.model
+            t0 = time.monotonic()
+            try:
+                resp = await self._client.post(config.url, content=json.dumps(payload), timeout=config.timeout_s)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception:
+                self.breaker.record(ok=False, seconds=time.monotonic() - t0)
+                return None, False
+            self.breaker.record(ok=resp.status_code < 500, seconds=time.monotonic() - t0)
+            if resp.status_code >= 400:
+                return None, False
+            try:
+                data = resp.json()
+            except Exception:
+                data = resp.text
+            return _candidate_from_response(data, heading=heading, clause_text=clause), True
+
+    async def _batch(self, config: RewriteConfig, question: str, items: Sequence[Tuple[str, str]], budget_s: Optional[float]):
+        sem = asyncio.Semaphore(self._limit)
+        tasks = [asyncio.ensure_future(self._call(config, sem, question, h, c)) for h, c in items]
+        done, pending = await asyncio.wait(tasks, timeout=budget_s)
+        for t in pending:
+            t.cancel()
+        return [t.result() if t in done else (None, False) for t in tasks], len(pending)
+
+    def run(self, config: RewriteConfig, question: str, items: Sequence[Tuple[str, str]], budget_s: Optional[float] = None):
+        """([(rewrite, answered)], calls cut off by `budget_s`)."""
+        return asyncio.run_coroutine_threadsafe(self._batch(config, question, items, budget_s), self._loop).result()
+
+
+_CLIENTS: Dict[Tuple[Any, ...], _RewriteClient] = {}
+_CACHES: Dict[str, RewriteCache] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _client_for(config: RewriteConfig) -> _RewriteClient:
+    key = (config.url, config.max_concurrency, config.timeout_s, config.slow_call_s, config.breaker_failures, config.breaker_cooldown_s)
+    with _REGISTRY_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = _CLIENTS[key] = _RewriteClient(config)
+        return client
+
+
+def _cache_for(config: RewriteConfig) -> Optional[RewriteCache]:
+    if not config.cache_path:
+        return None
+    with _REGISTRY_LOCK:
+        cache = _CACHES.get(config.cache_path)
+        if cache is None:
+            cache = _CACHES[config.cache_path] = RewriteCache(Path(config.cache_path))
+            watch_cache("qa_rewrite", lambda: (cache.hits, cache.misses))
+        return cache
+
+
+def rewrite_bullets(
+    *,
+    question: str,
+    items: Sequence[Tuple[str, str]],
+    config: RewriteConfig,
+    budget_s: Optional[float] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Optional[str]]:
+    """Rewrite many (heading, clause_text) pairs; None where the deterministic bullet should stay.
+
+    Cached clauses never reach the model. The rest are sent concurrently (at most
+    `config.max_concurrency` in flight) over a pooled connection; once the circuit
+    breaker opens, remaining clauses fall back immediately. Calls still running after
+    `budget_s` are cancelled. `stats`, if given, receives sent/cached/timed_out counts.
+    """
+
+    if config.provider != "http" or not config.url or not items:
+        # Keep only HTTP provider for now to avoid heavy local deps.
+        return [None] * len(items)
+
+    cache = _cache_for(config)
+    keys = [RewriteCache.key(config.url, config.model, h, c) for h, c in items]
+    known: Dict[str, Optional[str]] = cache.get_many(keys) if cache is not None else {}
+
+    todo: Dict[str, Tuple[str, str]] = {}
+    for k, item in zip(keys, items):
+        if k not in known:
+            todo.setdefault(k, item)
+    timed_out = 0
+    if todo:
+        with stage("llm_rewrite"):
+            results, timed_out = _client_for(config).run(config, question, list(todo.values()), budget_s)
+        answered = {k: text for k, (text, ok) in zip(todo, results) if ok}
+        known.update({k: text for k, (text, _ok) in zip(todo, results)})
+        if cache is not None:
+            cache.put_many(answered)
+    if stats is not None:
+        stats.update({"sent": len(todo), "cached": len(set(keys)) - len(todo), "timed_out": timed_out})
+    return [known.get(k) for k in keys]
+
+
+def rewrite_clause_to_bullet(
+    *,
+    question: str,
+    heading: str,
+    clause_text: str,
+    config: RewriteConfig,
+) -> Optional[str]:
+    """Rewrite a single clause into a single clean bullet.
+
+    IMPORTANT:
+    - The clause_text is already filtered/approved by deterministic rules.
+    - The LLM is used only to simplify language, not to add information.
+    """
+
+    if config.provider in {"", "none", "off", "disabled"}:
+        return None
+    return rewrite_bullets(question=question, items=[(heading, clause_text)], config=config)[0]
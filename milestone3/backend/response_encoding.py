@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import gzip
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from starlette.responses import Response
+
+
+def _maybe_load_orjson():
+    try:
+        import orjson  # type: ignore
+
+        return orjson
+    except Exception:
+        return None
+
+
+def _maybe_load_brotli():
+    try:
+        import brotli  # type: ignore
+
+        return brotli
+    except Exception:
+        return None
+
+
+_ORJSON = _maybe_load_orjson()
+_BROTLI = _maybe_load_brotli()
+
+COMPACT_ENCODING = "chunk-table-v1"
+
+# Responses smaller than this are sent uncompressed (compression overhead > savings).
+MIN_COMPRESS_BYTES = 1024
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes; orjson when installed, stdlib otherwise."""
+    if _ORJSON is not None:
+        try:
+            return _ORJSON.dumps(payload, option=_ORJSON.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            # e.g. non-str dict keys; stdlib handles these.
+            pass
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+_MISSING = object()
+
+
+def project_fields(payload: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Keep only the requested dotted paths, e.g. ["report", "analysis.overall_risk"].
+
+    Unknown paths are ignored. An empty selection returns the payload unchanged.
+    """
+
+    paths = [p.strip() for p in fields if (p or "").strip()]
+    if not paths:
+        return payload
+
+    out: Dict[str, Any] = {}
+    for path in paths:
+        parts = path.split(".")
+        src: Any = payload
+        for part in parts:
+            if not isinstance(src, dict) or part not in src:
+                src = _MISSING
+                break
+            src = src[part]
+        if src is _MISSING:
+            continue
+        dst = out
+        for part in parts[:-1]:
+            nxt = dst.get(part)
+            if not isinstance(nxt, dict):
+                nxt = {}
+                dst[part] = nxt
+            dst = nxt
+        dst[parts[-1]] = src
+    return out
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    return [f.strip() for f in (fields or "").split(",") if f.strip()]
+
+
+def compact_payload(payload: Dict[str, Any], *, min_len: int = 64) -> Dict[str, Any]:
+    """Emit each long text once in a top-level `chunks` table and reference it by index.
+
+    Retrieved chunk text shows up many times per response (key evidence, per-agent
+    per-query matches, evidence lists), often as a prefix or clause-level slice of the
+    same chunk. Strings >= `min_len` chars become `{"$chunk": i}` when identical to a
+    table entry, or `{"$chunk": i, "start": s, "end": e}` when they are a slice of one.
+    `expand_payload` reverses the encoding.
+    """
+
+    strings: Dict[str, None] = {}
+
+    def collect(v: Any) -> None:
+        if isinstance(v, str):
+            if len(v) >= min_len:
+                strings[v] = None
+        elif isinstance(v, dict):
+            for x in v.values():
+                collect(x)
+        elif isinstance(v, list):
+            for x in v:
+                collect(x)
+
+    collect(payload)
+
+    # Longest first, so prefixes/slices resolve against the fullest text available.
+    table: List[str] = []
+    refs: Dict[str, Dict[str, int]] = {}
+    for s in sorted(strings, key=len, reverse=True):
+        for i, parent in enumerate(table):
+            start = parent.find(s)
+            if start >= 0:
+                refs[s] = {"$chunk": i, "start": start, "end": start + len(s)}
+                break
+        else:
+            refs[s] = {"$chunk": len(table)}
+            table.append(s)
+
+    def encode(v: Any) -> Any:
+        if isinstance(v, str):
+            ref = refs.get(v)
+            return dict(ref) if ref is not None else v
+        if isinstance(v, dict):
+            return {k: encode(x) for k, x in v.items()}
+        if isinstance(v, list):
+            return [encode(x) for x in v]
+        return v
+
+    body = encode(payload)
+    body["chunks"] = table
+    body["encoding"] = COMPACT_ENCODING
+    return body
+
+
+def expand_payload(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of `compact_payload`."""
+    if (body or {}).get("encoding") != COMPACT_ENCODING:
+        return body
+    table: List[str] = list(body.get("chunks") or [])
+
+    def decode(v: Any) -> Any:
+        if isinstance(v, dict):
+            if "$chunk" in v and set(v) <= {"$chunk", "start", "end"}:
+                text = table[int(v["$chunk"])]
+                if "start" in v:
+                    return text[int(v["start"]) : int(v["end"])]
+                return text
+            return {k: decode(x) for k, x in v.items()}
+        if isinstance(v, list):
+            return [decode(x) for x in v]
+        return v
+
+    out = {k: decode(v) for k, v in body.items() if k not in {"chunks", "encoding"}}
+    return out
+
+
+def _qvalue(params: str) -> float:
+    for param in params.split(";"):
+        key, _, value = param.partition("=")
+        if key.strip() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    """True if `coding` is acceptable: its own entry wins over `*`, and q=0 means refused."""
+    exact: Optional[float] = None
+    wildcard: Optional[float] = None
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip()
+        if name == coding:
+            exact = _qvalue(params)
+        elif name == "*":
+            wildcard = _qvalue(params)
+    q = exact if exact is not None else wildcard
+    return q is not None and q > 0
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br (when the brotli package is installed) over gzip; None for identity."""
+    if _BROTLI is not None and _accepts(accept_encoding, "br"):
+        return "br"
+    if _accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, coding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    if coding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if coding == "br" and _BROTLI is not None:
+        return _BROTLI.compress(body, quality=5), "br"
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+
+def json_response(
+    payload: Dict[str, Any],
+    *,
+    accept_encoding: str = "",
+    compact: bool = False,
+    fields: Optional[str] = None,
+) -> Response:
+    """Project -> (optionally) compact -> fast JSON -> negotiated compression."""
+
+    selected = parse_fields(fields)
+    if selected:
+        payload = project_fields(payload, selected)
+    if compact:
+        payload = compact_payload(payload)
+
+    body, coding = compress(dumps(payload), negotiate_encoding(accept_encoding))
+    headers = {"Vary": "Accept-Encoding"}
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
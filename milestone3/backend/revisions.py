@@ -0,0 +1,188 @@
+"""Revision-aware indexing of uploaded contracts.
+
+Uploads that opt in to revision tracking (or name a previous version) are indexed with
+content-defined chunks and stored under outputs/revisions/<owner>/<contract_id>/
+(LocalRAGIndex artifacts + lineage in meta.json; see owner_root); other uploads keep the
+standard chunk_text index. A new upload that names its previous
+version reuses that version's embeddings for every chunk whose text is unchanged, so a
+redline re-embeds only the chunks around the edit, and gets a clause-level diff against it.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from contract_pipeline import (
+    OUTPUTS_DIR,
+    LocalRAGIndex,
+    _split_into_clause_candidates,
+    chunk_hash,
+    content_defined_chunks,
+    utc_now_iso,
+)
+from metrics import timed
+
+
+REVISIONS_DIR = OUTPUTS_DIR / "revisions"
+
+
+@dataclass
+class RevisionResult:
+    rag: LocalRAGIndex
+    contract_id: str
+    previous_contract_id: Optional[str]
+    version: int
+    chunks_total: int
+    chunks_reused: int
+    chunks_embedded: int
+    diff: List[Dict[str, Any]] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "contract_id": self.contract_id,
+            "previous_contract_id": self.previous_contract_id,
+            "version": self.version,
+            "chunks_total": self.chunks_total,
+            "chunks_reused": self.chunks_reused,
+            "chunks_embedded": self.chunks_embedded,
+            "diff": self.diff,
+        }
+
+
+def owner_root(owner_email: str, root: Path = REVISIONS_DIR) -> Path:
+    """Per-user revisions root: one user's contract ids never resolve to another's uploads."""
+    return Path(root) / hashlib.sha256(owner_email.strip().lower().encode("utf-8")).hexdigest()[:24]
+
+
+def revision_dir(contract_id: str, root: Path = REVISIONS_DIR) -> Path:
+    safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in contract_id)
+    return Path(root) / safe
+
+
+def load_revision_meta(contract_id: str, root: Path = REVISIONS_DIR) -> Optional[Dict[str, Any]]:
+    p = revision_dir(contract_id, root) / "meta.json"
+    if not p.exists():
+        return None
+    return json.loads(p.read_text(encoding="utf-8"))
+
+
+def _load_rag(contract_id: str, *, embedder: LocalRAGIndex, root: Path) -> Optional[LocalRAGIndex]:
+    try:
+        # Not memory-mapped: the same directory may be rewritten below.
+        return LocalRAGIndex.load(revision_dir(contract_id, root), embedder=embedder)
+    except (FileNotFoundError, ValueError):
+        # Missing, or built with another embedder: nothing reusable.
+        return None
+
+
+def clause_diff(old_text: str, new_text: str) -> List[Dict[str, Any]]:
+    """Clause-level changes from old to new: added / removed / modified, in document order."""
+
+    old = _split_into_clause_candidates(old_text)
+    new = _split_into_clause_candidates(new_text)
+    sm = difflib.SequenceMatcher(None, [c.lower() for c in old], [c.lower() for c in new], autojunk=False)
+    out: List[Dict[str, Any]] = []
+    for op, a0, a1, b0, b1 in sm.get_opcodes():
+        if op == "equal":
+            continue
+        if op == "replace":
+            # Pair clauses positionally; any surplus on either side is a pure add/remove.
+            for i in range(max(a1 - a0, b1 - b0)):
+                a, b = a0 + i, b0 + i
+                if a < a1 and b < b1:
+                    out.append({"change": "modified", "old_index": a, "new_index": b, "old": old[a], "new": new[b]})
+                elif a < a1:
+                    out.append({"change": "removed", "old_index": a, "old": old[a]})
+                else:
+                    out.append({"change": "added", "new_index": b, "new": new[b]})
+        elif op == "delete":
+            out += [{"change": "removed", "old_index": a, "old": old[a]} for a in range(a0, a1)]
+        else:
+            out += [{"change": "added", "new_index": b, "new": new[b]} for b in range(b0, b1)]
+    return out
+
+
+@timed("index_revision")
+def index_revision(
+    contract_text: str,
+    *,
+    contract_id: str,
+    previous_contract_id: Optional[str] = None,
+    model_name: Optional[str] = None,
+    embedder: Optional[LocalRAGIndex] = None,
+    root: Path = REVISIONS_DIR,
+    persist: bool = True,
+) -> RevisionResult:
+    """Index one upload, reusing embeddings from itself or its previous version.
+
+    With `persist`, the index is stored (atomically) so later uploads can name it as their
+    previous version. Raises KeyError if `previous_contract_id` has never been stored.
+    """
+
+    root = Path(root)
+    if embedder is None:
+        embedder = LocalRAGIndex(model_name=model_name or os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"))
+    previous_contract_id = previous_contract_id if previous_contract_id != contract_id else None
+    prev_meta = load_revision_meta(previous_contract_id, root) if previous_contract_id else None
+    if previous_contract_id and prev_meta is None:
+        raise KeyError(previous_contract_id)
+
+    # The same text uploaded again reuses its own index; a revision reuses its parent's.
+    own_meta = load_revision_meta(contract_id, root)
+    sources = [contract_id] if own_meta else []
+    if previous_contract_id:
+        sources.append(previous_contract_id)
+    reuse: Dict[str, np.ndarray] = {}
+    prev_rag: Optional[LocalRAGIndex] = None
+    for cid in sources:
+        loaded = _load_rag(cid, embedder=embedder, root=root)
+        if loaded is None or loaded.vectors is None:
+            continue
+        if cid == previous_contract_id:
+            prev_rag = loaded
+        for chunk, vec in zip(loaded.chunks, loaded.vectors):
+            reuse.setdefault(chunk_hash(chunk), vec)
+
+    chunks = content_defined_chunks(contract_text)
+    rag = LocalRAGIndex.sharing_model(embedder)
+    embedded = rag.build_from_chunks(chunks, reuse=reuse)
+
+    if own_meta and not embedded and (previous_contract_id or None) in {None, own_meta.get("previous_contract_id")}:
+        # Re-upload of an already indexed text: keep its stored lineage.
+        previous_contract_id = own_meta.get("previous_contract_id")
+        version = int(own_meta.get("version") or 1)
+    else:
+        version = int((prev_meta or {}).get("version") or 0) + 1
+    if persist and (own_meta is None or embedded or version != own_meta.get("version")):
+        rag.save(
+            revision_dir(contract_id, root),
+            meta={
+                "contract_id": contract_id,
+                "previous_contract_id": previous_contract_id,
+                "version": version,
+                "model_name": rag.model_name,
+                "created_at": utc_now_iso(),
+            },
+        )
+
+    diff: List[Dict[str, Any]] = []
+    if prev_rag is not None:
+        diff = clause_diff(" ".join(prev_rag.chunks), " ".join(chunks))
+    return RevisionResult(
+        rag=rag,
+        contract_id=contract_id,
+        previous_contract_id=previous_contract_id,
+        version=version,
+        chunks_total=len(chunks),
+        chunks_reused=len(chunks) - embedded,
+        chunks_embedded=embedded,
+        diff=diff,
+    )
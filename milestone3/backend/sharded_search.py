@@ -0,0 +1,236 @@
+"""Exact (brute-force) top-k over the whole corpus, sharded across cores.
+
+The corpus vectors are the per-contract `vectors.npy` files written by LocalRAGIndex.save
+(via bulk_ingest.py). They are memory-mapped, not copied: each worker process maps the
+files of its shard, so the OS page cache is the shared memory between workers. A query
+batch is scored shard-by-shard in parallel and the per-shard top-k lists are merged.
+
+    cd milestone3/backend
+    python sharded_search.py "uncapped liability" --k 10 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import heapq
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bulk_ingest import DEFAULT_CORPUS_DIR, artifact_dir, load_manifest
+from contract_pipeline import LocalRAGIndex
+
+
+# (path, first row in file, end row in file, global row of the first row)
+Segment = Tuple[str, int, int, int]
+
+
+def _open(path: str, _cache: Dict[str, np.ndarray] = {}) -> np.ndarray:  # noqa: B006 - per-process map cache
+    arr = _cache.get(path)
+    if arr is None:
+        arr = np.load(path, mmap_mode="r")
+        _cache[path] = arr
+    return arr
+
+
+def _merge_topk(a_scores: np.ndarray, a_rows: np.ndarray, b_scores: np.ndarray, b_rows: np.ndarray, k: int):
+    scores = np.concatenate([a_scores, b_scores], axis=1)
+    rows = np.concatenate([a_rows, b_rows], axis=1)
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        rows = np.take_along_axis(rows, part, axis=1)
+    return scores, rows
+
+
+def score_shard(
+    segments: Sequence[Segment],
+    queries: np.ndarray,
+    k: int,
+    block_rows: int = 65_536,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k cosine scores and global row ids for one shard. Runs inside a worker.
+
+    Scores match `cosine_sim_matrix` (rows are re-normalized), and memory is bounded by
+    `block_rows x n_queries` regardless of shard size.
+    """
+
+    q = np.asarray(queries, dtype=np.float32)
+    q = q / (np.linalg.norm(q, axis=1, keepdims=True) + 1e-12)
+    best_s = np.empty((q.shape[0], 0), dtype=np.float32)
+    best_r = np.empty((q.shape[0], 0), dtype=np.int64)
+    buf: List[np.ndarray] = []
+    buf_rows: List[np.ndarray] = []
+    buffered = 0
+
+    def flush() -> None:
+        nonlocal best_s, best_r, buffered
+        if not buf:
+            return
+        block = np.concatenate(buf) if len(buf) > 1 else buf[0]
+        ids = np.concatenate(buf_rows) if len(buf_rows) > 1 else buf_rows[0]
+        buf.clear()
+        buf_rows.clear()
+        buffered = 0
+        sims = (q @ block.T) / (np.linalg.norm(block, axis=1) + 1e-12)[None, :]
+        rows = np.broadcast_to(ids, sims.shape)
+        if sims.shape[1] > k:
+            part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            sims = np.take_along_axis(sims, part, axis=1)
+            rows = np.take_along_axis(rows, part, axis=1)
+        best_s, best_r = _merge_topk(best_s, best_r, sims, np.asarray(rows), k)
+
+    # Small per-contract files are coalesced into ~block_rows blocks before scoring.
+    for path, start, end, global_start in segments:
+        mat = _open(path)
+        for a in range(start, end, block_rows):
+            b = min(end, a + block_rows)
+            buf.append(np.asarray(mat[a:b], dtype=np.float32))
+            buf_rows.append(np.arange(global_start + (a - start), global_start + (b - start)))
+            buffered += b - a
+            if buffered >= block_rows:
+                flush()
+    flush()
+    order = np.argsort(-best_s, axis=1, kind="stable")
+    return np.take_along_axis(best_s, order, axis=1), np.take_along_axis(best_r, order, axis=1)
+
+
+def partition(files: Sequence[Tuple[str, int]], n_shards: int) -> List[List[Segment]]:
+    """Split (path, n_rows) files into `n_shards` row-balanced shards (files may be cut)."""
+
+    total = sum(n for _, n in files)
+    n_shards = max(1, min(int(n_shards), total or 1))
+    target = -(-total // n_shards)
+    shards: List[List[Segment]] = [[]]
+    filled = 0
+    global_row = 0
+    for path, n in files:
+        pos = 0
+        while pos < n:
+            if filled >= target and len(shards) < n_shards:
+                shards.append([])
+                filled = 0
+            take = min(n - pos, target - filled) if len(shards) < n_shards else n - pos
+            shards[-1].append((path, pos, pos + take, global_row))
+            pos += take
+            filled += take
+            global_row += take
+    return [s for s in shards if s]
+
+
+class ShardedExactSearch:
+    """Exact top-k over many memory-mapped vector files using a pool of workers."""
+
+    def __init__(
+        self,
+        files: Sequence[Tuple[str, int]],
+        *,
+        workers: Optional[int] = None,
+        shards: Optional[int] = None,
+        backend: str = "process",
+        labels: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.files = [(str(p), int(n)) for p, n in files]
+        self.n_rows = sum(n for _, n in self.files)
+        self.workers = max(0, int(os.cpu_count() or 1) if workers is None else int(workers))
+        self.shards = partition(self.files, shards or max(1, self.workers))
+        self.backend = backend
+        # Row -> (file label, row within file) for result lookup.
+        self.labels = list(labels) if labels is not None else [p for p, _ in self.files]
+        self._starts = np.cumsum([0] + [n for _, n in self.files])[:-1].tolist()
+        self._pool: Optional[Executor] = None
+
+    @classmethod
+    def from_corpus(cls, corpus_dir: Path = DEFAULT_CORPUS_DIR, **kwargs) -> "ShardedExactSearch":
+        manifest = load_manifest(corpus_dir)
+        contract_ids = sorted(
+            {f["contract_id"] for f in manifest["files"].values() if f.get("status") == "ok" and f.get("contract_id")}
+        )
+        files: List[Tuple[str, int]] = []
+        labels: List[str] = []
+        for cid in contract_ids:
+            p = artifact_dir(corpus_dir, cid) / "vectors.npy"
+            n = int(np.load(p, mmap_mode="r").shape[0])
+            if n:
+                files.append((str(p), n))
+                labels.append(cid)
+        return cls(files, labels=labels, **kwargs)
+
+    def _executor(self) -> Optional[Executor]:
+        if self.workers <= 1:
+            return None
+        if self._pool is None:
+            if self.backend == "thread":
+                # numpy releases the GIL in matmul, so threads also scale for this workload.
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="clauseai-exact")
+            else:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __enter__(self) -> "ShardedExactSearch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def search(self, queries: np.ndarray, *, k: int = 10) -> List[List[Tuple[float, int]]]:
+        """Exact top-k (score, global row) per query, best first."""
+
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = max(1, min(int(k), self.n_rows))
+        if self.n_rows == 0:
+            return [[] for _ in range(q.shape[0])]
+
+        pool = self._executor()
+        if pool is None:
+            parts = [score_shard(s, q, k) for s in self.shards]
+        else:
+            parts = list(pool.map(score_shard, self.shards, [q] * len(self.shards), [k] * len(self.shards)))
+
+        out: List[List[Tuple[float, int]]] = []
+        for i in range(q.shape[0]):
+            # Each shard's list is already sorted: a k-way heap merge is enough.
+            streams = [zip((-s[i]).tolist(), r[i].tolist()) for s, r in parts]
+            out.append([(-neg, row) for neg, row in heapq.nsmallest(k, heapq.merge(*streams))])
+        return out
+
+    def locate(self, row: int) -> Tuple[str, int]:
+        """Global row -> (label, row within its file); label is the contract_id for from_corpus."""
+        f = bisect.bisect_right(self._starts, int(row)) - 1
+        return self.labels[f], int(row) - int(self._starts[f])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", nargs="+")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS_DIR))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--backend", choices=["process", "thread"], default="process")
+    args = parser.parse_args()
+
+    corpus = Path(args.corpus)
+    with ShardedExactSearch.from_corpus(corpus, workers=args.workers, backend=args.backend) as engine:
+        rag = LocalRAGIndex(model_name=os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"))
+        t0 = time.perf_counter()
+        results = engine.search(rag.encode(args.query, normalize_embeddings=True), k=args.k)
+        print(f"{engine.n_rows} rows, {len(engine.shards)} shards, {time.perf_counter() - t0:.3f}s")
+        for text, hits in zip(args.query, results):
+            print(f"\n{text!r}")
+            for score, row in hits:
+                cid, chunk = engine.locate(row)
+                print(f"  {score:.4f}  {cid}  chunk {chunk}")
+
+
+if __name__ == "__main__":
+    main()
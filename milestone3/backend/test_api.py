@@ -38,6 +38,12 @@ def _post(file_bytes: bytes, filename: str, question: str, tone: str = "executiv
     )
 
 
+@pytest.fixture(autouse=True)
+def _scratch_revisions_dir(tmp_path, monkeypatch):
+    # Uploads that opt in to revision tracking must not land in the real outputs/revisions.
+    monkeypatch.setenv("CLAUSEAI_REVISIONS_DIR", str(tmp_path / "revisions"))
+
+
 @pytest.fixture(scope="session")
 def sample_bytes() -> bytes:
     return _load_sample_contract_bytes()
@@ -328,3 +334,1225 @@ def test_contract_id_override(sample_bytes: bytes):
     )
     assert r.status_code == 200
     assert r.json().get("contract_id") == "uploaded_contract"
+
+
+def test_login_throttled_per_account_after_repeated_failures():
+    email = f"throttle_{time.time_ns()}@example.com"
+    r = client.post("/auth/register", json={"email": email, "password": "pass1234", "name": "Throttle"})
+    assert r.status_code == 200
+
+    statuses = [
+        client.post("/auth/login", json={"email": email, "password": "wrong-pass"}).status_code for _ in range(6)
+    ]
+    assert statuses[:5] == [401] * 5
+    assert statuses[5] == 429
+
+
+def test_ip_throttle_counts_failures_only_and_honours_trusted_proxies(monkeypatch):
+    import app as app_module
+    from password_hashing import AttemptThrottle
+
+    monkeypatch.setattr(app_module, "IP_THROTTLE", AttemptThrottle(max_attempts=2, window_s=60))
+    email = f"ipthrottle_{time.time_ns()}@example.com"
+    assert client.post("/auth/register", json={"email": email, "password": "pass1234", "name": "Ip"}).status_code == 200
+    good = {"email": email, "password": "pass1234"}
+    assert [client.post("/auth/login", json=good).status_code for _ in range(3)] == [200] * 3
+
+    def fail(**kw):
+        bad = {"email": f"nobody_{time.time_ns()}@example.com", "password": "wrong-pass"}
+        return client.post("/auth/login", json=bad, **kw).status_code
+
+    # Behind a trusted proxy, each forwarded client has its own window.
+    monkeypatch.setenv("CLAUSEAI_TRUSTED_PROXIES", "testclient")
+    a, b = {"X-Forwarded-For": "203.0.113.7"}, {"X-Forwarded-For": "198.51.100.1, 203.0.113.9"}
+    assert [fail(headers=a), fail(headers=a), fail(headers=a), fail(headers=b)] == [401, 401, 429, 401]
+    assert fail() == 401 and fail() == 401 and fail() == 401  # proxy without a forwarded address: no IP key
+
+    monkeypatch.delenv("CLAUSEAI_TRUSTED_PROXIES")
+    assert [fail(), fail(), fail()] == [401, 401, 429]
+    assert client.post("/auth/login", json=good).status_code == 429
+
+
+def test_hash_timeout_answers_503(monkeypatch):
+    from concurrent.futures import Future
+    import functools
+
+    import db_sqlite
+    import password_hashing
+
+    monkeypatch.setattr(password_hashing, "submit_hash", lambda *a, **kw: Future())
+    monkeypatch.setattr(db_sqlite, "hash_password", functools.partial(password_hashing.hash_password, timeout_s=0.01))
+    body = {"email": f"slowhash_{time.time_ns()}@example.com", "password": "pass1234", "name": "Slow"}
+    r = client.post("/auth/register", json=body)
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+
+
+def test_login_transparently_rehashes_to_new_iteration_count(monkeypatch):
+    import db_sqlite
+
+    email = f"rehash_{time.time_ns()}@example.com"
+    monkeypatch.setenv("CLAUSEAI_PBKDF2_ITERATIONS", "1000")
+    r = client.post("/auth/register", json={"email": email, "password": "pass1234", "name": "Rehash"})
+    assert r.status_code == 200
+
+    monkeypatch.setenv("CLAUSEAI_PBKDF2_ITERATIONS", "2000")
+    r = client.post("/auth/login", json={"email": email, "password": "pass1234"})
+    assert r.status_code == 200
+
+    iterations = None
+    for _ in range(50):
+        with db_sqlite._connect() as con:
+            iterations = con.execute("SELECT password_iterations FROM users WHERE email = ?", (email,)).fetchone()[0]
+        if iterations == 2000:
+            break
+        time.sleep(0.05)
+    assert iterations == 2000
+
+    # Old password still works against the upgraded hash.
+    r = client.post("/auth/login", json={"email": email, "password": "pass1234"})
+    assert r.status_code == 200
+    metrics = client.get("/auth/hash_metrics", headers={"Authorization": f"Bearer {r.json()['token']}"}).json()
+    assert metrics["metrics"]["completed"] >= 3
+
+
+def test_history_server_side_filters_and_keyset_pagination():
+    email = f"history_{time.time_ns()}@example.com"
+    client.post("/auth/register", json={"email": email, "password": "pass1234", "name": "History"})
+    token = client.post("/auth/login", json={"email": email, "password": "pass1234"}).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    saved = []
+    for i in range(5):
+        payload = {
+            "mode": "ask" if i % 2 == 0 else "analysis",
+            "question": f"Question number {i}",
+            "filenames": [f"vendor_{i}.pdf"],
+            "results": [{"filename": f"vendor_{i}.pdf", "report": "Liability is uncapped" if i == 3 else "Net 30 payment"}],
+        }
+        saved.append(client.post("/history/save", json=payload, headers=headers).json()["id"])
+
+    # Keyset pages cover every run exactly once, newest first.
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/history", params=params, headers=headers).json()
+        seen.extend(r["id"] for r in page["runs"])
+        cursor = page.get("next_cursor")
+        if not cursor:
+            break
+    assert seen == list(reversed(saved))
+
+    runs = client.get("/history", params={"mode": "ask", "limit": 50}, headers=headers).json()["runs"]
+    assert [r["id"] for r in runs] == [saved[4], saved[2], saved[0]]
+
+    runs = client.get("/history", params={"q": "uncap"}, headers=headers).json()["runs"]
+    assert [r["id"] for r in runs] == [saved[3]]
+
+    runs = client.get("/history", params={"filename": "vendor_1"}, headers=headers).json()["runs"]
+    assert [r["id"] for r in runs] == [saved[1]]
+
+    runs = client.get("/history", params={"date_to": "2000-01-01"}, headers=headers).json()["runs"]
+    assert runs == []
+
+    client.delete(f"/history/{saved[3]}", headers=headers)
+    assert client.get("/history", params={"q": "uncapped"}, headers=headers).json()["runs"] == []
+    assert client.get("/history", params={"cursor": "nope"}, headers=headers).status_code == 400
+
+
+def test_history_search_without_fts_matches_report_text(monkeypatch, tmp_path):
+    import db_sqlite
+
+    monkeypatch.setattr(db_sqlite, "DB_PATH", tmp_path / "nofts.sqlite3")
+    monkeypatch.setattr(db_sqlite, "_FTS_AVAILABLE", False)
+    email = "nofts@example.com"
+    report = "Liability is uncapped for confidentiality breach. " + "Padding text. " * 400  # large -> compressed field
+    ids = [
+        db_sqlite.save_analysis_run(
+            user_email=email, mode="analysis", question=f"q{i}", tone="executive", run_all_agents=False,
+            no_evidence_threshold=0.25, filenames=[f"f{i}.txt"], results=[{"report": text}],
+        )
+        for i, text in enumerate([report, "Net 30 payment"])
+    ]
+    hits = db_sqlite.search_analysis_runs(user_email=email, q="uncapped confidentiality")["runs"]
+    assert [r["id"] for r in hits] == [ids[0]]
+    assert db_sqlite.get_analysis_run(user_email=email, run_id=ids[0])["results"][0]["report"] == report
+
+    # Legacy inline runs still match on results_json and report a ratio like normalized ones.
+    with db_sqlite._connect() as con:
+        legacy = con.execute(
+            """
+            INSERT INTO analysis_runs(user_email, created_at, mode, question, tone, no_evidence_threshold, files_json, results_json)
+            VALUES (?, '2024-01-01T00:00:00Z', 'analysis', 'old', 'executive', 0.25, '[]', ?)
+            """,
+            (email, '[{"report": "Legacy indemnity clause"}]'),
+        ).lastrowid
+        con.commit()
+    assert [r["id"] for r in db_sqlite.search_analysis_runs(user_email=email, q="indemnity")["runs"]] == [legacy]
+    for run_id in (legacy, ids[0]):
+        assert db_sqlite.analysis_run_size_report(user_email=email, run_id=run_id)["ratio"] > 0
+
+
+def test_history_results_are_normalized_compressed_and_lazy(sample_bytes: bytes):
+    email = f"storage_{time.time_ns()}@example.com"
+    client.post("/auth/register", json={"email": email, "password": "pass1234", "name": "Storage"})
+    token = client.post("/auth/login", json={"email": email, "password": "pass1234"}).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    analysis = client.post(
+        "/analyze",
+        files={"file": ("contract.txt", sample_bytes, "text/plain")},
+        data={"question": "Provide a risk analysis of payment terms", "include_agent_analysis": "true"},
+    ).json()
+    results = [{**analysis, "filename": "contract.txt"}, {"filename": "second.txt", "report": "short"}]
+    run_id = client.post(
+        "/history/save",
+        json={"mode": "analysis", "question": "q", "filenames": ["contract.txt", "second.txt"], "results": results},
+        headers=headers,
+    ).json()["id"]
+
+    full = client.get(f"/history/{run_id}", headers=headers).json()["run"]
+    assert full["results"][0]["report"] == analysis["report"]
+    assert full["results"][0]["analysis"] == analysis["analysis"]
+
+    light = client.get(f"/history/{run_id}", params={"lazy": "true"}, headers=headers).json()["run"]
+    assert "agent_analysis" not in light["results"][0]
+    assert "agent_analysis" in light["results"][0]["_lazy_fields"]
+    assert light["results"][1]["report"] == "short"
+
+    one = client.get(f"/history/{run_id}/results/1", headers=headers).json()["result"]
+    assert one == results[1]
+    field = client.get(f"/history/{run_id}/results/0/agent_analysis", headers=headers).json()
+    assert field["value"] == analysis["agent_analysis"]
+    assert client.get(f"/history/{run_id}/results/0/nope", headers=headers).status_code == 404
+
+    import db_sqlite
+
+    with db_sqlite._connect() as con:
+        con.execute(
+            "UPDATE analysis_run_fields SET data = ? WHERE run_id = ? AND position = 0 AND field = 'agent_analysis'",
+            (b"\x00corrupt", run_id),
+        )
+    r = client.get(f"/history/{run_id}/results/0/agent_analysis", headers=headers)
+    assert r.status_code == 410 and "unavailable" in r.json()["detail"].lower()
+
+    size = client.get(f"/history/{run_id}/size", headers=headers).json()["size"]
+    assert size["after_bytes"] < size["before_bytes"]
+
+
+def test_agent_analysis_summary_by_default_full_on_request(sample_bytes: bytes):
+    data = {
+        "question": "Provide a risk analysis",
+        "tone": "executive",
+        "no_evidence_threshold": "0.25",
+        "intent_override": "risk_analysis",
+        "run_all_agents": "true",
+    }
+    files = {"file": ("contract.txt", sample_bytes, "text/plain")}
+    summary = client.post("/analyze", files=files, data=data).json()
+    full = client.post("/analyze", files=files, data={**data, "include_agent_analysis": "true"}).json()
+    none = client.post("/analyze", files=files, data={**data, "agent_detail": "none"}).json()
+
+    assert summary["agent_analysis"]["detail"] == "summary"
+    assert "retrieval" not in summary["agent_analysis"]["legal"]
+    assert full["agent_analysis"]["legal"]["retrieval"]["per_query"]
+    for agent in ("legal", "compliance", "finance", "operations"):
+        assert summary["agent_analysis"][agent]["risk_level"] == full["agent_analysis"][agent]["risk_level"]
+        assert summary["confidence"]["per_agent"][agent] == pytest.approx(full["confidence"]["per_agent"][agent])
+    assert set(none["agent_analysis"]) == {"selected_agents", "detail"}
+    assert summary["report"] == full["report"] == none["report"]
+    assert "evidence" not in summary["agent_analysis"]["legal"]
+
+
+def test_high_risk_evidence_is_kept_at_the_default_agent_detail(monkeypatch, tmp_path, sample_bytes: bytes):
+    import asyncio
+
+    import contract_pipeline
+
+    monkeypatch.setattr(contract_pipeline, "MEMORY_DIR", tmp_path)
+    text = sample_bytes.decode("utf-8", errors="ignore")
+    runs = {
+        detail: asyncio.run(
+            contract_pipeline.run_full_pipeline(
+                contract_text=text, question="Provide a risk analysis", contract_id=f"hre_{detail}",
+                **({} if detail == "default" else {"agent_detail": detail}),
+            )
+        )[0]
+        for detail in ("default", "full")
+    }
+    assert runs["default"]["agent_analysis"]["detail"] == "summary"
+    assert runs["default"]["high_risk_evidence"]
+    assert runs["default"]["high_risk_evidence"] == runs["full"]["high_risk_evidence"]
+
+
+def test_analyze_compact_encoding_roundtrip_and_field_projection(sample_bytes: bytes):
+    from response_encoding import compact_payload, expand_payload
+
+    data = {"question": "Provide a risk analysis", "run_all_agents": "true", "include_agent_analysis": "true"}
+    files = {"file": ("contract.txt", sample_bytes, "text/plain")}
+    plain = client.post("/analyze", files=files, data=data)
+    compact = client.post("/analyze", files=files, data={**data, "compact": "true"})
+    assert compact.status_code == 200
+    body = compact.json()
+    assert body["encoding"] == "chunk-table-v1" and body["chunks"]
+    assert len(compact.content) < len(plain.content)
+
+    expected = plain.json()
+    got = expand_payload(body)
+    for key in ("analysis", "qa", "report"):
+        assert got[key] == expected[key]
+    assert expand_payload(compact_payload(expected)) == expected
+
+    projected = client.post("/analyze", files=files, data={**data, "fields": "report,analysis.overall_risk"}).json()
+    assert set(projected) == {"report", "analysis"}
+    assert projected["analysis"] == {"overall_risk": expected["analysis"]["overall_risk"]}
+
+    gz = client.post("/analyze", files=files, data=data, headers={"Accept-Encoding": "gzip"})
+    assert gz.headers.get("content-encoding") == "gzip"
+    assert gz.json()["report"] == expected["report"]
+
+    from response_encoding import negotiate_encoding
+
+    for header in ("gzip;q=0", "gzip; q=0.0", "*;q=0", "*, gzip;q=0", "identity"):
+        assert negotiate_encoding(header) is None, header
+    for header in ("gzip;q=0.5", "*;q=0, gzip", "deflate, *"):
+        assert negotiate_encoding(header) in {"gzip", "br"}, header
+    refused = client.post("/analyze", files=files, data=data, headers={"Accept-Encoding": "gzip;q=0"})
+    assert refused.headers.get("content-encoding") is None
+
+
+def test_bulk_ingest_is_incremental_and_artifacts_load(tmp_path, sample_bytes: bytes):
+    from bulk_ingest import artifact_dir, ingest_corpus, load_manifest
+    from contract_pipeline import LocalRAGIndex
+
+    src = tmp_path / "contracts"
+    src.mkdir()
+    (src / "a.txt").write_bytes(sample_bytes)
+    (src / "b.txt").write_text("4. Liability: Liability is uncapped for all claims.", encoding="utf-8")
+    out = tmp_path / "corpus"
+
+    first = ingest_corpus(src, corpus_dir=out, workers=0, log=lambda *_: None)
+    assert first["ingested"] == 2 and first["skipped"] == 0 and first["chunks"] > 0
+
+    (src / "b.txt").write_text("4. Liability: Liability is capped at fees paid.", encoding="utf-8")
+    second = ingest_corpus(src, corpus_dir=out, workers=0, log=lambda *_: None)
+    assert second["ingested"] == 1 and second["skipped"] == 1
+
+    entry = load_manifest(out)["files"]["a.txt"]
+    rag = LocalRAGIndex.load(artifact_dir(out, entry["contract_id"]))
+    assert len(rag.chunks) == entry["n_chunks"]
+    assert rag.query("late fees interest", top_k=1)
+
+
+def test_bulk_reingest_of_an_edited_file_drops_its_previous_version(tmp_path, sample_bytes: bytes):
+    import sqlite3
+
+    from bulk_ingest import artifact_dir, ingest_corpus, load_manifest
+    from clause_lsh import lsh_db_path
+    from facts_store import facts_db_path
+
+    src, out = tmp_path / "contracts", tmp_path / "corpus"
+    src.mkdir()
+    (src / "a.txt").write_bytes(sample_bytes)
+    (src / "b.txt").write_text("4. Liability: Liability is uncapped for all claims. Payment within 30 days.", encoding="utf-8")
+    ingest_corpus(src, corpus_dir=out, workers=0, log=lambda *_: None)
+    old_cid = load_manifest(out)["files"]["b.txt"]["contract_id"]
+
+    (src / "b.txt").write_text("4. Liability: Liability is capped at fees paid. Payment within 45 days.", encoding="utf-8")
+    ingest_corpus(src, corpus_dir=out, workers=0, log=lambda *_: None)
+    cids = {f["contract_id"] for f in load_manifest(out)["files"].values()}
+    assert old_cid not in cids and not artifact_dir(out, old_cid).exists()
+
+    def contract_ids(db, sql):
+        with sqlite3.connect(db) as con:
+            return {r[0] for r in con.execute(sql)}
+
+    assert contract_ids(facts_db_path(out), "SELECT contract_id FROM contracts") == cids
+    assert contract_ids(facts_db_path(out), "SELECT DISTINCT contract_id FROM contract_facts") <= cids
+    assert old_cid not in contract_ids(lsh_db_path(out), "SELECT DISTINCT contract_id FROM lsh_occurrences")
+
+
+def test_corpus_ann_search_filters_and_matches_exact(tmp_path, monkeypatch, sample_bytes: bytes):
+    import numpy as np
+
+    from bulk_ingest import artifact_dir, ingest_corpus
+    from corpus_index import CorpusIndex, evaluate_recall
+
+    src = tmp_path / "contracts"
+    src.mkdir()
+    (src / "a.txt").write_bytes(sample_bytes)
+    (src / "b.txt").write_text("4. Liability: Liability is uncapped for all claims.", encoding="utf-8")
+    (src / "c.txt").write_text("5. SLA: Uptime commitment is 99.5% with service credits.", encoding="utf-8")
+    out = tmp_path / "corpus"
+    ingest_corpus(src, corpus_dir=out, workers=0, model_name="acme/contract-minilm", log=lambda *_: None)
+
+    monkeypatch.setenv("EMBEDDING_MODEL_NAME", "some/other-model")  # build-time env must not leak into meta
+    for _ in range(2):  # saving over an existing index swaps it in whole
+        index = CorpusIndex.build(out, nlist=2)
+        index.save()
+    assert sorted(p.name for p in out.iterdir() if p.name.startswith(".ann")) == []
+    index = CorpusIndex.load(out)
+    assert index.meta["model_name"] == "acme/contract-minilm"
+    queries = index.encode(["late fees interest", "uncapped liability", "uptime service credits"])
+    rows = evaluate_recall(index, queries, k=3, nprobes=[index.meta["nlist"]])
+    assert rows[-1]["recall_at_k"] == 1.0  # probing every list is exact
+
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(out))
+    email = f"search_{time.time_ns()}@example.com"
+    client.post("/auth/register", json={"email": email, "password": "pass1234", "name": "Search"})
+    token = client.post("/auth/login", json={"email": email, "password": "pass1234"}).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    r = client.post("/search", json={"query": "uncapped liability", "top_k": 3}, headers=headers)
+    assert r.status_code == 200
+    matches = r.json()["matches"]
+    assert matches and "uncapped" in matches[0]["text"].lower()
+
+    only = matches[-1]["contract_id"]
+    r = client.post("/search", json={"query": "uncapped liability", "contract_ids": [only]}, headers=headers)
+    assert {m["contract_id"] for m in r.json()["matches"]} == {only}
+
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(tmp_path / "missing"))
+    assert client.post("/search", json={"query": "x"}, headers=headers).status_code == 404
+
+    for cid in index.contract_ids:
+        np.save(artifact_dir(out, cid) / "vectors.npy", np.zeros((0, index.vectors.shape[1]), dtype=np.float32))
+    with pytest.raises(ValueError, match="no vectors to index"):
+        CorpusIndex.build(out)
+
+
+def test_sharded_exact_search_matches_cosine_sim_matrix(tmp_path):
+    import numpy as np
+
+    from contract_pipeline import cosine_sim_matrix
+    from sharded_search import ShardedExactSearch
+
+    rng = np.random.default_rng(0)
+    files, mats = [], []
+    for i, n in enumerate([7, 1, 23, 12]):
+        v = rng.standard_normal((n, 16)).astype(np.float32)
+        np.save(tmp_path / f"{i}.npy", v)
+        files.append((str(tmp_path / f"{i}.npy"), n))
+        mats.append(v)
+    mat = np.concatenate(mats)
+    queries = rng.standard_normal((5, 16)).astype(np.float32)
+
+    with ShardedExactSearch(files, workers=2, shards=3, backend="thread") as engine:
+        got = engine.search(queries, k=4)
+    for q, hits in zip(queries, got):
+        expected = np.argsort(-cosine_sim_matrix(q, mat))[:4].tolist()
+        assert [row for _, row in hits] == expected
+    assert engine.locate(8) == (files[2][0], 0)
+
+
+def test_portfolio_sweep_streams_jsonl_and_resumes(tmp_path, sample_bytes: bytes):
+    import json
+
+    from bulk_ingest import ingest_corpus
+    from portfolio_sweep import corpus_contracts, sweep_portfolio
+
+    src = tmp_path / "contracts"
+    src.mkdir()
+    (src / "a.txt").write_bytes(sample_bytes)
+    (src / "b.txt").write_text("4. Liability: Liability is uncapped for all claims.", encoding="utf-8")
+    corpus = tmp_path / "corpus"
+    ingest_corpus(src, corpus_dir=corpus, workers=0, log=lambda *_: None)
+    ids = list(corpus_contracts(corpus))
+    out = tmp_path / "sweep.jsonl"
+
+    first = sweep_portfolio(out, corpus_dir=corpus, contract_ids=ids[:1], workers=0, log=lambda *_: None)
+    assert first["swept"] == 1 and first["complete"]
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"contract_id": "torn')  # simulate a kill mid-write
+
+    second = sweep_portfolio(out, corpus_dir=corpus, workers=0, log=lambda *_: None)
+    assert second["resumed"] == 1 and second["swept"] == 1 and second["complete"]
+    rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert sorted(r["contract_id"] for r in rows) == sorted(ids)
+    assert all(set(r["agents"]) == {"legal", "compliance", "finance", "operations"} for r in rows)
+    assert all(r["overall_risk"] in {"low", "medium", "high", "unknown"} for r in rows)
+
+
+def test_clause_facts_extracted_at_ingest_drive_risk_scoring(tmp_path, sample_bytes: bytes):
+    from bulk_ingest import ingest_corpus
+    from contract_pipeline import LocalRAGIndex, build_executive_report_data, extract_clause_facts
+    from facts_store import facts_db_path, get_contract_facts
+    from portfolio_sweep import corpus_contracts, sweep_one
+
+    text = sample_bytes.decode("utf-8")
+    facts = extract_clause_facts(text)
+    by_kind = {f.fact: f for f in facts}
+    assert by_kind["payment_days"].value_num == 15
+    assert (by_kind["late_fee_pct"].value_num, by_kind["late_fee_pct"].unit) == (1.5, "per_month")
+    assert by_kind["uptime_pct"].value_num == 99.9
+    assert by_kind["liability_cap"].value_text == "capped_with_exceptions"
+    for f in facts:
+        assert f.evidence.split()[-1] in text[f.start : f.end]
+
+    rag = LocalRAGIndex()
+    rag.build(text)
+    agents = ["legal", "compliance", "finance", "operations"]
+    retrieved = build_executive_report_data(contract_text=text, rag=rag, selected_agents=agents)
+    from_facts = build_executive_report_data(contract_text=text, rag=rag, selected_agents=agents, facts=facts)
+    assert retrieved == from_facts
+
+    # Several payment clauses: facts quote the ones retrieval ranks first, not the first in the document.
+    from benchmarks.synthetic_contracts import generate_contract
+
+    long_text = generate_contract(3, seed=1)
+    long_rag = LocalRAGIndex()
+    long_rag.build(long_text)
+    long_facts = extract_clause_facts(long_text)
+    first_in_doc = next(f.evidence for f in long_facts if f.fact == "payment_days")
+    ranked = build_executive_report_data(contract_text=long_text, rag=long_rag, selected_agents=agents)
+    assert ranked["finance"]["evidence"][0] != first_in_doc
+    assert build_executive_report_data(contract_text=long_text, rag=long_rag, selected_agents=agents, facts=long_facts) == ranked
+
+    src = tmp_path / "contracts"
+    src.mkdir()
+    (src / "a.txt").write_bytes(sample_bytes)
+    corpus = tmp_path / "corpus"
+    stats = ingest_corpus(src, corpus_dir=corpus, workers=0, log=lambda *_: None)
+    assert stats["facts"] == len(facts)
+    cid = next(iter(corpus_contracts(corpus)))
+    assert [f.fact for f in get_contract_facts(facts_db_path(corpus), cid)] == [f.fact for f in facts]
+    row = sweep_one(cid, corpus_dir=str(corpus), model_name="hashing")
+    assert row["from_facts"] and row["overall_risk"] == retrieved["overall_risk"]
+
+
+def test_facts_query_filters_sorts_and_aggregates_across_contracts(tmp_path, monkeypatch, sample_bytes: bytes):
+    from bulk_ingest import ingest_corpus
+
+    src = tmp_path / "contracts"
+    src.mkdir()
+    (src / "net15.txt").write_bytes(sample_bytes)
+    (src / "net45.txt").write_text(
+        "1. Payment Terms: Customer will pay within 45 days of invoice.\n"
+        "2. Liability: Liability is uncapped for all claims.\n"
+        "3. SLA: Uptime commitment is 99.0% monthly.\n"
+        "4. Late Fees: Overdue amounts accrue interest at 12% per annum.",
+        encoding="utf-8",
+    )
+    corpus = tmp_path / "corpus"
+    ingest_corpus(src, corpus_dir=corpus, workers=0, log=lambda *_: None)
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(corpus))
+
+    email = f"facts_{time.time_ns()}@example.com"
+    client.post("/auth/register", json={"email": email, "password": "pass1234", "name": "Facts"})
+    token = client.post("/auth/login", json={"email": email, "password": "pass1234"}).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    r = client.post("/facts/query", json={"filters": [{"fact": "payment_days", "op": "lte", "value": 15}]}, headers=headers)
+    assert r.status_code == 200
+    j = r.json()
+    assert j["total"] == 1 and j["contracts"][0]["source"] == "net15.txt"
+    ev = j["contracts"][0]["facts"][0]
+    assert ev["value"] == 15 and "15" in ev["evidence"] and ev["end"] > ev["start"]
+
+    r = client.post(
+        "/facts/query",
+        json={
+            "filters": [{"fact": "uptime_pct", "op": "lt", "value": 99.5}, {"fact": "liability_cap", "op": "eq", "value": "uncapped"}],
+        },
+        headers=headers,
+    )
+    assert [c["source"] for c in r.json()["contracts"]] == ["net45.txt"]
+
+    r = client.post("/facts/query", json={"sort": "payment_days", "order": "desc", "aggregate": ["payment_days", "liability_cap"]}, headers=headers)
+    j = r.json()
+    assert [c["sort_value"] for c in j["contracts"]] == [45, 15]
+    assert (j["aggregations"]["payment_days"]["min"], j["aggregations"]["payment_days"]["max"]) == (15, 45)
+    assert {b["value"] for b in j["aggregations"]["liability_cap"]["by_value"]} == {"uncapped", "capped_with_exceptions"}
+
+    # Numbers sent as strings compare numerically, alone or mixed with text values.
+    for flt, expected in (
+        ({"fact": "payment_days", "op": "eq", "value": "45"}, ["net45.txt"]),
+        ({"fact": "payment_days", "op": "ne", "value": " 45 "}, ["net15.txt"]),
+        ({"fact": "payment_days", "op": "in", "value": ["15", "upon receipt"]}, ["net15.txt"]),
+    ):
+        r = client.post("/facts/query", json={"filters": [flt]}, headers=headers)
+        assert [c["source"] for c in r.json()["contracts"]] == expected, flt
+
+    # Late fees compare as a monthly rate: 12% per annum is 1% a month, below 1.5% per month.
+    r = client.post("/facts/query", json={"filters": [{"fact": "late_fee_pct", "op": "gt", "value": 1.2}]}, headers=headers)
+    assert [c["source"] for c in r.json()["contracts"]] == ["net15.txt"]
+    r = client.post("/facts/query", json={"filters": [{"fact": "late_fee_pct", "op": "lte", "value": 1}]}, headers=headers)
+    ev = r.json()["contracts"][0]["facts"][0]
+    assert [c["source"] for c in r.json()["contracts"]] == ["net45.txt"]
+    assert ev["value"] == 1.0 and ev["unit"] == "per_month"
+
+    assert client.post("/facts/query", json={"filters": [{"fact": "nope"}]}, headers=headers).status_code == 400
+
+
+def test_compare_aligns_topics_and_reports_risk_deltas(tmp_path, monkeypatch, sample_bytes: bytes):
+    import contract_compare
+    from bulk_ingest import ingest_corpus
+    from portfolio_sweep import corpus_contracts
+
+    text = sample_bytes.decode("utf-8")
+    src = tmp_path / "contracts"
+    src.mkdir()
+    (src / "template.txt").write_bytes(sample_bytes)
+    (src / "precedent.txt").write_text(text + "\n", encoding="utf-8")
+    (src / "draft.txt").write_text(
+        "1. Payment Terms: Customer will pay within 45 days of invoice.\n"
+        "2. Liability: Liability is uncapped for all claims.\n"
+        "3. SLA: Uptime commitment is 99.0% monthly.",
+        encoding="utf-8",
+    )
+    corpus = tmp_path / "corpus"
+    ingest_corpus(src, corpus_dir=corpus, workers=0, log=lambda *_: None)
+    ids = {source: cid for cid, source in corpus_contracts(corpus).items()}
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(corpus))
+
+    loads = []
+    real_get = contract_compare.get_contract_facts
+    monkeypatch.setattr(contract_compare, "get_contract_facts", lambda db, cid: loads.append(cid) or real_get(db, cid))
+
+    email = f"compare_{time.time_ns()}@example.com"
+    client.post("/auth/register", json={"email": email, "password": "pass1234", "name": "Compare"})
+    token = client.post("/auth/login", json={"email": email, "password": "pass1234"}).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    body = {"contract_ids": [ids["template.txt"], ids["draft.txt"], ids["precedent.txt"]]}
+    r = client.post("/compare", json=body, headers=headers)
+    assert r.status_code == 200
+    j = r.json()
+    assert sorted(loads) == sorted(body["contract_ids"])
+    assert j["reference"] == ids["template.txt"]
+
+    topics = {t["topic"]: {c["contract_id"]: c for c in t["comparisons"]} for t in j["topics"]}
+    draft = topics["payment"][ids["draft.txt"]]
+    assert draft["value"] == 45 and draft["value_delta"] == 30 and not draft["identical"]
+    assert topics["liability"][ids["draft.txt"]]["value"] == "uncapped"
+    assert all(t[ids["precedent.txt"]]["identical"] for t in topics.values())
+
+    deltas = {d["contract_id"]: d for d in j["risk_deltas"]}
+    assert deltas[ids["precedent.txt"]]["overall"]["delta"] == 0
+    assert deltas[ids["draft.txt"]]["agents"]["legal"]["other"] == "high"
+
+    r = client.post("/compare", json={"contract_ids": [ids["template.txt"], "nope"]}, headers=headers)
+    assert r.status_code == 404
+
+
+def test_revision_upload_reuses_embeddings_and_diffs_clauses(tmp_path, monkeypatch):
+    monkeypatch.setenv("CLAUSEAI_REVISIONS_DIR", str(tmp_path / "revisions"))
+    clauses = [
+        f"{i}. Section {i}: The Supplier shall deliver deliverable {i} within {10 + i} days of the order and "
+        f"maintain records of item {i} for audit by the Customer during the term of this agreement."
+        for i in range(1, 121)
+    ]
+    v1 = "\n".join(clauses)
+    clauses[59] = "60. Payment Terms: Customer shall pay undisputed invoices within 90 days of receipt."
+    v2 = "\n".join(clauses)
+    body = {"question": "What are the payment terms?", "intent_override": "fact_summary"}
+    headers = {}
+    for who in ("owner", "other"):
+        email = f"rev_{who}_{time.time_ns()}@example.com"
+        client.post("/auth/register", json={"email": email, "password": "pass1234", "name": who})
+        token = client.post("/auth/login", json={"email": email, "password": "pass1234"}).json()["token"]
+        headers[who] = {"Authorization": f"Bearer {token}"}
+
+    untracked = client.post("/analyze_text", json={**body, "contract_text": v1 + "\n121. Draft."})
+    assert untracked.status_code == 200 and untracked.json()["revision"] is None
+    assert not (tmp_path / "revisions").exists()
+    # Tracking stores the caller's contract text, so it needs a login.
+    assert client.post("/analyze_text", json={**body, "contract_text": v1, "track_revisions": True}).status_code == 401
+
+    r1 = client.post("/analyze_text", json={**body, "contract_text": v1, "track_revisions": True}, headers=headers["owner"])
+    assert r1.status_code == 200
+    rev1 = r1.json()["revision"]
+    assert rev1["version"] == 1 and rev1["chunks_reused"] == 0 and rev1["chunks_embedded"] == rev1["chunks_total"]
+
+    # Another user can neither diff against nor overwrite the owner's stored revision.
+    stolen = {**body, "contract_text": "1. Draft.", "previous_contract_id": rev1["contract_id"]}
+    assert client.post("/analyze_text", json=stolen).status_code == 401
+    assert client.post("/analyze_text", json=stolen, headers=headers["other"]).status_code == 404
+    clobber = {**body, "contract_text": v2, "contract_id": rev1["contract_id"], "track_revisions": True}
+    assert client.post("/analyze_text", json=clobber, headers=headers["other"]).json()["revision"]["version"] == 1
+
+    r2 = client.post(
+        "/analyze_text",
+        json={**body, "contract_text": v2, "previous_contract_id": rev1["contract_id"]},
+        headers=headers["owner"],
+    )
+    assert r2.status_code == 200
+    rev2 = r2.json()["revision"]
+    assert rev2["version"] == 2 and rev2["previous_contract_id"] == rev1["contract_id"]
+    assert rev2["contract_id"] != rev1["contract_id"]
+    assert 1 <= rev2["chunks_embedded"] <= 3 < rev2["chunks_total"] - 3
+    assert [d["change"] for d in rev2["diff"]] == ["modified"]
+    assert "90 days" in rev2["diff"][0]["new"] and "Section 60" in rev2["diff"][0]["old"]
+
+    # Same text again: nothing re-embedded, lineage kept.
+    r3 = client.post("/analyze_text", json={**body, "contract_text": v2, "track_revisions": True}, headers=headers["owner"])
+    assert r3.json()["revision"]["chunks_embedded"] == 0 and r3.json()["revision"]["version"] == 2
+
+    r4 = client.post(
+        "/analyze_text",
+        json={**body, "contract_text": v2, "previous_contract_id": "uploaded_missing"},
+        headers=headers["owner"],
+    )
+    assert r4.status_code == 404
+    owners = list((tmp_path / "revisions").iterdir())
+    assert len(owners) == 2
+    stored = sorted(p.name for o in owners for p in o.iterdir())
+    assert stored == sorted([rev1["contract_id"], rev1["contract_id"], rev2["contract_id"]])  # no staging leftovers
+
+
+def test_embedding_cache_dedups_chunks_across_contracts_with_lru(tmp_path, sample_bytes: bytes):
+    import numpy as np
+
+    from bulk_ingest import artifact_dir, ingest_corpus
+    from embedding_cache import EmbeddingCache
+    from portfolio_sweep import corpus_contracts
+
+    cache = EmbeddingCache(tmp_path / "lru", embedder_name="unit", dim=4, capacity=3)
+    cache.put_many(["a", "b", "c"], np.eye(4, dtype=np.float32)[:3])
+    assert set(cache.get_many(["a", "c"])) == {"a", "c"}
+    cache.put_many(["d"], np.ones((1, 4), dtype=np.float32))  # evicts "b", the least recently used
+    reopened = EmbeddingCache(tmp_path / "lru", embedder_name="unit", dim=4, capacity=99)
+    got = reopened.get_many(["a", "b", "c", "d"])
+    assert sorted(got) == ["a", "c", "d"] and reopened.capacity == 3
+    assert np.array_equal(got["d"], np.ones(4, dtype=np.float32))
+
+    text = sample_bytes.decode("utf-8")
+    src = tmp_path / "contracts"
+    src.mkdir()
+    (src / "a.txt").write_text(text * 3, encoding="utf-8")
+    (src / "b.txt").write_text(text * 3 + "\n99. Notices: by email.", encoding="utf-8")
+    quiet = {"workers": 0, "log": lambda *_: None}
+    plain = ingest_corpus(src, corpus_dir=tmp_path / "plain", **quiet)
+    cached = ingest_corpus(src, corpus_dir=tmp_path / "cached", embedding_cache_dir=tmp_path / "cache", **quiet)
+    assert plain["embedded"] == plain["chunks"] and plain["dedup_ratio"] == 0
+    assert cached["chunks"] == plain["chunks"] and cached["embedded"] < plain["embedded"]
+    assert cached["dedup_ratio"] > 0.3
+    for cid in corpus_contracts(tmp_path / "plain"):
+        a = np.load(artifact_dir(tmp_path / "plain", cid) / "vectors.npy")
+        b = np.load(artifact_dir(tmp_path / "cached", cid) / "vectors.npy")
+        assert np.allclose(a, b)
+
+
+def test_near_duplicate_clauses_report_seen_in(tmp_path, monkeypatch, sample_bytes: bytes):
+    from bulk_ingest import ingest_corpus
+    from clause_lsh import find_near_duplicates, lsh_db_path
+    from contract_pipeline import extract_clause_facts
+
+    text = sample_bytes.decode("utf-8")
+    src = tmp_path / "contracts"
+    src.mkdir()
+    for i, days in enumerate([15, 30, 45]):
+        (src / f"v{i}.txt").write_text(text.replace("15", str(days)) + f"\nVendor ref {i}.", encoding="utf-8")
+    corpus = tmp_path / "corpus"
+    stats = ingest_corpus(src, corpus_dir=corpus, workers=0, log=lambda *_: None)
+    assert 0 < stats["new_clauses"] < stats["facts"]  # numbers differ, masked clause text does not
+    db = lsh_db_path(corpus)
+
+    draft = text.replace("15", "60")
+    facts_by_text = {f.evidence for f in extract_clause_facts(draft)}
+    matches = find_near_duplicates(db, list(facts_by_text))
+    assert matches and all(m.seen_in == 3 for m in matches.values())
+    assert not find_near_duplicates(db, ["Either party may assign this agreement to a lender as collateral."])
+
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(corpus))
+    monkeypatch.setenv("CLAUSEAI_REVISIONS_DIR", str(tmp_path / "revisions"))
+    body = {"contract_text": draft, "question": "Give me a risk analysis", "run_all_agents": True}
+    j = client.post("/analyze_text", json=body).json()
+    nd = j["near_duplicates"]
+    assert nd == {"statements_checked": len(facts_by_text), "seen_before": len(matches)}
+    seen = [e for e in j["analysis"]["key_evidence"] if "seen_in" in e]
+    assert seen and all(e["seen_in"] == 3 for e in seen)
+    assert not any("seen_in_examples" in e for e in seen)  # corpus ids stay private on an open endpoint
+
+    # A broken clause index only drops the annotation; the analysis still succeeds.
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    lsh_db_path(broken).write_bytes(b"not a sqlite database" * 100)
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(broken))
+    r = client.post("/analyze_text", json=body)
+    assert r.status_code == 200 and r.json()["near_duplicates"] is None
+
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(tmp_path / "empty"))
+    plain = client.post("/analyze_text", json=body).json()
+    assert plain["near_duplicates"] is None
+    strip = lambda ev: [{k: v for k, v in e.items() if not k.startswith("seen_in")} for e in ev]
+    assert strip(j["analysis"].pop("key_evidence")) == strip(plain["analysis"].pop("key_evidence"))
+    assert j["analysis"] == plain["analysis"]
+
+
+def test_near_duplicate_differing_in_topic_keyword_keeps_own_classification(tmp_path, monkeypatch):
+    from clause_lsh import NearDuplicateLookup, lsh_db_path, replace_many_contract_clauses
+    from contract_pipeline import extract_clause_facts
+
+    seen = (
+        "Security: Provider shall maintain administrative, physical and technical safeguards for Customer Data consistent with "
+        "industry standards, shall keep those safeguards in place for the full term of this Agreement and any transition period, "
+        "and shall permit Customer to conduct audits of such safeguards once per contract year at Customer's own cost and expense."
+    )
+    draft = seen.replace("conduct audits of", "conduct reviews of")
+    corpus = tmp_path / "corpus"
+    replace_many_contract_clauses(lsh_db_path(corpus), [("seen", extract_clause_facts(seen))])
+
+    facts = extract_clause_facts(draft)
+    lookup = NearDuplicateLookup(lsh_db_path(corpus), exclude_contract="draft")
+    lookup(facts)
+    (match,) = lookup.matches.values()
+    assert ("audit_rights", "compliance") in match.kinds
+    assert [(f.fact, f.topic) for f in facts] == [("compliance", "compliance")]
+
+    body = {"contract_text": draft, "question": "Give me a risk analysis", "run_all_agents": True}
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(corpus))
+    j = client.post("/analyze_text", json=body).json()
+    assert j["near_duplicates"] == {"statements_checked": 1, "seen_before": 1}
+    monkeypatch.setenv("CLAUSEAI_CORPUS_DIR", str(tmp_path / "empty"))
+    plain = client.post("/analyze_text", json=body).json()
+    strip = lambda ev: [{k: v for k, v in e.items() if not k.startswith("seen_in")} for e in ev]
+    assert strip(j["analysis"].pop("key_evidence")) == strip(plain["analysis"].pop("key_evidence"))
+    assert j["analysis"] == plain["analysis"]
+
+
+def test_batching_encoder_coalesces_concurrent_calls_and_matches_direct():
+    import threading
+
+    import numpy as np
+
+    from contract_pipeline import LocalRAGIndex
+    from embedding_service import attach_batching
+
+    rag = LocalRAGIndex(model_name="__hashing__")
+    calls = []
+    direct = rag.encode_direct
+
+    def slow_encode(texts, *, normalize_embeddings=True):
+        calls.append(len(texts))
+        time.sleep(0.01)
+        return direct(texts, normalize_embeddings=normalize_embeddings)
+
+    rag.encode_direct = slow_encode
+    service = attach_batching(rag, max_batch=64, max_wait_ms=5)
+    try:
+        texts = [f"termination notice clause {i}" for i in range(24)]
+        out = [None] * len(texts)
+
+        def worker(i):
+            out[i] = rag.encode([texts[i]])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert all(o.shape == (1, 384) for o in out)
+        assert np.allclose(np.vstack(out), direct(texts), atol=1e-6)
+        assert len(calls) < len(texts) and service.stats["requests"] == len(texts)
+        # Indexes built from the shared embedder go through the same service.
+        assert LocalRAGIndex.sharing_model(rag).encode_service is service
+    finally:
+        service.close()
+    assert rag.encode(["after close"]).shape == (1, 384)
+
+
+def test_onnx_encoder_mean_pools_in_input_order_and_plugs_into_rag(monkeypatch, tmp_path):
+    from types import SimpleNamespace
+
+    import numpy as np
+
+    from contract_pipeline import LocalRAGIndex
+    from onnx_embedder import OnnxSentenceEncoder
+
+    class FakeTokenizer:
+        def encode_batch(self, texts):
+            width = max(len(t.split()) for t in texts)
+            out = []
+            for t in texts:
+                n = len(t.split())
+                ids = [len(w) for w in t.split()] + [0] * (width - n)
+                out.append(SimpleNamespace(ids=ids, attention_mask=[1] * n + [0] * (width - n), type_ids=[0] * width))
+            return out
+
+    class FakeSession:
+        def get_inputs(self):
+            return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+        def run(self, _outputs, feeds):
+            ids = feeds["input_ids"].astype(np.float32)
+            return [np.stack([ids, np.ones_like(ids)], axis=-1)]  # hidden = (token id, 1)
+
+    enc = OnnxSentenceEncoder(FakeSession(), FakeTokenizer(), model_name="mini", quantized=True, batch_size=2)
+    texts = ["aaaa bb", "c", "dd dd dd", "eee"]
+    vecs = enc.encode(texts, normalize_embeddings=False)
+    # Padding tokens are masked out of the mean; rows come back in input order.
+    assert np.allclose(vecs, [[3, 1], [1, 1], [2, 1], [3, 1]])
+    assert np.allclose(np.linalg.norm(enc.encode(texts), axis=1), 1.0)
+    assert enc.embedder_name == "onnx-int8:mini"
+
+    monkeypatch.setattr("onnx_embedder.load_onnx_encoder", lambda _d: enc)
+    monkeypatch.setenv("CLAUSEAI_ONNX_MODEL_DIR", str(tmp_path))
+    rag = LocalRAGIndex()
+    assert rag.model is enc and rag.embedder_name == "onnx-int8:mini"
+    monkeypatch.undo()
+    # A directory without a loadable model falls back like a missing torch install.
+    monkeypatch.setenv("CLAUSEAI_ONNX_MODEL_DIR", str(tmp_path / "missing"))
+    assert LocalRAGIndex().embedder_name == "hashing"
+
+
+def test_vector_store_backends_agree_on_filtered_namespaced_queries(tmp_path):
+    import json as _json
+
+    import numpy as np
+
+    from vector_store import (
+        MEMORY_NAMESPACE,
+        MemoryVectorStore,
+        MmapVectorStore,
+        PineconeHTTPStore,
+        PineconeIndexAdapter,
+        SqliteVectorStore,
+        VectorStore,
+        serve,
+    )
+
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((300, 16)).astype(np.float32)
+    recs = [{"id": f"v{i}", "values": vecs[i], "metadata": {"contract_id": f"c{i % 3}", "n": i}} for i in range(300)]
+    server = serve(MemoryVectorStore(16), port=0)
+    stores = {
+        "memory": MemoryVectorStore(16),
+        "mmap": MmapVectorStore(tmp_path / "mmap", 16),
+        "sqlite": SqliteVectorStore(tmp_path / "v.sqlite3", 16),
+        "http": PineconeHTTPStore(f"http://127.0.0.1:{server.server_address[1]}", dim=16),
+    }
+    flt = {"$or": [{"contract_id": "c1"}, {"n": {"$gte": 290}}], "n": {"$ne": 1}}
+    results = {}
+    try:
+        for name, store in stores.items():
+            assert store.upsert(recs[:200]) == 200 and store.upsert(recs[200:]) == 100
+            store.upsert([("m1", vecs[1], {"contract_id": "c1", "agent_type": "legal"})], namespace=MEMORY_NAMESPACE)
+            got = store.query_many(vecs[:4], top_k=5, filter=flt)
+            assert all(matches and all(m.metadata["contract_id"] == "c1" or m.metadata["n"] >= 290 for m in matches) for matches in got)
+            assert store.delete(["v4"]) == 1 and store.count() == 300 and store.count(MEMORY_NAMESPACE) == 1
+            results[name] = [[m.id for m in ms] for ms in got] + [[m.id for m in store.query(vecs[4], top_k=2)]]
+        assert len({repr(r) for r in results.values()}) == 1
+        assert "v4" not in results["memory"][-1] and "v1" not in sum(results["memory"][:4], [])
+
+        # Persistent backends reopen with the same content; sqlite sees other connections' writes.
+        stores["sqlite"].upsert([("late", vecs[0], {})])
+        for reopened in (MmapVectorStore(tmp_path / "mmap", 16), SqliteVectorStore(tmp_path / "v.sqlite3", 16)):
+            assert reopened.query(vecs[7], top_k=1)[0].id == "v7"
+            assert reopened.count(MEMORY_NAMESPACE) == 1 and "v4" not in [m.id for m in reopened.query(vecs[4], top_k=3)]
+        assert SqliteVectorStore(tmp_path / "v.sqlite3", 16).count() == 301
+        log = next((tmp_path / "mmap").glob("*/records.jsonl"))
+        with open(log, "a", encoding="utf-8") as f:
+            f.write(_json.dumps({"id": "bad", "row": 9999}) + "\n")
+        with pytest.raises(ValueError, match="corrupt record log"):
+            MmapVectorStore(tmp_path / "mmap", 16)
+        with pytest.raises(TypeError):
+            VectorStore()
+
+        # Notebook-style pinecone Index calls.
+        index = PineconeIndexAdapter(stores["memory"])
+        resp = index.query(vector=vecs[1].tolist(), top_k=1, namespace=MEMORY_NAMESPACE, filter={"agent_type": {"$eq": "legal"}}, include_metadata=True)
+        assert resp["matches"][0]["id"] == "m1" and resp["matches"][0]["metadata"]["contract_id"] == "c1"
+    finally:
+        server.shutdown()
+
+
+def test_qa_rewrites_run_concurrently_are_cached_and_trip_the_breaker(tmp_path, monkeypatch):
+    import json as _json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from qa_llm_rewriter import DEFAULT_CACHE_PATH, RewriteConfig, load_rewrite_config_from_env, rewrite_bullets
+
+    monkeypatch.delenv("QA_REWRITE_CACHE", raising=False)
+    assert load_rewrite_config_from_env().cache_path == RewriteConfig(provider="http").cache_path == str(DEFAULT_CACHE_PATH)
+    monkeypatch.setenv("QA_REWRITE_CACHE", "off")
+    assert load_rewrite_config_from_env().cache_path is None
+
+    state = {"calls": 0, "delay": 0.2}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = _json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                state["calls"] += 1
+            time.sleep(state["delay"])
+            clause = body["prompt"].split("Clause: ", 1)[1].split("\n", 1)[0]
+            data = _json.dumps({"response": f"Plain: {clause}"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        cfg = RewriteConfig(
+            provider="http",
+            url=f"http://127.0.0.1:{server.server_address[1]}/api/generate",
+            model="m",
+            max_concurrency=4,
+            cache_path=str(tmp_path / "rewrites.sqlite3"),
+            slow_call_s=1.0,
+        )
+        items = [("Payment Terms", f"Customer pays invoice {i} within {i + 10} days.") for i in range(9)]
+        t0 = time.perf_counter()
+        out = rewrite_bullets(question="What are the payment terms?", items=items, config=cfg)
+        took = time.perf_counter() - t0
+        assert out == [f"Plain: {c}" for _, c in items]
+        assert state["calls"] == 9 and took < 9 * 0.2 * 0.6  # serial would be >= 1.8 s
+
+        assert rewrite_bullets(question="another question", items=items[:3], config=cfg) == out[:3]
+        assert state["calls"] == 9  # (endpoint, model, heading, clause) cache hit
+        other = RewriteConfig(**{**cfg.__dict__, "url": cfg.url + "?endpoint=2"})
+        assert rewrite_bullets(question="q", items=items[:3], config=other) == out[:3]
+        assert state["calls"] == 12  # another endpoint is a different model deployment
+
+        # A slow endpoint opens the breaker; the rest fall back to deterministic bullets.
+        state["delay"] = 0.3
+        slow = RewriteConfig(**{**cfg.__dict__, "max_concurrency": 1, "slow_call_s": 0.1, "breaker_failures": 2, "cache_path": None})
+        fresh = [("Payment Terms", f"Fee {i} is due in {i} days.") for i in range(6)]
+        res = rewrite_bullets(question="q", items=fresh, config=slow)
+        assert state["calls"] == 14 and res[2:] == [None] * 4
+    finally:
+        server.shutdown()
+
+
+def test_qa_rewrite_runs_off_the_event_loop(monkeypatch, sample_bytes: bytes):
+    import asyncio
+
+    import qa_llm_rewriter
+
+    calls = []
+
+    def fake_rewrite(*, question, items, **_kwargs):
+        try:
+            asyncio.get_running_loop()
+            calls.append("event loop")
+        except RuntimeError:
+            calls.append("worker thread")
+        return [f"Plain: {c}" for _, c in items]
+
+    monkeypatch.setattr(qa_llm_rewriter, "rewrite_bullets", fake_rewrite)
+    monkeypatch.setenv("QA_REWRITE_CACHE", "off")
+    monkeypatch.setenv("QA_REWRITE_PROVIDER", "http")
+    monkeypatch.setenv("QA_REWRITE_URL", "http://127.0.0.1:9/api/generate")
+    body = {"contract_text": sample_bytes.decode("utf-8"), "question": "What are the payment terms?"}
+    j = client.post("/analyze_text", json=body).json()
+    assert calls == ["worker thread"] and "Plain: " in j["report"]
+
+
+def test_deadline_skips_optional_stages_and_lists_degradations(monkeypatch, tmp_path, sample_bytes: bytes):
+    from contract_pipeline import StageCosts
+
+    text = sample_bytes.decode("utf-8", errors="ignore")
+    monkeypatch.setenv("CLAUSEAI_REVISIONS_DIR", str(tmp_path / "revisions"))
+    costs = StageCosts({"agent_analysis": 60_000.0, "extra_topics": 60_000.0}, skip_decay=1.0)
+    monkeypatch.setattr(app.state, "stage_costs", costs)
+    body = {
+        "contract_text": text,
+        "question": "Give me a risk analysis of the payment terms",
+        "run_all_agents": True,
+        "agent_detail": "full",
+    }
+    full = client.post("/analyze_text", json=body).json()
+    assert full["deadline"] is None and not full["agent_analysis"]["finance"].get("skipped")
+
+    tight = client.post("/analyze_text", json={**body, "deadline_ms": 30_000}).json()
+    stages = {d["stage"]: d for d in tight["deadline"]["degraded"]}
+    assert stages["agent_analysis"]["action"] == "skipped" and stages["extra_topics"]["action"] == "skipped"
+    assert "finance" not in stages["extra_topics"]["agents"] and tight["deadline"]["met"]
+    # Mandatory output is still there, narrowed to the question's topics.
+    assert tight["analysis"]["finance"]["risk_level"] == full["analysis"]["finance"]["risk_level"]
+    assert tight["analysis"]["legal"]["risk_level"] == "n/a" and tight["agent_analysis"]["finance"]["skipped"]
+
+    # Fact summaries skip the LLM rewrite when it cannot fit.
+    monkeypatch.setenv("QA_REWRITE_PROVIDER", "http")
+    monkeypatch.setenv("QA_REWRITE_URL", "http://127.0.0.1:9/unreachable")
+    costs.estimates["llm_rewrite"] = 60_000.0
+    qa = client.post("/analyze_text", json={"contract_text": text, "question": "What are the payment terms?", "deadline_ms": 30_000}).json()
+    assert [d["stage"] for d in qa["deadline"]["degraded"]] == ["llm_rewrite"]
+    assert qa["report"] and qa["qa"]
+
+
+def test_stage_cost_estimate_recovers_after_a_slow_spell(monkeypatch, sample_bytes: bytes):
+    from contract_pipeline import StageCosts
+
+    costs = StageCosts({"agent_analysis": 30_000.0}, alpha=0.6)
+    costs.observe("agent_analysis", 40_000.0, complete=False)  # cut short: a lower bound only
+    assert costs.estimate("agent_analysis") == 40_000.0
+    costs.observe("agent_analysis", 10.0, complete=False)
+    assert costs.estimate("agent_analysis") == 40_000.0
+
+    monkeypatch.setattr(app.state, "stage_costs", costs)
+    body = {
+        "contract_text": sample_bytes.decode("utf-8", errors="ignore"),
+        "question": "Give me a risk analysis of the payment terms",
+        "agent_detail": "full",
+        "deadline_ms": 30_000,
+    }
+    skipped = 0
+    for _ in range(10):
+        j = client.post("/analyze_text", json=body).json()
+        if not j["agent_analysis"]["finance"].get("skipped"):
+            break
+        skipped += 1
+    # Each skip decays the stale estimate until the stage is tried and re-measured.
+    assert 0 < skipped < 10 and costs.estimate("agent_analysis") < 30_000.0
+    for _ in range(4):
+        client.post("/analyze_text", json=body)
+    assert costs.estimate("agent_analysis") < 1_000.0
+
+
+def test_timings_block_and_prometheus_metrics(monkeypatch, tmp_path, sample_bytes: bytes):
+    monkeypatch.setenv("CLAUSEAI_REVISIONS_DIR", str(tmp_path / "revisions"))
+    text = sample_bytes.decode("utf-8", errors="ignore")
+    body = {"contract_text": text, "question": "Give me a risk analysis of the payment terms"}
+    assert client.post("/analyze_text", json=body).json()["timings"] is None
+
+    res = client.post("/analyze_text", json={**body, "timings": True}).json()
+    stages = res["timings"]["stages"]
+    for name in ("chunk", "embed", "retrieve", "extract_facts", "executive_report", "agents", "report"):
+        assert stages[name]["calls"] >= 1, name
+    # Spans inside asyncio.to_thread workers are attributed to the request too.
+    assert stages["agents"]["ms"] <= res["timings"]["total_ms"]
+
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = r.text.splitlines()
+    assert "# TYPE clauseai_stage_seconds histogram" in lines
+    assert any(l.startswith('clauseai_stage_seconds_bucket{stage="embed",le="+Inf"} ') for l in lines)
+    assert any(l.startswith('clauseai_http_request_seconds_count{method="POST",route="/analyze_text",status="200"} ') for l in lines)
+    assert "clauseai_pipelines_in_flight 0" in lines
+    assert any(l.startswith('clauseai_queue_depth{queue="hash_pool"} ') for l in lines)
+
+    monkeypatch.setenv("CLAUSEAI_METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+
+def test_admin_can_profile_one_request_and_download_it(monkeypatch, tmp_path, sample_bytes: bytes):
+    import pstats
+
+    import contract_pipeline
+
+    monkeypatch.setenv("CLAUSEAI_REVISIONS_DIR", str(tmp_path / "revisions"))
+    monkeypatch.setenv("CLAUSEAI_PROFILES_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(contract_pipeline, "MEMORY_DIR", tmp_path)
+    tokens, emails = {}, {}
+    for who, role in (("Admin", "User"), ("Legal", "Legal"), ("SelfAdmin", "Admin")):
+        emails[who] = f"profile_{who.lower()}_{int(time.time() * 1000)}@example.com"
+        client.post("/auth/register", json={"email": emails[who], "password": "pass1234", "name": who, "role": role})
+        tokens[who] = client.post("/auth/login", json={"email": emails[who], "password": "pass1234"}).json()["token"]
+    monkeypatch.setenv("CLAUSEAI_ADMIN_EMAILS", f"someone@example.com, {emails['Admin'].upper()}")
+    body = {
+        "contract_text": sample_bytes.decode("utf-8", errors="ignore"),
+        "question": "Give me a risk analysis",
+        "contract_id": f"profiled_{int(time.time() * 1000)}",
+    }
+
+    plain = client.post("/analyze_text", json=body)
+    assert "x-profile-id" not in plain.headers and not (tmp_path / "profiles").exists()
+    # Only the server-side allowlist grants admin; a self-registered "Admin" role does not.
+    for who in ("Legal", "SelfAdmin"):
+        denied = client.post(
+            "/analyze_text", json=body, headers={"X-Profile": "all", "Authorization": f"Bearer {tokens[who]}"}
+        )
+        assert denied.status_code == 403
+
+    r = client.post(
+        "/analyze_text",
+        json=body,
+        headers={"X-Profile": "all", "X-Request-ID": "slow-case-42", "Authorization": f"Bearer {tokens['Admin']}"},
+    )
+    assert r.status_code == 200 and r.headers["x-profile-id"] == "slow-case-42"
+    assert r.json()["timings"] is None  # profiling alone does not change the response body
+
+    admin = {"Authorization": f"Bearer {tokens['Admin']}"}
+    listed = client.get("/admin/profiles", headers=admin).json()["profiles"]
+    assert [p["profile_id"] for p in listed] == ["slow-case-42"] and listed[0]["has_prof"]
+    meta = client.get("/admin/profiles/slow-case-42", headers=admin).json()
+    assert meta["path"] == "/analyze_text" and meta["memory"]["peak_bytes"] > 0
+    assert "agents" in meta["timings"]["stages"] and meta["cpu"]["top_functions"]
+
+    dl = client.get("/admin/profiles/slow-case-42/download", headers=admin)
+    assert dl.status_code == 200
+    (tmp_path / "dl.prof").write_bytes(dl.content)
+    profiled = {func for (_file, _line, func) in pstats.Stats(str(tmp_path / "dl.prof")).stats}
+    # Stages run in asyncio.to_thread workers are profiled too.
+    assert {"run_agents_summary", "extract_clause_facts", "_save_memory"} <= profiled
+    assert client.get("/admin/profiles/..%2Fsecret/download", headers=admin).status_code == 404
+    assert client.get("/admin/profiles", headers={"Authorization": f"Bearer {tokens['SelfAdmin']}"}).status_code == 403
+
+
+def test_pipeline_benchmark_suite_measures_and_flags_regressions():
+    import contract_pipeline
+    from benchmarks.pipeline_suite import compare, merge_best, run_suite
+    from benchmarks.synthetic_contracts import PAGE_CHARS, generate_contract
+
+    text = generate_contract(5)
+    assert text == generate_contract(5) and len(text) >= 5 * PAGE_CHARS
+    memory_dir = contract_pipeline.MEMORY_DIR
+
+    wanted = {"chunk_text/1p", "rag_query/1p", "pipeline/risk_analysis/1p", "history/list"}
+    current = run_suite(pages=[1], min_time_s=0.0, selected=lambda name: name in wanted)
+    assert set(current["results"]) == wanted and current["embedder"] == "hashing"
+    assert all(r["min_ms"] <= r["median_ms"] <= r["p95_ms"] for r in current["results"].values())
+    assert contract_pipeline.MEMORY_DIR == memory_dir  # scratch locations are restored
+
+    baseline = {"results": {name: {**r, "min_ms": r["min_ms"] / 2} for name, r in current["results"].items()}}
+    baseline["results"]["chunk_text/1p"]["min_ms"] = current["results"]["chunk_text/1p"]["min_ms"]
+    report = compare(current, baseline, threshold=0.25, noise_ms=0.0)
+    assert {r["case"] for r in report["regressions"]} == wanted - {"chunk_text/1p"}
+    # Sub-noise differences are never flagged; a faster re-run clears a flag.
+    assert not compare(current, baseline, threshold=0.25, noise_ms=1e9)["regressions"]
+    merge_best(current, baseline)
+    assert not compare(current, baseline, threshold=0.25, noise_ms=0.0)["regressions"]
+
+
+def test_load_test_helpers_parse_mix_load_questions_and_summarize():
+    from benchmarks.load_test import BUCKETS_MS, OpStats, load_questions, parse_weights
+
+    assert parse_weights("analyze=0.7, history=0.2,login") == {"analyze": 0.7, "history": 0.2, "login": 1.0}
+    with pytest.raises(ValueError):
+        parse_weights("analyze=0")
+    questions = load_questions()
+    assert len(questions) >= 10 and all(isinstance(q, str) and q for q in questions)
+
+    stats = OpStats()
+    for ms in range(1, 101):
+        stats.add(float(ms), "200" if ms <= 98 else "500", ms <= 98)
+    s = stats.summary(seconds=10.0)
+    assert (s["requests"], s["rps"], s["errors"], s["error_rate"]) == (100, 10.0, 2, 0.02)
+    assert (s["p50_ms"], s["p95_ms"], s["p99_ms"], s["max_ms"]) == (50.0, 95.0, 99.0, 100.0)
+    assert s["statuses"] == {"200": 98, "500": 2}
+    assert len(s["histogram"]) == len(BUCKETS_MS) and sum(b["count"] for b in s["histogram"]) == 100
+
+
+def test_retrieval_eval_rebuilds_labelled_corpus_and_scores_configs():
+    import numpy as np
+
+    from benchmarks.retrieval_eval import evaluate, load_labelled_set, make_embedder, score_ranking, store
+
+    docs, queries = load_labelled_set()
+    texts = {d.doc_id: d.text for d in docs}
+    assert len(queries) >= 10 and all(q.relevant for q in queries)
+    assert all(e > s and texts[cid][s:e].strip() for q in queries for cid, s, e in q.relevant)
+
+    gold = [("a", 0, 1000), ("b", 500, 1500)]
+    m = score_ranking([("b", 0, 900), ("a", 100, 1000), ("a", 0, 1000)], gold, ks=(1, 2), min_overlap=0.5)
+    assert m == {"recall@1": 0.0, "recall@2": 0.5, "rr": 0.5}
+
+    v = np.random.default_rng(0).standard_normal((50, 16)).astype(np.float32)
+    assert store(v, "int8").dtype == np.int8 and store(v, "float16").nbytes == v.nbytes // 2
+
+    rows = evaluate(docs, queries, embedder=make_embedder("hashing"), chunk_size=900, overlap=120,
+                    precisions=("float32", "int8"), ks=(1, 5), repeat=1)
+    assert [r["precision"] for r in rows] == ["float32", "int8"]
+    assert rows[1]["index_bytes"] * 4 == rows[0]["index_bytes"]
+    assert all(0.0 <= r["recall@1"] <= r["recall@5"] <= 1.0 and 0.0 <= r["mrr"] <= 1.0 for r in rows)
+    assert abs(rows[0]["recall@5"] - rows[1]["recall@5"]) <= 0.05
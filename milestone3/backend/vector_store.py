@@ -0,0 +1,817 @@
+"""Pluggable vector storage with Pinecone-style upsert/query, namespaces and metadata filters.
+
+Backends (cosine similarity, exact top-k; vectors are stored L2-normalized):
+
+    MemoryVectorStore      numpy matrices in RAM (tests, per-request indexes)
+    MmapVectorStore        <root>/<namespace>/vectors.f32 + records.jsonl, memory-mapped
+    SqliteVectorStore      one SQLite file (vectors as BLOBs); the matrix is cached per
+                           namespace and reloaded when another connection writes
+    PineconeHTTPStore      client for the Pinecone data-plane REST protocol; talks to
+                           Pinecone itself or to `serve()` below
+
+`serve(store)` exposes any store over the same protocol (`/vectors/upsert`, `/query`,
+`/vectors/delete`, `/describe_index_stats`), so the Milestone 2/3 notebooks can run
+offline against `Pinecone(api_key=...).Index(host="http://127.0.0.1:8765")`, or in-process
+via `PineconeIndexAdapter(store)`:
+
+    cd milestone3/backend
+    python -m vector_store serve --backend sqlite --path ../outputs/vectors.sqlite3 --dim 384
+
+Filters follow Pinecone's syntax: `{"contract_id": {"$eq": "c1"}, "agent_type": {"$in": [...]}}`
+with $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte/$exists and $and/$or. A bare value means $eq.
+"""
+
+from __future__ import annotations
+
+import abc
+import argparse
+import http.client
+import json
+import socket
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+CHUNKS_NAMESPACE = "contract-chunks"
+MEMORY_NAMESPACE = "agent-memory"
+
+Record = Union[Mapping[str, Any], Tuple[str, Sequence[float]], Tuple[str, Sequence[float], Mapping[str, Any]]]
+
+
+@dataclass
+class VectorMatch:
+    id: str
+    score: float
+    metadata: Optional[Dict[str, Any]] = None
+    values: Optional[List[float]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"id": self.id, "score": self.score}
+        if self.metadata is not None:
+            out["metadata"] = self.metadata
+        if self.values is not None:
+            out["values"] = self.values
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Metadata filters
+# ---------------------------------------------------------------------------
+
+_MISSING = object()
+
+
+def _as_list(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _cmp(value: Any, arg: Any, op) -> bool:
+    try:
+        return value is not _MISSING and op(value, arg)
+    except TypeError:
+        return False
+
+
+_OPS = {
+    "$eq": lambda v, a: v is not _MISSING and a in _as_list(v),
+    "$ne": lambda v, a: v is _MISSING or a not in _as_list(v),
+    "$in": lambda v, a: v is not _MISSING and any(x in a for x in _as_list(v)),
+    "$nin": lambda v, a: v is _MISSING or not any(x in a for x in _as_list(v)),
+    "$gt": lambda v, a: _cmp(v, a, lambda x, y: x > y),
+    "$gte": lambda v, a: _cmp(v, a, lambda x, y: x >= y),
+    "$lt": lambda v, a: _cmp(v, a, lambda x, y: x < y),
+    "$lte": lambda v, a: _cmp(v, a, lambda x, y: x <= y),
+    "$exists": lambda v, a: (v is not _MISSING) == bool(a),
+}
+
+
+def matches_filter(metadata: Optional[Mapping[str, Any]], flt: Optional[Mapping[str, Any]]) -> bool:
+    """Pinecone metadata filter semantics (list-valued metadata matches any element)."""
+    if not flt:
+        return True
+    metadata = metadata or {}
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, f) for f in cond):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, f) for f in cond):
+                return False
+            continue
+        value = metadata.get(key, _MISSING)
+        for op, arg in (cond.items() if isinstance(cond, dict) else [("$eq", cond)]):
+            fn = _OPS.get(op)
+            if fn is None:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            if not fn(value, arg):
+                return False
+    return True
+
+
+def _parse_record(rec: Record) -> Tuple[str, np.ndarray, Dict[str, Any]]:
+    if isinstance(rec, Mapping):
+        return str(rec["id"]), np.asarray(rec["values"], dtype=np.float32), dict(rec.get("metadata") or {})
+    rid, values, *rest = rec
+    return str(rid), np.asarray(values, dtype=np.float32), dict(rest[0] or {}) if rest else {}
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[None, :]
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
+
+
+# ---------------------------------------------------------------------------
+# Interface
+# ---------------------------------------------------------------------------
+
+
+class VectorStore(abc.ABC):
+    """Batched upsert/query over namespaces. Scores are cosine similarities."""
+
+    dim: int
+
+    @abc.abstractmethod
+    def upsert(self, vectors: Iterable[Record], *, namespace: str = "") -> int:
+        """Insert or overwrite records; returns the number written."""
+
+    @abc.abstractmethod
+    def query_many(
+        self,
+        vectors: Union[np.ndarray, Sequence[Sequence[float]]],
+        *,
+        top_k: int = 5,
+        namespace: str = "",
+        filter: Optional[Mapping[str, Any]] = None,
+        include_metadata: bool = True,
+        include_values: bool = False,
+    ) -> List[List[VectorMatch]]:
+        """Top-`top_k` matches per query vector, best first."""
+
+    def query(self, vector: Sequence[float], **kwargs: Any) -> List[VectorMatch]:
+        return self.query_many(np.asarray([vector], dtype=np.float32), **kwargs)[0]
+
+    @abc.abstractmethod
+    def delete(self, ids: Iterable[str], *, namespace: str = "") -> int:
+        """Remove ids from `namespace`; returns how many were deleted (remote stores: requested)."""
+
+    @abc.abstractmethod
+    def namespaces(self) -> Dict[str, int]:
+        """Vector count per namespace."""
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        ns = self.namespaces()
+        return sum(ns.values()) if namespace is None else ns.get(namespace, 0)
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        ns = self.namespaces()
+        return {
+            "dimension": self.dim,
+            "namespaces": {k: {"vectorCount": v} for k, v in ns.items()},
+            "totalVectorCount": sum(ns.values()),
+        }
+
+    def close(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Matrix-backed stores (memory, mmap, sqlite)
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Namespace:
+    ids: List[str] = field(default_factory=list)
+    row_of: Dict[str, int] = field(default_factory=dict)
+    metas: List[Dict[str, Any]] = field(default_factory=list)
+    alive: np.ndarray = field(default_factory=lambda: np.zeros((0,), dtype=bool))
+    version: int = 0
+
+    def assign(self, rid: str, meta: Dict[str, Any]) -> Tuple[int, bool]:
+        """Row for `rid` (existing rows are overwritten in place). Returns (row, is_new)."""
+        row = self.row_of.get(rid)
+        if row is not None:
+            self.metas[row] = meta
+            self.alive[row] = True
+            return row, False
+        row = len(self.ids)
+        self.ids.append(rid)
+        self.metas.append(meta)
+        self.row_of[rid] = row
+        if row >= self.alive.shape[0]:
+            grown = np.zeros((max(16, 2 * self.alive.shape[0]),), dtype=bool)
+            grown[: self.alive.shape[0]] = self.alive
+            self.alive = grown
+        self.alive[row] = True
+        return row, True
+
+    def remove(self, rid: str) -> Optional[int]:
+        row = self.row_of.pop(rid, None)
+        if row is not None:
+            self.alive[row] = False
+        return row
+
+    @property
+    def size(self) -> int:
+        return len(self.row_of)
+
+
+class _MatrixStore(VectorStore):
+    """Shared exact search: per-namespace row bookkeeping + a (rows, dim) matrix per subclass."""
+
+    SCAN_BLOCK = 65_536
+    FILTER_CACHE = 64
+
+    def __init__(self, dim: int) -> None:
+        self.dim = int(dim)
+        self._ns: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+        self._filter_masks: "OrderedDict[Tuple[str, int, str], np.ndarray]" = OrderedDict()
+
+    # Subclass hooks --------------------------------------------------------
+    @abc.abstractmethod
+    def _matrix(self, name: str, ns: _Namespace) -> np.ndarray:
+        """The namespace's (rows, dim) vector matrix."""
+
+    @abc.abstractmethod
+    def _write(self, name: str, ns: _Namespace, rows: List[int], ids: List[str], vecs: np.ndarray, metas: List[Dict[str, Any]]) -> None:
+        """Persist `vecs`/`metas` at `rows` (already assigned in `ns`)."""
+
+    def _write_delete(self, name: str, ns: _Namespace, ids: List[str]) -> None:
+        pass
+
+    def _refresh(self) -> None:
+        """Pick up writes made by other processes (no-op unless the backend supports it)."""
+
+    # VectorStore -----------------------------------------------------------
+    def upsert(self, vectors: Iterable[Record], *, namespace: str = "") -> int:
+        parsed = [_parse_record(r) for r in vectors]
+        if not parsed:
+            return 0
+        vecs = _normalize(np.stack([v for _, v, _ in parsed]))
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vecs.shape[1]} does not match store dimension {self.dim}")
+        with self._lock:
+            self._refresh()
+            ns = self._ns.setdefault(namespace, _Namespace())
+            # Last write wins for ids repeated within the batch.
+            latest = {rid: i for i, (rid, _, _) in enumerate(parsed)}
+            order = sorted(latest.values())
+            rows = [ns.assign(parsed[i][0], parsed[i][2])[0] for i in order]
+            self._write(namespace, ns, rows, [parsed[i][0] for i in order], vecs[order], [parsed[i][2] for i in order])
+            ns.version += 1
+        return len(parsed)
+
+    def delete(self, ids: Iterable[str], *, namespace: str = "") -> int:
+        with self._lock:
+            self._refresh()
+            ns = self._ns.get(namespace)
+            if ns is None:
+                return 0
+            gone = [rid for rid in dict.fromkeys(ids) if ns.remove(rid) is not None]
+            if gone:
+                self._write_delete(namespace, ns, gone)
+                ns.version += 1
+            return len(gone)
+
+    def namespaces(self) -> Dict[str, int]:
+        with self._lock:
+            self._refresh()
+            return {k: v.size for k, v in self._ns.items() if v.size}
+
+    def _mask(self, name: str, ns: _Namespace, flt: Optional[Mapping[str, Any]]) -> np.ndarray:
+        n = len(ns.ids)
+        if not flt:
+            return ns.alive[:n]
+        key = (name, ns.version, json.dumps(flt, sort_keys=True, default=str))
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = ns.alive[:n] & np.fromiter((matches_filter(m, flt) for m in ns.metas), dtype=bool, count=n)
+            self._filter_masks[key] = mask
+            while len(self._filter_masks) > self.FILTER_CACHE:
+                self._filter_masks.popitem(last=False)
+        else:
+            self._filter_masks.move_to_end(key)
+        return mask
+
+    def query_many(
+        self,
+        vectors: Union[np.ndarray, Sequence[Sequence[float]]],
+        *,
+        top_k: int = 5,
+        namespace: str = "",
+        filter: Optional[Mapping[str, Any]] = None,
+        include_metadata: bool = True,
+        include_values: bool = False,
+    ) -> List[List[VectorMatch]]:
+        q = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            self._refresh()
+            ns = self._ns.get(namespace)
+            if ns is None or not ns.size or top_k <= 0:
+                return [[] for _ in range(q.shape[0])]
+            mask = self._mask(namespace, ns, filter)
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                return [[] for _ in range(q.shape[0])]
+            mat = self._matrix(namespace, ns)
+            dense = rows.size == mask.shape[0]
+            k = min(int(top_k), rows.size)
+            best_s = np.full((q.shape[0], 0), -np.inf, dtype=np.float32)
+            best_r = np.zeros((q.shape[0], 0), dtype=np.int64)
+            for start in range(0, rows.size, self.SCAN_BLOCK):
+                part = rows[start : start + self.SCAN_BLOCK]
+                block = mat[part[0] : part[-1] + 1] if dense else mat[part]
+                scores = np.asarray(block, dtype=np.float32) @ q.T  # (block, queries)
+                kk = min(k, part.size)
+                top = np.argpartition(-scores, kk - 1, axis=0)[:kk] if kk < part.size else np.arange(part.size)[:, None].repeat(q.shape[0], 1)
+                best_s = np.concatenate([best_s, np.take_along_axis(scores, top, axis=0).T], axis=1)
+                best_r = np.concatenate([best_r, part[top].T], axis=1)
+                if best_s.shape[1] > k:
+                    keep = np.argpartition(-best_s, k - 1, axis=1)[:, :k]
+                    best_s = np.take_along_axis(best_s, keep, axis=1)
+                    best_r = np.take_along_axis(best_r, keep, axis=1)
+            order = np.argsort(-best_s, axis=1, kind="stable")
+            out: List[List[VectorMatch]] = []
+            for qi in range(q.shape[0]):
+                matches = []
+                for j in order[qi]:
+                    r = int(best_r[qi, j])
+                    matches.append(
+                        VectorMatch(
+                            id=ns.ids[r],
+                            score=float(best_s[qi, j]),
+                            metadata=dict(ns.metas[r]) if include_metadata else None,
+                            values=np.asarray(mat[r], dtype=np.float32).tolist() if include_values else None,
+                        )
+                    )
+                out.append(matches)
+            return out
+
+
+class MemoryVectorStore(_MatrixStore):
+    """In-RAM numpy backend."""
+
+    def __init__(self, dim: int) -> None:
+        super().__init__(dim)
+        self._mats: Dict[str, np.ndarray] = {}
+
+    def _matrix(self, name: str, ns: _Namespace) -> np.ndarray:
+        return self._mats[name]
+
+    def _write(self, name, ns, rows, ids, vecs, metas) -> None:
+        mat = self._mats.get(name)
+        need = len(ns.ids)
+        if mat is None or mat.shape[0] < need:
+            grown = np.zeros((max(need, 16, 2 * (0 if mat is None else mat.shape[0])), self.dim), dtype=np.float32)
+            if mat is not None:
+                grown[: mat.shape[0]] = mat
+            mat = self._mats[name] = grown
+        mat[rows] = vecs
+
+
+def _dir_name(namespace: str) -> str:
+    safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in namespace)
+    return safe or "__default__"
+
+
+class MmapVectorStore(_MatrixStore):
+    """Memory-mapped backend: <root>/<namespace>/vectors.f32 (rows) + records.jsonl (id, row, metadata).
+
+    records.jsonl is an append-only log (later lines win, `"deleted": true` tombstones),
+    replayed on open. Deleted rows are not reclaimed; `compact()` rewrites a namespace.
+    """
+
+    def __init__(self, root: Path, dim: int) -> None:
+        super().__init__(dim)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        info = self.root / "store.json"
+        if info.exists():
+            stored = json.loads(info.read_text(encoding="utf-8"))
+            if int(stored["dim"]) != self.dim:
+                raise ValueError(f"Vector store at {self.root} has dim {stored['dim']}, expected {dim}")
+        else:
+            info.write_text(json.dumps({"dim": self.dim}), encoding="utf-8")
+        self._maps: Dict[str, np.memmap] = {}
+        for d in sorted(p for p in self.root.iterdir() if (p / "records.jsonl").exists()):
+            self._replay(d)
+
+    def _replay(self, d: Path) -> None:
+        name = None
+        ns = _Namespace()
+        with open(d / "records.jsonl", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                name = rec.get("namespace", name)
+                if rec.get("deleted"):
+                    ns.remove(rec["id"])
+                else:
+                    row, _ = ns.assign(rec["id"], rec.get("metadata") or {})
+                    if row != rec["row"]:
+                        raise ValueError(f"corrupt record log in {d}: {rec['id']!r} expected row {rec['row']}, replayed {row}")
+        if name is not None:
+            self._ns[name] = ns
+
+    def _dir(self, name: str) -> Path:
+        return self.root / _dir_name(name)
+
+    def _matrix(self, name: str, ns: _Namespace) -> np.ndarray:
+        m = self._maps.get(name)
+        if m is None or m.shape[0] < len(ns.ids):
+            m = self._maps[name] = np.memmap(self._dir(name) / "vectors.f32", dtype=np.float32, mode="r+", shape=(len(ns.ids), self.dim))
+        return m
+
+    def _write(self, name, ns, rows, ids, vecs, metas) -> None:
+        d = self._dir(name)
+        d.mkdir(parents=True, exist_ok=True)
+        path = d / "vectors.f32"
+        need = len(ns.ids) * self.dim * 4
+        if not path.exists() or path.stat().st_size < need:
+            with open(path, "ab") as f:
+                f.truncate(need)
+            self._maps.pop(name, None)
+        mat = self._matrix(name, ns)
+        mat[rows] = vecs
+        mat.flush()
+        with open(d / "records.jsonl", "a", encoding="utf-8") as f:
+            for row, rid, meta in zip(rows, ids, metas):
+                f.write(json.dumps({"namespace": name, "id": rid, "row": row, "metadata": meta}, ensure_ascii=False) + "\n")
+
+    def _write_delete(self, name, ns, ids) -> None:
+        with open(self._dir(name) / "records.jsonl", "a", encoding="utf-8") as f:
+            for rid in ids:
+                f.write(json.dumps({"namespace": name, "id": rid, "deleted": True}) + "\n")
+
+    def compact(self, namespace: str = "") -> None:
+        """Rewrite `namespace` without deleted rows."""
+        with self._lock:
+            ns = self._ns.get(namespace)
+            if ns is None:
+                return
+            live = sorted(ns.row_of.items(), key=lambda kv: kv[1])
+            vecs = np.asarray(self._matrix(namespace, ns)[[r for _, r in live]]) if live else np.zeros((0, self.dim), np.float32)
+            metas = [ns.metas[r] for _, r in live]
+            self._maps.pop(namespace, None)
+            d = self._dir(namespace)
+            for p in ("vectors.f32", "records.jsonl"):
+                (d / p).unlink(missing_ok=True)
+            fresh = self._ns[namespace] = _Namespace()
+            rows = [fresh.assign(rid, m)[0] for (rid, _), m in zip(live, metas)]
+            if rows:
+                self._write(namespace, fresh, rows, [rid for rid, _ in live], vecs, metas)
+            fresh.version = ns.version + 1
+
+
+class SqliteVectorStore(_MatrixStore):
+    """SQLite backend: table `vectors(namespace, id, row, vector BLOB, metadata JSON)`.
+
+    The search matrix per namespace is cached in memory and reloaded when
+    `PRAGMA data_version` shows a write from another connection.
+    """
+
+    def __init__(self, path: Path, dim: int) -> None:
+        super().__init__(dim)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self._con.row_factory = sqlite3.Row
+        self._con.execute("PRAGMA journal_mode=WAL")
+        with self._con:
+            self._con.execute("CREATE TABLE IF NOT EXISTS store_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._con.execute("INSERT OR IGNORE INTO store_info (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            self._con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS vectors (
+                    namespace TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    metadata TEXT NOT NULL,
+                    PRIMARY KEY (namespace, id)
+                )
+                """
+            )
+        stored = int(self._con.execute("SELECT value FROM store_info WHERE key = 'dim'").fetchone()[0])
+        if stored != self.dim:
+            raise ValueError(f"Vector store at {self.path} has dim {stored}, expected {dim}")
+        self._mats: Dict[str, np.ndarray] = {}
+        self._data_version = -1
+        self._refresh()
+
+    def _refresh(self) -> None:
+        version = int(self._con.execute("PRAGMA data_version").fetchone()[0])
+        if version == self._data_version:
+            return
+        self._data_version = version
+        self._ns.clear()
+        self._mats.clear()
+        self._filter_masks.clear()
+        groups: Dict[str, List[sqlite3.Row]] = {}
+        for r in self._con.execute("SELECT namespace, id, vector, metadata FROM vectors ORDER BY namespace, row"):
+            groups.setdefault(r["namespace"], []).append(r)
+        for name, recs in groups.items():
+            ns = self._ns[name] = _Namespace()
+            for r in recs:
+                ns.assign(r["id"], json.loads(r["metadata"]))
+            self._mats[name] = np.frombuffer(b"".join(r["vector"] for r in recs), dtype=np.float32).reshape(len(recs), self.dim).copy()
+
+    def _matrix(self, name: str, ns: _Namespace) -> np.ndarray:
+        return self._mats[name]
+
+    def _write(self, name, ns, rows, ids, vecs, metas) -> None:
+        with self._con:
+            self._con.executemany(
+                "INSERT OR REPLACE INTO vectors (namespace, id, row, vector, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (name, rid, row, np.asarray(v, dtype=np.float32).tobytes(), json.dumps(m, ensure_ascii=False))
+                    for row, rid, v, m in zip(rows, ids, vecs, metas)
+                ],
+            )
+        mat = self._mats.get(name)
+        need = len(ns.ids)
+        if mat is None or mat.shape[0] < need:
+            grown = np.zeros((max(need, 16, 2 * (0 if mat is None else mat.shape[0])), self.dim), dtype=np.float32)
+            if mat is not None:
+                grown[: mat.shape[0]] = mat
+            mat = self._mats[name] = grown
+        mat[rows] = vecs
+        # Our own commit bumps nothing for this connection; keep the cached version.
+        self._data_version = int(self._con.execute("PRAGMA data_version").fetchone()[0])
+
+    def _write_delete(self, name, ns, ids) -> None:
+        with self._con:
+            self._con.executemany("DELETE FROM vectors WHERE namespace = ? AND id = ?", [(name, rid) for rid in ids])
+
+    def close(self) -> None:
+        self._con.close()
+
+
+# ---------------------------------------------------------------------------
+# Pinecone REST protocol: client, server, notebook adapter
+# ---------------------------------------------------------------------------
+
+
+class PineconeHTTPStore(VectorStore):
+    """VectorStore over the Pinecone data-plane REST API (Pinecone itself or `serve()`)."""
+
+    def __init__(self, host: str, *, api_key: Optional[str] = None, dim: Optional[int] = None, timeout: float = 30.0) -> None:
+        url = urlparse(host if "://" in host else f"https://{host}")
+        self._scheme, self._netloc = url.scheme, url.netloc
+        self._api_key = api_key
+        self._timeout = timeout
+        self._local = threading.local()
+        self.dim = int(dim) if dim else int(self.describe_index_stats().get("dimension") or 0)
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+            conn = self._local.conn = cls(self._netloc, timeout=self._timeout)
+            conn.connect()
+            # Headers and body go out as separate writes; without this, Nagle + delayed ACK add ~40 ms.
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    def _post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        payload = json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if self._api_key:
+            headers["Api-Key"] = self._api_key
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.request("POST", path, body=payload, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if resp.status >= 400:
+            raise RuntimeError(f"{path} failed with HTTP {resp.status}: {data[:200]!r}")
+        return json.loads(data) if data else {}
+
+    def upsert(self, vectors: Iterable[Record], *, namespace: str = "", batch_size: int = 100) -> int:
+        parsed = [_parse_record(r) for r in vectors]
+        n = 0
+        for i in range(0, len(parsed), batch_size):
+            body = {
+                "vectors": [{"id": rid, "values": v.tolist(), "metadata": m} for rid, v, m in parsed[i : i + batch_size]],
+                "namespace": namespace,
+            }
+            n += int(self._post("/vectors/upsert", body).get("upsertedCount", 0))
+        return n
+
+    def query_many(self, vectors, *, top_k=5, namespace="", filter=None, include_metadata=True, include_values=False):
+        out = []
+        for v in np.asarray(vectors, dtype=np.float32):
+            body: Dict[str, Any] = {
+                "vector": v.tolist(),
+                "topK": int(top_k),
+                "namespace": namespace,
+                "includeMetadata": bool(include_metadata),
+                "includeValues": bool(include_values),
+            }
+            if filter:
+                body["filter"] = filter
+            res = self._post("/query", body)
+            out.append(
+                [
+                    VectorMatch(id=m["id"], score=float(m["score"]), metadata=m.get("metadata"), values=m.get("values"))
+                    for m in res.get("matches", [])
+                ]
+            )
+        return out
+
+    def delete(self, ids: Iterable[str], *, namespace: str = "") -> int:
+        ids = list(ids)
+        self._post("/vectors/delete", {"ids": ids, "namespace": namespace})
+        return len(ids)
+
+    def namespaces(self) -> Dict[str, int]:
+        stats = self._post("/describe_index_stats", {})
+        return {k: int(v.get("vectorCount", 0)) for k, v in (stats.get("namespaces") or {}).items()}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        return self._post("/describe_index_stats", {})
+
+
+def _make_handler(store: VectorStore, api_key: Optional[str]):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args: Any) -> None:  # quiet
+            pass
+
+        def _send(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self) -> None:
+            if api_key and self.headers.get("Api-Key") != api_key:
+                return self._send(401, {"message": "Invalid API key"})
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            ns = body.get("namespace", "") or ""
+            path = self.path.split("?", 1)[0]
+            try:
+                if path == "/vectors/upsert":
+                    return self._send(200, {"upsertedCount": store.upsert(body.get("vectors") or [], namespace=ns)})
+                if path == "/query":
+                    if "vector" not in body:
+                        return self._send(400, {"message": "Only vector queries are supported"})
+                    matches = store.query(
+                        body["vector"],
+                        top_k=int(body.get("topK", 10)),
+                        namespace=ns,
+                        filter=body.get("filter"),
+                        include_metadata=bool(body.get("includeMetadata", False)),
+                        include_values=bool(body.get("includeValues", False)),
+                    )
+                    return self._send(200, {"matches": [m.to_dict() for m in matches], "namespace": ns})
+                if path == "/vectors/delete":
+                    if body.get("deleteAll"):
+                        ids = [m.id for m in _all_ids(store, ns)]
+                    else:
+                        ids = body.get("ids") or []
+                    store.delete(ids, namespace=ns)
+                    return self._send(200, {})
+                if path == "/describe_index_stats":
+                    return self._send(200, store.describe_index_stats())
+            except (KeyError, ValueError) as e:
+                return self._send(400, {"message": str(e)})
+            return self._send(404, {"message": f"Unknown path {path}"})
+
+        do_POST = _handle
+        do_GET = _handle
+
+    return Handler
+
+
+def _all_ids(store: VectorStore, namespace: str) -> List[VectorMatch]:
+    n = store.count(namespace)
+    if not n:
+        return []
+    probe = np.zeros((store.dim,), dtype=np.float32)
+    probe[0] = 1.0
+    return store.query(probe, top_k=n, namespace=namespace, include_metadata=False)
+
+
+def serve(store: VectorStore, *, host: str = "127.0.0.1", port: int = 8765, api_key: Optional[str] = None) -> ThreadingHTTPServer:
+    """Start a Pinecone-protocol HTTP server for `store` on a background thread."""
+    server = ThreadingHTTPServer((host, port), _make_handler(store, api_key))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="vector-store-http", daemon=True).start()
+    return server
+
+
+class PineconeIndexAdapter:
+    """Drop-in for a pinecone `Index` in notebook code (`index.query(...)`, `index.upsert(...)`)."""
+
+    def __init__(self, store: VectorStore) -> None:
+        self.store = store
+
+    def upsert(self, vectors: Iterable[Record], namespace: str = "", **_: Any) -> Dict[str, Any]:
+        return {"upserted_count": self.store.upsert(vectors, namespace=namespace or "")}
+
+    def query(
+        self,
+        vector: Sequence[float],
+        top_k: int = 10,
+        namespace: Optional[str] = None,
+        filter: Optional[Mapping[str, Any]] = None,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        matches = self.store.query(
+            vector,
+            top_k=top_k,
+            namespace=namespace or "",
+            filter=filter,
+            include_metadata=include_metadata,
+            include_values=include_values,
+        )
+        return {"matches": [m.to_dict() for m in matches], "namespace": namespace or ""}
+
+    def delete(self, ids: Optional[Iterable[str]] = None, namespace: str = "", **_: Any) -> Dict[str, Any]:
+        self.store.delete(ids or [], namespace=namespace or "")
+        return {}
+
+    def describe_index_stats(self, **_: Any) -> Dict[str, Any]:
+        return self.store.describe_index_stats()
+
+
+def open_store(backend: str, *, dim: int, path: Optional[Path] = None, host: Optional[str] = None, api_key: Optional[str] = None) -> VectorStore:
+    backend = (backend or "memory").strip().lower()
+    if backend == "memory":
+        return MemoryVectorStore(dim)
+    if backend == "mmap":
+        return MmapVectorStore(Path(path or "vector_store"), dim)
+    if backend == "sqlite":
+        return SqliteVectorStore(Path(path or "vectors.sqlite3"), dim)
+    if backend in {"http", "pinecone"}:
+        if not host:
+            raise ValueError("The http backend needs a host URL")
+        return PineconeHTTPStore(host, api_key=api_key, dim=dim)
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+def upsert_rag_chunks(store: VectorStore, rag: Any, *, contract_id: str, namespace: str = CHUNKS_NAMESPACE) -> int:
+    """Copy a built LocalRAGIndex into `store`, with the Milestone 2 chunk metadata."""
+    if rag.vectors is None or not rag.chunks:
+        return 0
+    return store.upsert(
+        [
+            {"id": f"{contract_id}::{i}", "values": v, "metadata": {"contract_id": contract_id, "chunk_index": i, "text": c}}
+            for i, (c, v) in enumerate(zip(rag.chunks, np.asarray(rag.vectors)))
+        ],
+        namespace=namespace,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local vector store over the Pinecone REST protocol.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_serve = sub.add_parser("serve")
+    p_serve.add_argument("--backend", choices=["memory", "mmap", "sqlite"], default="sqlite")
+    p_serve.add_argument("--path", type=Path, default=None)
+    p_serve.add_argument("--dim", type=int, default=384)
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8765)
+    p_serve.add_argument("--api-key", default=None)
+    args = parser.parse_args()
+
+    store = open_store(args.backend, dim=args.dim, path=args.path)
+    server = serve(store, host=args.host, port=args.port, api_key=args.api_key)
+    print(f"Serving {args.backend} vector store on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from typing import Any, Dict, Optional
 
 import streamlit as st
 
-from services.history import delete_run, get_run, list_runs
+from services.history import delete_run, get_run, search_runs
 from utils.report_pdf import make_pdf_filename, run_to_pdf_bytes
 
 
@@ -29,25 +29,58 @@ def history_page():
     with c1:
         mode_filter = st.selectbox("Mode", ["All", "ask", "analysis"], index=0)
     with c2:
-        limit = st.slider("Max items", 5, 50, 15, 5)
+        limit = st.slider("Page size", 5, 50, 15, 5)
     with c3:
-        q = st.text_input("Search question", placeholder="type to filter by question text")
+        q = st.text_input("Search", placeholder="search questions, file names and report text")
+
+    d1, d2, d3 = st.columns([2, 2, 3])
+    with d3:
+        filename = st.text_input("File name", placeholder="filter by uploaded file name")
+        use_dates = st.checkbox("Filter by date", value=False)
+    date_from = date_to = None
+    if use_dates:
+        with d1:
+            date_from = st.date_input("From")
+        with d2:
+            date_to = st.date_input("To")
+
+    # Filtering and paging happen server-side; the cursor stack lets us go back a page.
+    filters = (mode_filter, int(limit), q.strip(), filename.strip(), str(date_from or ""), str(date_to or ""))
+    if st.session_state.get("history_filters") != filters:
+        st.session_state["history_filters"] = filters
+        st.session_state["history_cursors"] = [None]
+    cursors = st.session_state.setdefault("history_cursors", [None])
 
     try:
-        runs = list_runs(token=token, limit=int(limit))
+        page = search_runs(
+            token=token,
+            limit=int(limit),
+            cursor=cursors[-1],
+            mode=None if mode_filter == "All" else mode_filter,
+            q=q.strip() or None,
+            filename=filename.strip() or None,
+            date_from=date_from.isoformat() if date_from else None,
+            date_to=date_to.isoformat() if date_to else None,
+        )
     except Exception:
-        runs = []
-
-    if mode_filter != "All":
-        runs = [r for r in runs if (r.get("mode") or "").lower() == mode_filter]
-    if q:
-        qq = q.strip().lower()
-        runs = [r for r in runs if qq in (r.get("question") or "").lower()]
+        page = {"runs": [], "next_cursor": None}
+    runs = page.get("runs") or []
+    next_cursor = page.get("next_cursor")
 
     if not runs:
         st.info("No history entries match your filters yet.")
         return
 
+    p1, _, p3 = st.columns([2, 3, 2])
+    with p1:
+        if len(cursors) > 1 and st.button("← Newer", use_container_width=True, key="history_prev_page"):
+            cursors.pop()
+            st.rerun()
+    with p3:
+        if next_cursor and st.button("Older →", use_container_width=True, key="history_next_page"):
+            cursors.append(next_cursor)
+            st.rerun()
+
     for r in runs:
         run_id = int(r.get("id"))
         created_at = (r.get("created_at") or "").replace("T", " ")[:19]
@@ -24,14 +24,41 @@ def _safe_json(resp: requests.Response) -> Any:
 
 
 def list_runs(*, token: str, limit: int = 8) -> List[Dict[str, Any]]:
+    return search_runs(token=token, limit=limit)["runs"]
+
+
+def search_runs(
+    *,
+    token: str,
+    limit: int = 15,
+    cursor: Optional[str] = None,
+    mode: Optional[str] = None,
+    q: Optional[str] = None,
+    filename: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Server-side filtered history page: {"runs": [...], "next_cursor": str | None}."""
     url = f"{_base_url()}/history"
-    r = requests.get(url, params={"limit": int(limit)}, headers=_headers(token), timeout=30)
+    params: Dict[str, Any] = {"limit": int(limit)}
+    for key, value in (
+        ("cursor", cursor),
+        ("mode", mode),
+        ("q", q),
+        ("filename", filename),
+        ("date_from", date_from),
+        ("date_to", date_to),
+    ):
+        if value not in (None, ""):
+            params[key] = value
+    empty: Dict[str, Any] = {"runs": [], "next_cursor": None}
+    r = requests.get(url, params=params, headers=_headers(token), timeout=30)
     if r.status_code >= 400:
-        return []
+        return empty
     data = _safe_json(r)
     if isinstance(data, dict) and data.get("ok") and isinstance(data.get("runs"), list):
-        return data["runs"]
-    return []
+        return {"runs": data["runs"], "next_cursor": data.get("next_cursor")}
+    return empty
 
 
 def get_run(*, token: str, run_id: int) -> Optional[Dict[str, Any]]: